@@ -11,10 +11,10 @@ from flask import Flask, request, jsonify, send_file, make_response
 from flask_cors import CORS
 from typing import List, Dict, Optional, Tuple
 from datetime import datetime
-from concurrent.futures import ThreadPoolExecutor, as_completed, TimeoutError
+from concurrent.futures import TimeoutError
 from pathlib import Path
 from secondary_pipeline import SecondaryPipeline, get_secondary_pipeline
-from pipeline_integration import PipelineIntegration, BatchResultProcessor
+from pipeline_integration import PipelineIntegration, BatchResultProcessor, result_merge_key, apply_improvement
 import asyncio 
 
 # Core processing components
@@ -22,13 +22,19 @@ from parser import RadiologySemanticParser
 from nlp_processor import NLPProcessor
 from nhs_lookup_engine import NHSLookupEngine
 from reranker_manager import RerankerManager
-from database_models import DatabaseManager, CacheManager
+from database_models import DatabaseManager
 from feedback_training import FeedbackTrainingManager
 from parsing_utils import AbbreviationExpander, AnatomyExtractor, LateralityDetector, ContrastMapper
 ### FIX: Import detect_all_contexts for correct data flow. Context is determined from the input request.
 from context_detection import detect_all_contexts
 from preprocessing import initialize_preprocessor, preprocess_exam_name, get_preprocessor
-from cache_version import get_current_cache_version, format_cache_key
+from tiered_cache import get_cache
+from async_http import get_async_pipeline_config
+from async_runtime import run_coroutine
+from circuit_breaker import get_breaker, get_all_breaker_states
+from rate_limiter import priority_lane, get_all_rate_limiter_states, INTERACTIVE
+from deadline import request_deadline, get_deadline_config, remaining as deadline_remaining
+from llm_usage import UsageBudget, run_with_budget, get_usage_tracker
 from r2_cache_manager import R2CacheManager
 from validation_cache_manager import ValidationCacheManager
 from common.hash_keys import compute_request_hash_with_preimage
@@ -82,32 +88,13 @@ CORS(app,
 
 def run_async_task(coro):
     """
-    Safely runs an async coroutine in a synchronous context by creating,
-    managing, and gracefully shutting down a new event loop.
+    Runs an async coroutine from synchronous code on this worker's long-lived
+    background event loop (async_runtime.py) and waits for the result.
+    
+    The loop and its pooled clients are reused across calls; the caller's
+    deadline, rate-limit lane and LLM budget carry over into the coroutine.
     """
-    loop = asyncio.new_event_loop()
-    asyncio.set_event_loop(loop)
-    try:
-        result = loop.run_until_complete(coro)
-        
-        # --- START OF NEW, GRACEFUL SHUTDOWN LOGIC ---
-        
-        # Allow time for background cleanup tasks (like from httpx) to complete
-        # by running all pending tasks before closing the loop.
-        pending = asyncio.all_tasks(loop=loop)
-        if pending:
-            loop.run_until_complete(asyncio.gather(*pending))
-        
-        # Additional graceful shutdown step for async generators
-        loop.run_until_complete(loop.shutdown_asyncgens())
-        
-        # --- END OF NEW, GRACEFUL SHUTDOWN LOGIC ---
-        
-        return result
-    finally:
-        # Close the loop only after ensuring all tasks are done.
-        loop.close()
-        asyncio.set_event_loop(None)
+    return run_coroutine(coro)
 
 # =============================================================================
 # ### END OF ADDED CODE ###
@@ -230,30 +217,7 @@ def _initialize_app():
         logger.critical(f"Failed to initialize config manager: {e}")
         sys.exit(1)
     
-    class SimpleCache:
-        def __init__(self):
-            self.cache = {}
-            self.cache_version = get_current_cache_version()
-            logger.info(f"Initialized cache with version: {self.cache_version}")
-        
-        def _check_version_and_clear_if_needed(self):
-            current_version = get_current_cache_version()
-            if current_version != self.cache_version:
-                logger.info(f"Cache version changed from {self.cache_version} to {current_version}, clearing cache")
-                self.cache.clear()
-                self.cache_version = current_version
-        
-        def get(self, key):
-            self._check_version_and_clear_if_needed()
-            formatted_key = format_cache_key("simple_cache", self.cache_version, key)
-            return self.cache.get(formatted_key)
-        
-        def set(self, key, value):
-            self._check_version_and_clear_if_needed()
-            formatted_key = format_cache_key("simple_cache", self.cache_version, key)
-            self.cache[formatted_key] = value
-            return formatted_key
-    cache_manager = SimpleCache()
+    cache_manager = get_cache()
 
     model_processors = _initialize_model_processors()
     
@@ -380,14 +344,27 @@ def _refresh_validation_caches():
     else:
         logger.warning("[CACHE-REFRESH] ValidationCacheManager not available for cache refresh")
 
-def process_exam_request(exam_name: str, modality_code: Optional[str], nlp_processor: NLPProcessor, debug: bool = False, reranker_key: Optional[str] = None, data_source: Optional[str] = None, exam_code: Optional[str] = None, run_secondary_inline: bool = True) -> Dict:
-    """Central processing logic for a single exam."""
-    if debug:
-        logger.info(f"[DEBUG-FLOW] process_exam_request received debug=True for exam: {exam_name}")
+def _exam_error_response(exam_name: str, e: Exception) -> Dict:
+    """Error result for an exam whose processing raised (keeps batch output well-formed)."""
+    return {
+        "error": f"Internal processing error: {type(e).__name__}",
+        "message": str(e),
+        "exam_name": exam_name,
+        "clean_name": f"ERROR: {type(e).__name__}",
+        "excluded": True
+    }
+
+def _prepare_exam_input(exam_name: str, modality_code: Optional[str]) -> Tuple[Optional[Dict], str, bool, Dict]:
+    """
+    Shared input stage for single-exam processing: exclusion check, preprocessing and parsing.
     
+    Returns:
+        (early_result, cleaned_exam_name, is_input_simple, parsed_input_components);
+        early_result is set when the exam should not go through the engine.
+    """
     _ensure_app_is_initialized()
     if not nhs_lookup_engine or not semantic_parser:
-        return {'error': 'Core components not initialized'}
+        return {'error': 'Core components not initialized'}, exam_name, False, {}
 
     _preprocessor = get_preprocessor()
     
@@ -397,10 +374,155 @@ def process_exam_request(exam_name: str, modality_code: Optional[str], nlp_proce
             'message': f'Excluded non-clinical entry: {exam_name}',
             'exam_name': exam_name,
             'excluded': True
-        }
+        }, exam_name, False, {}
     
     cleaned_exam_name, is_input_simple = _preprocessor.preprocess_with_complexity(exam_name)
     parsed_input_components = semantic_parser.parse_exam_name(cleaned_exam_name, modality_code or 'Other')
+    return None, cleaned_exam_name, is_input_simple, parsed_input_components
+
+def _build_exam_response(nhs_result: Dict, exam_name: str, cleaned_exam_name: str, parsed_input_components: Dict, modality_code: Optional[str], data_source: Optional[str], exam_code: Optional[str], debug: bool = False) -> Dict:
+    """Format an engine result into the API response for a single exam."""
+    components_from_engine = nhs_result.get('components', {})
+    context_from_input = detect_all_contexts(cleaned_exam_name, parsed_input_components.get('anatomy', []))
+    matched_modalities = components_from_engine.get('modality', [])
+
+    final_result = {
+        'data_source': data_source or 'N/A',
+        'modality_code': [modality_code] if modality_code else [],
+        'exam_code': exam_code or 'N/A',
+        'exam_name': exam_name,
+        'clean_name': _medical_title_case(nhs_result.get('clean_name', cleaned_exam_name)),
+        'ambiguous': nhs_result.get('ambiguous', False),
+        'snomed': {
+            'found': bool(nhs_result.get('snomed_id')),
+            'fsn': nhs_result.get('snomed_fsn', ''),
+            'id': nhs_result.get('snomed_id', ''),
+            'laterality_concept_id': nhs_result.get('snomed_laterality_concept_id', ''),
+            'laterality_fsn': nhs_result.get('snomed_laterality_fsn', '')
+        },
+        'components': {
+            'anatomy': components_from_engine.get('anatomy', []),
+            'laterality': components_from_engine.get('laterality', []),
+            'contrast': components_from_engine.get('contrast', []),
+            'technique': components_from_engine.get('technique', []),
+            'modality': matched_modalities,
+            'confidence': components_from_engine.get('confidence', 0.0),
+            'gender_context': context_from_input['gender_context'],
+            'age_context': context_from_input['age_context'],
+            'clinical_context': context_from_input['clinical_context'],
+        },
+        # Add secondary pipeline status fields directly to the main result object
+        'secondary_pipeline_applied': nhs_result.get('secondary_pipeline_applied', False),
+        'secondary_pipeline_details': nhs_result.get('secondary_pipeline_details')
+    }
+    
+    if 'all_candidates' in nhs_result:
+        final_result['all_candidates'] = nhs_result['all_candidates']
+    
+    if 'reranker_cascade' in nhs_result:
+        final_result['reranker_cascade'] = nhs_result['reranker_cascade']
+    
+    if debug and 'debug' in nhs_result:
+        final_result['debug'] = nhs_result['debug']
+    
+    return final_result
+
+async def process_exam_request_async(exam_name: str, modality_code: Optional[str], reranker_key: Optional[str] = None, data_source: Optional[str] = None, exam_code: Optional[str] = None, deadline_seconds: Optional[float] = None) -> Dict:
+    """
+    Async counterpart of process_exam_request for batch processing.
+    
+    Awaits the engine's network calls instead of blocking a thread; the secondary
+    pipeline is never run inline (batches run it as a separate pass).
+    """
+    if deadline_seconds:
+        with request_deadline(deadline_seconds):
+            return await process_exam_request_async(exam_name, modality_code, reranker_key, data_source, exam_code)
+    
+    early_result, cleaned_exam_name, is_input_simple, parsed_input_components = _prepare_exam_input(exam_name, modality_code)
+    if early_result is not None:
+        return early_result
+    
+    try:
+        nhs_result = await nhs_lookup_engine.standardize_exam_async(cleaned_exam_name, parsed_input_components, is_input_simple=is_input_simple, reranker_key=reranker_key, data_source=data_source, exam_code=exam_code)
+        nhs_result['secondary_pipeline_applied'] = False
+        return _build_exam_response(nhs_result, exam_name, cleaned_exam_name, parsed_input_components, modality_code, data_source, exam_code)
+    except Exception as e:
+        logger.error(f"FATAL ERROR in process_exam_request_async for '{exam_name}': {e}", exc_info=True)
+        return _exam_error_response(exam_name, e)
+
+def process_exam_requests_batch(exams: List[Dict], reranker_key: Optional[str] = None, max_workers: int = 2, deadline_seconds: Optional[float] = None) -> List[Tuple[Optional[Dict], Optional[Exception]]]:
+    """
+    Batch counterpart of process_exam_request for the threaded batch path.
+
+    The exams run through the engine together so their reranker calls are packed
+    (NHSLookupEngine.standardize_exams_batch); the secondary pipeline is never run
+    inline. Returns (result, error) per exam, aligned with exams.
+
+    deadline_seconds is a per-exam budget. The exams advance in lockstep and share
+    every round's wall time, so the chunk runs under one deadline of
+    deadline_seconds * len(exams) - the same total the exams would get one by one.
+    """
+    if deadline_seconds:
+        with request_deadline(deadline_seconds * max(1, len(exams))):
+            return process_exam_requests_batch(exams, reranker_key, max_workers)
+
+    outcomes: List[Tuple[Optional[Dict], Optional[Exception]]] = [(None, None)] * len(exams)
+    prepared = []
+    for idx, exam in enumerate(exams):
+        exam_name = exam.get("EXAM_NAME") or exam.get("exam_name")
+        modality_code = exam.get("MODALITY_CODE") or exam.get("modality_code")
+        try:
+            early_result, cleaned_exam_name, is_input_simple, parsed_input_components = _prepare_exam_input(exam_name, modality_code)
+        except Exception as e:
+            outcomes[idx] = (None, e)
+            continue
+        if early_result is not None:
+            outcomes[idx] = (early_result, None)
+            continue
+        prepared.append((idx, exam_name, modality_code, cleaned_exam_name, is_input_simple, parsed_input_components))
+
+    engine_outcomes = nhs_lookup_engine.standardize_exams_batch([
+        {
+            'input_exam': cleaned_exam_name,
+            'extracted_input_components': parsed_input_components,
+            'is_input_simple': is_input_simple,
+            'reranker_key': reranker_key,
+            'data_source': exams[idx].get("DATA_SOURCE") or exams[idx].get("data_source"),
+            'exam_code': exams[idx].get("EXAM_CODE") or exams[idx].get("exam_code"),
+        }
+        for idx, _, _, cleaned_exam_name, is_input_simple, parsed_input_components in prepared
+    ], max_workers=max_workers)
+
+    for (idx, exam_name, modality_code, cleaned_exam_name, _, parsed_input_components), (nhs_result, error) in zip(prepared, engine_outcomes):
+        try:
+            if error is not None:
+                raise error
+            nhs_result['secondary_pipeline_applied'] = False
+            outcomes[idx] = (_build_exam_response(nhs_result, exam_name, cleaned_exam_name, parsed_input_components, modality_code,
+                                                  exams[idx].get("DATA_SOURCE") or exams[idx].get("data_source"),
+                                                  exams[idx].get("EXAM_CODE") or exams[idx].get("exam_code")), None)
+        except Exception as e:
+            logger.error(f"FATAL ERROR in process_exam_requests_batch for '{exam_name}': {e}", exc_info=True)
+            outcomes[idx] = (_exam_error_response(exam_name, e), None)
+    return outcomes
+
+def process_exam_request(exam_name: str, modality_code: Optional[str], nlp_processor: NLPProcessor, debug: bool = False, reranker_key: Optional[str] = None, data_source: Optional[str] = None, exam_code: Optional[str] = None, run_secondary_inline: bool = True, deadline_seconds: Optional[float] = None) -> Dict:
+    """
+    Central processing logic for a single exam.
+    
+    deadline_seconds bounds the whole request: embedding, reranking and the
+    inline secondary pipeline size their timeouts from the time left.
+    """
+    if deadline_seconds:
+        with request_deadline(deadline_seconds):
+            return process_exam_request(exam_name, modality_code, nlp_processor, debug, reranker_key, data_source, exam_code, run_secondary_inline)
+    
+    if debug:
+        logger.info(f"[DEBUG-FLOW] process_exam_request received debug=True for exam: {exam_name}")
+    
+    early_result, cleaned_exam_name, is_input_simple, parsed_input_components = _prepare_exam_input(exam_name, modality_code)
+    if early_result is not None:
+        return early_result
     
     lookup_engine_to_use = nhs_lookup_engine
     
@@ -426,7 +548,10 @@ def process_exam_request(exam_name: str, modality_code: Optional[str], nlp_proce
             confidence < 0.8 or  # Use a clear threshold
             nhs_result.get('semantic_similarity_safeguard', {}).get('applied', False)
         )
-        if run_secondary_inline and should_apply_secondary and SECONDARY_PIPELINE_AVAILABLE:
+        # Not worth starting the ensemble if the request deadline would cut it off
+        time_left = deadline_remaining()
+        secondary_out_of_time = time_left is not None and time_left < get_deadline_config().get('secondary_min_seconds', 8)
+        if run_secondary_inline and should_apply_secondary and SECONDARY_PIPELINE_AVAILABLE and not secondary_out_of_time:
             # Ensure the error for non-clinical exams is handled first
             if nhs_result.get('error') == 'EXCLUDED_NON_CLINICAL':
                 logger.info(f"Engine excluded '{exam_name}' as non-clinical. Formatting final response.")
@@ -475,12 +600,17 @@ def process_exam_request(exam_name: str, modality_code: Optional[str], nlp_proce
                         'improved': True,
                         'original_confidence': confidence,
                         'consensus_confidence': secondary_result.consensus_confidence,
-                        'agreement_score': secondary_result.agreement_score
+                        'agreement_score': secondary_result.agreement_score,
+                        'cached': secondary_result.cached
                     }
                 else:
                     logger.info(f"[SECONDARY-PIPELINE] No improvement from secondary pipeline for: {exam_name}")
                     nhs_result['secondary_pipeline_applied'] = True
-                    nhs_result['secondary_pipeline_details'] = {'improved': False, 'reason': 'No consensus improvement found'}
+                    nhs_result['secondary_pipeline_details'] = {
+                        'improved': False,
+                        'reason': 'No consensus improvement found',
+                        'cached': bool(ensemble_results and ensemble_results[0].cached)
+                    }
 
             except Exception as e:
                 logger.error(f"Error during single-exam secondary pipeline processing: {e}", exc_info=True)
@@ -489,63 +619,20 @@ def process_exam_request(exam_name: str, modality_code: Optional[str], nlp_proce
 
         else:
             nhs_result['secondary_pipeline_applied'] = False
+            if run_secondary_inline and should_apply_secondary and secondary_out_of_time:
+                logger.info(f"[SECONDARY-PIPELINE] Skipping for '{exam_name}': {time_left:.1f}s left on request deadline")
+                nhs_result['secondary_pipeline_details'] = {'improved': False, 'reason': 'Skipped: request deadline'}
 
         # =============================================================================
         # ### END OF REFACTORED LOGIC ###
         # =============================================================================
 
-        components_from_engine = nhs_result.get('components', {})
-        context_from_input = detect_all_contexts(cleaned_exam_name, parsed_input_components.get('anatomy', []))
-        matched_modalities = components_from_engine.get('modality', [])
-
-        final_result = {
-            'data_source': data_source or 'N/A',
-            'modality_code': [modality_code] if modality_code else [],
-            'exam_code': exam_code or 'N/A',
-            'exam_name': exam_name,
-            'clean_name': _medical_title_case(nhs_result.get('clean_name', cleaned_exam_name)),
-            'ambiguous': nhs_result.get('ambiguous', False),
-            'snomed': {
-                'found': bool(nhs_result.get('snomed_id')),
-                'fsn': nhs_result.get('snomed_fsn', ''),
-                'id': nhs_result.get('snomed_id', ''),
-                'laterality_concept_id': nhs_result.get('snomed_laterality_concept_id', ''),
-                'laterality_fsn': nhs_result.get('snomed_laterality_fsn', '')
-            },
-            'components': {
-                'anatomy': components_from_engine.get('anatomy', []),
-                'laterality': components_from_engine.get('laterality', []),
-                'contrast': components_from_engine.get('contrast', []),
-                'technique': components_from_engine.get('technique', []),
-                'modality': matched_modalities,
-                'confidence': components_from_engine.get('confidence', 0.0),
-                'gender_context': context_from_input['gender_context'],
-                'age_context': context_from_input['age_context'],
-                'clinical_context': context_from_input['clinical_context'],
-            },
-            # Add secondary pipeline status fields directly to the main result object
-            'secondary_pipeline_applied': nhs_result.get('secondary_pipeline_applied', False),
-            'secondary_pipeline_details': nhs_result.get('secondary_pipeline_details')
-        }
-        
-        if 'all_candidates' in nhs_result:
-            final_result['all_candidates'] = nhs_result['all_candidates']
-        
-        if debug and 'debug' in nhs_result:
-            final_result['debug'] = nhs_result['debug']
-        
-        return final_result
+        return _build_exam_response(nhs_result, exam_name, cleaned_exam_name, parsed_input_components, modality_code, data_source, exam_code, debug)
 
     except Exception as e:
         # This is a critical safeguard. If anything goes wrong, return a proper error structure.
         logger.error(f"FATAL ERROR in process_exam_request for '{exam_name}': {e}", exc_info=True)
-        return {
-            "error": f"Internal processing error: {type(e).__name__}",
-            "message": str(e),
-            "exam_name": exam_name,
-            "clean_name": f"ERROR: {type(e).__name__}",
-            "excluded": True
-        }
+        return _exam_error_response(exam_name, e)
     
     
     ### FIX: The context (gender, age, etc.) is a property of the INPUT request, not the matched NHS entry.
@@ -603,10 +690,12 @@ def process_exam_request(exam_name: str, modality_code: Optional[str], nlp_proce
 @app.route('/health', methods=['GET'])
 def health_check():
     """Health check endpoint for monitoring service availability"""
+    backends = get_all_breaker_states()
     return jsonify({
         'status': 'healthy', 
         'timestamp': datetime.now().isoformat(), 
-        'app_initialized': _app_initialized
+        'app_initialized': _app_initialized,
+        'degraded_backends': [name for name, state in backends.items() if state['state'] != 'closed']
     })
 
 @app.route('/initialization-status', methods=['GET'])
@@ -630,6 +719,8 @@ def initialization_status():
         
         if reranker_manager:
             status['available_rerankers'] = len(reranker_manager.get_available_rerankers())
+        status['backends'] = get_all_breaker_states()
+        status['rate_limits'] = get_all_rate_limiter_states()
     else:
         status.update({
             'status': 'initializing',
@@ -659,6 +750,7 @@ def warmup_api():
         
         if reranker_manager:
             warmup_status['available_rerankers'] = len(reranker_manager.get_available_rerankers())
+        warmup_status['backends'] = get_all_breaker_states()
         
         elapsed_time = time.time() - start_time
         logger.info(f"✅ API warmup completed in {elapsed_time:.2f}s")
@@ -723,7 +815,8 @@ def list_available_models():
                 'name': model_config['hf_name'],
                 'status': model_config['status'],
                 'description': model_config['description'],
-                'embeddings_loaded': embeddings_loaded
+                'embeddings_loaded': embeddings_loaded,
+                'circuit': get_breaker(f"hf:{model_key}").state
             }
         
         # Get reranker information
@@ -739,6 +832,7 @@ def list_available_models():
             'default_model': 'retriever',
             'rerankers': reranker_info,
             'default_reranker': default_reranker,
+            'backends': get_all_breaker_states(),
             'usage': 'Add "model": "model_key" and "reranker": "reranker_key" to your request',
             'app_initialized': _app_initialized
         })
@@ -820,6 +914,59 @@ def reload_validation_cache():
             'timestamp': time.time()
         }), 500
 
+@app.route('/admin/cache-stats', methods=['GET'])
+def cache_stats():
+    """
+    Admin endpoint reporting tiered cache usage.
+    
+    Returns overall memory/byte usage plus per-namespace hit, miss,
+    eviction and expiration counts (and SQLite tier entry counts if enabled).
+    """
+    try:
+        cache = cache_manager or get_cache()
+        if request.args.get('cleanup', '').lower() in ('true', '1', 'yes'):
+            cache.cleanup_expired()
+        return jsonify({
+            'status': 'success',
+            'cache': cache.stats(),
+            'rerank_score_cache': reranker_manager.get_cache_stats() if reranker_manager else None,
+            'timestamp': time.time()
+        }), 200
+    except Exception as e:
+        logger.error(f"Failed to collect cache stats via admin endpoint: {e}")
+        return jsonify({
+            'status': 'error',
+            'error': str(e),
+            'timestamp': time.time()
+        }), 500
+
+@app.route('/admin/llm-usage', methods=['GET'])
+def llm_usage_stats():
+    """
+    Admin endpoint reporting LLM usage per model since startup (or the last reset).
+    
+    Returns call/error counts, prompt and completion tokens, cost and latency
+    (average, p50, p95) for every OpenRouter model used by reranking or the
+    secondary pipeline. Pass ?reset=true to start a new measurement window.
+    """
+    try:
+        tracker = get_usage_tracker()
+        usage = tracker.snapshot()
+        if request.args.get('reset', '').lower() in ('true', '1', 'yes'):
+            tracker.reset()
+        return jsonify({
+            'status': 'success',
+            'llm_usage': usage,
+            'timestamp': time.time()
+        }), 200
+    except Exception as e:
+        logger.error(f"Failed to collect LLM usage via admin endpoint: {e}")
+        return jsonify({
+            'status': 'error',
+            'error': str(e),
+            'timestamp': time.time()
+        }), 500
+
 @app.route('/config/status', methods=['GET'])
 def config_status():
     """Get configuration source and cache status."""
@@ -1170,7 +1317,13 @@ def parse_enhanced():
             }
             return jsonify(result)
         
-        result = process_exam_request(exam_name, modality_code, selected_nlp_processor, debug=debug, reranker_key=reranker_key, data_source=data_source, exam_code=exam_code)
+        # Interactive lane: outbound model calls jump ahead of queued batch traffic,
+        # and the whole request is held to the interactive latency ceiling
+        interactive_seconds = get_deadline_config().get('interactive_seconds', 30)
+        remaining_budget = interactive_seconds - (time.time() - start_time) if interactive_seconds else None
+        with priority_lane(INTERACTIVE):
+            result = process_exam_request(exam_name, modality_code, selected_nlp_processor, debug=debug, reranker_key=reranker_key, data_source=data_source, exam_code=exam_code,
+                                          deadline_seconds=max(remaining_budget, 1.0) if remaining_budget is not None else None)
         
         # Add transparent flags to indicate this was NOT a cached result
         result['cached_skip'] = False
@@ -1267,6 +1420,38 @@ def _perform_preflight_check(exam_dict, model_key, reranker_key, debug=False):
     return None, False, request_hash
 
 
+def _write_consolidated_results(results_filepath: str, consolidated_filepath: str, metadata: Dict, improvements: Dict) -> int:
+    """
+    Stream the batch JSONL into the consolidated JSON artifact, one row at a time.
+    
+    Secondary pipeline improvements are joined by result_merge_key (request_hash),
+    so memory stays flat regardless of batch size and rows sharing an exam name
+    don't collide. Rows are written compactly. Returns the number of rows merged.
+    """
+    merged_count = 0
+    with open(consolidated_filepath, 'w', encoding='utf-8') as f_out:
+        f_out.write('{"metadata":')
+        json.dump(metadata, f_out, separators=(',', ':'))
+        f_out.write(',"results":[')
+        
+        with open(results_filepath, 'r', encoding='utf-8') as f_in:
+            first = True
+            for line in f_in:
+                if not line.strip():
+                    continue
+                record = json.loads(line)
+                improvement = improvements.get(result_merge_key(record)) if improvements and 'output' in record else None
+                if improvement:
+                    apply_improvement(record, improvement)
+                    merged_count += 1
+                if not first:
+                    f_out.write(',')
+                f_out.write(json.dumps(record, separators=(',', ':')))
+                first = False
+        
+        f_out.write(']}')
+    return merged_count
+
 def _process_batch_background(data, start_time, batch_id):
     """Background function to process a batch of exams."""
     try:
@@ -1293,6 +1478,35 @@ def _process_batch_background(data, start_time, batch_id):
         except Exception as progress_error:
             logger.error(f"Failed to write error progress: {progress_error}")
 
+async def _process_exams_async(exams: List[Dict], reranker_key: Optional[str], max_concurrency: int, on_result):
+    """
+    Run a chunk of batch exams concurrently on the current event loop.
+    
+    At most max_concurrency exams are in flight; on_result(exam, result, error)
+    is called as each one finishes.
+    """
+    semaphore = asyncio.Semaphore(max_concurrency)
+    exam_deadline = get_deadline_config().get('batch_exam_seconds')
+    
+    async def run_one(exam):
+        async with semaphore:
+            try:
+                result = await process_exam_request_async(
+                    exam.get("EXAM_NAME") or exam.get("exam_name"),
+                    exam.get("MODALITY_CODE") or exam.get("modality_code"),
+                    reranker_key,
+                    exam.get("DATA_SOURCE") or exam.get("data_source"),
+                    exam.get("EXAM_CODE") or exam.get("exam_code"),
+                    deadline_seconds=exam_deadline
+                )
+                return exam, result, None
+            except Exception as e:
+                return exam, None, e
+    
+    for next_done in asyncio.as_completed([run_one(exam) for exam in exams]):
+        exam, result, error = await next_done
+        on_result(exam, result, error)
+
 def _process_batch(data, start_time, batch_id=None, background_mode=False):
     """Helper function to process a batch of exams."""
     # Use the explicit background_mode parameter to determine mode
@@ -1308,6 +1522,8 @@ def _process_batch(data, start_time, batch_id=None, background_mode=False):
     model_key = data.get('model', 'retriever')
     reranker_key = data.get('reranker', reranker_manager.get_default_reranker_key() if reranker_manager else 'medcpt')
     enable_secondary = data.get('enable_secondary_pipeline', False)
+    # LLM token/cost accounting for this batch; optional 'llm_budget' overrides the configured limits
+    llm_budget = UsageBudget.from_config(data.get('llm_budget'))
     
     # Use provided batch_id or generate new one (for backwards compatibility)
     if batch_id is None:
@@ -1390,7 +1606,21 @@ def _process_batch(data, start_time, batch_id=None, background_mode=False):
         except Exception as e:
             logger.warning(f"Could not pre-load config from R2 ({e}), secondary pipeline will load individually")
     
-    chunk_size = 10
+    # Low-confidence results are queued for adjudication as they are produced, so the
+    # secondary pipeline runs alongside the remaining primary work
+    secondary_processor = None
+    if enable_secondary and SECONDARY_PIPELINE_AVAILABLE:
+        _initialize_secondary_pipeline()
+        if secondary_integration:
+            logger.info("Starting concurrent secondary pipeline processing for the batch...")
+            secondary_processor = run_with_budget(llm_budget, secondary_integration.start_concurrent_processing)
+    
+    # Async mode keeps many exams in flight on one event loop instead of 2 blocking threads
+    async_config = get_async_pipeline_config()
+    use_async = bool(data.get('async_processing', async_config.get('enabled', False)))
+    async_concurrency = max(1, int(async_config.get('max_concurrency', 32)))
+    
+    chunk_size = max(10, async_concurrency * 2) if use_async else 10
     total_exams = len(exams_to_process)
     chunks = [exams_to_process[i:i + chunk_size] for i in range(0, total_exams, chunk_size)]
     
@@ -1399,110 +1629,112 @@ def _process_batch(data, start_time, batch_id=None, background_mode=False):
     cpu_cnt = os.cpu_count() or 1
     max_workers = min(2, max(1, cpu_cnt))
     logger.info(f"Processing {total_exams} exams in {len(chunks)} chunks of {chunk_size}")
-    logger.info(f"ThreadPoolExecutor using max_workers={max_workers}")
+    if use_async:
+        logger.info(f"Async processing with max_concurrency={async_concurrency}")
+    else:
+        logger.info(f"Batched engine path with max_workers={max_workers} for embedding calls")
 
-    with open(results_filepath, 'w', encoding='utf-8') as f_out:
-        for chunk_idx, chunk in enumerate(chunks):
-            logger.info(f"Processing chunk {chunk_idx + 1}/{len(chunks)} ({len(chunk)} exams)")
+    try:
+        with open(results_filepath, 'w', encoding='utf-8') as f_out:
+            for chunk_idx, chunk in enumerate(chunks):
+                logger.info(f"Processing chunk {chunk_idx + 1}/{len(chunks)} ({len(chunk)} exams)")
             
-            # Perform preflight checking for all exams in this chunk
-            cached_results = []
-            exams_for_processing = []
-            exam_hash_map = {}  # Map original exam to its hash for transparent flagging
+                # Perform preflight checking for all exams in this chunk
+                cached_results = []
+                exams_for_processing = []
+                exam_hash_map = {}  # Map original exam to its hash for transparent flagging
             
-            for exam in chunk:
-                cache_result, is_cache_hit, request_hash = _perform_preflight_check(exam, model_key, reranker_key)
+                for exam in chunk:
+                    cache_result, is_cache_hit, request_hash = _perform_preflight_check(exam, model_key, reranker_key)
                 
-                if is_cache_hit:
-                    # Handle cache hit immediately
-                    result_entry = {
-                        "input": exam,
-                        "output": cache_result,
-                        "status": "success"
-                    }
-                    cached_results.append(result_entry)
-                    success_count += 1
-                    cache_hits_count += 1
+                    if is_cache_hit:
+                        # Handle cache hit immediately
+                        result_entry = {
+                            "input": exam,
+                            "output": cache_result,
+                            "status": "success"
+                        }
+                        cached_results.append(result_entry)
+                        success_count += 1
+                        cache_hits_count += 1
                     
-                    # Track rejection vs approval caches
-                    if cache_result.get('error') == 'PREFLIGHT_REJECTED':
-                        cache_rejects_count += 1
-                else:
-                    # No cache hit - add to processing queue
-                    exams_for_processing.append(exam)
-                    if request_hash:
-                        exam_hash_map[id(exam)] = request_hash
+                        # Track rejection vs approval caches
+                        if cache_result.get('error') == 'PREFLIGHT_REJECTED':
+                            cache_rejects_count += 1
+                    else:
+                        # No cache hit - add to processing queue
+                        exams_for_processing.append(exam)
+                        if request_hash:
+                            exam_hash_map[id(exam)] = request_hash
             
-            # Write all cached results first
-            for cached_entry in cached_results:
-                f_out.write(json.dumps(cached_entry) + '\n')
-                f_out.flush()
+                # Write all cached results first
+                for cached_entry in cached_results:
+                    f_out.write(json.dumps(cached_entry) + '\n')
+                    f_out.flush()
+                    if secondary_processor:
+                        secondary_processor.submit(cached_entry)
             
-            logger.info(f"Chunk {chunk_idx + 1}: {len(cached_results)} cache hits, {len(exams_for_processing)} to process")
+                logger.info(f"Chunk {chunk_idx + 1}: {len(cached_results)} cache hits, {len(exams_for_processing)} to process")
             
-            # Only process exams that weren't cached
-            if exams_for_processing:
-                with ThreadPoolExecutor(max_workers=max_workers) as executor:
-                    future_to_exam = {
-                        executor.submit(
-                            process_exam_request, 
-                            exam.get("EXAM_NAME") or exam.get("exam_name"), 
-                            exam.get("MODALITY_CODE") or exam.get("modality_code"), 
-                            selected_nlp_processor, 
-                            False, 
-                            reranker_key, 
-                            exam.get("DATA_SOURCE") or exam.get("data_source"), 
-                            exam.get("EXAM_CODE") or exam.get("exam_code"),
-                            run_secondary_inline=False
-                        ): exam 
-                        for exam in exams_for_processing
-                    }
+                def record_processed(original_exam, processed_result=None, error=None):
+                    """Write one processed exam (or its error) and update progress."""
+                    nonlocal success_count, error_count
+                    if error is None:
+                        # Add transparent flags for non-cached results
+                        processed_result['cached_skip'] = False
+                        processed_result['cache_type'] = None
+                        request_hash = exam_hash_map.get(id(original_exam))
+                        if request_hash:
+                            processed_result['request_hash'] = request_hash
+                        if 'metadata' not in processed_result:
+                            processed_result['metadata'] = {}
+                        processed_result['metadata']['preflight_skipped'] = False
                     
-                    chunk_completed = 0
-                    per_future_timeout = 60
-
-                    for future in as_completed(future_to_exam):
-                        original_exam = future_to_exam[future]
-                        try:
-                            processed_result = future.result(timeout=per_future_timeout)
-                            
-                            # Add transparent flags for non-cached results
-                            processed_result['cached_skip'] = False
-                            processed_result['cache_type'] = None
-                            request_hash = exam_hash_map.get(id(original_exam))
-                            if request_hash:
-                                processed_result['request_hash'] = request_hash
-                            if 'metadata' not in processed_result:
-                                processed_result['metadata'] = {}
-                            processed_result['metadata']['preflight_skipped'] = False
-                            
-                            result_entry = {
-                                "input": original_exam,
-                                "output": processed_result,
-                                "status": "success"
-                            }
-                            f_out.write(json.dumps(result_entry) + '\n')
-                            f_out.flush()
-                            success_count += 1
-                        except Exception as e:
-                            logger.error(f"Error processing exam '{original_exam.get('exam_name')}': {e}", exc_info=True)
-                            error_entry = {
-                                "input": original_exam,
-                                "error": str(e),
-                                "status": "error"
-                            }
-                            f_out.write(json.dumps(error_entry) + '\n')
-                            f_out.flush()
-                            error_count += 1
-                        finally:
-                            chunk_completed += 1
-                            update_progress(success_count + error_count, total_exams, success_count, error_count)
+                        result_entry = {
+                            "input": original_exam,
+                            "output": processed_result,
+                            "status": "success"
+                        }
+                        f_out.write(json.dumps(result_entry) + '\n')
+                        f_out.flush()
+                        success_count += 1
+                        if secondary_processor:
+                            secondary_processor.submit(result_entry)
+                    else:
+                        logger.error(f"Error processing exam '{original_exam.get('exam_name')}': {error}", exc_info=error)
+                        error_entry = {
+                            "input": original_exam,
+                            "error": str(error),
+                            "status": "error"
+                        }
+                        f_out.write(json.dumps(error_entry) + '\n')
+                        f_out.flush()
+                        error_count += 1
+                    update_progress(success_count + error_count, total_exams, success_count, error_count)
+            
+                # Only process exams that weren't cached
+                if exams_for_processing and use_async:
+                    # Keep up to async_concurrency exams in flight on one event loop
+                    run_with_budget(llm_budget, run_async_task,
+                                    _process_exams_async(exams_for_processing, reranker_key, async_concurrency, record_processed))
+                elif exams_for_processing:
+                    # The chunk runs through the engine together so its reranker calls are packed into batch requests
+                    exam_deadline = get_deadline_config().get('batch_exam_seconds')
+                    outcomes = run_with_budget(llm_budget, process_exam_requests_batch, exams_for_processing, reranker_key,
+                                               max_workers=max_workers, deadline_seconds=exam_deadline)
+                    for original_exam, (processed_result, error) in zip(exams_for_processing, outcomes):
+                        record_processed(original_exam, processed_result, error)
             
-            # Update progress for the entire chunk (including cached results)
-            update_progress(success_count + error_count, total_exams, success_count, error_count)
+                # Update progress for the entire chunk (including cached results)
+                update_progress(success_count + error_count, total_exams, success_count, error_count)
             
-            logger.info(f"Completed chunk {chunk_idx + 1}/{len(chunks)}: {len(cached_results)} cached, {len(exams_for_processing)} processed")
-            logger.info(f"Overall progress: {success_count + error_count}/{total_exams} exams processed")
+                logger.info(f"Completed chunk {chunk_idx + 1}/{len(chunks)}: {len(cached_results)} cached, {len(exams_for_processing)} processed")
+                logger.info(f"Overall progress: {success_count + error_count}/{total_exams} exams processed")
+    except Exception:
+        if secondary_processor is not None:
+            # Don't leave the consumer adjudicating rows from a batch that failed
+            secondary_processor.cancel()
+        raise
 
     processing_time_ms = int((time.time() - start_time) * 1000)
     logger.info(f"Batch processing finished in {processing_time_ms}ms. Success: {success_count}, Errors: {error_count}")
@@ -1524,6 +1756,19 @@ def _process_batch(data, start_time, batch_id=None, background_mode=False):
     except Exception as e:
         logger.warning(f"Failed to clean up progress file: {e}")
 
+    # Adjudication has been running alongside the primary batch; wait for the stragglers
+    secondary_report = None
+    improvements = {}
+    if secondary_processor is not None:
+        logger.info(f"Waiting for secondary pipeline to finish ({secondary_processor.queued} low-confidence results queued)...")
+        try:
+            # Bounded by scheduling.max_wall_seconds so a stuck adjudication can't hold the batch open
+            secondary_report = secondary_processor.finish(timeout=secondary_processor.finish_timeout())
+            improvements = secondary_report.pop('improvements', {}) or {}
+        except Exception as e:
+            logger.error(f"Secondary pipeline batch processing failed: {e}", exc_info=True)
+            secondary_report = {"error": str(e)}
+
     r2_upload_success = False
     r2_url = None
     consolidated_filepath = None
@@ -1552,24 +1797,9 @@ def _process_batch(data, start_time, batch_id=None, background_mode=False):
             consolidated_filepath = os.path.join(output_dir, consolidated_filename)
 
             logger.info(f"Streaming results to consolidated file: {consolidated_filepath}")
-            with open(consolidated_filepath, 'w', encoding='utf-8') as f_out:
-                f_out.write('{"metadata": ')
-                json.dump(metadata, f_out)
-                f_out.write(', "results": [')
-
-                # Stream-read the JSONL and write to the new JSON file
-                with open(results_filepath, 'r', encoding='utf-8') as f_in:
-                    first = True
-                    for line in f_in:
-                        if line.strip():
-                            if not first:
-                                f_out.write(',')
-                            f_out.write(line.strip())
-                            first = False
-                
-                f_out.write(']}')
+            merged_count = _write_consolidated_results(results_filepath, consolidated_filepath, metadata, improvements)
             
-            logger.info("Consolidated file created successfully.")
+            logger.info(f"Consolidated file created successfully ({merged_count} secondary pipeline results merged).")
 
             # Consolidated file ready for R2 upload
             logger.info("Consolidated file created and ready for R2 upload")
@@ -1579,79 +1809,9 @@ def _process_batch(data, start_time, batch_id=None, background_mode=False):
     else:
         logger.warning("R2 not available - results only stored locally")
 
-    secondary_report = None
-    merged_filepath = None
-    
-    if enable_secondary and SECONDARY_PIPELINE_AVAILABLE:
-        _initialize_secondary_pipeline()
-        if secondary_integration and secondary_integration.is_enabled():
-            logger.info("Starting secondary pipeline processing for the entire batch...")
-            
-            # 1. Load all results from the primary processing stage
-            all_results = []
-            if os.path.exists(results_filepath):
-                with open(results_filepath, 'r', encoding='utf-8') as f_in:
-                    for line in f_in:
-                        if line.strip():
-                            all_results.append(json.loads(line.strip()))
-            
-            if all_results:
-                try:
-                    # 2. Trigger secondary processing ONCE with all results
-                    # The integration layer will filter for low-confidence items internally
-                    secondary_report = run_async_task(
-                        secondary_integration.trigger_secondary_processing(all_results)
-                    )
-                    
-                    # 3. If there were improvements, merge them into a new file
-                    if secondary_report and secondary_report.get('results'):
-                        logger.info("Merging secondary pipeline improvements into final results...")
-                        
-                        # Load the original consolidated data to modify it
-                        with open(consolidated_filepath, 'r', encoding='utf-8') as f:
-                            original_data = json.load(f)
-                        
-                        # Create a map for efficient lookups
-                        results_map = {res['input']['exam_name']: res for res in original_data['results'] if 'exam_name' in res.get('input', {})}
-                        
-                        for secondary_res_dict in secondary_report['results']:
-                            # The original result is nested inside the ensemble result
-                            original_full_record = secondary_res_dict.get('original_result', {})
-                            exam_name = original_full_record.get('input', {}).get('exam_name')
-                            
-                            if exam_name and exam_name in results_map:
-                                result_to_update = results_map[exam_name]
-                                output_to_update = result_to_update['output']
-
-                                # Overwrite with improved data
-                                output_to_update['clean_name'] = secondary_res_dict['consensus_best_match_procedure_name']
-                                output_to_update['snomed']['id'] = secondary_res_dict['consensus_best_match_snomed_id']
-                                output_to_update['snomed']['fsn'] = secondary_res_dict.get('consensus_snomed_fsn')
-                                output_to_update['components']['confidence'] = secondary_res_dict['consensus_confidence']
-                                
-                                # Add metadata for transparency
-                                output_to_update['secondary_pipeline_applied'] = True
-                                output_to_update['secondary_pipeline_details'] = {
-                                    'improved': secondary_res_dict.get('improved', False),
-                                    'original_confidence': secondary_res_dict.get('original_result', {}).get('output', {}).get('components', {}).get('confidence'),
-                                    'consensus_confidence': secondary_res_dict.get('consensus_confidence'),
-                                    'agreement_score': secondary_res_dict.get('agreement_score'),
-                                }
-                        
-                        # Reconstruct the results list and save to a new merged file
-                        original_data['results'] = list(results_map.values())
-                        merged_filepath = consolidated_filepath.replace('.json', '_merged.json')
-                        with open(merged_filepath, 'w', encoding='utf-8') as f:
-                            json.dump(original_data, f, indent=2)
-                        
-                        logger.info(f"Successfully merged results into: {merged_filepath}")
-                        
-                except Exception as e:
-                    logger.error(f"Secondary pipeline batch processing failed: {e}", exc_info=True)
-                    secondary_report = {"error": str(e)}
 
     # Upload the consolidated file to R2
-    final_upload_path = merged_filepath if merged_filepath else consolidated_filepath
+    final_upload_path = consolidated_filepath
     if r2_manager and final_upload_path and os.path.exists(final_upload_path):
         try:
             final_filename = os.path.basename(consolidated_filepath)
@@ -1678,6 +1838,8 @@ def _process_batch(data, start_time, batch_id=None, background_mode=False):
     # Avoid returning in-memory results or file references to deleted files.
     logger.info(f"Batch processing complete. Returning response with R2 URL: {r2_url}")
     
+    llm_budget_summary = llm_budget.summary()
+    secondary_skipped = (secondary_report or {}).get('skipped')
     response_data = {
         "message": "Batch processing complete. Results are available at the provided R2 URL." + (" Secondary pipeline applied inline to low-confidence results." if enable_secondary else ""),
         "batch_id": batch_id,
@@ -1695,7 +1857,9 @@ def _process_batch(data, start_time, batch_id=None, background_mode=False):
             "cache_rejects": cache_rejects_count,
             "cache_approvals": cache_hits_count - cache_rejects_count,
             "cache_hit_rate": (cache_hits_count / total_exams * 100) if total_exams > 0 else 0,
-            "preflight_enabled": True
+            "preflight_enabled": True,
+            "llm_usage": llm_budget_summary,
+            "secondary_skipped": secondary_skipped
         },
         "secondary_pipeline_summary": "Secondary pipeline processing handled inline per exam" if enable_secondary else None
     }
@@ -1723,7 +1887,9 @@ def _process_batch(data, start_time, batch_id=None, background_mode=False):
             "cache_rejects": cache_rejects_count,
             "cache_approvals": cache_hits_count - cache_rejects_count,
             "cache_hit_rate": (cache_hits_count / total_exams * 100) if total_exams > 0 else 0,
-            "preflight_enabled": True
+            "preflight_enabled": True,
+            "llm_usage": llm_budget_summary,
+            "secondary_skipped": secondary_skipped
         }
     }
     try:
@@ -2164,20 +2330,12 @@ def test_secondary_pipeline():
             }
         ]
         
-        loop = asyncio.new_event_loop()
-        asyncio.set_event_loop(loop)
-        
-        try:
-            report = loop.run_until_complete(
-                secondary_integration.trigger_secondary_processing(test_cases)
-            )
-            return jsonify({
-                'message': 'Secondary pipeline test completed',
-                'test_exam': 'ERCP',
-                'results': report
-            })
-        finally:
-            loop.close()
+        report = run_async_task(secondary_integration.trigger_secondary_processing(test_cases))
+        return jsonify({
+            'message': 'Secondary pipeline test completed',
+            'test_exam': 'ERCP',
+            'results': report
+        })
             
     except Exception as e:
         logger.error(f"Secondary pipeline test error: {e}")
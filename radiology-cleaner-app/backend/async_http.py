@@ -0,0 +1,64 @@
+"""
+Shared httpx.AsyncClient pool for the async primary pipeline.
+
+Embedding and reranking calls made from coroutines reuse one AsyncClient (and
+its keep-alive connection pool) per event loop instead of opening a connection
+per request. httpx ties pooled connections to the loop that created them, so
+clients are kept per loop and dropped with it.
+
+Settings come from the 'async_pipeline' config section.
+"""
+
+import asyncio
+import logging
+import threading
+import weakref
+from typing import Dict
+
+import httpx
+
+logger = logging.getLogger(__name__)
+
+_clients: "weakref.WeakKeyDictionary[asyncio.AbstractEventLoop, httpx.AsyncClient]" = weakref.WeakKeyDictionary()
+_clients_lock = threading.Lock()
+
+
+def get_async_pipeline_config() -> Dict:
+    """The 'async_pipeline' config section (empty dict if config is unavailable)."""
+    try:
+        from config_manager import get_config
+        return get_config().get('async_pipeline', {}) or {}
+    except Exception as e:
+        logger.warning(f"[ASYNC-HTTP] Config unavailable, using defaults: {e}")
+        return {}
+
+
+def _build_client() -> httpx.AsyncClient:
+    pipeline_config = get_async_pipeline_config()
+    limits = httpx.Limits(
+        max_connections=pipeline_config.get('max_connections', 64),
+        max_keepalive_connections=pipeline_config.get('max_keepalive_connections', 32),
+    )
+    timeout = httpx.Timeout(pipeline_config.get('timeout', 60), connect=10.0)
+    logger.info(f"[ASYNC-HTTP] Created shared AsyncClient (max_connections={limits.max_connections})")
+    return httpx.AsyncClient(limits=limits, timeout=timeout)
+
+
+def get_async_client() -> httpx.AsyncClient:
+    """Get the shared AsyncClient for the running event loop."""
+    loop = asyncio.get_running_loop()
+    with _clients_lock:
+        client = _clients.get(loop)
+        if client is None or client.is_closed:
+            client = _build_client()
+            _clients[loop] = client
+        return client
+
+
+async def close_async_client():
+    """Close the running loop's shared client (call before the loop shuts down)."""
+    loop = asyncio.get_running_loop()
+    with _clients_lock:
+        client = _clients.pop(loop, None)
+    if client is not None and not client.is_closed:
+        await client.aclose()
@@ -0,0 +1,175 @@
+"""
+Long-lived background event loop for running async code from sync code.
+
+Each worker process gets one asyncio loop running forever in a daemon thread.
+Flask request threads and batch workers submit coroutines to it thread-safely
+and block on the result, so loop setup/teardown is paid once per process and
+loop-bound resources (the shared httpx.AsyncClient from async_http, the
+ensemble's AsyncOpenAI client) keep their connection pools across calls.
+
+The caller's contextvars (request deadline, rate-limit lane, LLM usage budget)
+are carried into the submitted task. The loop is created lazily and per PID,
+so it is safe with gunicorn --preload (a loop started before fork is not
+reused by children). Shutdown (atexit or shutdown_async_runtime) cancels
+outstanding tasks, runs registered close hooks and stops the loop.
+"""
+
+import asyncio
+import atexit
+import concurrent.futures
+import contextvars
+import logging
+import os
+import threading
+from typing import Awaitable, Callable, List, Optional
+
+logger = logging.getLogger(__name__)
+
+
+class AsyncRuntime:
+    """An event loop running forever in a dedicated daemon thread."""
+
+    def __init__(self, name: str = 'async-runtime'):
+        self.name = name
+        self.loop = asyncio.new_event_loop()
+        self._shutdown_hooks: List[Callable[[], Awaitable[None]]] = []
+        self._closed = False
+        ready = threading.Event()
+        self.thread = threading.Thread(target=self._run, args=(ready,), name=name, daemon=True)
+        self.thread.start()
+        ready.wait()
+        logger.info(f"[ASYNC-RUNTIME] Started background event loop '{name}' (pid {os.getpid()})")
+
+    def _run(self, ready: threading.Event):
+        asyncio.set_event_loop(self.loop)
+        self.loop.call_soon(ready.set)
+        self.loop.run_forever()
+
+    def in_loop_thread(self) -> bool:
+        return threading.current_thread() is self.thread
+
+    def submit(self, coro) -> concurrent.futures.Future:
+        """Schedule a coroutine on the loop; the task runs in a copy of the caller's context."""
+        if self._closed:
+            coro.close()
+            raise RuntimeError(f"Async runtime '{self.name}' is shut down")
+        future: concurrent.futures.Future = concurrent.futures.Future()
+
+        def start_task():
+            if future.cancelled():
+                coro.close()
+                return
+            # Runs in the caller's copied context, so the task inherits it
+            task = self.loop.create_task(coro)
+
+            def on_done(done_task: asyncio.Task):
+                if future.cancelled():
+                    return
+                if done_task.cancelled():
+                    future.cancel()
+                elif done_task.exception() is not None:
+                    future.set_exception(done_task.exception())
+                else:
+                    future.set_result(done_task.result())
+
+            task.add_done_callback(on_done)
+            future.add_done_callback(lambda f: f.cancelled() and self.loop.call_soon_threadsafe(task.cancel))
+
+        self.loop.call_soon_threadsafe(start_task, context=contextvars.copy_context())
+        return future
+
+    def run(self, coro, timeout: Optional[float] = None):
+        """Run a coroutine on the loop and block the calling thread until it finishes."""
+        if self.in_loop_thread():
+            coro.close()
+            raise RuntimeError("run() called from the runtime's own loop thread; await the coroutine instead")
+        future = self.submit(coro)
+        try:
+            return future.result(timeout=timeout)
+        except concurrent.futures.TimeoutError:
+            future.cancel()
+            raise
+
+    def add_shutdown_hook(self, hook: Callable[[], Awaitable[None]]):
+        """Register an async callable (e.g. a client's aclose) to await on shutdown."""
+        self._shutdown_hooks.append(hook)
+
+    def remove_shutdown_hook(self, hook: Callable[[], Awaitable[None]]):
+        """Unregister a hook (e.g. once the client it closes was closed early); no-op if absent."""
+        try:
+            self._shutdown_hooks.remove(hook)
+        except ValueError:
+            pass
+
+    async def _drain(self):
+        current = asyncio.current_task()
+        tasks = [task for task in asyncio.all_tasks() if task is not current]
+        for task in tasks:
+            task.cancel()
+        if tasks:
+            await asyncio.gather(*tasks, return_exceptions=True)
+        # Hooks may unregister themselves as they run
+        for hook in list(self._shutdown_hooks):
+            try:
+                await hook()
+            except Exception as e:
+                logger.warning(f"[ASYNC-RUNTIME] Shutdown hook failed: {e}")
+        await self.loop.shutdown_asyncgens()
+
+    def shutdown(self, timeout: float = 10.0):
+        """Cancel outstanding tasks, run close hooks, then stop and close the loop."""
+        if self._closed:
+            return
+        try:
+            self.run(self._drain(), timeout=timeout)
+        except Exception as e:
+            logger.warning(f"[ASYNC-RUNTIME] Unclean shutdown of '{self.name}': {e}")
+        self._closed = True
+        self.loop.call_soon_threadsafe(self.loop.stop)
+        self.thread.join(timeout=timeout)
+        if not self.thread.is_alive():
+            self.loop.close()
+        logger.info(f"[ASYNC-RUNTIME] Stopped background event loop '{self.name}'")
+
+
+# One runtime per worker process
+_runtime: Optional[AsyncRuntime] = None
+_runtime_pid: Optional[int] = None
+_runtime_lock = threading.Lock()
+
+
+def _close_shared_http_client():
+    from async_http import close_async_client
+    return close_async_client()
+
+
+def get_async_runtime() -> AsyncRuntime:
+    """Get this process's background loop, starting it on first use."""
+    global _runtime, _runtime_pid
+    pid = os.getpid()
+    if _runtime is None or _runtime_pid != pid:
+        with _runtime_lock:
+            if _runtime is None or _runtime_pid != pid:
+                # A runtime inherited across fork has no thread in this process; start a fresh one
+                _runtime = AsyncRuntime()
+                _runtime.add_shutdown_hook(_close_shared_http_client)
+                _runtime_pid = pid
+    return _runtime
+
+
+def run_coroutine(coro, timeout: Optional[float] = None):
+    """Run a coroutine on the shared background loop and wait for its result."""
+    return get_async_runtime().run(coro, timeout=timeout)
+
+
+def shutdown_async_runtime():
+    """Stop this process's background loop (registered with atexit)."""
+    global _runtime
+    with _runtime_lock:
+        runtime = _runtime if _runtime_pid == os.getpid() else None
+        _runtime = None
+    if runtime is not None:
+        runtime.shutdown()
+
+
+atexit.register(shutdown_async_runtime)
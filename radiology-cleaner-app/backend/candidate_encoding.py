@@ -0,0 +1,88 @@
+"""
+Candidate serialization for ensemble prompts.
+
+The ensemble shows each model the primary pipeline's ranked candidates. The
+"compact" encoding sends a fixed column header and one pipe-separated line per
+candidate with a short id (C1, C2, ...) instead of pretty-printed JSON with
+repeated keys; the model answers with the short id, which is mapped back to
+the SNOMED id after the tool call. "json" keeps the original full dicts.
+
+How many candidates a model sees is a token budget: candidates are added in
+rank order until the next one would exceed it (always at least one, at most
+max_candidates).
+"""
+
+import json
+from typing import Dict, List, Optional, Tuple
+
+from rate_limiter import estimate_tokens
+
+COMPACT_HEADER = 'id|primary_name|snomed_fsn|score'
+FSN_SUFFIX = ' (procedure)'
+
+
+def _field(value) -> str:
+    # The separator and line breaks would split a row
+    return ' '.join(str(value or '').replace('|', '/').split())
+
+
+def short_id(index: int) -> str:
+    return f"C{index + 1}"
+
+
+def compact_row(index: int, candidate: Dict) -> str:
+    fsn = _field(candidate.get('snomed_fsn'))
+    if fsn.endswith(FSN_SUFFIX):
+        fsn = fsn[:-len(FSN_SUFFIX)]
+    score = candidate.get('confidence')
+    score_text = f"{score:.2f}" if isinstance(score, (int, float)) else ''
+    return f"{short_id(index)}|{_field(candidate.get('primary_name'))}|{fsn}|{score_text}"
+
+
+def select_candidates(candidates: List[Dict], token_budget: Optional[int] = None, max_candidates: int = 10,
+                      encoding: str = 'compact') -> List[Dict]:
+    """Leading candidates that fit in `token_budget` encoded tokens (None = only max_candidates applies)."""
+    selected = []
+    used = estimate_tokens(COMPACT_HEADER) if encoding == 'compact' else 1
+    for index, candidate in enumerate(candidates[:max_candidates]):
+        if encoding == 'compact':
+            cost = estimate_tokens(compact_row(index, candidate))
+        else:
+            cost = estimate_tokens(json.dumps(candidate, indent=2))
+        if selected and token_budget is not None and used + cost > token_budget:
+            break
+        selected.append(candidate)
+        used += cost
+    return selected
+
+
+def encode_candidates(candidates: List[Dict], encoding: str = 'compact') -> Tuple[str, Dict[str, str]]:
+    """Prompt text for the candidates and the short-id -> SNOMED id map (empty for json)."""
+    if encoding != 'compact':
+        return json.dumps(candidates, indent=2), {}
+    lines = [COMPACT_HEADER]
+    id_map = {}
+    for index, candidate in enumerate(candidates):
+        lines.append(compact_row(index, candidate))
+        id_map[short_id(index)] = str(candidate.get('snomed_id', ''))
+    return '\n'.join(lines), id_map
+
+
+def resolve_candidate_id(value, id_map: Dict[str, str]) -> Optional[str]:
+    """Map a model's answer (short id, or a SNOMED id it copied anyway) back to the SNOMED id."""
+    if value is None or not id_map:
+        return value
+    key = str(value).strip().upper()
+    return id_map.get(key, value)
+
+
+def encoding_savings(candidates: List[Dict]) -> Dict:
+    """Estimated tokens for the candidates as pretty JSON vs compact lines."""
+    json_tokens = estimate_tokens(json.dumps(candidates, indent=2))
+    compact_tokens = estimate_tokens(encode_candidates(candidates, 'compact')[0])
+    return {
+        'json_tokens': json_tokens,
+        'compact_tokens': compact_tokens,
+        'saved_tokens': json_tokens - compact_tokens,
+        'saved_pct': round(100.0 * (json_tokens - compact_tokens) / json_tokens, 1) if json_tokens else 0.0,
+    }
@@ -0,0 +1,230 @@
+"""
+Per-backend circuit breakers for remote model APIs.
+
+Each remote backend (HF embeddings, MedCPT, each OpenRouter model) gets one
+CircuitBreaker that tracks recent outcomes, failure rate and a latency EWMA.
+
+- closed:    calls flow normally
+- open:      tripped after consecutive failures or a high failure rate over the
+             recent window; calls are skipped immediately until the cool-down ends
+- half_open: after the cool-down a limited number of probe calls go through;
+             a success closes the breaker, a failure re-opens it, and a probe
+             with no result within another cool-down re-opens it too
+
+Callers check allow_request() before each network attempt and report
+record_success()/record_failure(), so an upstream outage costs a handful of
+timeouts instead of retries on every exam. They call release_probe() once the
+attempt is over (in a finally), so a probe that ends without a reported outcome
+(deadline expiry, cancellation) frees its slot.
+"""
+
+import logging
+import threading
+import time
+from collections import deque
+from typing import Dict, Optional
+
+logger = logging.getLogger(__name__)
+
+CLOSED = 'closed'
+OPEN = 'open'
+HALF_OPEN = 'half_open'
+
+
+class CircuitBreaker:
+    """Failure-rate / consecutive-failure circuit breaker with latency EWMA."""
+
+    def __init__(self, name: str, failure_threshold: int = 5, failure_rate_threshold: float = 0.5,
+                 window_size: int = 20, min_calls: int = 10, cooldown_seconds: float = 60.0,
+                 half_open_max_calls: int = 1, ewma_alpha: float = 0.2):
+        """
+        Args:
+            name: Backend name used in logs and status reports
+            failure_threshold: Consecutive failures that trip the breaker
+            failure_rate_threshold: Failure rate over the window that trips it
+            window_size: Number of recent outcomes kept for the failure rate
+            min_calls: Outcomes needed before the failure rate is considered
+            cooldown_seconds: How long the breaker stays open before probing
+            half_open_max_calls: Concurrent probe calls allowed while half-open
+            ewma_alpha: Smoothing factor for the latency EWMA
+        """
+        self.name = name
+        self.failure_threshold = max(1, failure_threshold)
+        self.failure_rate_threshold = failure_rate_threshold
+        self.min_calls = max(1, min_calls)
+        self.cooldown_seconds = cooldown_seconds
+        self.half_open_max_calls = max(1, half_open_max_calls)
+        self.ewma_alpha = ewma_alpha
+
+        self._lock = threading.Lock()
+        self._outcomes = deque(maxlen=max(1, window_size))
+        self._state = CLOSED
+        self._opened_at: Optional[float] = None
+        self._half_open_in_flight = 0
+        self._probe_started_at: Optional[float] = None
+        self._consecutive_failures = 0
+        self._latency_ewma: Optional[float] = None
+        self._last_error: Optional[str] = None
+        self._counters = {'successes': 0, 'failures': 0, 'rejected': 0, 'trips': 0}
+
+    @property
+    def state(self) -> str:
+        with self._lock:
+            self._maybe_half_open()
+            return self._state
+
+    def _maybe_half_open(self):
+        """Move open -> half-open after the cool-down, and re-open on probes that never reported."""
+        if (self._state == HALF_OPEN and self._half_open_in_flight
+                and time.time() - self._probe_started_at >= self.cooldown_seconds):
+            self._trip("probe got no result within the cool-down")
+        if self._state == OPEN and time.time() - self._opened_at >= self.cooldown_seconds:
+            self._state = HALF_OPEN
+            self._half_open_in_flight = 0
+            logger.info(f"[CIRCUIT] {self.name}: cool-down elapsed, probing (half-open)")
+
+    def allow_request(self) -> bool:
+        """True if a call may be attempted now."""
+        with self._lock:
+            self._maybe_half_open()
+            if self._state == CLOSED:
+                return True
+            if self._state == HALF_OPEN and self._half_open_in_flight < self.half_open_max_calls:
+                self._half_open_in_flight += 1
+                self._probe_started_at = time.time()
+                return True
+            self._counters['rejected'] += 1
+            return False
+
+    def release_probe(self):
+        """
+        Free a half-open probe slot whose attempt ended without record_success/record_failure.
+
+        Safe to call after every attempt: a reported outcome already moved the breaker
+        out of half-open, and outside half-open there is no slot to free.
+        """
+        with self._lock:
+            if self._state == HALF_OPEN and self._half_open_in_flight > 0:
+                self._half_open_in_flight -= 1
+
+    def is_available(self) -> bool:
+        """True unless the breaker is open (does not reserve a half-open probe)."""
+        return self.state != OPEN
+
+    def _update_latency(self, latency: Optional[float]):
+        if latency is None:
+            return
+        if self._latency_ewma is None:
+            self._latency_ewma = latency
+        else:
+            self._latency_ewma = self.ewma_alpha * latency + (1 - self.ewma_alpha) * self._latency_ewma
+
+    def record_success(self, latency: Optional[float] = None):
+        with self._lock:
+            self._counters['successes'] += 1
+            self._outcomes.append(True)
+            self._consecutive_failures = 0
+            self._update_latency(latency)
+            if self._state != CLOSED:
+                logger.info(f"[CIRCUIT] {self.name}: probe succeeded, closing breaker")
+                self._state = CLOSED
+                self._opened_at = None
+                self._half_open_in_flight = 0
+                self._outcomes.clear()
+
+    def record_failure(self, reason: str = '', latency: Optional[float] = None):
+        with self._lock:
+            self._counters['failures'] += 1
+            self._outcomes.append(False)
+            self._consecutive_failures += 1
+            self._last_error = reason[:200] if reason else None
+            self._update_latency(latency)
+
+            if self._state == HALF_OPEN:
+                self._trip(f"probe failed: {reason}")
+                return
+            if self._state == OPEN:
+                return
+
+            failure_rate = self._failure_rate()
+            if self._consecutive_failures >= self.failure_threshold:
+                self._trip(f"{self._consecutive_failures} consecutive failures")
+            elif len(self._outcomes) >= self.min_calls and failure_rate >= self.failure_rate_threshold:
+                self._trip(f"failure rate {failure_rate:.0%} over last {len(self._outcomes)} calls")
+
+    def _trip(self, why: str):
+        self._state = OPEN
+        self._opened_at = time.time()
+        self._half_open_in_flight = 0
+        self._counters['trips'] += 1
+        logger.warning(f"[CIRCUIT] {self.name}: OPEN for {self.cooldown_seconds:.0f}s ({why})")
+
+    def _failure_rate(self) -> float:
+        if not self._outcomes:
+            return 0.0
+        return sum(1 for ok in self._outcomes if not ok) / len(self._outcomes)
+
+    def reset(self):
+        with self._lock:
+            self._state = CLOSED
+            self._opened_at = None
+            self._half_open_in_flight = 0
+            self._consecutive_failures = 0
+            self._outcomes.clear()
+
+    def snapshot(self) -> Dict:
+        """JSON-friendly state for status endpoints."""
+        with self._lock:
+            self._maybe_half_open()
+            retry_in = None
+            if self._state == OPEN:
+                retry_in = round(max(0.0, self.cooldown_seconds - (time.time() - self._opened_at)), 1)
+            return {
+                'state': self._state,
+                'failure_rate': round(self._failure_rate(), 3),
+                'consecutive_failures': self._consecutive_failures,
+                'latency_ewma_ms': round(self._latency_ewma * 1000, 1) if self._latency_ewma is not None else None,
+                'retry_in_seconds': retry_in,
+                'last_error': self._last_error,
+                **self._counters,
+            }
+
+
+# Breaker registry: one breaker per backend name
+_breakers: Dict[str, CircuitBreaker] = {}
+_breakers_lock = threading.Lock()
+
+
+def _breaker_settings() -> Dict:
+    try:
+        from config_manager import get_config
+        return get_config().get('circuit_breaker', {}) or {}
+    except Exception as e:
+        logger.warning(f"[CIRCUIT] Config unavailable, using defaults: {e}")
+        return {}
+
+
+def get_breaker(name: str) -> CircuitBreaker:
+    """Get (or create) the breaker for a backend, configured from 'circuit_breaker'."""
+    with _breakers_lock:
+        breaker = _breakers.get(name)
+        if breaker is None:
+            settings = _breaker_settings()
+            breaker = CircuitBreaker(
+                name,
+                failure_threshold=settings.get('failure_threshold', 5),
+                failure_rate_threshold=settings.get('failure_rate_threshold', 0.5),
+                window_size=settings.get('window_size', 20),
+                min_calls=settings.get('min_calls', 10),
+                cooldown_seconds=settings.get('cooldown_seconds', 60),
+                half_open_max_calls=settings.get('half_open_max_calls', 1),
+            )
+            _breakers[name] = breaker
+        return breaker
+
+
+def get_all_breaker_states() -> Dict[str, Dict]:
+    """Snapshot of every registered breaker, keyed by backend name."""
+    with _breakers_lock:
+        breakers = list(_breakers.values())
+    return {breaker.name: breaker.snapshot() for breaker in breakers}
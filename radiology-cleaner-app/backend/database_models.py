@@ -1,40 +1,91 @@
 from datetime import datetime
 from typing import Dict, List, Optional
-import sqlite3
+from collections import Counter, defaultdict
+from difflib import SequenceMatcher
 import json
 import hashlib
+import heapq
+import re
 from contextlib import contextmanager
 import threading
+from sqlite_pool import get_pool
 import csv
 import io
 
+_NON_WORD_RE = re.compile(r'[^\w\s]')
+
+# Combined fuzzy score = 0.4*sequence + 0.4*word + 0.2*prefix (+0.1 abdomen/pelvis boost).
+# A candidate sharing no trigram or word with the target has word=0 and prefix=0, so it can
+# never exceed this score; above it, the trigram index shortlist is exact.
+_NO_OVERLAP_MAX_SCORE = 0.5
+
+
+def _normalize_clean_name(text: str) -> str:
+    """Normalize a clean name for fuzzy matching (lowercase, punctuation stripped)."""
+    return _NON_WORD_RE.sub('', text.lower().strip())
+
+
+def _trigrams(text: str) -> set:
+    """Character trigrams of a normalized string, padded so short names still index."""
+    padded = f"  {text} "
+    return {padded[i:i + 3] for i in range(len(padded) - 2)}
+
+
+class CleanNameIndex:
+    """
+    Trigram/word inverted index over snomed_reference clean names.
+
+    Built once when the clean names are loaded into memory so that fuzzy
+    lookups only score candidates sharing at least one n-gram with the target.
+    """
+
+    def __init__(self, entries: List[Dict]):
+        self.entries = [entry for entry in entries if entry.get('clean_name')]
+        self.normalized = []
+        self.words = []
+        self.postings = defaultdict(list)
+
+        for idx, entry in enumerate(self.entries):
+            normalized = _normalize_clean_name(entry['clean_name'])
+            words = set(normalized.split())
+            self.normalized.append(normalized)
+            self.words.append(words)
+            for key in _trigrams(normalized) | {f"w:{word}" for word in words}:
+                self.postings[key].append(idx)
+
+    def __len__(self) -> int:
+        return len(self.entries)
+
+    def shortlist(self, target_normalized: str) -> List[int]:
+        """Indices of entries sharing at least one trigram or word with the target."""
+        keys = _trigrams(target_normalized) | {f"w:{word}" for word in target_normalized.split()}
+        shared = Counter()
+        for key in keys:
+            shared.update(self.postings.get(key, ()))
+        return list(shared)
+
+
 class DatabaseManager:
     """
     Database manager for caching, feedback, and configuration storage.
     Uses SQLite for simplicity and portability.
     """
     
-    def __init__(self, db_path: str = "radiology_cleaner.db"):
+    # Namespace used for parsed results in the shared tiered cache
+    RESULT_CACHE_NAMESPACE = 'parse_results'
+    
+    def __init__(self, db_path: str = "radiology_cleaner.db", result_cache=None):
         self.db_path = db_path
         self.lock = threading.Lock()
+        self.pool = get_pool(db_path)
+        self._result_cache = result_cache # TieredCache; shared instance used if None
         self.all_clean_names_cache = [] # In-memory cache for clean names
+        self.clean_name_index = None # Trigram/word index over all_clean_names_cache
         self._init_database()
     
     def _init_database(self):
         """Initialize database with required tables."""
         with self.get_connection() as conn:
-            # Cache table for parsed results
-            conn.execute('''
-                CREATE TABLE IF NOT EXISTS cache (
-                    id INTEGER PRIMARY KEY AUTOINCREMENT,
-                    input_hash TEXT UNIQUE NOT NULL,
-                    input_data TEXT NOT NULL,
-                    output_data TEXT NOT NULL,
-                    created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-                    last_accessed TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-                    access_count INTEGER DEFAULT 1
-                )
-            ''')
             
             # Feedback table for user corrections
             conn.execute('''
@@ -117,7 +168,6 @@ class DatabaseManager:
             ''')
             
             # Create indexes for performance
-            conn.execute('CREATE INDEX IF NOT EXISTS idx_cache_hash ON cache(input_hash)')
             conn.execute('CREATE INDEX IF NOT EXISTS idx_feedback_exam ON feedback(original_exam_name)')
             conn.execute('CREATE INDEX IF NOT EXISTS idx_config_key ON configuration(key)')
             conn.execute('CREATE INDEX IF NOT EXISTS idx_equiv_group ON equivalence_groups(group_id)')
@@ -153,51 +203,33 @@ class DatabaseManager:
     
     @contextmanager
     def get_connection(self):
-        """Get database connection with proper locking."""
-        with self.lock:
-            conn = sqlite3.connect(self.db_path, timeout=30.0)
-            conn.row_factory = sqlite3.Row
-            try:
-                yield conn
-                conn.commit()
-            except Exception:
-                conn.rollback()
-                raise
-            finally:
-                conn.close()
+        """Get this thread's pooled WAL connection inside a transaction."""
+        with self.pool.connection() as conn:
+            yield conn
+    
+    def buffer_write(self, sql: str, params):
+        """Queue a high-volume insert; written in batches by the connection pool."""
+        self.pool.buffer_write(sql, params)
+    
+    def flush_writes(self) -> int:
+        """Flush buffered writes now (e.g. before reading them back)."""
+        return self.pool.flush()
+    
+    @property
+    def result_cache(self):
+        """Tiered cache backing get_cached_result/cache_result."""
+        if self._result_cache is None:
+            from tiered_cache import get_cache
+            self._result_cache = get_cache()
+        return self._result_cache
     
     def get_cached_result(self, input_data: Dict) -> Optional[Dict]:
         """Get cached parsing result."""
-        input_hash = self._hash_input(input_data)
-        
-        with self.get_connection() as conn:
-            cursor = conn.execute(
-                'SELECT output_data FROM cache WHERE input_hash = ?',
-                (input_hash,)
-            )
-            row = cursor.fetchone()
-            
-            if row:
-                # Update access statistics
-                conn.execute('''
-                    UPDATE cache 
-                    SET last_accessed = CURRENT_TIMESTAMP, access_count = access_count + 1
-                    WHERE input_hash = ?
-                ''', (input_hash,))
-                
-                return json.loads(row['output_data'])
-            
-            return None
+        return self.result_cache.get(self.RESULT_CACHE_NAMESPACE, self._hash_input(input_data))
     
     def cache_result(self, input_data: Dict, output_data: Dict):
         """Cache a parsing result."""
-        input_hash = self._hash_input(input_data)
-        
-        with self.get_connection() as conn:
-            conn.execute('''
-                INSERT OR REPLACE INTO cache (input_hash, input_data, output_data)
-                VALUES (?, ?, ?)
-            ''', (input_hash, json.dumps(input_data), json.dumps(output_data)))
+        self.result_cache.set(self.RESULT_CACHE_NAMESPACE, self._hash_input(input_data), output_data)
     
     def submit_feedback(self, feedback_data: Dict) -> int:
         """Submit user feedback for correction."""
@@ -390,22 +422,22 @@ class DatabaseManager:
     
     def record_performance_metric(self, metric_data: Dict):
         """Record performance metric."""
-        with self.get_connection() as conn:
-            conn.execute('''
-                INSERT INTO performance_metrics (
-                    endpoint, processing_time_ms, input_size, success, error_message
-                ) VALUES (?, ?, ?, ?, ?)
-            ''', (
-                metric_data['endpoint'],
-                metric_data['processing_time_ms'],
-                metric_data['input_size'],
-                metric_data['success'],
-                metric_data.get('error_message')
-            ))
+        self.buffer_write('''
+            INSERT INTO performance_metrics (
+                endpoint, processing_time_ms, input_size, success, error_message
+            ) VALUES (?, ?, ?, ?, ?)
+        ''', (
+            metric_data['endpoint'],
+            metric_data['processing_time_ms'],
+            metric_data['input_size'],
+            metric_data['success'],
+            metric_data.get('error_message')
+        ))
     
     def get_performance_metrics(self, endpoint: Optional[str] = None, 
                                hours: int = 24) -> List[Dict]:
         """Get performance metrics."""
+        self.flush_writes()
         with self.get_connection() as conn:
             if endpoint:
                 cursor = conn.execute('''
@@ -433,33 +465,14 @@ class DatabaseManager:
             
             return results
     
-    def cleanup_old_cache(self, days: int = 30):
-        """Clean up old cache entries."""
-        with self.get_connection() as conn:
-            conn.execute('''
-                DELETE FROM cache 
-                WHERE last_accessed < datetime('now', '-{} days')
-            '''.format(days))
+    def cleanup_old_cache(self) -> int:
+        """Drop expired cache entries (expiry is governed by the cache TTL)."""
+        return self.result_cache.cleanup_expired()
     
     def get_cache_statistics(self) -> Dict:
-        """Get cache statistics."""
-        with self.get_connection() as conn:
-            cursor = conn.execute('''
-                SELECT 
-                    COUNT(*) as total_entries,
-                    SUM(access_count) as total_accesses,
-                    AVG(access_count) as avg_accesses,
-                    MAX(access_count) as max_accesses
-                FROM cache
-            ''')
-            row = cursor.fetchone()
-            
-            return {
-                'total_entries': row['total_entries'],
-                'total_accesses': row['total_accesses'],
-                'avg_accesses': row['avg_accesses'],
-                'max_accesses': row['max_accesses']
-            }
+        """Get cache statistics for parsed results."""
+        stats = self.result_cache.stats()
+        return stats['namespaces'].get(self.RESULT_CACHE_NAMESPACE, {})
     
     def _hash_input(self, input_data: Dict) -> str:
         """Create hash for input data."""
@@ -530,8 +543,6 @@ class DatabaseManager:
 
     def load_snomed_from_csv(self, csv_path: str):
         """Load SNOMED reference data from CSV file."""
-        import io
-        
         with self.get_connection() as conn:
             # Check if table is already populated
             cursor = conn.execute('SELECT COUNT(*) FROM snomed_reference WHERE clean_name IS NOT NULL')
@@ -638,106 +649,122 @@ class DatabaseManager:
             return [dict(row) for row in cursor.fetchall()]
 
     def _load_all_clean_names_into_memory(self):
-        """Loads all clean names from the database into an in-memory cache."""
+        """Loads all clean names from the database into an in-memory cache and trigram index."""
         self.all_clean_names_cache = self.get_all_clean_names()
-        print(f"Loaded {len(self.all_clean_names_cache)} clean names into memory for fuzzy matching.")
+        self.clean_name_index = CleanNameIndex(self.all_clean_names_cache)
+        print(f"Loaded {len(self.all_clean_names_cache)} clean names into memory for fuzzy matching "
+              f"({len(self.clean_name_index.postings)} index keys).")
 
-    def fuzzy_match_clean_names(self, target_clean_name: str, threshold: float = 0.6) -> List[Dict]:
-        """Find fuzzy matches for a clean name with similarity scores."""
-        from difflib import SequenceMatcher
-        import re
-        
+    def fuzzy_match_clean_names(self, target_clean_name: str, threshold: float = 0.6,
+                                top_k: Optional[int] = None) -> List[Dict]:
+        """
+        Find fuzzy matches for a clean name with similarity scores.
+
+        Candidates are shortlisted through the trigram/word index and only those are
+        scored. Returns every match at or above threshold (highest first), or only
+        the best top_k when given.
+        """
         # Load cache lazily if not already loaded
-        if self.all_clean_names_cache is None:
+        if self.all_clean_names_cache is None or self.clean_name_index is None:
             self._load_all_clean_names_into_memory()
-        
-        # Use the in-memory cache instead of fetching from DB every time
-        all_clean_names = self.all_clean_names_cache
-        matches = []
-        
+
+        index = self.clean_name_index
+
         # Normalize target for better matching
-        target_normalized = re.sub(r'[^\w\s]', '', target_clean_name.lower().strip())
+        target_normalized = _normalize_clean_name(target_clean_name)
         target_words = set(target_normalized.split())
-        
+
         # Extract modality for CT/MRI abdomen-pelvis equivalence
         modality = target_normalized.split()[0] if target_normalized.split() else ""
         is_ct_or_mri = modality in ['ct', 'mri', 'mr']
-        
-        for entry in all_clean_names:
-            if not entry['clean_name']:
+
+        # Very low thresholds can be met without any shared n-gram, so score everything
+        if threshold <= _NO_OVERLAP_MAX_SCORE:
+            candidate_indices = range(len(index))
+        else:
+            candidate_indices = index.shortlist(target_normalized)
+
+        matches = []
+        for idx in candidate_indices:
+            scores = self._score_clean_name_candidate(
+                target_normalized, target_words, is_ct_or_mri,
+                index.normalized[idx], index.words[idx], threshold
+            )
+            if scores is None:
                 continue
-                
-            candidate = entry['clean_name']
-            candidate_normalized = re.sub(r'[^\w\s]', '', candidate.lower().strip())
-            candidate_words = set(candidate_normalized.split())
-            
-            # Apply CT/MRI abdomen-pelvis equivalence
-            target_for_comparison = target_normalized
-            candidate_for_comparison = candidate_normalized
-            
-            if is_ct_or_mri:
-                # For CT/MRI: treat "abdomen pelvis" as equivalent to "abdomen"
-                if 'abdomen' in target_words and 'pelvis' not in target_words:
-                    # Target has abdomen but not pelvis - also match "abdomen pelvis" patterns
-                    if 'abdomen' in candidate_words and 'pelvis' in candidate_words:
-                        # Boost similarity for abdomen+pelvis matching abdomen-only
-                        candidate_for_comparison = candidate_normalized.replace('pelvis', '').strip()
-                        candidate_words = set(candidate_for_comparison.split())
-                
-                elif 'abdomen' in target_words and 'pelvis' in target_words:
-                    # Target has both - also match abdomen-only patterns
-                    if 'abdomen' in candidate_words and 'pelvis' not in candidate_words:
-                        # Allow abdomen-only to match abdomen+pelvis
-                        target_for_comparison = target_normalized.replace('pelvis', '').strip()
-                        target_words = set(target_for_comparison.split())
-            
-            # Calculate multiple similarity metrics
-            # 1. Sequence similarity
-            seq_similarity = SequenceMatcher(None, target_for_comparison, candidate_for_comparison).ratio()
-            
-            # 2. Word overlap similarity (Jaccard coefficient)
-            comparison_target_words = set(target_for_comparison.split())
-            comparison_candidate_words = set(candidate_for_comparison.split())
-            
-            if comparison_target_words and comparison_candidate_words:
-                word_similarity = len(comparison_target_words.intersection(comparison_candidate_words)) / len(comparison_target_words.union(comparison_candidate_words))
-            else:
-                word_similarity = 0.0
-            
-            # 3. Prefix similarity (for cases like "CT Head" vs "CT Head with Contrast")
-            prefix_similarity = 0.0
-            if target_for_comparison.startswith(candidate_for_comparison) or candidate_for_comparison.startswith(target_for_comparison):
-                shorter_len = min(len(target_for_comparison), len(candidate_for_comparison))
-                longer_len = max(len(target_for_comparison), len(candidate_for_comparison))
-                prefix_similarity = shorter_len / longer_len if longer_len > 0 else 0
-            
-            # Combined similarity score (weighted average)
-            combined_score = (seq_similarity * 0.4 + word_similarity * 0.4 + prefix_similarity * 0.2)
-            
-            # Boost score for exact anatomy matches in CT/MRI
-            if is_ct_or_mri and 'abdomen' in target_words:
-                if ('abdomen' in candidate_words and 'pelvis' in candidate_words and 'pelvis' not in target_words) or \
-                   ('abdomen' in candidate_words and 'pelvis' not in candidate_words and 'pelvis' in target_words):
-                    combined_score = min(1.0, combined_score + 0.1)  # Small boost for abdomen/pelvis equivalence
-            
-            if combined_score >= threshold:
-                matches.append({
-                    'clean_name': candidate,
-                    'similarity_score': combined_score,
-                    'sequence_similarity': seq_similarity,
-                    'word_similarity': word_similarity,
-                    'prefix_similarity': prefix_similarity,
-                    'snomed_concept_id': entry.get('snomed_concept_id'),
-                    'snomed_fsn': entry.get('snomed_fsn'),
-                    'snomed_laterality_concept_id': entry.get('snomed_laterality_concept_id'),
-                    'snomed_laterality_fsn': entry.get('snomed_laterality_fsn'),
-                    'database_id': entry['id']
-                })
-        
+            entry = index.entries[idx]
+            matches.append({
+                'clean_name': entry['clean_name'],
+                **scores,
+                'snomed_concept_id': entry.get('snomed_concept_id'),
+                'snomed_fsn': entry.get('snomed_fsn'),
+                'snomed_laterality_concept_id': entry.get('snomed_laterality_concept_id'),
+                'snomed_laterality_fsn': entry.get('snomed_laterality_fsn'),
+                'database_id': entry['id']
+            })
+
         # Sort by similarity score (highest first)
+        if top_k is not None:
+            return heapq.nlargest(top_k, matches, key=lambda x: x['similarity_score'])
         matches.sort(key=lambda x: x['similarity_score'], reverse=True)
         return matches
 
+    @staticmethod
+    def _score_clean_name_candidate(target_normalized: str, target_words: set, is_ct_or_mri: bool,
+                                    candidate_normalized: str, candidate_words: set,
+                                    threshold: float) -> Optional[Dict]:
+        """Score one indexed candidate; returns None if it cannot reach the threshold."""
+        target_for_comparison = target_normalized
+        candidate_for_comparison = candidate_normalized
+        abdomen_pelvis_equivalent = False
+
+        # Apply CT/MRI abdomen-pelvis equivalence
+        if is_ct_or_mri and 'abdomen' in target_words and 'abdomen' in candidate_words:
+            if 'pelvis' not in target_words and 'pelvis' in candidate_words:
+                # Target has abdomen but not pelvis - also match "abdomen pelvis" patterns
+                candidate_for_comparison = candidate_normalized.replace('pelvis', '').strip()
+                abdomen_pelvis_equivalent = True
+            elif 'pelvis' in target_words and 'pelvis' not in candidate_words:
+                # Target has both - allow abdomen-only to match abdomen+pelvis
+                target_for_comparison = target_normalized.replace('pelvis', '').strip()
+                abdomen_pelvis_equivalent = True
+
+        # 1. Word overlap similarity (Jaccard coefficient)
+        comparison_target_words = set(target_for_comparison.split())
+        comparison_candidate_words = set(candidate_for_comparison.split())
+        if comparison_target_words and comparison_candidate_words:
+            word_similarity = len(comparison_target_words & comparison_candidate_words) / len(comparison_target_words | comparison_candidate_words)
+        else:
+            word_similarity = 0.0
+
+        # 2. Prefix similarity (for cases like "CT Head" vs "CT Head with Contrast")
+        prefix_similarity = 0.0
+        if target_for_comparison.startswith(candidate_for_comparison) or candidate_for_comparison.startswith(target_for_comparison):
+            shorter_len = min(len(target_for_comparison), len(candidate_for_comparison))
+            longer_len = max(len(target_for_comparison), len(candidate_for_comparison))
+            prefix_similarity = shorter_len / longer_len if longer_len > 0 else 0
+
+        boost = 0.1 if abdomen_pelvis_equivalent else 0.0
+
+        # 3. Sequence similarity - skip the expensive diff if the length bound can't reach the threshold
+        total_len = len(target_for_comparison) + len(candidate_for_comparison)
+        seq_upper_bound = 2.0 * min(len(target_for_comparison), len(candidate_for_comparison)) / total_len if total_len else 1.0
+        if seq_upper_bound * 0.4 + word_similarity * 0.4 + prefix_similarity * 0.2 + boost < threshold:
+            return None
+        seq_similarity = SequenceMatcher(None, target_for_comparison, candidate_for_comparison).ratio()
+
+        # Combined similarity score (weighted average), small boost for abdomen/pelvis equivalence
+        combined_score = min(1.0, seq_similarity * 0.4 + word_similarity * 0.4 + prefix_similarity * 0.2 + boost)
+        if combined_score < threshold:
+            return None
+
+        return {
+            'similarity_score': combined_score,
+            'sequence_similarity': seq_similarity,
+            'word_similarity': word_similarity,
+            'prefix_similarity': prefix_similarity
+        }
+
     def load_abbreviations_from_csv(self, csv_path: str):
         """Load abbreviations from CSV file."""
         with self.get_connection() as conn:
@@ -764,78 +791,3 @@ class DatabaseManager:
         with self.get_connection() as conn:
             cursor = conn.execute('SELECT abbreviation, full_text FROM abbreviations')
             return {row['abbreviation']: row['full_text'] for row in cursor.fetchall()}
-
-
-class CacheManager:
-    """
-    In-memory cache manager for high-performance operations.
-    """
-    
-    def __init__(self, max_size: int = 10000):
-        self.max_size = max_size
-        self.cache = {}
-        self.access_order = []
-        self.lock = threading.Lock()
-    
-    def get(self, key: str) -> Optional[Dict]:
-        """Get cached value."""
-        with self.lock:
-            if key in self.cache:
-                # Move to end (most recently used)
-                self.access_order.remove(key)
-                self.access_order.append(key)
-                return self.cache[key]
-            return None
-    
-    def set(self, key: str, value: Dict):
-        """Set cached value."""
-        with self.lock:
-            # Remove if already exists
-            if key in self.cache:
-                self.access_order.remove(key)
-            
-            # Add new entry
-            self.cache[key] = value
-            self.access_order.append(key)
-            
-            # Evict if over capacity
-            while len(self.cache) > self.max_size:
-                oldest_key = self.access_order.pop(0)
-                del self.cache[oldest_key]
-    
-    def clear(self):
-        """Clear all cached values."""
-        with self.lock:
-            self.cache.clear()
-            self.access_order.clear()
-    
-    def size(self) -> int:
-        """Get current cache size."""
-        with self.lock:
-            return len(self.cache)
-    
-    def stats(self) -> Dict:
-        """Get cache statistics."""
-        with self.lock:
-            return {
-                'size': len(self.cache),
-                'max_size': self.max_size,
-                'usage_percent': (len(self.cache) / self.max_size) * 100
-            }
-
-    def bulk_set(self, items: Dict[str, Dict]):
-        """Set multiple cached values."""
-        with self.lock:
-            for key, value in items.items():
-                # Remove if already exists
-                if key in self.cache:
-                    self.access_order.remove(key)
-                
-                # Add new entry
-                self.cache[key] = value
-                self.access_order.append(key)
-                
-            # Evict if over capacity after adding all new items
-            while len(self.cache) > self.max_size:
-                oldest_key = self.access_order.pop(0)
-                del self.cache[oldest_key]
\ No newline at end of file
@@ -0,0 +1,73 @@
+"""
+Request deadlines propagated across pipeline stages.
+
+An endpoint opens request_deadline(seconds); everything called from that
+context (same thread, or asyncio tasks created from it) sees the same absolute
+deadline. Network clients size their timeouts with timeout_for(), skip work
+once expired(), and the rate limiter never queues past the deadline, so a
+request's total latency is bounded instead of stacking per-stage timeouts and
+retries.
+
+Nested deadlines keep the earlier one. ThreadPoolExecutor workers don't
+inherit the context, so submit through contextvars.copy_context().run (as
+standardize_exams_batch does) to keep them under the caller's deadline.
+
+Settings come from the 'deadlines' config section.
+"""
+
+import contextvars
+import logging
+import time
+from contextlib import contextmanager
+from typing import Dict, Optional
+
+logger = logging.getLogger(__name__)
+
+_deadline: contextvars.ContextVar = contextvars.ContextVar('request_deadline', default=None)
+
+
+def get_deadline_config() -> Dict:
+    """The 'deadlines' config section (empty dict if config is unavailable)."""
+    try:
+        from config_manager import get_config
+        return get_config().get('deadlines', {}) or {}
+    except Exception as e:
+        logger.warning(f"[DEADLINE] Config unavailable, using defaults: {e}")
+        return {}
+
+
+@contextmanager
+def request_deadline(seconds: Optional[float]):
+    """Bound everything run in this context to `seconds` from now (None/0 = no new deadline)."""
+    if not seconds or seconds <= 0:
+        yield
+        return
+    deadline = time.monotonic() + seconds
+    current = _deadline.get()
+    token = _deadline.set(deadline if current is None else min(current, deadline))
+    try:
+        yield
+    finally:
+        _deadline.reset(token)
+
+
+def remaining() -> Optional[float]:
+    """Seconds left before the current deadline, or None if there is none."""
+    deadline = _deadline.get()
+    if deadline is None:
+        return None
+    return max(0.0, deadline - time.monotonic())
+
+
+def expired() -> bool:
+    """True once the current deadline has passed."""
+    left = remaining()
+    return left is not None and left <= 0
+
+
+def timeout_for(default: float, minimum: float = 0.1) -> float:
+    """A stage's timeout: its own default, capped by the time left on the deadline."""
+    left = remaining()
+    if left is None:
+        return default
+    return max(minimum, min(default, left))
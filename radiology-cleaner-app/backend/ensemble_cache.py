@@ -0,0 +1,82 @@
+"""
+Secondary-pipeline result cache.
+
+Stores ensemble adjudications in the shared tiered cache (memory LRU + SQLite
+tier) so an exam that was already adjudicated against the same candidates is
+not re-sent to every ensemble model when a sample or nightly batch is re-run.
+
+Keyed by (exam name, hash of the candidate SNOMED ids, model list, system
+prompt hash): changing the models or the prompt naturally misses. Entries hold
+the consensus and per-model responses but not the primary result they were
+computed for; the caller re-attaches the current one on a hit.
+"""
+
+import hashlib
+import json
+import logging
+import threading
+from typing import Dict, List, Optional
+
+logger = logging.getLogger(__name__)
+
+
+def _sha256(payload) -> str:
+    return hashlib.sha256(json.dumps(payload, ensure_ascii=False).encode('utf-8')).hexdigest()
+
+
+class EnsembleResultCache:
+    """Ensemble adjudication cache backed by the tiered cache."""
+
+    NAMESPACE = 'ensemble_results'
+
+    def __init__(self, cache=None, ttl_seconds: Optional[float] = 2592000, enabled: bool = True):
+        """
+        Args:
+            cache: TieredCache instance (shared get_cache() if None)
+            ttl_seconds: Lifetime of cached adjudications
+            enabled: When False every lookup misses and nothing is stored
+        """
+        self._cache = cache
+        self.ttl_seconds = ttl_seconds
+        self.enabled = enabled
+        self._lock = threading.Lock()
+        self._counters = {'lookups': 0, 'hits': 0, 'stores': 0}
+
+    @property
+    def cache(self):
+        if self._cache is None:
+            from tiered_cache import get_cache
+            self._cache = get_cache()
+        return self._cache
+
+    @staticmethod
+    def make_key(exam_name: str, candidate_ids: List[str], models: List[str], system_prompt: str) -> str:
+        # Candidate order doesn't change which candidate the models should pick
+        candidates_hash = _sha256(sorted(str(snomed_id) for snomed_id in candidate_ids))
+        return _sha256([exam_name, candidates_hash, list(models), _sha256(system_prompt or '')])
+
+    def _count(self, **increments):
+        with self._lock:
+            for name, value in increments.items():
+                self._counters[name] += value
+
+    def get(self, key: str) -> Optional[Dict]:
+        """Cached adjudication dict (EnsembleResult fields minus original_result), or None."""
+        if not self.enabled:
+            return None
+        entry = self.cache.get(self.NAMESPACE, key)
+        self._count(lookups=1, hits=int(entry is not None))
+        return entry
+
+    def set(self, key: str, entry: Dict):
+        if not self.enabled:
+            return
+        self.cache.set(self.NAMESPACE, key, entry, ttl=self.ttl_seconds)
+        self._count(stores=1)
+
+    def stats(self) -> Dict:
+        with self._lock:
+            counters = dict(self._counters)
+        counters['hit_rate'] = counters['hits'] / counters['lookups'] if counters['lookups'] else 0.0
+        counters['enabled'] = self.enabled
+        return counters
@@ -2,23 +2,40 @@ import json
 import sqlite3
 from datetime import datetime
 from typing import Dict, List, Optional
-import threading
 from collections import defaultdict
+from contextlib import contextmanager
 import logging
+from sqlite_pool import get_pool
 
 logger = logging.getLogger(__name__)
 
+# FTS5 trigram tokenizer needs at least 3 characters to produce a token
+FTS_TRIGRAM_MIN_LENGTH = 3
+
+def _enable_recursive_triggers(conn: sqlite3.Connection):
+    """INSERT OR REPLACE must fire delete triggers so the FTS indexes stay in sync"""
+    conn.execute('PRAGMA recursive_triggers = ON')
+
 class FeedbackTrainingManager:
     """Manages user feedback for active learning and model improvement"""
     
     def __init__(self, db_path: str = "radiology_cleaner.db"):
         self.db_path = db_path
-        self.lock = threading.Lock()
+        self.pool = get_pool(db_path)
+        self.pool.add_connection_hook(_enable_recursive_triggers)
+        self.fts_enabled = False
         self._init_feedback_tables()
+        self._init_fts_indexes()
+    
+    @contextmanager
+    def _get_connection(self):
+        """Yield this thread's pooled WAL connection, committing on success."""
+        with self.pool.connection() as conn:
+            yield conn
         
     def _init_feedback_tables(self):
         """Initialize feedback and training tables"""
-        with sqlite3.connect(self.db_path) as conn:
+        with self._get_connection() as conn:
             # User feedback table
             conn.execute('''
                 CREATE TABLE IF NOT EXISTS user_feedback (
@@ -93,9 +110,63 @@ class FeedbackTrainingManager:
             conn.execute('CREATE INDEX IF NOT EXISTS idx_patterns_input ON learned_patterns(input_pattern)')
             conn.execute('CREATE INDEX IF NOT EXISTS idx_org_mappings ON organization_mappings(organization, exam_name)')
 
+    def _init_fts_indexes(self):
+        """
+        Create FTS5 trigram indexes over learned_patterns.input_pattern and
+        organization_mappings.exam_name, kept in sync by triggers.
+        
+        Falls back to LIKE scans if this SQLite build lacks FTS5/trigram.
+        """
+        fts_tables = {
+            'learned_patterns_fts': ('learned_patterns', 'input_pattern'),
+            'organization_mappings_fts': ('organization_mappings', 'exam_name'),
+        }
+        try:
+            with self._get_connection() as conn:
+                for fts_table, (source_table, column) in fts_tables.items():
+                    exists = conn.execute(
+                        "SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = ?", (fts_table,)
+                    ).fetchone()
+                    conn.execute(f'''
+                        CREATE VIRTUAL TABLE IF NOT EXISTS {fts_table} USING fts5(
+                            {column}, content='{source_table}', content_rowid='id', tokenize='trigram'
+                        )
+                    ''')
+                    conn.execute(f'''
+                        CREATE TRIGGER IF NOT EXISTS {fts_table}_ai AFTER INSERT ON {source_table} BEGIN
+                            INSERT INTO {fts_table}(rowid, {column}) VALUES (new.id, new.{column});
+                        END
+                    ''')
+                    conn.execute(f'''
+                        CREATE TRIGGER IF NOT EXISTS {fts_table}_ad AFTER DELETE ON {source_table} BEGIN
+                            INSERT INTO {fts_table}({fts_table}, rowid, {column}) VALUES ('delete', old.id, old.{column});
+                        END
+                    ''')
+                    conn.execute(f'''
+                        CREATE TRIGGER IF NOT EXISTS {fts_table}_au AFTER UPDATE OF {column} ON {source_table} BEGIN
+                            INSERT INTO {fts_table}({fts_table}, rowid, {column}) VALUES ('delete', old.id, old.{column});
+                            INSERT INTO {fts_table}(rowid, {column}) VALUES (new.id, new.{column});
+                        END
+                    ''')
+                    if not exists:
+                        # Index rows written before the FTS table existed
+                        conn.execute(f"INSERT INTO {fts_table}({fts_table}) VALUES ('rebuild')")
+            self.fts_enabled = True
+        except sqlite3.OperationalError as e:
+            logger.warning(f"FTS5 trigram index unavailable, falling back to LIKE scans: {e}")
+            self.fts_enabled = False
+
+    @staticmethod
+    def _fts_phrase(text: str) -> str:
+        """Quote text as an FTS5 phrase (trigram phrase queries match substrings)."""
+        return '"' + text.replace('"', '""') + '"'
+
+    def _can_use_fts(self, text: str) -> bool:
+        return self.fts_enabled and len(text) >= FTS_TRIGRAM_MIN_LENGTH
+
     def submit_user_feedback(self, feedback_data: Dict) -> int:
         """Submit user feedback for a mapping result"""
-        with sqlite3.connect(self.db_path) as conn:
+        with self._get_connection() as conn:
             cursor = conn.execute('''
                 INSERT INTO user_feedback (
                     session_id, user_id, organization, original_exam_name, 
@@ -126,7 +197,7 @@ class FeedbackTrainingManager:
 
     def _process_feedback_immediately(self, feedback_id: int):
         """Process high-confidence feedback immediately"""
-        with sqlite3.connect(self.db_path) as conn:
+        with self._get_connection() as conn:
             cursor = conn.execute('''
                 SELECT * FROM user_feedback WHERE id = ? AND processed = FALSE
             ''', (feedback_id,))
@@ -165,7 +236,7 @@ class FeedbackTrainingManager:
                                    modality_code: str, nhs_clean_name: str, 
                                    confidence_score: float):
         """Create or update organization-specific mapping"""
-        with sqlite3.connect(self.db_path) as conn:
+        with self._get_connection() as conn:
             conn.execute('''
                 INSERT OR REPLACE INTO organization_mappings (
                     organization, exam_name, modality_code, nhs_clean_name, 
@@ -181,7 +252,7 @@ class FeedbackTrainingManager:
                               input_pattern: str, target_nhs_name: str, 
                               confidence_score: float):
         """Create learned pattern from feedback"""
-        with sqlite3.connect(self.db_path) as conn:
+        with self._get_connection() as conn:
             conn.execute('''
                 INSERT OR REPLACE INTO learned_patterns (
                     pattern_type, source_organization, input_pattern, 
@@ -196,8 +267,7 @@ class FeedbackTrainingManager:
     def get_organization_mapping(self, organization: str, exam_name: str, 
                                modality_code: str) -> Optional[Dict]:
         """Get organization-specific mapping if exists"""
-        with sqlite3.connect(self.db_path) as conn:
-            conn.row_factory = sqlite3.Row
+        with self._get_connection() as conn:
             cursor = conn.execute('''
                 SELECT * FROM organization_mappings 
                 WHERE organization = ? AND exam_name = ? AND modality_code = ?
@@ -209,10 +279,31 @@ class FeedbackTrainingManager:
             row = cursor.fetchone()
             return dict(row) if row else None
 
+    def search_organization_mappings(self, organization: str, exam_text: str,
+                                     limit: int = 5) -> List[Dict]:
+        """Find verified organization mappings whose exam name contains exam_text"""
+        with self._get_connection() as conn:
+            if self._can_use_fts(exam_text):
+                cursor = conn.execute('''
+                    SELECT om.* FROM organization_mappings_fts
+                    JOIN organization_mappings om ON om.id = organization_mappings_fts.rowid
+                    WHERE organization_mappings_fts MATCH ? AND om.organization = ?
+                    AND om.verified_count >= 2
+                    ORDER BY om.confidence_score DESC, om.verified_count DESC
+                    LIMIT ?
+                ''', (self._fts_phrase(exam_text), organization, limit))
+            else:
+                cursor = conn.execute('''
+                    SELECT * FROM organization_mappings
+                    WHERE exam_name LIKE ? AND organization = ? AND verified_count >= 2
+                    ORDER BY confidence_score DESC, verified_count DESC
+                    LIMIT ?
+                ''', (f'%{exam_text}%', organization, limit))
+            return [dict(row) for row in cursor.fetchall()]
+
     def get_learned_patterns(self, input_text: str, threshold: float = 0.7) -> List[Dict]:
         """Get learned patterns that match input text"""
-        with sqlite3.connect(self.db_path) as conn:
-            conn.row_factory = sqlite3.Row
+        with self._get_connection() as conn:
             
             # Exact matches first
             cursor = conn.execute('''
@@ -223,13 +314,22 @@ class FeedbackTrainingManager:
             
             exact_matches = [dict(row) for row in cursor.fetchall()]
             
-            # Fuzzy matches (basic - can be enhanced)
-            cursor = conn.execute('''
-                SELECT * FROM learned_patterns 
-                WHERE input_pattern LIKE ? AND active = TRUE AND confidence_score >= ?
-                ORDER BY confidence_score DESC, feedback_count DESC
-                LIMIT 5
-            ''', (f'%{input_text}%', threshold - 0.2))
+            # Fuzzy (substring) matches via the trigram index, LIKE scan as fallback
+            if self._can_use_fts(input_text):
+                cursor = conn.execute('''
+                    SELECT lp.* FROM learned_patterns_fts
+                    JOIN learned_patterns lp ON lp.id = learned_patterns_fts.rowid
+                    WHERE learned_patterns_fts MATCH ? AND lp.active = TRUE AND lp.confidence_score >= ?
+                    ORDER BY lp.confidence_score DESC, lp.feedback_count DESC
+                    LIMIT 5
+                ''', (self._fts_phrase(input_text), threshold - 0.2))
+            else:
+                cursor = conn.execute('''
+                    SELECT * FROM learned_patterns 
+                    WHERE input_pattern LIKE ? AND active = TRUE AND confidence_score >= ?
+                    ORDER BY confidence_score DESC, feedback_count DESC
+                    LIMIT 5
+                ''', (f'%{input_text}%', threshold - 0.2))
             
             fuzzy_matches = [dict(row) for row in cursor.fetchall()]
             
@@ -237,7 +337,7 @@ class FeedbackTrainingManager:
 
     def get_feedback_stats(self, days: int = 30) -> Dict:
         """Get feedback statistics for monitoring"""
-        with sqlite3.connect(self.db_path) as conn:
+        with self._get_connection() as conn:
             cursor = conn.execute('''
                 SELECT 
                     feedback_type,
@@ -275,7 +375,7 @@ class FeedbackTrainingManager:
 
     def retrain_patterns(self):
         """Retrain patterns based on accumulated feedback"""
-        with sqlite3.connect(self.db_path) as conn:
+        with self._get_connection() as conn:
             # Update pattern success rates
             cursor = conn.execute('''
                 UPDATE learned_patterns 
@@ -0,0 +1,280 @@
+"""
+Token, latency and cost accounting for LLM completions.
+
+Every OpenRouter completion (listwise reranking and ensemble adjudication) is
+recorded with its model, source, prompt/completion tokens, prompt tokens served
+from the provider's prompt cache, and latency:
+
+- per model: process-wide totals and latency percentiles for /admin/llm-usage
+- per batch: a UsageBudget opened with usage_budget() collects the batch's
+  usage for processing_stats and can cap its LLM spend. Once the budget is
+  exhausted, LLM rerankers fall back to non-LLM backends and the secondary
+  pipeline stops adjudicating.
+
+The budget lives in a contextvar like the request deadline; ThreadPoolExecutor
+workers don't inherit it, so submit through run_with_budget().
+
+Settings come from the 'llm_usage' config section.
+"""
+
+import contextvars
+import logging
+import threading
+import time
+from collections import deque
+from contextlib import contextmanager
+from typing import Any, Dict, Optional
+
+logger = logging.getLogger(__name__)
+
+_budget: contextvars.ContextVar = contextvars.ContextVar('llm_usage_budget', default=None)
+
+
+def get_usage_config() -> Dict:
+    """The 'llm_usage' config section (empty dict if config is unavailable)."""
+    try:
+        from config_manager import get_config
+        return get_config().get('llm_usage', {}) or {}
+    except Exception as e:
+        logger.warning(f"[LLM-USAGE] Config unavailable, using defaults: {e}")
+        return {}
+
+
+def _usage_value(usage: Any, key: str) -> Optional[float]:
+    """Read a field from a usage dict (raw HTTP) or usage object (openai SDK)."""
+    if usage is None:
+        return None
+    value = usage.get(key) if isinstance(usage, dict) else getattr(usage, key, None)
+    return value if isinstance(value, (int, float)) else None
+
+
+def _cached_tokens(usage: Any) -> int:
+    """Prompt tokens served from the provider's prompt cache (usage.prompt_tokens_details.cached_tokens)."""
+    if usage is None:
+        return 0
+    details = usage.get('prompt_tokens_details') if isinstance(usage, dict) else getattr(usage, 'prompt_tokens_details', None)
+    return int(_usage_value(details, 'cached_tokens') or 0)
+
+
+def _cost(model: str, prompt_tokens: int, completion_tokens: int, reported: Optional[float],
+          cost_per_1k_tokens: Optional[float], cached_tokens: int = 0) -> Optional[float]:
+    """Provider-reported cost if present, else configured pricing, else the caller's flat rate."""
+    if reported is not None:
+        return reported
+    pricing = (get_usage_config().get('pricing', {}) or {}).get(model)
+    if pricing:
+        prompt_rate = pricing.get('prompt_per_1k', 0.0)
+        cached_rate = pricing.get('cached_prompt_per_1k', prompt_rate)
+        return ((prompt_tokens - cached_tokens) * prompt_rate + cached_tokens * cached_rate
+                + completion_tokens * pricing.get('completion_per_1k', 0.0)) / 1000.0
+    if cost_per_1k_tokens is not None:
+        return (prompt_tokens + completion_tokens) * cost_per_1k_tokens / 1000.0
+    return None
+
+
+class _Totals:
+    """Running totals for one model (or one whole budget)."""
+
+    def __init__(self, latency_window: int = 0):
+        self.calls = 0
+        self.errors = 0
+        self.prompt_tokens = 0
+        self.completion_tokens = 0
+        self.cached_prompt_tokens = 0
+        self.cost_usd = 0.0
+        self.latency_seconds = 0.0
+        self.by_source: Dict[str, int] = {}
+        self._latencies = deque(maxlen=latency_window) if latency_window else None
+
+    def add(self, source: str, prompt_tokens: int, completion_tokens: int, latency: float,
+            cost: Optional[float], error: bool, cached_tokens: int = 0):
+        self.calls += 1
+        self.errors += int(error)
+        self.prompt_tokens += prompt_tokens
+        self.completion_tokens += completion_tokens
+        self.cached_prompt_tokens += cached_tokens
+        self.cost_usd += cost or 0.0
+        self.latency_seconds += latency
+        self.by_source[source] = self.by_source.get(source, 0) + 1
+        if self._latencies is not None:
+            self._latencies.append(latency)
+
+    @property
+    def total_tokens(self) -> int:
+        return self.prompt_tokens + self.completion_tokens
+
+    def snapshot(self) -> Dict:
+        snapshot = {
+            'calls': self.calls,
+            'errors': self.errors,
+            'prompt_tokens': self.prompt_tokens,
+            'completion_tokens': self.completion_tokens,
+            'total_tokens': self.total_tokens,
+            'cached_prompt_tokens': self.cached_prompt_tokens,
+            'prompt_cache_hit_rate': round(self.cached_prompt_tokens / self.prompt_tokens, 3) if self.prompt_tokens else 0.0,
+            'cost_usd': round(self.cost_usd, 6),
+            'avg_latency_ms': round(self.latency_seconds / self.calls * 1000, 1) if self.calls else 0.0,
+            'calls_by_source': dict(self.by_source),
+        }
+        if self._latencies:
+            ordered = sorted(self._latencies)
+            snapshot['p50_latency_ms'] = round(ordered[len(ordered) // 2] * 1000, 1)
+            snapshot['p95_latency_ms'] = round(ordered[min(len(ordered) - 1, int(len(ordered) * 0.95))] * 1000, 1)
+        return snapshot
+
+
+class UsageBudget:
+    """LLM usage of one batch, with optional call, token and cost limits (None = unlimited)."""
+
+    def __init__(self, max_total_tokens: Optional[int] = None, max_cost_usd: Optional[float] = None,
+                 max_calls: Optional[int] = None):
+        self.max_total_tokens = max_total_tokens
+        self.max_cost_usd = max_cost_usd
+        self.max_calls = max_calls
+        self.totals = _Totals()
+        self.per_model: Dict[str, _Totals] = {}
+        self.skipped_calls = 0
+        self._exhausted_logged = False
+        self._lock = threading.Lock()
+
+    @classmethod
+    def from_config(cls, overrides: Optional[Dict] = None) -> 'UsageBudget':
+        """Budget from the 'llm_usage.batch_budget' config, with per-request overrides."""
+        settings = dict(get_usage_config().get('batch_budget', {}) or {})
+        settings.update({key: value for key, value in (overrides or {}).items()
+                         if key in ('max_total_tokens', 'max_cost_usd', 'max_calls')})
+        return cls(settings.get('max_total_tokens'), settings.get('max_cost_usd'), settings.get('max_calls'))
+
+    def add(self, model: str, source: str, prompt_tokens: int, completion_tokens: int, latency: float,
+            cost: Optional[float], error: bool = False, cached_tokens: int = 0):
+        with self._lock:
+            self.totals.add(source, prompt_tokens, completion_tokens, latency, cost, error, cached_tokens)
+            self.per_model.setdefault(model, _Totals()).add(source, prompt_tokens, completion_tokens,
+                                                            latency, cost, error, cached_tokens)
+
+    def _over_limit(self) -> bool:
+        return ((self.max_total_tokens is not None and self.totals.total_tokens >= self.max_total_tokens)
+                or (self.max_cost_usd is not None and self.totals.cost_usd >= self.max_cost_usd)
+                or (self.max_calls is not None and self.totals.calls >= self.max_calls))
+
+    def is_exhausted(self) -> bool:
+        with self._lock:
+            return self._over_limit()
+
+    def note_skipped(self):
+        with self._lock:
+            self.skipped_calls += 1
+            if self._exhausted_logged:
+                return
+            self._exhausted_logged = True
+        logger.warning(f"[LLM-USAGE] Batch LLM budget exhausted ({self.totals.calls} calls, {self.totals.total_tokens} tokens, "
+                       f"${self.totals.cost_usd:.4f}); skipping further LLM calls")
+
+    def summary(self) -> Dict:
+        with self._lock:
+            summary = self.totals.snapshot()
+            summary.update({
+                'budget': {'max_total_tokens': self.max_total_tokens, 'max_cost_usd': self.max_cost_usd,
+                           'max_calls': self.max_calls},
+                'budget_exhausted': self._over_limit(),
+                'skipped_calls': self.skipped_calls,
+                'per_model': {model: totals.snapshot() for model, totals in self.per_model.items()},
+            })
+            return summary
+
+
+@contextmanager
+def usage_budget(budget: Optional[UsageBudget]):
+    """Charge LLM calls made in this context (thread or task) to `budget`."""
+    token = _budget.set(budget)
+    try:
+        yield budget
+    finally:
+        _budget.reset(token)
+
+
+def run_with_budget(budget: Optional[UsageBudget], fn, *args, **kwargs):
+    """Call fn inside usage_budget(budget); for submitting work to executor threads."""
+    with usage_budget(budget):
+        return fn(*args, **kwargs)
+
+
+def current_budget() -> Optional[UsageBudget]:
+    return _budget.get()
+
+
+def budget_exhausted(count_skip: bool = True) -> bool:
+    """True if the current batch budget is spent (the caller should skip its LLM call)."""
+    budget = _budget.get()
+    if budget is None or not budget.is_exhausted():
+        return False
+    if count_skip:
+        budget.note_skipped()
+    return True
+
+
+class UsageTracker:
+    """Process-wide per-model usage for the metrics endpoint."""
+
+    def __init__(self, latency_window: int = 500):
+        self.latency_window = latency_window
+        self.models: Dict[str, _Totals] = {}
+        self.started = time.time()
+        self._lock = threading.Lock()
+
+    def add(self, model: str, source: str, prompt_tokens: int, completion_tokens: int, latency: float,
+            cost: Optional[float], error: bool = False, cached_tokens: int = 0):
+        with self._lock:
+            totals = self.models.get(model)
+            if totals is None:
+                totals = self.models[model] = _Totals(self.latency_window)
+            totals.add(source, prompt_tokens, completion_tokens, latency, cost, error, cached_tokens)
+
+    def snapshot(self) -> Dict:
+        with self._lock:
+            return {
+                'since': self.started,
+                'models': {model: totals.snapshot() for model, totals in self.models.items()},
+            }
+
+    def reset(self):
+        with self._lock:
+            self.models.clear()
+            self.started = time.time()
+
+
+_tracker: Optional[UsageTracker] = None
+_tracker_lock = threading.Lock()
+
+
+def get_usage_tracker() -> UsageTracker:
+    global _tracker
+    if _tracker is None:
+        with _tracker_lock:
+            if _tracker is None:
+                _tracker = UsageTracker(get_usage_config().get('latency_window', 500))
+    return _tracker
+
+
+def record_llm_usage(model: str, source: str, usage: Any, latency: float, error: bool = False,
+                     cost_per_1k_tokens: Optional[float] = None) -> Dict:
+    """
+    Record one completion against the per-model tracker and the current batch budget.
+
+    `usage` is the response's usage block (dict or SDK object; None for failed
+    calls). Returns the normalised {prompt_tokens, completion_tokens,
+    cached_prompt_tokens, cost_usd}.
+    """
+    prompt_tokens = int(_usage_value(usage, 'prompt_tokens') or 0)
+    completion_tokens = int(_usage_value(usage, 'completion_tokens') or 0)
+    cached_tokens = min(_cached_tokens(usage), prompt_tokens)
+    cost = _cost(model, prompt_tokens, completion_tokens, _usage_value(usage, 'cost'), cost_per_1k_tokens, cached_tokens)
+
+    get_usage_tracker().add(model, source, prompt_tokens, completion_tokens, latency, cost, error, cached_tokens)
+    budget = _budget.get()
+    if budget is not None:
+        budget.add(model, source, prompt_tokens, completion_tokens, latency, cost, error, cached_tokens)
+    logger.debug(f"[LLM-USAGE] {source} {model}: {prompt_tokens}+{completion_tokens} tokens "
+                 f"({cached_tokens} cached) in {latency * 1000:.0f}ms")
+    return {'prompt_tokens': prompt_tokens, 'completion_tokens': completion_tokens,
+            'cached_prompt_tokens': cached_tokens, 'cost_usd': cost}
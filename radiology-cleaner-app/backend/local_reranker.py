@@ -0,0 +1,223 @@
+"""
+Local CPU cross-encoder reranker.
+
+Loads a cross-encoder from local disk (sentence-transformers CrossEncoder) and
+scores (query, doc) pairs in fixed-size batches spread over a small pool of CPU
+threads, so reranking latency doesn't depend on a third-party endpoint or on
+network availability.
+
+model_path is required. Setting it to 'stand-in' together with allow_stand_in
+swaps in StandInCrossEncoder, a tiny deterministic lexical scorer with the same
+predict() interface. It needs no model files or ML dependencies and is only for
+tests and offline development; without the flag a 'stand-in' path is refused.
+"""
+
+import asyncio
+import logging
+import math
+import os
+import re
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, List, Optional, Sequence, Tuple
+
+logger = logging.getLogger(__name__)
+
+STAND_IN_MODEL_PATH = 'stand-in'
+
+_TOKEN_RE = re.compile(r'[a-z0-9]+')
+
+
+class StandInCrossEncoder:
+    """
+    Deterministic stand-in for a cross-encoder.
+
+    Scores a pair from token and character-trigram overlap, squashed to a
+    logistic probability. Same input always gives the same score, and a closer
+    lexical match always scores higher.
+    """
+
+    model_id = 'stand-in-cross-encoder'
+
+    @staticmethod
+    def _features(text: str) -> Tuple[set, set]:
+        tokens = set(_TOKEN_RE.findall(text.lower()))
+        joined = ' '.join(sorted(tokens))
+        trigrams = {joined[i:i + 3] for i in range(len(joined) - 2)}
+        return tokens, trigrams
+
+    @staticmethod
+    def _jaccard(a: set, b: set) -> float:
+        if not a or not b:
+            return 0.0
+        return len(a & b) / len(a | b)
+
+    def predict(self, pairs: Sequence[Tuple[str, str]], batch_size: int = 32, **kwargs) -> List[float]:
+        scores = []
+        for query, doc in pairs:
+            q_tokens, q_trigrams = self._features(query)
+            d_tokens, d_trigrams = self._features(doc)
+            overlap = 0.6 * self._jaccard(q_tokens, d_tokens) + 0.4 * self._jaccard(q_trigrams, d_trigrams)
+            scores.append(1.0 / (1.0 + math.exp(-8.0 * (overlap - 0.5))))
+        return scores
+
+
+class LocalCrossEncoderReranker:
+    """
+    Cross-encoder reranker running on local CPU threads.
+
+    Exposes the same get_rerank_scores() interface as OpenRouterReranker, plus
+    score_raw()/score_raw_batch() returning unnormalized pair probabilities
+    (used by RerankerManager's pair-score cache).
+    """
+
+    def __init__(self, model_path: str, batch_size: int = 32, num_threads: int = 2,
+                 max_length: int = 256, model_id: Optional[str] = None, allow_stand_in: bool = False):
+        """
+        Args:
+            model_path: Directory of a saved cross-encoder, or 'stand-in' (with allow_stand_in)
+            batch_size: Pairs per forward pass
+            num_threads: CPU worker threads scoring batches in parallel
+            max_length: Max tokens per (query, doc) pair
+            model_id: Identifier used in cache keys (defaults to the model directory name)
+            allow_stand_in: Permit the 'stand-in' test model (tests and offline development only)
+        """
+        self.model_path = model_path
+        self.allow_stand_in = allow_stand_in
+        self.batch_size = max(1, batch_size)
+        self.num_threads = max(1, num_threads)
+        self.max_length = max_length
+        self.model_id = model_id or (StandInCrossEncoder.model_id if model_path == STAND_IN_MODEL_PATH
+                                     else os.path.basename(os.path.normpath(model_path or '')))
+        self.model = None
+        self.load_error: Optional[str] = None
+        self._load_lock = threading.Lock()
+        self._executor = ThreadPoolExecutor(max_workers=self.num_threads, thread_name_prefix='local-rerank')
+
+    def _load_model(self):
+        """Load the model once; later calls return the cached instance (or None on failure)."""
+        if self.model is not None or self.load_error:
+            return self.model
+        with self._load_lock:
+            if self.model is not None or self.load_error:
+                return self.model
+            if self.model_path == STAND_IN_MODEL_PATH:
+                if not self.allow_stand_in:
+                    self.load_error = "stand-in model requires allow_stand_in (tests only)"
+                    logger.error(f"[LOCAL-RERANK] {self.load_error}")
+                    return None
+                self.model = StandInCrossEncoder()
+                logger.info("[LOCAL-RERANK] Using deterministic stand-in cross-encoder")
+                return self.model
+            if not self.model_path or not os.path.isdir(self.model_path):
+                self.load_error = f"model directory not found: {self.model_path}"
+                logger.warning(f"[LOCAL-RERANK] {self.load_error}")
+                return None
+            try:
+                from sentence_transformers import CrossEncoder
+                try:
+                    import torch
+                    # Split CPU cores between worker threads instead of oversubscribing
+                    torch.set_num_threads(max(1, (os.cpu_count() or 1) // self.num_threads))
+                except ImportError:
+                    pass
+                self.model = CrossEncoder(self.model_path, max_length=self.max_length, device='cpu')
+                logger.info(f"[LOCAL-RERANK] Loaded cross-encoder from {self.model_path} "
+                            f"(batch_size={self.batch_size}, threads={self.num_threads})")
+            except ImportError:
+                self.load_error = "sentence-transformers not installed"
+                logger.warning(f"[LOCAL-RERANK] {self.load_error}; local reranker disabled")
+            except Exception as e:
+                self.load_error = str(e)
+                logger.error(f"[LOCAL-RERANK] Failed to load cross-encoder from {self.model_path}: {e}")
+        return self.model
+
+    def is_available(self) -> bool:
+        return self._load_model() is not None
+
+    def _predict_chunk(self, pairs: List[Tuple[str, str]]) -> List[float]:
+        scores = self.model.predict(pairs, batch_size=self.batch_size, show_progress_bar=False)
+        return [float(score) for score in scores]
+
+    def score_raw_batch(self, items: Sequence[Tuple[str, List[str]]]) -> List[Optional[List[float]]]:
+        """Raw pair probabilities per exam (None for every exam if the model can't score)."""
+        if self._load_model() is None:
+            return [None] * len(items)
+
+        pairs = [(query, doc) for query, docs in items for doc in docs]
+        if not pairs:
+            return [[] for _ in items]
+
+        chunks = [pairs[i:i + self.batch_size] for i in range(0, len(pairs), self.batch_size)]
+        try:
+            flat_scores = [score for chunk_scores in self._executor.map(self._predict_chunk, chunks)
+                           for score in chunk_scores]
+        except Exception as e:
+            logger.error(f"[LOCAL-RERANK] Scoring failed for {len(pairs)} pairs: {e}")
+            return [None] * len(items)
+
+        results = []
+        offset = 0
+        for _, docs in items:
+            results.append(flat_scores[offset:offset + len(docs)])
+            offset += len(docs)
+        return results
+
+    async def score_raw_batch_async(self, items: Sequence[Tuple[str, List[str]]]) -> List[Optional[List[float]]]:
+        """Async variant of score_raw_batch; scoring runs off the event loop."""
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(None, self.score_raw_batch, items)
+
+    def score_raw(self, query: str, documents: List[str]) -> Optional[List[float]]:
+        return self.score_raw_batch([(query, documents)])[0]
+
+    @staticmethod
+    def normalize(raw_scores: Optional[List[float]], n_docs: int) -> List[float]:
+        """Min-max normalize one exam's scores to 0-1 (neutral 0.5 on failure), matching MedCPT."""
+        if raw_scores is None:
+            return [0.5] * n_docs
+        if not raw_scores:
+            return []
+        max_score = max(raw_scores)
+        min_score = min(raw_scores)
+        if max_score <= min_score:
+            return [0.5] * len(raw_scores)
+        return [(score - min_score) / (max_score - min_score) for score in raw_scores]
+
+    def get_rerank_scores(self, query: str, documents: List[str]) -> List[float]:
+        """Normalized scores (0.0-1.0) for one exam's candidates."""
+        return self.normalize(self.score_raw(query, documents), len(documents))
+
+    def test_connection(self) -> bool:
+        scores = self.get_rerank_scores("CT chest", ["CT Chest", "MRI Brain"])
+        return len(scores) == 2 and scores[0] > scores[1]
+
+    def close(self):
+        self._executor.shutdown(wait=False)
+
+
+def build_local_reranker(config: Dict) -> Optional[LocalCrossEncoderReranker]:
+    """
+    Create the local reranker from a 'reranking.local_cross_encoder' config block.
+
+    Returns None if it is disabled, or if no model_path is configured (the
+    backend is not registered rather than silently serving the stand-in).
+    """
+    if not config or not config.get('enabled', False):
+        return None
+    model_path = os.environ.get('LOCAL_RERANKER_MODEL_PATH') or config.get('model_path')
+    if not model_path:
+        logger.error("[LOCAL-RERANK] Enabled without a model_path (or LOCAL_RERANKER_MODEL_PATH); not registering")
+        return None
+    allow_stand_in = bool(config.get('allow_stand_in', False))
+    if model_path == STAND_IN_MODEL_PATH and not allow_stand_in:
+        logger.error("[LOCAL-RERANK] model_path 'stand-in' requires allow_stand_in (tests only); not registering")
+        return None
+    return LocalCrossEncoderReranker(
+        model_path=model_path,
+        batch_size=config.get('batch_size', 32),
+        num_threads=config.get('num_threads', 2),
+        max_length=config.get('max_length', 256),
+        model_id=config.get('model_id'),
+        allow_stand_in=allow_stand_in,
+    )
@@ -0,0 +1,388 @@
+"""
+MedCPT cross-encoder client for reranking via the HuggingFace Inference API.
+
+Keeps one keep-alive requests.Session (pooled connections, retry on transient
+errors) for the life of the process instead of a fresh TLS handshake per exam,
+and can pack the (query, doc) pairs of many exams into a single inference call.
+
+Two batching entry points:
+- score_raw_batch([(query, docs), ...]) - explicit multi-exam batch (batch processor,
+  via RerankerManager.get_rerank_scores_batch)
+- score(query, docs) - single exam; concurrent batch-lane callers arriving within
+  a short window are coalesced into one batch call (micro-batch path)
+
+score_raw_batch_async() is the coroutine variant used by the async pipeline; it
+sends the same requests on the shared httpx.AsyncClient (async_http.py).
+
+The *_raw variants return unnormalized pair probabilities, which are stable per
+(query, doc) pair and therefore safe to cache. Normalized scores are min-max
+scaled per exam, so packing exams together never changes an exam's scores.
+"""
+
+import asyncio
+import math
+import os
+import logging
+import threading
+import time
+from typing import List, Optional, Sequence, Tuple
+
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+
+from circuit_breaker import get_breaker
+from rate_limiter import get_rate_limiter, parse_retry_after, get_priority, INTERACTIVE
+from deadline import timeout_for, expired as deadline_expired
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_API_URL = "https://api-inference.huggingface.co/models/ncbi/MedCPT-Cross-Encoder"
+
+
+class _PendingScore:
+    """One exam waiting in the micro-batch queue."""
+    __slots__ = ('query', 'documents', 'event', 'scores')
+
+    def __init__(self, query: str, documents: List[str]):
+        self.query = query
+        self.documents = documents
+        self.event = threading.Event()
+        self.scores: Optional[List[float]] = None
+
+
+class MedCPTClient:
+    """
+    Pooled, batching client for the MedCPT cross-encoder.
+    """
+
+    def __init__(self, api_token: Optional[str] = None, api_url: str = DEFAULT_API_URL,
+                 timeout: int = 30, max_pairs_per_request: int = 256,
+                 micro_batch_wait_ms: float = 10.0, pool_maxsize: int = 16):
+        """
+        Args:
+            api_token: HuggingFace token (or from env var HUGGING_FACE_TOKEN)
+            api_url: Inference endpoint for the cross-encoder
+            timeout: Request timeout in seconds
+            max_pairs_per_request: Upper bound on pairs packed into one inference call
+            micro_batch_wait_ms: How long the first caller waits for others to join (0 disables coalescing)
+            pool_maxsize: Keep-alive connections held by the session
+        """
+        self.api_token = api_token or os.environ.get('HUGGING_FACE_TOKEN')
+        self.api_url = api_url
+        self.timeout = timeout
+        self.max_pairs_per_request = max(1, max_pairs_per_request)
+        self.micro_batch_wait = max(0.0, micro_batch_wait_ms) / 1000.0
+
+        self.session = requests.Session()
+        # 429/503 are not retried here: _parse_response pauses the shared rate limiter on them
+        retry_strategy = Retry(
+            total=3,
+            backoff_factor=1,
+            status_forcelist=[500, 502, 504],
+            allowed_methods=frozenset(['POST']),
+        )
+        adapter = HTTPAdapter(pool_connections=4, pool_maxsize=pool_maxsize, max_retries=retry_strategy)
+        self.session.mount("http://", adapter)
+        self.session.mount("https://", adapter)
+        self.session.headers.update({"Authorization": f"Bearer {self.api_token}"})
+
+        # Micro-batch state: the first caller in a window becomes the leader and sends for everyone
+        self._queue: List[_PendingScore] = []
+        self._queue_lock = threading.Lock()
+        self._leader_active = False
+
+        self.stats = {'requests': 0, 'pairs': 0, 'exams': 0, 'coalesced_batches': 0, 'errors': 0,
+                      'circuit_rejected': 0}
+        self.breaker = get_breaker('medcpt')
+        self.rate_limiter = get_rate_limiter('huggingface', api_url.rstrip('/').split('/models/')[-1])
+
+    def is_available(self) -> bool:
+        return bool(self.api_token)
+
+    # ------------------------------------------------------------------
+    # Public API
+    # ------------------------------------------------------------------
+
+    def score(self, query: str, documents: List[str]) -> List[float]:
+        """Normalized scores for one exam; may be coalesced with concurrent callers."""
+        return self.normalize(self.score_raw(query, documents), query, len(documents))
+
+    def score_raw(self, query: str, documents: List[str]) -> Optional[List[float]]:
+        """
+        Raw (unnormalized) pair probabilities for one exam, or None on failure.
+
+        Concurrent callers arriving within the micro-batch window are packed
+        into one score_raw_batch call by whichever caller arrived first.
+        Interactive-lane calls are sent straight away rather than waiting the
+        window for company.
+        """
+        if not documents:
+            return []
+        if self.micro_batch_wait <= 0 or get_priority() == INTERACTIVE:
+            return self.score_raw_batch([(query, documents)])[0]
+
+        pending = _PendingScore(query, documents)
+        with self._queue_lock:
+            self._queue.append(pending)
+            is_leader = not self._leader_active
+            if is_leader:
+                self._leader_active = True
+
+        if is_leader:
+            time.sleep(self.micro_batch_wait)
+            with self._queue_lock:
+                batch, self._queue = self._queue, []
+                self._leader_active = False
+            if len(batch) > 1:
+                self.stats['coalesced_batches'] += 1
+                logger.debug(f"[MEDCPT] Coalesced {len(batch)} concurrent exams into one batch")
+            try:
+                results = self.score_raw_batch([(p.query, p.documents) for p in batch])
+            except Exception as e:
+                logger.error(f"[MEDCPT] Micro-batch scoring error: {e}")
+                results = [None] * len(batch)
+            for item, scores in zip(batch, results):
+                item.scores = scores
+                item.event.set()
+        elif not pending.event.wait(timeout=timeout_for(self.timeout * 2 + self.micro_batch_wait)):
+            logger.error("[MEDCPT] Timed out waiting for micro-batch leader")
+            return None
+
+        return pending.scores
+
+    def score_raw_batch(self, items: Sequence[Tuple[str, List[str]]]) -> List[Optional[List[float]]]:
+        """Raw pair probabilities per exam (None for exams whose call failed)."""
+        results: List[Optional[List[float]]] = [None] * len(items)
+        if not self.api_token:
+            logger.warning("[MEDCPT] MedCPT requires HUGGING_FACE_TOKEN")
+            return results
+
+        for group in self._group_items(items, results):
+            pairs = [{"text": items[idx][0], "text_pair": doc} for idx in group for doc in items[idx][1]]
+            self._assign_group_scores(items, group, self._request_raw_scores(pairs), results)
+
+        self.stats['exams'] += len(items)
+        return results
+
+    async def score_raw_batch_async(self, items: Sequence[Tuple[str, List[str]]]) -> List[Optional[List[float]]]:
+        """Async variant of score_raw_batch; request groups are sent concurrently."""
+        results: List[Optional[List[float]]] = [None] * len(items)
+        if not self.api_token:
+            logger.warning("[MEDCPT] MedCPT requires HUGGING_FACE_TOKEN")
+            return results
+
+        groups = self._group_items(items, results)
+        responses = await asyncio.gather(*(
+            self._request_raw_scores_async([{"text": items[idx][0], "text_pair": doc}
+                                            for idx in group for doc in items[idx][1]])
+            for group in groups
+        ))
+        for group, raw_scores in zip(groups, responses):
+            self._assign_group_scores(items, group, raw_scores, results)
+
+        self.stats['exams'] += len(items)
+        return results
+
+    # ------------------------------------------------------------------
+    # Internals
+    # ------------------------------------------------------------------
+
+    def _group_items(self, items: Sequence[Tuple[str, List[str]]], results: List[Optional[List[float]]]) -> List[List[int]]:
+        """Group whole exams into requests of at most max_pairs_per_request pairs (empty exams resolve to [])."""
+        groups: List[List[int]] = []
+        current: List[int] = []
+        current_pairs = 0
+        for idx, (_, docs) in enumerate(items):
+            if not docs:
+                results[idx] = []
+                continue
+            if current and current_pairs + len(docs) > self.max_pairs_per_request:
+                groups.append(current)
+                current, current_pairs = [], 0
+            current.append(idx)
+            current_pairs += len(docs)
+        if current:
+            groups.append(current)
+        return groups
+
+    @staticmethod
+    def _assign_group_scores(items, group: List[int], raw_scores: Optional[List[float]],
+                             results: List[Optional[List[float]]]):
+        """Split one request's flat scores back into per-exam lists (failed requests stay None)."""
+        if raw_scores is None:
+            return
+        offset = 0
+        for idx in group:
+            n_docs = len(items[idx][1])
+            results[idx] = raw_scores[offset:offset + n_docs]
+            offset += n_docs
+
+    def _request_raw_scores(self, pairs: List[dict]) -> Optional[List[float]]:
+        """POST pairs to the endpoint and return one raw probability per pair, or None."""
+        if deadline_expired() or not self.rate_limiter.acquire() or not self._allow_request():
+            return None
+        self.stats['requests'] += 1
+        self.stats['pairs'] += len(pairs)
+        start_time = time.time()
+        try:
+            try:
+                response = self.session.post(
+                    self.api_url,
+                    json={"inputs": pairs, "options": {"wait_for_model": True}},
+                    timeout=timeout_for(self.timeout)
+                )
+            except requests.exceptions.RequestException as e:
+                self.stats['errors'] += 1
+                if not deadline_expired():
+                    self.breaker.record_failure(str(e), time.time() - start_time)
+                logger.error(f"[MEDCPT] Request failed for {len(pairs)} pairs: {e}")
+                return None
+
+            return self._parse_response(response, len(pairs), time.time() - start_time)
+        finally:
+            # Frees a half-open probe slot the outcome above didn't resolve (e.g. deadline expiry)
+            self.breaker.release_probe()
+
+    async def _request_raw_scores_async(self, pairs: List[dict]) -> Optional[List[float]]:
+        """Async variant of _request_raw_scores on the shared httpx.AsyncClient."""
+        import httpx
+        from async_http import get_async_client
+
+        if deadline_expired() or not await self.rate_limiter.acquire_async() or not self._allow_request():
+            return None
+        self.stats['requests'] += 1
+        self.stats['pairs'] += len(pairs)
+        start_time = time.time()
+        try:
+            try:
+                response = await get_async_client().post(
+                    self.api_url,
+                    headers={"Authorization": f"Bearer {self.api_token}"},
+                    json={"inputs": pairs, "options": {"wait_for_model": True}},
+                    timeout=timeout_for(self.timeout)
+                )
+            except httpx.RequestError as e:
+                self.stats['errors'] += 1
+                if not deadline_expired():
+                    self.breaker.record_failure(str(e), time.time() - start_time)
+                logger.error(f"[MEDCPT] Async request failed for {len(pairs)} pairs: {e}")
+                return None
+
+            return self._parse_response(response, len(pairs), time.time() - start_time)
+        finally:
+            # Also runs when the task is cancelled mid-request
+            self.breaker.release_probe()
+
+    def _allow_request(self) -> bool:
+        """Check the circuit breaker; an open breaker skips the request entirely."""
+        if self.breaker.allow_request():
+            return True
+        self.stats['circuit_rejected'] += 1
+        logger.warning("[MEDCPT] Circuit open; skipping request (neutral scores)")
+        return False
+
+    def _parse_response(self, response, n_pairs: int, latency: float) -> Optional[List[float]]:
+        """Extract raw scores from an HTTP response and report the outcome to the breaker."""
+        if response.status_code != 200:
+            self.stats['errors'] += 1
+            self.breaker.record_failure(f"HTTP {response.status_code}", latency)
+            if response.status_code in (429, 503):
+                self.rate_limiter.pause(parse_retry_after(response.headers))
+            logger.error(f"[MEDCPT] API error {response.status_code}: {response.text[:200]}")
+            return None
+
+        try:
+            raw_scores = self._extract_raw_scores(response.json(), n_pairs)
+        except ValueError as e:
+            raw_scores = None
+            logger.error(f"[MEDCPT] Non-JSON response: {e}")
+        if raw_scores is None:
+            self.stats['errors'] += 1
+            self.breaker.record_failure("unexpected response format", latency)
+            logger.error(f"[MEDCPT] Unexpected response format for {n_pairs} pairs")
+        else:
+            self.breaker.record_success(latency)
+        return raw_scores
+
+    @staticmethod
+    def _extract_raw_scores(result, expected: int) -> Optional[List[float]]:
+        """
+        Handle the response shapes the Inference API has returned:
+        - [[{'label': 'LABEL_0', 'score': 0.12}, ...]]   (new format)
+        - [{'label': ..., 'score': ...}, ...]
+        - [[{'label': ..., 'score': ...}], ...]            (one list per pair)
+        - [logit_or_probability, ...]                      (old format)
+        """
+        if not isinstance(result, list):
+            return None
+        if len(result) == 1 and isinstance(result[0], list) and len(result[0]) == expected:
+            result = result[0]
+        if len(result) != expected:
+            return None
+
+        raw_scores = []
+        for item in result:
+            if isinstance(item, list) and item and isinstance(item[0], dict):
+                item = item[0]
+            if isinstance(item, dict) and 'score' in item:
+                raw_scores.append(float(item['score']))
+            elif isinstance(item, (int, float)):
+                raw_scores.append(float(item))
+            else:
+                logger.warning(f"[MEDCPT] Unexpected item format: {item}")
+                raw_scores.append(0.5)
+
+        # Old format: if values are mostly outside 0-1 range, treat as logits
+        if all(isinstance(x, (int, float)) for x in result) and any(abs(x) > 2 for x in raw_scores):
+            raw_scores = [1.0 / (1.0 + math.exp(-logit)) for logit in raw_scores]
+        return raw_scores
+
+    @staticmethod
+    def normalize(raw_scores: Optional[List[float]], query: str, n_docs: int) -> List[float]:
+        """
+        Min-max normalize one exam's scores to 0-1 to prevent confidence > 100%.
+        Failed calls (None) get neutral 0.5 scores.
+        """
+        if raw_scores is None:
+            return [0.5] * n_docs
+        if not raw_scores:
+            return []
+        max_score = max(raw_scores)
+        min_score = min(raw_scores)
+        if max_score > min_score:
+            scores = [(score - min_score) / (max_score - min_score) for score in raw_scores]
+        else:
+            # All scores are the same, normalize to 0.5
+            scores = [0.5] * len(raw_scores)
+        logger.info(f"[MEDCPT] Normalized {len(scores)} candidates for '{query[:40]}': {min_score:.3f}-{max_score:.3f} → {min(scores):.3f}-{max(scores):.3f}")
+        return scores
+
+
+# Global shared client (one connection pool per process)
+_shared_client = None
+_shared_client_lock = threading.Lock()
+
+
+def get_medcpt_client() -> MedCPTClient:
+    """Get the process-wide MedCPT client, configured from 'reranking.medcpt'."""
+    global _shared_client
+    if _shared_client is None:
+        with _shared_client_lock:
+            if _shared_client is None:
+                try:
+                    from config_manager import get_config
+                    medcpt_config = get_config().get('reranking.medcpt', {}) or {}
+                except Exception as e:
+                    logger.warning(f"[MEDCPT] Config unavailable, using client defaults: {e}")
+                    medcpt_config = {}
+                _shared_client = MedCPTClient(
+                    api_url=medcpt_config.get('api_url', DEFAULT_API_URL),
+                    timeout=medcpt_config.get('timeout', 30),
+                    max_pairs_per_request=medcpt_config.get('max_pairs_per_request', 256),
+                    micro_batch_wait_ms=medcpt_config.get('micro_batch_wait_ms', 10.0),
+                    pool_maxsize=medcpt_config.get('pool_maxsize', 16),
+                )
+                logger.info(f"[MEDCPT] Initialized pooled client (max_pairs_per_request={_shared_client.max_pairs_per_request}, "
+                            f"micro_batch_wait={_shared_client.micro_batch_wait * 1000:.0f}ms)")
+    return _shared_client
@@ -23,6 +23,7 @@
 #
 # =============================================================================
 
+import contextvars
 import json
 import logging
 import re
@@ -33,9 +34,10 @@ import yaml
 import hashlib
 import numpy as np
 import faiss
-from typing import Dict, List, Optional
+from typing import Any, Dict, List, Optional, Tuple
 from collections import defaultdict
-from fuzzywuzzy import fuzz
+from concurrent.futures import ThreadPoolExecutor
+from string_similarity import batch_ratio, normalize_for_similarity
 from typing import TYPE_CHECKING
 
 # Core application components
@@ -210,6 +212,7 @@ class NHSLookupEngine:
         This method enriches each NHS entry with:
         - _clean_fsn_for_embedding: Preprocessed SNOMED FSN for embeddings
         - _clean_primary_name_for_embedding: Preprocessed primary name for embeddings
+        - _similarity_key: Normalized primary name for batch fuzzy similarity
         - _interventional_terms: Detected interventional procedure indicators
         - _parsed_components: Semantic components (anatomy, modality, etc.)
         - _is_complex_fsn: Binary complexity flag for filtering
@@ -232,6 +235,7 @@ class NHSLookupEngine:
             # Preprocess names for embedding generation and semantic matching
             entry["_clean_fsn_for_embedding"] = preprocessor.preprocess(snomed_fsn_clean)
             entry["_clean_primary_name_for_embedding"] = preprocessor.preprocess(primary_name_raw)
+            entry["_similarity_key"] = normalize_for_similarity(entry["_clean_primary_name_for_embedding"])
             
             # Detect interventional procedure terms for scoring bonuses/penalties
             entry["_interventional_terms"] = detect_interventional_procedure_terms(entry["_clean_primary_name_for_embedding"])
@@ -574,6 +578,138 @@ class NHSLookupEngine:
         Stage 1 (Retrieval): Use retriever_processor (BioLORD) to get top-k candidates via FAISS
         Stage 2 (Reranking): Use selected reranker (MedCPT/GPT/Claude/Gemini) + component scoring to find best match
         """
+        steps = self._standardize_exam_steps(input_exam, extracted_input_components, is_input_simple, debug, reranker_key, data_source, exam_code)
+        reply = None
+        while True:
+            try:
+                request = steps.send(reply)
+            except StopIteration as done:
+                return done.value
+            reply = self._run_pipeline_request(request)
+    
+    async def standardize_exam_async(self, input_exam: str, extracted_input_components: Dict, is_input_simple: bool = False, debug: bool = False, reranker_key: Optional[str] = None, data_source: Optional[str] = None, exam_code: Optional[str] = None) -> Dict:
+        """
+        Async variant of `standardize_exam` with identical results.
+        
+        The embedding and reranking calls are awaited on the shared httpx.AsyncClient,
+        so many exams can be in flight on one event loop; retrieval and scoring run inline.
+        """
+        steps = self._standardize_exam_steps(input_exam, extracted_input_components, is_input_simple, debug, reranker_key, data_source, exam_code)
+        reply = None
+        while True:
+            try:
+                request = steps.send(reply)
+            except StopIteration as done:
+                return done.value
+            reply = await self._run_pipeline_request_async(request)
+    
+    def standardize_exams_batch(self, exams: List[Dict], max_workers: int = 2) -> List[Tuple[Optional[Dict], Optional[Exception]]]:
+        """
+        Run `standardize_exam` for many exams in lockstep, batching their reranker calls.
+
+        Each exam's pipeline advances to its next network request; the pending
+        ('rerank', ...) requests of a round are grouped by reranker key and served
+        by one `get_rerank_scores_batch` call each (packed MedCPT / OpenRouter
+        requests), and the remaining requests run on max_workers threads.
+
+        Args:
+            exams: standardize_exam keyword arguments per exam (input_exam, extracted_input_components, ...)
+            max_workers: Threads serving the non-rerank requests of a round
+
+        Returns:
+            (result, error) per exam, aligned with exams
+        """
+        outcomes: List[Tuple[Optional[Dict], Optional[Exception]]] = [(None, None)] * len(exams)
+        steps = {}
+        for idx, exam in enumerate(exams):
+            steps[idx] = self._standardize_exam_steps(
+                exam['input_exam'], exam['extracted_input_components'], exam.get('is_input_simple', False),
+                exam.get('debug', False), exam.get('reranker_key'), exam.get('data_source'), exam.get('exam_code'))
+        replies: Dict[int, Any] = {idx: None for idx in steps}
+
+        with ThreadPoolExecutor(max_workers=max(1, max_workers)) as executor:
+            while steps:
+                pending: Dict[int, Tuple] = {}
+                for idx in list(steps):
+                    try:
+                        pending[idx] = steps[idx].send(replies.pop(idx))
+                    except StopIteration as done:
+                        outcomes[idx] = (done.value, None)
+                        del steps[idx]
+                    except Exception as e:
+                        outcomes[idx] = (None, e)
+                        del steps[idx]
+                if not pending:
+                    break
+
+                rerank_groups: Dict[Optional[str], List[int]] = defaultdict(list)
+                futures = {}
+                for idx, request in pending.items():
+                    if request[0] == 'rerank':
+                        rerank_groups[request[3]].append(idx)
+                    else:
+                        futures[idx] = executor.submit(contextvars.copy_context().run, self._run_pipeline_request, request)
+
+                for tier_key, group in rerank_groups.items():
+                    items = [(pending[idx][1], pending[idx][2]) for idx in group]
+                    try:
+                        if len(items) == 1:
+                            scores = [self.reranker_manager.get_rerank_scores(items[0][0], items[0][1], tier_key)]
+                        else:
+                            scores = self.reranker_manager.get_rerank_scores_batch(items, tier_key)
+                    except Exception as e:
+                        logger.error(f"[V3-PIPELINE] Batch rerank with {tier_key} failed for {len(items)} exams, using neutral scores: {e}")
+                        scores = [[0.5] * len(documents) for _, documents in items]
+                    replies.update(zip(group, scores))
+
+                for idx, future in futures.items():
+                    try:
+                        replies[idx] = future.result()
+                    except Exception as e:
+                        # The sequential path would raise out of standardize_exam here
+                        steps[idx].close()
+                        outcomes[idx] = (None, e)
+                        del steps[idx]
+        return outcomes
+
+    def _run_pipeline_request(self, request: Tuple) -> Any:
+        """Serve a network request yielded by `_standardize_exam_steps` with blocking calls."""
+        kind = request[0]
+        if kind == 'embed':
+            return self.retriever_processor.get_text_embedding(request[1])
+        if kind == 'rerank':
+            return self.reranker_manager.get_rerank_scores(*request[1:])
+        # 'prefetch_embeddings': the sync path fetches embeddings on demand
+        return None
+    
+    async def _run_pipeline_request_async(self, request: Tuple) -> Any:
+        """Serve a network request yielded by `_standardize_exam_steps` without blocking the loop."""
+        kind = request[0]
+        if kind == 'embed':
+            return await self.retriever_processor.get_text_embedding_async(request[1])
+        if kind == 'rerank':
+            return await self.reranker_manager.get_rerank_scores_async(*request[1:])
+        if kind == 'prefetch_embeddings':
+            await self.retriever_processor.prefetch_embeddings_async(request[1])
+        return None
+    
+    def _standardize_exam_steps(self, input_exam: str, extracted_input_components: Dict, is_input_simple: bool, debug: bool, reranker_key: Optional[str], data_source: Optional[str], exam_code: Optional[str]):
+        """
+        Body of the two-stage pipeline, shared by the sync and async entry points.
+        
+        A generator that yields its network calls as request tuples and receives
+        their results - ('embed', text), ('rerank', query, documents, reranker_key)
+        and ('prefetch_embeddings', texts) - then returns the result dict.
+        """
+        cascade_trace = {}
+        result = yield from self._run_pipeline_stages(input_exam, extracted_input_components, is_input_simple, debug, reranker_key, data_source, exam_code, cascade_trace)
+        if cascade_trace and isinstance(result, dict):
+            # Record which reranker tier decided the match
+            result['reranker_cascade'] = cascade_trace
+        return result
+    
+    def _run_pipeline_stages(self, input_exam: str, extracted_input_components: Dict, is_input_simple: bool, debug: bool, reranker_key: Optional[str], data_source: Optional[str], exam_code: Optional[str], cascade_trace: Dict):
+        """Pipeline stages behind `_standardize_exam_steps`; cascade tier decisions are written to cascade_trace."""
         if debug:
             logger.info(f"[DEBUG] Debug mode enabled for input: {input_exam}, is_input_simple: {is_input_simple}")
         
@@ -661,7 +797,7 @@ class NHSLookupEngine:
             return result
         
         # Generate embedding for input using retriever
-        input_embedding = self.retriever_processor.get_text_embedding(input_exam)
+        input_embedding = yield ('embed', input_exam)
         if input_embedding is None:
             result = {'error': 'Failed to generate embedding for input.', 'confidence': 0.0}
             if debug: result['debug_early_exit'] = 'Early exit: Failed to generate embedding'
@@ -773,13 +909,13 @@ class NHSLookupEngine:
             simple_candidates = []
             complex_candidates = []
             
-            for entry in candidate_entries:
+            # Score all candidates against the input in one batch call (>0.70 preserves accurate matches)
+            similarity_scores = self._calculate_batch_semantic_similarity(input_exam, candidate_entries)
+            
+            for entry, semantic_similarity in zip(candidate_entries, similarity_scores):
                 clean_name = entry.get('_clean_primary_name_for_embedding', '')
                 is_complex_fsn = entry.get('_is_complex_fsn', False)
                 
-                # Check for high semantic similarity (>0.70) to preserve accurate matches
-                semantic_similarity = self._calculate_semantic_similarity(input_exam, clean_name)
-                
                 if semantic_similarity > 0.70:
                     # High semantic match - preserve regardless of complexity
                     prioritized_candidates.append(entry)
@@ -809,107 +945,11 @@ class NHSLookupEngine:
         candidate_texts = [entry.get('_clean_primary_name_for_embedding', '') for entry in candidate_entries]
         logger.debug(f"[V4-PIPELINE] Prepared {len(candidate_texts)} candidate texts for reranking")
         
-        # Get reranker scores using selected reranker
-        rerank_scores = self.reranker_manager.get_rerank_scores(input_exam, candidate_texts, reranker_key)
-        
-        # ### NEW LOGIC START ###
-        # Check for the "clinically invalid" signal from the reranker (all scores are 0.0)
-        is_clinically_invalid = rerank_scores and all(score == 0.0 for score in rerank_scores)
-
-        if is_clinically_invalid:
-            logger.warning(f"[V4-PIPELINE] Input exam '{input_exam}' was flagged as clinically invalid by the reranker. Aborting match.")
-            # Return a specific error/status that app.py can handle
-            return {
-                'error': 'EXCLUDED_NON_CLINICAL',
-                'message': f'Reranker identified input as non-clinical: {input_exam}',
-                'confidence': 0.0,
-                'all_candidates': [] # No candidates are relevant
-            }
-        # ### NEW LOGIC END ###
-
-        if not rerank_scores or len(rerank_scores) != len(candidate_entries):
-            logger.warning(f"[V4-PIPELINE] Reranker {reranker_name} failed (got {len(rerank_scores) if rerank_scores else 0} scores for {len(candidate_entries)} candidates) - using neutral fallback")
-            rerank_scores = [0.5] * len(candidate_entries)  # Neutral fallback
-        
-        # Find best match by combining reranking + component scores
-        best_match = None
-        highest_confidence = -1.0
-        
-        wf = self.config['weights_final']
-        
-        # Check for reranker-specific weights
-        reranker_specific_weights = wf.get('reranker_specific', {})
-        if reranker_key in reranker_specific_weights:
-            # Use reranker-specific weights
-            specific_weights = reranker_specific_weights[reranker_key]
-            reranker_weight = specific_weights.get('reranker', 0.45)
-            component_weight = specific_weights.get('component', 0.55)
-            logger.info(f"[V3-PIPELINE] Using {reranker_key}-specific weights: reranker={reranker_weight}, component={component_weight}")
-        else:
-            # Use default weights
-            reranker_weight = wf.get('reranker', 0.45)
-            component_weight = wf.get('component', 0.55)
-            logger.debug(f"[V3-PIPELINE] Using default weights: reranker={reranker_weight}, component={component_weight}")
-        
-        component_scores = []
-        final_scores = []
-        position_bonuses = []
-        
-        logger.debug(f"[V3-PIPELINE] Processing {len(candidate_entries)} candidates with weights: reranker={reranker_weight}, component={component_weight}")
-        
-        for i, (entry, rerank_score) in enumerate(zip(candidate_entries, rerank_scores)):
-            candidate_name = entry.get('primary_source_name', 'Unknown')
-            
-            # Calculate component score using extracted logic
-            component_start = time.time()
-            component_score = self._calculate_component_score(input_exam, extracted_input_components, entry)
-            component_time = time.time() - component_start
-            
-            # CRITICAL SAFETY FIX: Check for explicit contrast mismatch
-            # Calculate contrast score to detect dangerous explicit contradictions
-            input_contrast = extracted_input_components.get('contrast', [])
-            nhs_components = entry.get('_parsed_components', {})
-            nhs_contrast = nhs_components.get('contrast', [])
-            contrast_mismatch_score = self.config.get('contrast_mismatch_score', 0.05)
-            
-            # If both input and NHS have explicit contrast info and they conflict (score = contrast_mismatch_score)
-            if (input_contrast and nhs_contrast and 
-                not set(input_contrast).intersection(set(nhs_contrast)) and
-                component_score == 0.0):  # Component score 0 indicates threshold violation
-                
-                logger.warning(f"[V3-PIPELINE] Rejecting '{candidate_name[:30]}' due to explicit contrast mismatch: input={input_contrast} vs NHS={nhs_contrast}")
-                component_scores.append(0.0)
-                final_scores.append(0.0) 
-                position_bonuses.append(0.0)
-                continue
-            
-            component_scores.append(component_score)
-            
-            # Combine reranker score and component score
-            final_score = (reranker_weight * rerank_score) + (component_weight * component_score)
-            
-            # Apply position bonus if complexity filtering was used (respects reordering)
-            # Only apply for non-prompt based models (HuggingFace), not for LLM rerankers
-            position_bonus = 0.0
-            reranker_info = self.reranker_manager.get_available_rerankers().get(reranker_key, {})
-            is_openrouter_model = reranker_info.get('type') == 'openrouter'
-            
-            if is_input_simple and len(candidate_entries) > 1 and not is_openrouter_model:
-                # Earlier positions get higher bonus (0.03 max, decays by 0.003 per position)
-                # Skip for OpenRouter LLMs as they handle complexity in their own scoring
-                position_bonus = max(0.0, 0.03 - (i * 0.003))
-                final_score += position_bonus
-                
-            final_scores.append(final_score)
-            position_bonuses.append(position_bonus)
-            
-            if final_score > highest_confidence:
-                highest_confidence = final_score
-                best_match = entry
-                bonus_info = f" (pos_bonus={position_bonus:.3f})" if position_bonus > 0 else ""
-                logger.info(f"[V3-PIPELINE] New best match: '{candidate_name[:40]}' (final_score={final_score:.3f}{bonus_info})")
-            
-            logger.debug(f"[V3-PIPELINE] Candidate {i+1}: '{candidate_name[:30]}' - rerank={rerank_score:.3f}, component={component_score:.3f}, final={final_score:.3f} (component_time={component_time:.3f}s)")
+        early_result, scoring = yield from self._rerank_and_score(
+            input_exam, extracted_input_components, candidate_entries, candidate_texts, reranker_key, is_input_simple, cascade_trace)
+        if early_result is not None:
+            return early_result
+        rerank_scores, best_match, highest_confidence, component_scores, final_scores, position_bonuses = scoring
         
         stage2_time = time.time() - stage2_start
         
@@ -1037,6 +1077,7 @@ class NHSLookupEngine:
                     result['all_candidates'] = all_candidates_list
                     
                     # Apply semantic similarity safeguard to bilateral peer result
+                    yield ('prefetch_embeddings', [input_exam.lower(), result.get('clean_name', '').lower()])
                     result = self._apply_semantic_similarity_safeguard(result, input_exam)
                     
                     # === HUMAN-IN-THE-LOOP VALIDATION CACHE CHECK ===
@@ -1081,6 +1122,7 @@ class NHSLookupEngine:
             result = self._format_match_result(best_match, extracted_input_components, highest_confidence, self.retriever_processor, strip_laterality_from_name=strip_laterality, input_exam_text=input_exam, force_ambiguous=laterally_ambiguous)
             
             # Apply semantic similarity safeguard
+            yield ('prefetch_embeddings', [input_exam.lower(), result.get('clean_name', '').lower()])
             result = self._apply_semantic_similarity_safeguard(result, input_exam)
             
             # Add debug information if requested (MUST be after _format_match_result)
@@ -1181,6 +1223,171 @@ class NHSLookupEngine:
         logger.warning(f"[V3-PIPELINE] ❌ No suitable match found in {total_time:.2f}s total")
         return {'error': 'No suitable match found.', 'confidence': 0.0, 'all_candidates': all_candidates_list}
 
+    def _rerank_and_score(self, input_exam: str, extracted_input_components: Dict, candidate_entries: List[Dict], candidate_texts: List[str], reranker_key: str, is_input_simple: bool, cascade_trace: Dict):
+        """
+        Stage 2 of `_run_pipeline_stages`: rerank (through the cascade tiers, if configured) and score.
+        
+        A generator yielding ('rerank', query, documents, tier_key) requests. Component
+        scores are computed once and reused by every tier. Returns (early_result, scoring):
+        early_result is the exclusion result when the reranker flags the input as
+        non-clinical, otherwise scoring is (rerank_scores, best_match, highest_confidence,
+        component_scores, final_scores, position_bonuses) from the deciding tier.
+        """
+        # Cascade mode reranks with a cheap tier first and escalates only when the answer is unclear
+        cascade_config = self.reranker_manager.get_cascade_config(reranker_key)
+        tiers = cascade_config['tiers'] if cascade_config else [reranker_key]
+        component_scores = None
+        for tier_index, tier_key in enumerate(tiers):
+            reranker_name = self.reranker_manager.get_available_rerankers().get(tier_key, {}).get('name', tier_key)
+            
+            # Get reranker scores using selected reranker
+            rerank_scores = yield ('rerank', input_exam, candidate_texts, tier_key)
+            
+            # Check for the "clinically invalid" signal from the reranker (all scores are 0.0)
+            is_clinically_invalid = rerank_scores and all(score == 0.0 for score in rerank_scores)
+
+            if is_clinically_invalid:
+                logger.warning(f"[V4-PIPELINE] Input exam '{input_exam}' was flagged as clinically invalid by the reranker. Aborting match.")
+                # Return a specific error/status that app.py can handle
+                return {
+                    'error': 'EXCLUDED_NON_CLINICAL',
+                    'message': f'Reranker identified input as non-clinical: {input_exam}',
+                    'confidence': 0.0,
+                    'all_candidates': [] # No candidates are relevant
+                }, None
+
+            if not rerank_scores or len(rerank_scores) != len(candidate_entries):
+                logger.warning(f"[V4-PIPELINE] Reranker {reranker_name} failed (got {len(rerank_scores) if rerank_scores else 0} scores for {len(candidate_entries)} candidates) - using neutral fallback")
+                rerank_scores = [0.5] * len(candidate_entries)  # Neutral fallback
+            
+            best_match, highest_confidence, component_scores, final_scores, position_bonuses = self._score_candidates(
+                input_exam, extracted_input_components, candidate_entries, rerank_scores, tier_key, is_input_simple,
+                component_scores)
+            
+            if not cascade_config:
+                break
+            
+            ranked_scores = sorted(final_scores, reverse=True)
+            margin = ranked_scores[0] - ranked_scores[1] if len(ranked_scores) > 1 else highest_confidence
+            cascade_trace.setdefault('tiers', []).append({
+                'reranker': tier_key,
+                'top_score': round(highest_confidence, 4),
+                'margin': round(margin, 4)
+            })
+            is_decisive = highest_confidence >= cascade_config['min_confidence'] and margin >= cascade_config['min_margin']
+            # Don't escalate into a backend whose circuit breaker is open - it would only return neutral scores
+            escalation_blocked = (not is_decisive and tier_index < len(tiers) - 1
+                                  and not self.reranker_manager.is_reranker_healthy(tiers[tier_index + 1]))
+            if escalation_blocked:
+                cascade_trace['escalation_skipped'] = f"{tiers[tier_index + 1]}: circuit open"
+                logger.warning(f"[CASCADE] Not escalating to {tiers[tier_index + 1]} (circuit open); keeping {tier_key} result")
+            if is_decisive or escalation_blocked or tier_index == len(tiers) - 1:
+                cascade_trace['decided_by'] = tier_key
+                cascade_trace['escalated'] = tier_index > 0
+                logger.info(f"[CASCADE] Decided by {tier_key} (top={highest_confidence:.3f}, margin={margin:.3f})")
+                break
+            logger.info(f"[CASCADE] Escalating from {tier_key} to {tiers[tier_index + 1]} "
+                        f"(top={highest_confidence:.3f} < {cascade_config['min_confidence']} or margin={margin:.3f} < {cascade_config['min_margin']})")
+        
+        return None, (rerank_scores, best_match, highest_confidence, component_scores, final_scores, position_bonuses)
+    
+    def _score_candidates(self, input_exam: str, extracted_input_components: Dict, candidate_entries: List[Dict], rerank_scores: List[float], reranker_key: str, is_input_simple: bool, component_scores_in: Optional[List[float]] = None) -> Tuple[Optional[Dict], float, List[float], List[float], List[float]]:
+        """
+        Combine reranker and component scores for every candidate.
+        
+        Component scores don't depend on the reranker, so cascade tiers pass the
+        previous tier's component_scores back in (component_scores_in) instead of
+        recomputing them.
+        
+        Returns:
+            (best_match, highest_confidence, component_scores, final_scores, position_bonuses)
+        """
+        # Find best match by combining reranking + component scores
+        best_match = None
+        highest_confidence = -1.0
+        
+        wf = self.config['weights_final']
+        
+        # Check for reranker-specific weights
+        reranker_specific_weights = wf.get('reranker_specific', {})
+        if reranker_key in reranker_specific_weights:
+            # Use reranker-specific weights
+            specific_weights = reranker_specific_weights[reranker_key]
+            reranker_weight = specific_weights.get('reranker', 0.45)
+            component_weight = specific_weights.get('component', 0.55)
+            logger.info(f"[V3-PIPELINE] Using {reranker_key}-specific weights: reranker={reranker_weight}, component={component_weight}")
+        else:
+            # Use default weights
+            reranker_weight = wf.get('reranker', 0.45)
+            component_weight = wf.get('component', 0.55)
+            logger.debug(f"[V3-PIPELINE] Using default weights: reranker={reranker_weight}, component={component_weight}")
+        
+        component_scores = []
+        final_scores = []
+        position_bonuses = []
+        
+        logger.debug(f"[V3-PIPELINE] Processing {len(candidate_entries)} candidates with weights: reranker={reranker_weight}, component={component_weight}")
+        
+        # Position bonuses only apply for non-prompt based models (HuggingFace), not for LLM rerankers
+        is_openrouter_model = self.reranker_manager.get_available_rerankers().get(reranker_key, {}).get('type') == 'openrouter'
+        
+        for i, (entry, rerank_score) in enumerate(zip(candidate_entries, rerank_scores)):
+            candidate_name = entry.get('primary_source_name', 'Unknown')
+            
+            # Calculate component score using extracted logic (once per exam; reused across cascade tiers)
+            component_start = time.time()
+            if component_scores_in is not None:
+                component_score = component_scores_in[i]
+            else:
+                component_score = self._calculate_component_score(input_exam, extracted_input_components, entry)
+            component_time = time.time() - component_start
+            
+            # CRITICAL SAFETY FIX: Check for explicit contrast mismatch
+            # Calculate contrast score to detect dangerous explicit contradictions
+            input_contrast = extracted_input_components.get('contrast', [])
+            nhs_components = entry.get('_parsed_components', {})
+            nhs_contrast = nhs_components.get('contrast', [])
+            contrast_mismatch_score = self.config.get('contrast_mismatch_score', 0.05)
+            
+            # If both input and NHS have explicit contrast info and they conflict (score = contrast_mismatch_score)
+            if (input_contrast and nhs_contrast and 
+                not set(input_contrast).intersection(set(nhs_contrast)) and
+                component_score == 0.0):  # Component score 0 indicates threshold violation
+                
+                logger.warning(f"[V3-PIPELINE] Rejecting '{candidate_name[:30]}' due to explicit contrast mismatch: input={input_contrast} vs NHS={nhs_contrast}")
+                component_scores.append(0.0)
+                final_scores.append(0.0) 
+                position_bonuses.append(0.0)
+                continue
+            
+            component_scores.append(component_score)
+            
+            # Combine reranker score and component score
+            final_score = (reranker_weight * rerank_score) + (component_weight * component_score)
+            
+            # Apply position bonus if complexity filtering was used (respects reordering)
+            # Only apply for non-prompt based models (HuggingFace), not for LLM rerankers
+            position_bonus = 0.0
+            
+            if is_input_simple and len(candidate_entries) > 1 and not is_openrouter_model:
+                # Earlier positions get higher bonus (0.03 max, decays by 0.003 per position)
+                # Skip for OpenRouter LLMs as they handle complexity in their own scoring
+                position_bonus = max(0.0, 0.03 - (i * 0.003))
+                final_score += position_bonus
+                
+            final_scores.append(final_score)
+            position_bonuses.append(position_bonus)
+            
+            if final_score > highest_confidence:
+                highest_confidence = final_score
+                best_match = entry
+                bonus_info = f" (pos_bonus={position_bonus:.3f})" if position_bonus > 0 else ""
+                logger.info(f"[V3-PIPELINE] New best match: '{candidate_name[:40]}' (final_score={final_score:.3f}{bonus_info})")
+            
+            logger.debug(f"[V3-PIPELINE] Candidate {i+1}: '{candidate_name[:30]}' - rerank={rerank_score:.3f}, component={component_score:.3f}, final={final_score:.3f} (component_time={component_time:.3f}s)")
+        
+        return best_match, highest_confidence, component_scores, final_scores, position_bonuses
+
     # =============================================================================
     # COMPONENT-BASED SCORING SYSTEM
     # =============================================================================
@@ -2032,30 +2239,25 @@ class NHSLookupEngine:
         # If we get here, it's a biopsy without explicit modality - this is ambiguous
         return True
 
-    def _calculate_semantic_similarity(self, text1: str, text2: str) -> float:
+    def _calculate_batch_semantic_similarity(self, text: str, entries: List[Dict]) -> List[float]:
         """
-        Calculate semantic similarity between two text strings using fuzzy matching.
+        Calculate fuzzy similarity of one input against many NHS entries in a single call.
         
-        Used for complexity filtering to preserve high-similarity matches regardless
-        of FSN complexity when input is simple.
+        Uses the pre-normalized '_similarity_key' computed at load time so catalog
+        names are not re-normalized per request.
         
         Args:
-            text1: First text string
-            text2: Second text string
+            text: Input exam name
+            entries: Candidate NHS entries
             
         Returns:
-            float: Similarity score between 0.0 and 1.0
+            List[float]: Similarity scores between 0.0 and 1.0, aligned with entries
         """
-        if not text1 or not text2:
-            return 0.0
-        
-        # Normalize texts for comparison
-        norm_text1 = text1.lower().strip()
-        norm_text2 = text2.lower().strip()
-        
-        # Use fuzzy ratio for semantic similarity approximation
-        similarity = fuzz.ratio(norm_text1, norm_text2) / 100.0
-        return similarity
+        choices = [
+            entry.get('_similarity_key') or normalize_for_similarity(entry.get('_clean_primary_name_for_embedding', ''))
+            for entry in entries
+        ]
+        return batch_ratio(normalize_for_similarity(text), choices, normalized=True)
 
     def validate_consistency(self):
         snomed_to_names = defaultdict(set)
@@ -7,10 +7,23 @@ import requests
 from typing import Optional, List
 import json
 import time  # Added for retry logic and performance monitoring
-from functools import lru_cache
+import asyncio
+import threading
+from collections import OrderedDict, deque
+from concurrent.futures import ThreadPoolExecutor, as_completed, wait
+
+from circuit_breaker import get_breaker
+from rate_limiter import get_rate_limiter, parse_retry_after
+from deadline import get_deadline_config, timeout_for, remaining as deadline_remaining, expired as deadline_expired
 
 logger = logging.getLogger(__name__)
 
+# Should comfortably hold the most common radiology terms
+EMBEDDING_CACHE_SIZE = 1024
+
+# Default per-attempt timeout for embedding requests (capped by any request deadline)
+EMBEDDING_TIMEOUT = 120
+
 class NLPProcessor:
     """
     API-based NLP processor that uses direct 'requests' calls to the Hugging Face
@@ -51,6 +64,25 @@ class NLPProcessor:
             "Content-Type": "application/json"
         }
         
+        # LRU embedding cache shared by the sync and async paths
+        self._embedding_cache: "OrderedDict[str, np.ndarray]" = OrderedDict()
+        self._embedding_cache_lock = threading.Lock()
+
+        # Trips on repeated upstream failures so an outage doesn't cost full retries per exam
+        self.breaker = get_breaker(f"hf:{self.model_key}")
+        # Shared per-model quota (see rate_limiter.py) so batches and UI calls don't race into 429s
+        self.rate_limiter = get_rate_limiter('huggingface', self.hf_model_name)
+
+        # Hedged requests: a duplicate is sent when the first exceeds the recent latency percentile
+        self.hedge_config = get_deadline_config().get('hedging', {}) or {}
+        self._latencies = deque(maxlen=self.hedge_config.get('window_size', 200))
+        self._latencies_lock = threading.Lock()
+        # Created up front (threads start lazily) so concurrent first hedges can't race to build it
+        self._hedge_executor = (ThreadPoolExecutor(max_workers=self.hedge_config.get('max_workers', 8),
+                                                   thread_name_prefix='hf-hedge')
+                                if self.hedge_config.get('enabled', False) else None)
+        self.hedge_stats = {'hedged': 0, 'hedge_wins': 0}
+        
         if not self.api_token:
             logger.error("HUGGING_FACE_TOKEN not set. API-based NLP processing is disabled.")
         else:
@@ -66,15 +98,21 @@ class NLPProcessor:
         delay = 2.0  # initial delay in seconds
 
         for attempt in range(1, max_retries + 1):
+            if deadline_expired():
+                logger.warning(f"[DEADLINE] Request deadline passed; skipping embedding request for {self.hf_model_name}")
+                return None
+            if not self.rate_limiter.acquire():
+                return None
+            if not self.breaker.allow_request():
+                logger.warning(f"[CIRCUIT] {self.breaker.name} is open; skipping embedding request")
+                return None
+            start_time = time.time()
             try:
-                response = requests.post(
-                    self.api_url,
-                    headers=self.headers,
-                    json=payload,
-                    timeout=120
-                )
+                response = self._post_with_hedge(payload)
                 response.raise_for_status()
-                return response.json()
+                result = response.json()
+                self.breaker.record_success(time.time() - start_time)
+                return result
 
             except json.JSONDecodeError:
                 logger.error(
@@ -84,10 +122,12 @@ class NLPProcessor:
                 return None
 
             except requests.exceptions.HTTPError as e:
-                # 503 while model loads is considered transient
-                if e.response is not None and e.response.status_code == 503:
+                retry_after = self._handle_http_error(e.response, time.time() - start_time)
+                # 503 while model loads and 429 rate limiting are considered transient
+                if e.response is not None and e.response.status_code in (429, 503):
+                    delay = max(delay, retry_after or 0.0)
                     logger.warning(
-                        f"Attempt {attempt}/{max_retries}: model loading or 503 error "
+                        f"Attempt {attempt}/{max_retries}: model loading or {e.response.status_code} error "
                         f"for {self.hf_model_name}. Retrying in {delay} s…"
                     )
                 else:
@@ -98,19 +138,235 @@ class NLPProcessor:
                     return None
 
             except requests.exceptions.RequestException as e:
+                # A timeout forced by our own deadline says nothing about the backend's health
+                if not deadline_expired():
+                    self.breaker.record_failure(str(e), time.time() - start_time)
                 logger.warning(
                     f"Attempt {attempt}/{max_retries}: network error '{e}'. "
                     f"Retrying in {delay} s…"
                 )
 
+            finally:
+                # Frees a half-open probe slot no outcome was reported for (deadline expiry, 4xx, bad JSON, cancellation)
+                self.breaker.release_probe()
+
             # back-off and retry if attempts remain
-            if attempt < max_retries:
+            if attempt < max_retries and not self._deadline_too_close(delay):
                 time.sleep(delay)
                 delay *= 2  # exponential back-off
             else:
                 logger.error("Max retries reached. Giving up on API request.")
                 return None
 
+    def _handle_http_error(self, response, latency: float) -> Optional[float]:
+        """
+        Report an HTTP error to the circuit breaker and rate limiter.
+
+        429/5xx count against the breaker (other 4xx are request problems, not
+        outages). A Retry-After on 429/503 pauses the shared rate limiter and
+        is returned so the retry waits at least that long.
+        """
+        status_code = response.status_code if response is not None else None
+        if status_code is None or status_code == 429 or status_code >= 500:
+            self.breaker.record_failure(f"HTTP {status_code}", latency)
+        if status_code in (429, 503):
+            retry_after = parse_retry_after(response.headers)
+            self.rate_limiter.pause(retry_after)
+            return retry_after
+        return None
+
+    @staticmethod
+    def _deadline_too_close(delay: float) -> bool:
+        """True if backing off for `delay` would leave no time before the request deadline."""
+        left = deadline_remaining()
+        if left is not None and left <= delay:
+            logger.warning(f"[DEADLINE] {left:.1f}s left on request deadline; not retrying")
+            return True
+        return False
+
+    def _record_latency(self, latency: float):
+        with self._latencies_lock:
+            self._latencies.append(latency)
+
+    def _hedge_delay(self, timeout: float) -> Optional[float]:
+        """Seconds to wait before sending a hedged duplicate, or None when hedging doesn't apply."""
+        if not self.hedge_config.get('enabled', False):
+            return None
+        with self._latencies_lock:
+            if len(self._latencies) < self.hedge_config.get('min_samples', 20):
+                return None
+            ordered = sorted(self._latencies)
+        percentile = self.hedge_config.get('percentile', 0.95)
+        delay = max(ordered[min(len(ordered) - 1, int(len(ordered) * percentile))],
+                    self.hedge_config.get('min_delay_ms', 250) / 1000.0)
+        return delay if delay < timeout else None
+
+    def _timed_post(self, payload: dict, timeout: float) -> requests.Response:
+        start_time = time.time()
+        response = requests.post(self.api_url, headers=self.headers, json=payload, timeout=timeout)
+        if response.ok:
+            self._record_latency(time.time() - start_time)
+        return response
+
+    def _post_with_hedge(self, payload: dict) -> requests.Response:
+        """
+        POST an embedding request, hedging with a duplicate once the first
+        exceeds the recent latency percentile. The first successful response
+        wins; the slower request finishes in the background and is discarded.
+        """
+        timeout = timeout_for(EMBEDDING_TIMEOUT)
+        hedge_delay = self._hedge_delay(timeout)
+        if hedge_delay is None:
+            return self._timed_post(payload, timeout)
+
+        primary = self._hedge_executor.submit(self._timed_post, payload, timeout)
+        done, _ = wait([primary], timeout=hedge_delay)
+        # Hedges only use spare quota - never queue for one
+        if done or not self.rate_limiter.acquire(max_wait=0):
+            return primary.result()
+
+        self.hedge_stats['hedged'] += 1
+        logger.info(f"[HEDGE] Embedding request exceeded p{int(self.hedge_config.get('percentile', 0.95) * 100)} "
+                    f"({hedge_delay:.2f}s); sending hedged duplicate")
+        hedge = self._hedge_executor.submit(self._timed_post, payload, timeout_for(EMBEDDING_TIMEOUT))
+
+        fallback, first_error = None, None
+        for future in as_completed([primary, hedge]):
+            try:
+                response = future.result()
+            except requests.exceptions.RequestException as e:
+                first_error = first_error or e
+                continue
+            if response.ok:
+                if future is hedge:
+                    self.hedge_stats['hedge_wins'] += 1
+                return response
+            fallback = fallback or response
+        if fallback is not None:
+            return fallback
+        raise first_error
+
+    async def _post_with_hedge_async(self, client, payload: dict):
+        """Async variant of `_post_with_hedge`; the losing request is cancelled."""
+        import httpx
+
+        async def timed_post(timeout: float):
+            start_time = time.time()
+            response = await client.post(self.api_url, headers=self.headers, json=payload, timeout=timeout)
+            if response.is_success:
+                self._record_latency(time.time() - start_time)
+            return response
+
+        timeout = timeout_for(EMBEDDING_TIMEOUT)
+        hedge_delay = self._hedge_delay(timeout)
+        primary = asyncio.ensure_future(timed_post(timeout))
+        if hedge_delay is None:
+            return await primary
+
+        done, _ = await asyncio.wait({primary}, timeout=hedge_delay)
+        if done or not await self.rate_limiter.acquire_async(max_wait=0):
+            return await primary
+
+        self.hedge_stats['hedged'] += 1
+        logger.info(f"[HEDGE] Embedding request exceeded p{int(self.hedge_config.get('percentile', 0.95) * 100)} "
+                    f"({hedge_delay:.2f}s); sending hedged duplicate")
+        hedge = asyncio.ensure_future(timed_post(timeout_for(EMBEDDING_TIMEOUT)))
+
+        pending = {primary, hedge}
+        fallback, first_error = None, None
+        try:
+            while pending:
+                done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+                for task in done:
+                    try:
+                        response = task.result()
+                    except httpx.RequestError as e:
+                        first_error = first_error or e
+                        continue
+                    if response.is_success:
+                        if task is hedge:
+                            self.hedge_stats['hedge_wins'] += 1
+                        return response
+                    fallback = fallback or response
+        finally:
+            for task in pending:
+                task.cancel()
+        if fallback is not None:
+            return fallback
+        raise first_error
+
+    async def _make_api_call_async(self, inputs: list[str]) -> Optional[list]:
+        """
+        Async counterpart of `_make_api_call` on the shared httpx.AsyncClient,
+        with the same exponential-back-off retry strategy.
+        """
+        import httpx
+        from async_http import get_async_client
+
+        payload = {"inputs": inputs, "options": {"wait_for_model": True}}
+        max_retries = 3
+        delay = 2.0  # initial delay in seconds
+        client = get_async_client()
+
+        for attempt in range(1, max_retries + 1):
+            if deadline_expired():
+                logger.warning(f"[DEADLINE] Request deadline passed; skipping embedding request for {self.hf_model_name}")
+                return None
+            if not await self.rate_limiter.acquire_async():
+                return None
+            if not self.breaker.allow_request():
+                logger.warning(f"[CIRCUIT] {self.breaker.name} is open; skipping embedding request")
+                return None
+            start_time = time.time()
+            try:
+                response = await self._post_with_hedge_async(client, payload)
+                response.raise_for_status()
+                result = response.json()
+                self.breaker.record_success(time.time() - start_time)
+                return result
+
+            except json.JSONDecodeError:
+                logger.error(
+                    f"API call to {self.api_url} returned non-JSON response. "
+                    f"Status: {response.status_code}, Body: {response.text[:200]}"
+                )
+                return None
+
+            except httpx.HTTPStatusError as e:
+                retry_after = self._handle_http_error(e.response, time.time() - start_time)
+                # 503 while model loads and 429 rate limiting are considered transient
+                if e.response.status_code in (429, 503):
+                    delay = max(delay, retry_after or 0.0)
+                    logger.warning(
+                        f"Attempt {attempt}/{max_retries}: model loading or {e.response.status_code} error "
+                        f"for {self.hf_model_name}. Retrying in {delay} s…"
+                    )
+                else:
+                    logger.error(
+                        f"API request failed with status {e.response.status_code} "
+                        f"to URL {self.api_url}: {e.response.text}"
+                    )
+                    return None
+
+            except httpx.RequestError as e:
+                if not deadline_expired():
+                    self.breaker.record_failure(str(e), time.time() - start_time)
+                logger.warning(
+                    f"Attempt {attempt}/{max_retries}: network error '{e}'. "
+                    f"Retrying in {delay} s…"
+                )
+
+            finally:
+                # Frees a half-open probe slot no outcome was reported for (deadline expiry, 4xx, bad JSON, cancellation)
+                self.breaker.release_probe()
+
+            if attempt < max_retries and not self._deadline_too_close(delay):
+                await asyncio.sleep(delay)
+                delay *= 2
+            else:
+                logger.error("Max retries reached. Giving up on API request.")
+                return None
+
     # --- START OF ADDED LOGIC ---
     def _pool_embedding(self, embedding_output) -> Optional[np.ndarray]:
         """
@@ -152,17 +408,65 @@ class NLPProcessor:
         logger.error(f"Unexpected API response format for single text: {result}")
         return None
 
-    @lru_cache(maxsize=1024)
-    def _cached_text_embedding(self, text: str) -> Optional[np.ndarray]:
-        """
-        LRU-cached wrapper around `_get_embedding_uncached`.
-        Cache size 1024 should comfortably hold the most common radiology terms.
-        """
-        return self._get_embedding_uncached(text)
+    def _get_cached_embedding(self, text: str) -> Optional[np.ndarray]:
+        with self._embedding_cache_lock:
+            embedding = self._embedding_cache.get(text)
+            if embedding is not None:
+                self._embedding_cache.move_to_end(text)
+            return embedding
+
+    def _store_cached_embedding(self, text: str, embedding: Optional[np.ndarray]):
+        # Failed lookups (None) are not cached so a transient API error isn't remembered
+        if embedding is None:
+            return
+        with self._embedding_cache_lock:
+            self._embedding_cache[text] = embedding
+            self._embedding_cache.move_to_end(text)
+            while len(self._embedding_cache) > EMBEDDING_CACHE_SIZE:
+                self._embedding_cache.popitem(last=False)
 
     def get_text_embedding(self, text: str) -> Optional[np.ndarray]:
         """Public method to obtain (and cache) the embedding for a single text."""
-        return self._cached_text_embedding(text)
+        embedding = self._get_cached_embedding(text)
+        if embedding is None:
+            embedding = self._get_embedding_uncached(text)
+            self._store_cached_embedding(text, embedding)
+        return embedding
+
+    async def get_text_embedding_async(self, text: str) -> Optional[np.ndarray]:
+        """Async variant of `get_text_embedding`, sharing its cache."""
+        embedding = self._get_cached_embedding(text)
+        if embedding is not None or not self.is_available() or not text or not text.strip():
+            return embedding
+
+        result = await self._make_api_call_async([text.strip()])
+        if isinstance(result, list) and result:
+            embedding = self._pool_embedding(result[0])
+            self._store_cached_embedding(text, embedding)
+            return embedding
+
+        logger.error(f"Unexpected API response format for single text: {result}")
+        return None
+
+    async def prefetch_embeddings_async(self, texts: List[str]):
+        """
+        Fetch embeddings for any of `texts` not yet cached, in one API call, so
+        later sync `get_text_embedding` calls are served from the cache.
+        """
+        missing = list(dict.fromkeys(
+            text for text in texts
+            if text and text.strip() and self._get_cached_embedding(text) is None
+        ))
+        if not missing or not self.is_available():
+            return
+
+        results = await self._make_api_call_async([text.strip() for text in missing])
+        if isinstance(results, list) and len(results) == len(missing):
+            for text, emb in zip(missing, results):
+                if isinstance(emb, list):
+                    self._store_cached_embedding(text, self._pool_embedding(emb))
+        else:
+            logger.warning(f"Embedding prefetch for {len(missing)} texts returned an unexpected response")
 
     def batch_get_embeddings(self, texts: List[str], chunk_size: int = 25, chunk_delay: float = 0.5, context_label: str = "items") -> List[Optional[np.ndarray]]:
         """Get embeddings for multiple texts, with pooling for token-level models."""
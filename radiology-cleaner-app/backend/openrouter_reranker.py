@@ -12,8 +12,96 @@ import requests
 from requests.adapters import HTTPAdapter
 from urllib3.util.retry import Retry
 
+from circuit_breaker import get_breaker
+from rate_limiter import get_rate_limiter, estimate_tokens, parse_retry_after
+from deadline import timeout_for, expired as deadline_expired
+from llm_usage import record_llm_usage, budget_exhausted
+
 logger = logging.getLogger(__name__)
 
+# Evaluation rules shared by the single-exam and packed multi-exam prompts; the
+# triage action (what an invalid exam's answer looks like) depends on the response format
+RERANKING_GUIDELINES = """**EVALUATION FRAMEWORK:**
+
+### ### NEW SECTION START ### ###
+**Priority 0: Triage for Clinical Validity (CRITICAL FIRST STEP)**
+First, analyze the `input_exam` for keywords that indicate it is NOT a diagnostic or interventional procedure. These are typically administrative or status updates.
+
+- **Keywords to look for**: `declined`, `cancelled`, `did not arrive`, `abandoned`, `unprocessed order`, `unable to contact`, `dna`, `no report`.
+
+{triage_action}
+
+**If and ONLY IF the `input_exam` passes this triage step, proceed to the ranking methodology below.**
+### ### NEW SECTION END ### ###
+
+**Guiding Principle: Parsimony (STRONGLY FAVOR SIMPLICITY)**
+The ideal candidate has **NO MORE clinical detail** than explicitly stated in the input. **When in doubt between two reasonable matches, ALWAYS choose the SIMPLER option.** This is a core principle of clinical coding - avoid assumptions and over-interpretation.
+
+- **Generic Input → Generic Candidate:** If the input is simple (e.g., "XR Chest"), the best match is the simplest canonical name ("XR Chest"), not a more detailed one ("XR Chest PA View").
+- **Specific Input → Specific Candidate:** If the input contains explicit details (e.g., "XR Chest PA View"), those details **must** be present in the best match.
+- **CRITICAL PARSIMONY RULE**: **Never add specificity not explicitly in the input.** If the input says "C+" (generic contrast), prefer "CT with contrast" over "CT with oral contrast" unless "oral" is explicitly mentioned.
+- **Ambiguity Resolution**: When input terms are ambiguous (like "C+", "contrast", "guided"), default to the **simplest interpretation** that captures the core procedure without adding assumptions.
+- **Confidence Gap Override**: A simpler match should be preferred over a more complex match **even if the complex match has slightly higher confidence** (up to 0.15 difference). Parsimony trumps minor confidence differences.
+
+**RANKING METHODOLOGY - Apply in priority order:**
+
+**Priority 1: Modality Match (BLOCKING - Critical for patient safety)**
+- **PERFECT**: Input "CT Head" → Candidate "CT of Head"
+- **ACCEPTABLE**: Input "CTA Chest" → Candidate "CT Angiography of Chest"  
+- **BLOCKING FAILURE**: Input "CT Head" → Candidate "MRI of Head" (Wrong equipment/procedure)
+- **Hybrid Modality Handling**: An input like "NM PET/CT" is a **PERFECT** match for a candidate like "PET/CT of Chest". Treat 'NM' (Nuclear Medicine) in this context as a correct high-level category for a PET scan.
+
+**Priority 2: Clinical Specifiers (HIGH impact on procedure accuracy)**
+- **Procedure Type**: Match critical terms (biopsy, angiography, guidance, interventional, screening).
+  - **CRITICAL**: If the input contains diagnostic terms like "standard", "routine", or "plain film", it **must not** be matched to a candidate that is clearly interventional (e.g., contains "biopsy", "guided", "insertion"). This is a **BLOCKING FAILURE**.
+  - GOOD: Input "US Guided Biopsy Liver" → Candidate "US Guided Biopsy of Liver"
+  - BAD: Input "US Guided Biopsy Liver" → Candidate "US Liver" (Missing intervention)
+- **Contrast Status**: Handle contrast intelligently with parsimony
+  - **Explicit contrast**: "with IV contrast" or "oral contrast only" → Match exactly
+  - **Ambiguous contrast**: "C+", "contrast", "with contrast" → Prefer simpler "with contrast" over specific types ("oral only", "IV only") unless explicitly stated
+  - **No contrast specified**: Prefer non-contrast procedures
+  - **PARSIMONY OVERRIDE**: When contrast type is ambiguous, choose the **simpler base procedure** over specific contrast assumptions
+- **Laterality Logic**:
+  - Input specifies side → Candidate MUST match that side
+  - Input non-specific → Prefer bilateral/non-specific over single-sided candidates
+- **Angiography Logic**:
+  - If the input uses a generic term like "Angiography", "Angio", "CTA", or "MRA", you **must** prioritize candidates that specify **arteries** (e.g., "CT Angiography of Aorta").
+  - Penalize or rank lower any candidates that specify **veins** (e.g., "CT Venography").
+
+**Priority 3: Parsimony Enforcement (CRITICAL - Often Most Important)**
+- **Apply Parsimony Principle:** Use the **"Parsimony"** principle aggressively to rank candidates that have passed the above checks.
+- **IGNORE administrative terms**: "portable", "ward", "stat", "single view" (not clinically relevant)
+- **HEAVILY PENALIZE over-specification**: Adding clinical details not in input is a **MAJOR ERROR**. **This is the most common mistake - simpler matches are almost always better.**
+  - **SEVERE PENALTY**: Input "CT Chest C+" → Candidate "CT Chest oral contrast only" (assumes specific contrast type)
+  - **PREFERRED**: Input "CT Chest C+" → Candidate "CT Chest with contrast" (doesn't assume type)
+  - **SEVERE PENALTY**: Input "MRI Brain" → Candidate "MRI Brain with Spectroscopy" (adds technique)
+  - **SEVERE PENALTY**: Input "US upper limb" → Candidate "US Doppler Vein Map Upper Limb" (adds flow mapping)
+  - **PREFERRED**: Input "US upper limb" → Candidate "US Upper Limb" (simple and direct)
+- **REWARD explicit specificity**: When input has explicit specific terms, find the candidate that also has them.
+  - EXCELLENT: Input "MRI Brain with Diffusion" → Candidate "MRI Brain with Diffusion"
+- **PARSIMONY ALWAYS WINS**: If two candidates are clinically equivalent but one is simpler, **always rank the simpler one higher**. This is not negotiable.
+- **Confidence Override Rule**: Prefer a simpler match even if a more complex match has up to 15% higher confidence. Parsimony is more important than minor confidence differences.
+
+---
+**CRITICAL PARSING EXAMPLES FOR AMBIGUOUS INPUTS:**
+
+- **"CT Chest C+"** → PREFER "CT Chest" or "CT Chest with contrast" over "CT Chest oral contrast only" or "CT Chest IV contrast only"
+- **"MRI Brain with contrast"** → PREFER "MRI Brain with contrast" over "MRI Brain with gadolinium"
+- **"US guided biopsy"** → PREFER "US guided biopsy" over "US guided core biopsy" (unless "core" explicitly stated)
+- **"XR chest portable"** → PREFER "XR Chest" (ignore administrative "portable")
+"""
+
+SINGLE_TRIAGE_ACTION = """- **Action**: If you find any of these keywords, the input is considered clinically invalid for matching. You **MUST** stop and return a JSON object with an empty "ranking" array. This signals that no procedure should be coded.
+    - **Example**: If `input_exam` is "MRI Did Not Arrive", your entire response must be `{"ranking": []}`."""
+
+PACKED_TRIAGE_ACTION = """- **Action**: If you find any of these keywords, that exam is considered clinically invalid for matching. You **MUST** stop ranking it and give its entry an empty "ranking" array. This signals that no procedure should be coded for that exam; the other exams are still ranked.
+    - **Example**: If exam 2's `input_exam` is "MRI Did Not Arrive", its entry in "results" must be `{"exam": 2, "ranking": []}`."""
+
+
+def reranking_guidelines(packed: bool = False) -> str:
+    """RERANKING_GUIDELINES with the triage action for the single-exam or packed response format."""
+    return RERANKING_GUIDELINES.replace('{triage_action}', PACKED_TRIAGE_ACTION if packed else SINGLE_TRIAGE_ACTION)
+
 class OpenRouterReranker:
     """
     OpenRouter-based reranker that uses LLMs to score query-document pairs.
@@ -36,7 +124,8 @@ class OpenRouterReranker:
         }
     }
     
-    def __init__(self, model_key: str = 'gemini-2.5-flash-lite', api_key: Optional[str] = None, timeout: int = 30):
+    def __init__(self, model_key: str = 'gemini-2.5-flash-lite', api_key: Optional[str] = None, timeout: int = 30,
+                 pack_size: int = 8, max_candidates_per_pack: int = 120):
         """
         Initialize OpenRouter reranker.
         
@@ -44,6 +133,8 @@ class OpenRouterReranker:
             model_key: Key from SUPPORTED_MODELS
             api_key: OpenRouter API key (or from env var OPENROUTER_API_KEY)
             timeout: API request timeout in seconds
+            pack_size: Max exams packed into one request by get_rerank_scores_batch
+            max_candidates_per_pack: Max candidates (summed over exams) in one packed request
         """
         self.model_key = model_key
         self.model_info = self.SUPPORTED_MODELS.get(model_key)
@@ -56,7 +147,9 @@ class OpenRouterReranker:
             logger.warning(f"No OpenRouter API key found for {model_key}. Set OPENROUTER_API_KEY environment variable.")
         
         self.timeout = timeout
-        self.base_url = "https://openrouter.ai/api/v1"
+        self.pack_size = max(1, pack_size)
+        self.max_candidates_per_pack = max(1, max_candidates_per_pack)
+        self.base_url = os.getenv('OPENROUTER_BASE_URL', "https://openrouter.ai/api/v1")
         
         # Setup session with retry strategy
         self.session = requests.Session()
@@ -69,6 +162,11 @@ class OpenRouterReranker:
         self.session.mount("http://", adapter)
         self.session.mount("https://", adapter)
         
+        # One breaker per model so a single degraded model doesn't take the others down
+        self.breaker = get_breaker(f"openrouter:{model_key}")
+        # Quota is shared with the secondary-pipeline ensemble when it uses the same model
+        self.rate_limiter = get_rate_limiter('openrouter', self.model_info['model_id'])
+        
         logger.info(f"🔄 [OPENROUTER] Initialized {self.model_info['name']} reranker")
     
     def is_available(self) -> bool:
@@ -121,6 +219,222 @@ class OpenRouterReranker:
             logger.error(f"[OPENROUTER] Critical error in reranking: {e}")
             return [0.5] * len(documents)
     
+    async def get_rerank_scores_async(self, query: str, documents: List[str]) -> List[float]:
+        """Async variant of `get_rerank_scores` on the shared httpx.AsyncClient."""
+        if not self.is_available():
+            logger.warning(f"[OPENROUTER] Reranker not available - API key missing")
+            return [0.5] * len(documents)
+        
+        if not query or not documents:
+            logger.warning(f"[OPENROUTER] Invalid input - query: {bool(query)}, documents: {len(documents) if documents else 0}")
+            return [0.0] * len(documents)
+        
+        try:
+            start_time = time.time()
+            response = await self._make_api_call_async(self._build_reranking_prompt(query, documents))
+            if not response:
+                logger.error(f"[OPENROUTER] API call failed")
+                return [0.5] * len(documents)
+            scores = self._parse_scores_from_response(response, len(documents))
+            logger.info(f"[OPENROUTER] Completed async reranking in {time.time() - start_time:.2f}s")
+            return scores
+        except Exception as e:
+            logger.error(f"[OPENROUTER] Critical error in async reranking: {e}")
+            return [0.5] * len(documents)
+    
+    def get_rerank_scores_batch(self, items: List[Tuple[str, List[str]]]) -> List[List[float]]:
+        """
+        Score several exams, packing them into as few requests as possible.
+        
+        Each pack sends the shared ranking guidelines once followed by every
+        exam's candidate list, and the response is parsed into one ranking per
+        exam. Exams whose ranking is missing or malformed fall back to an
+        individual get_rerank_scores call.
+        
+        Args:
+            items: List of (query, documents) tuples, one per exam
+            
+        Returns:
+            List of score lists (0.0-1.0), aligned with items
+        """
+        results: List[Optional[List[float]]] = [None] * len(items)
+        if not self.is_available():
+            logger.warning(f"[OPENROUTER] Reranker not available - API key missing")
+            return [[0.5] * len(documents) for _, documents in items]
+        
+        # Invalid inputs get the same treatment as the single-exam path and are never packed
+        packable = []
+        for idx, (query, documents) in enumerate(items):
+            if not query or not documents:
+                results[idx] = [0.0] * len(documents)
+            else:
+                packable.append(idx)
+        
+        packs: List[List[int]] = []
+        current: List[int] = []
+        current_candidates = 0
+        for idx in packable:
+            n_docs = len(items[idx][1])
+            if current and (len(current) >= self.pack_size or
+                            current_candidates + n_docs > self.max_candidates_per_pack):
+                packs.append(current)
+                current, current_candidates = [], 0
+            current.append(idx)
+            current_candidates += n_docs
+        if current:
+            packs.append(current)
+        
+        fallback = []
+        for pack in packs:
+            if len(pack) == 1:
+                fallback.extend(pack)
+                continue
+            
+            start_time = time.time()
+            pack_items = [items[idx] for idx in pack]
+            total_candidates = sum(len(documents) for _, documents in pack_items)
+            try:
+                prompt = self._build_packed_reranking_prompt(pack_items)
+                # Rankings are short integer arrays; budget ~6 tokens per candidate plus per-exam overhead
+                response = self._make_api_call(prompt, max_tokens=min(4000, 100 + 20 * len(pack) + 6 * total_candidates))
+                pack_scores = self._parse_packed_response(response, pack_items) if response else [None] * len(pack)
+            except Exception as e:
+                logger.error(f"[OPENROUTER] Packed reranking failed for {len(pack)} exams: {e}")
+                pack_scores = [None] * len(pack)
+            
+            for idx, scores in zip(pack, pack_scores):
+                if scores is None:
+                    fallback.append(idx)
+                else:
+                    results[idx] = scores
+            parsed = sum(scores is not None for scores in pack_scores)
+            logger.info(f"[OPENROUTER] Packed {len(pack)} exams ({total_candidates} candidates) into one request: "
+                        f"{parsed} parsed, {len(pack) - parsed} falling back, {time.time() - start_time:.2f}s")
+        
+        for idx in fallback:
+            query, documents = items[idx]
+            results[idx] = self.get_rerank_scores(query, documents)
+        
+        return results
+    
+    def _build_packed_reranking_prompt(self, items: List[Tuple[str, List[str]]]) -> str:
+        """
+        Build one prompt ranking several exams against their own candidate lists.
+        
+        Args:
+            items: List of (query, documents) tuples
+            
+        Returns:
+            Formatted prompt string
+        """
+        exams_json = [
+            {
+                "exam": exam_num,
+                "input_exam": query,
+                "candidate_procedures": {str(i): doc for i, doc in enumerate(documents, 1)}
+            }
+            for exam_num, (query, documents) in enumerate(items, 1)
+        ]
+        exams_json_str = json.dumps(exams_json, indent=2)
+        
+        prompt = f"""You are a precision medical coding specialist responsible for mapping real-world radiology exam names to standardized NHS procedures. This is a healthcare-critical system where accuracy is paramount.
+
+**Primary Objective:**
+You are given {len(items)} independent exams. For EACH exam, evaluate its `input_exam`. If it represents a valid clinical procedure, rank that exam's candidate procedures from BEST to WORST match. If it is NOT a valid procedure, indicate that no match is possible.
+
+---
+**INPUTS:**
+
+A JSON array of exams. Each exam has an `exam` number, the real-world `input_exam` name, and its own `candidate_procedures` object where keys are candidate numbers and values are procedure descriptions. Candidate numbers are local to each exam.
+```json
+{exams_json_str}
+```
+
+---
+Apply the following framework to each exam separately. Never compare candidates across exams.
+
+{reranking_guidelines(packed=True)}
+
+**FINAL INSTRUCTIONS:**
+
+1. **Perform Triage First** for each exam: This is the most important step.
+2. **Apply ranking priorities in order**: If triage passes, use Modality -> Clinical Specifiers -> **PARSIMONY ENFORCEMENT**.
+3. **Rank ALL candidates of each valid exam**: Even poor matches must be ranked.
+4. **Preserve clinical intent**: The best match captures the **core clinical procedure** as the input without adding assumptions.
+5. **When in doubt, go simpler**: This is the most important rule for healthcare coding accuracy.
+
+**RESPONSE FORMAT & CONSTRAINTS:**
+
+- You **MUST** respond with **ONLY** a single, valid JSON object.
+- The JSON object must contain a single key, "results", with an array containing exactly one entry per exam ({len(items)} entries).
+- Each entry must be an object with the keys "exam" (the exam number) and "ranking".
+- **Valid exam**: "ranking" is an array of ALL of that exam's candidate numbers (as integers) in ranked order from best to worst, i.e. a permutation of 1 to the number of candidates for that exam.
+- **Invalid exam**: "ranking" is an **empty array `[]`**.
+- Do not add any explanation, commentary, or markdown formatting before or after the JSON object.
+
+**Example Response Structure:**
+`{{"results": [{{"exam": 1, "ranking": [3, 1, 2]}}, {{"exam": 2, "ranking": []}}]}}`"""
+        
+        return prompt
+    
+    def _parse_packed_response(self, response: str, items: List[Tuple[str, List[str]]]) -> List[Optional[List[float]]]:
+        """
+        Parse a packed response into per-exam scores.
+        
+        Args:
+            response: Raw LLM response text
+            items: The (query, documents) tuples that were packed, in exam order
+            
+        Returns:
+            Scores per exam, or None for exams whose ranking is missing or invalid
+        """
+        results: List[Optional[List[float]]] = [None] * len(items)
+        try:
+            start = response.find('{')
+            end = response.rfind('}')
+            if start == -1 or end <= start:
+                raise ValueError("no JSON object in response")
+            data = json.loads(response[start:end + 1])
+            entries = data.get('results') if isinstance(data, dict) else None
+            if not isinstance(entries, list):
+                raise ValueError("'results' key is missing or not a list")
+        except (ValueError, json.JSONDecodeError) as e:
+            logger.warning(f"[OPENROUTER] Could not parse packed response ({e}): {response[:200]}...")
+            return results
+        
+        for entry in entries:
+            if not isinstance(entry, dict):
+                continue
+            try:
+                exam_index = int(entry.get('exam')) - 1
+                ranking = [int(r) for r in entry.get('ranking')]
+            except (TypeError, ValueError):
+                logger.warning(f"[OPENROUTER] Malformed packed entry: {str(entry)[:200]}")
+                continue
+            if not 0 <= exam_index < len(items) or results[exam_index] is not None:
+                logger.warning(f"[OPENROUTER] Packed entry for unknown or duplicate exam {exam_index + 1}")
+                continue
+            
+            expected_count = len(items[exam_index][1])
+            if ranking == []:
+                results[exam_index] = [0.0] * expected_count
+            elif sorted(ranking) == list(range(1, expected_count + 1)):
+                scores = [0.0] * expected_count
+                for rank_position, candidate_num in enumerate(ranking):
+                    scores[candidate_num - 1] = self._rank_position_score(rank_position, expected_count)
+                results[exam_index] = scores
+            else:
+                logger.warning(f"[OPENROUTER] Packed ranking for exam {exam_index + 1} is not a permutation of "
+                               f"1..{expected_count}: {ranking}")
+        
+        return results
+    
+    @staticmethod
+    def _rank_position_score(rank_position: int, num_ranked_items: int) -> float:
+        """Linear scoring: 1st place = 1.0, last place = ~0.1."""
+        score = 1.0 - (rank_position * 0.9 / (num_ranked_items - 1)) if num_ranked_items > 1 else 1.0
+        return max(0.1, score)
+    
     def _build_reranking_prompt(self, query: str, documents: List[str]) -> str:
         """
         Build a prompt for LLM-based reranking of medical exam names.
@@ -156,76 +470,7 @@ Evaluate the `input_exam`. If it represents a valid clinical procedure, rank the
     ```
 
 ---
-**EVALUATION FRAMEWORK:**
-
-### ### NEW SECTION START ### ###
-**Priority 0: Triage for Clinical Validity (CRITICAL FIRST STEP)**
-First, analyze the `input_exam` for keywords that indicate it is NOT a diagnostic or interventional procedure. These are typically administrative or status updates.
-
-- **Keywords to look for**: `declined`, `cancelled`, `did not arrive`, `abandoned`, `unprocessed order`, `unable to contact`, `dna`, `no report`.
-
-- **Action**: If you find any of these keywords, the input is considered clinically invalid for matching. You **MUST** stop and return a JSON object with an empty "ranking" array. This signals that no procedure should be coded.
-    - **Example**: If `input_exam` is "MRI Did Not Arrive", your entire response must be `{{"ranking": []}}`.
-
-**If and ONLY IF the `input_exam` passes this triage step, proceed to the ranking methodology below.**
-### ### NEW SECTION END ### ###
-
-**Guiding Principle: Parsimony (STRONGLY FAVOR SIMPLICITY)**
-The ideal candidate has **NO MORE clinical detail** than explicitly stated in the input. **When in doubt between two reasonable matches, ALWAYS choose the SIMPLER option.** This is a core principle of clinical coding - avoid assumptions and over-interpretation.
-
-- **Generic Input → Generic Candidate:** If the input is simple (e.g., "XR Chest"), the best match is the simplest canonical name ("XR Chest"), not a more detailed one ("XR Chest PA View").
-- **Specific Input → Specific Candidate:** If the input contains explicit details (e.g., "XR Chest PA View"), those details **must** be present in the best match.
-- **CRITICAL PARSIMONY RULE**: **Never add specificity not explicitly in the input.** If the input says "C+" (generic contrast), prefer "CT with contrast" over "CT with oral contrast" unless "oral" is explicitly mentioned.
-- **Ambiguity Resolution**: When input terms are ambiguous (like "C+", "contrast", "guided"), default to the **simplest interpretation** that captures the core procedure without adding assumptions.
-- **Confidence Gap Override**: A simpler match should be preferred over a more complex match **even if the complex match has slightly higher confidence** (up to 0.15 difference). Parsimony trumps minor confidence differences.
-
-**RANKING METHODOLOGY - Apply in priority order:**
-
-**Priority 1: Modality Match (BLOCKING - Critical for patient safety)**
-- **PERFECT**: Input "CT Head" → Candidate "CT of Head"
-- **ACCEPTABLE**: Input "CTA Chest" → Candidate "CT Angiography of Chest"  
-- **BLOCKING FAILURE**: Input "CT Head" → Candidate "MRI of Head" (Wrong equipment/procedure)
-- **Hybrid Modality Handling**: An input like "NM PET/CT" is a **PERFECT** match for a candidate like "PET/CT of Chest". Treat 'NM' (Nuclear Medicine) in this context as a correct high-level category for a PET scan.
-
-**Priority 2: Clinical Specifiers (HIGH impact on procedure accuracy)**
-- **Procedure Type**: Match critical terms (biopsy, angiography, guidance, interventional, screening).
-  - **CRITICAL**: If the input contains diagnostic terms like "standard", "routine", or "plain film", it **must not** be matched to a candidate that is clearly interventional (e.g., contains "biopsy", "guided", "insertion"). This is a **BLOCKING FAILURE**.
-  - GOOD: Input "US Guided Biopsy Liver" → Candidate "US Guided Biopsy of Liver"
-  - BAD: Input "US Guided Biopsy Liver" → Candidate "US Liver" (Missing intervention)
-- **Contrast Status**: Handle contrast intelligently with parsimony
-  - **Explicit contrast**: "with IV contrast" or "oral contrast only" → Match exactly
-  - **Ambiguous contrast**: "C+", "contrast", "with contrast" → Prefer simpler "with contrast" over specific types ("oral only", "IV only") unless explicitly stated
-  - **No contrast specified**: Prefer non-contrast procedures
-  - **PARSIMONY OVERRIDE**: When contrast type is ambiguous, choose the **simpler base procedure** over specific contrast assumptions
-- **Laterality Logic**:
-  - Input specifies side → Candidate MUST match that side
-  - Input non-specific → Prefer bilateral/non-specific over single-sided candidates
-- **Angiography Logic**:
-  - If the input uses a generic term like "Angiography", "Angio", "CTA", or "MRA", you **must** prioritize candidates that specify **arteries** (e.g., "CT Angiography of Aorta").
-  - Penalize or rank lower any candidates that specify **veins** (e.g., "CT Venography").
-
-**Priority 3: Parsimony Enforcement (CRITICAL - Often Most Important)**
-- **Apply Parsimony Principle:** Use the **"Parsimony"** principle aggressively to rank candidates that have passed the above checks.
-- **IGNORE administrative terms**: "portable", "ward", "stat", "single view" (not clinically relevant)
-- **HEAVILY PENALIZE over-specification**: Adding clinical details not in input is a **MAJOR ERROR**. **This is the most common mistake - simpler matches are almost always better.**
-  - **SEVERE PENALTY**: Input "CT Chest C+" → Candidate "CT Chest oral contrast only" (assumes specific contrast type)
-  - **PREFERRED**: Input "CT Chest C+" → Candidate "CT Chest with contrast" (doesn't assume type)
-  - **SEVERE PENALTY**: Input "MRI Brain" → Candidate "MRI Brain with Spectroscopy" (adds technique)
-  - **SEVERE PENALTY**: Input "US upper limb" → Candidate "US Doppler Vein Map Upper Limb" (adds flow mapping)
-  - **PREFERRED**: Input "US upper limb" → Candidate "US Upper Limb" (simple and direct)
-- **REWARD explicit specificity**: When input has explicit specific terms, find the candidate that also has them.
-  - EXCELLENT: Input "MRI Brain with Diffusion" → Candidate "MRI Brain with Diffusion"
-- **PARSIMONY ALWAYS WINS**: If two candidates are clinically equivalent but one is simpler, **always rank the simpler one higher**. This is not negotiable.
-- **Confidence Override Rule**: Prefer a simpler match even if a more complex match has up to 15% higher confidence. Parsimony is more important than minor confidence differences.
-
----
-**CRITICAL PARSING EXAMPLES FOR AMBIGUOUS INPUTS:**
-
-- **"CT Chest C+"** → PREFER "CT Chest" or "CT Chest with contrast" over "CT Chest oral contrast only" or "CT Chest IV contrast only"
-- **"MRI Brain with contrast"** → PREFER "MRI Brain with contrast" over "MRI Brain with gadolinium"
-- **"US guided biopsy"** → PREFER "US guided biopsy" over "US guided core biopsy" (unless "core" explicitly stated)
-- **"XR chest portable"** → PREFER "XR Chest" (ignore administrative "portable")
-
+{reranking_guidelines()}
 **FINAL INSTRUCTIONS:**
 
 1. **Perform Triage First**: This is the most important step.
@@ -247,35 +492,22 @@ The ideal candidate has **NO MORE clinical detail** than explicitly stated in th
 
         return prompt
     
-    def _make_api_call(self, prompt: str) -> Optional[str]:
+    def _make_api_call(self, prompt: str, max_tokens: int = 500) -> Optional[str]:
         """
         Make API call to OpenRouter.
         
         Args:
             prompt: The reranking prompt
+            max_tokens: Completion token limit
             
         Returns:
             Response text from the API, or None if failed
         """
-        headers = {
-            "Authorization": f"Bearer {self.api_key}",
-            "Content-Type": "application/json",
-            "HTTP-Referer": "https://hnzradtools.nz",
-            "X-Title": "HNZ Radiology Cleaner"
-        }
-        
-        payload = {
-            "model": self.model_info['model_id'],
-            "messages": [
-                {
-                    "role": "user",
-                    "content": prompt
-                }
-            ],
-            "temperature": 0.1,  # Low temperature for consistent scoring
-            "max_tokens": 500,   # Enough for score arrays
-            "top_p": 0.9
-        }
+        estimated_tokens = estimate_tokens(prompt) + max_tokens
+        if deadline_expired() or budget_exhausted() or not self.rate_limiter.acquire(tokens=estimated_tokens) or not self._allow_request():
+            return None
+        headers, payload = self._build_request(prompt, max_tokens)
+        start_time = time.time()
         
         try:
             logger.debug(f"[OPENROUTER] Making API call to {self.model_info['model_id']}")
@@ -284,31 +516,133 @@ The ideal candidate has **NO MORE clinical detail** than explicitly stated in th
                 f"{self.base_url}/chat/completions",
                 headers=headers,
                 json=payload,
-                timeout=self.timeout
+                timeout=timeout_for(self.timeout)
             )
             
             if response.status_code == 200:
-                data = response.json()
-                if 'choices' in data and len(data['choices']) > 0:
-                    content = data['choices'][0]['message']['content']
-                    logger.debug(f"[OPENROUTER] API response: {content[:100]}...")
-                    return content
-                else:
-                    logger.error(f"[OPENROUTER] Unexpected response format: {data}")
-                    return None
+                return self._handle_success(response.json(), estimated_tokens, start_time)
             else:
+                self._handle_rate_limit(response)
+                self.breaker.record_failure(f"HTTP {response.status_code}", time.time() - start_time)
                 logger.error(f"[OPENROUTER] API error {response.status_code}: {response.text}")
                 return None
                 
         except requests.exceptions.Timeout:
-            logger.error(f"[OPENROUTER] API timeout after {self.timeout}s")
+            # A timeout forced by the request deadline says nothing about the backend's health
+            if not deadline_expired():
+                self.breaker.record_failure("timeout", time.time() - start_time)
+            logger.error(f"[OPENROUTER] API timeout after {time.time() - start_time:.1f}s")
             return None
         except requests.exceptions.RequestException as e:
+            self.breaker.record_failure(str(e), time.time() - start_time)
             logger.error(f"[OPENROUTER] Network error: {e}")
             return None
         except Exception as e:
+            self.breaker.record_failure(str(e), time.time() - start_time)
             logger.error(f"[OPENROUTER] Unexpected error: {e}")
             return None
+        finally:
+            # Frees a half-open probe slot no outcome was reported for (deadline expiry)
+            self.breaker.release_probe()
+    
+    async def _make_api_call_async(self, prompt: str, max_tokens: int = 500) -> Optional[str]:
+        """Async variant of `_make_api_call` on the shared httpx.AsyncClient."""
+        import httpx
+        from async_http import get_async_client
+        
+        estimated_tokens = estimate_tokens(prompt) + max_tokens
+        if deadline_expired() or budget_exhausted() or not await self.rate_limiter.acquire_async(tokens=estimated_tokens) or not self._allow_request():
+            return None
+        headers, payload = self._build_request(prompt, max_tokens)
+        start_time = time.time()
+        try:
+            response = await get_async_client().post(
+                f"{self.base_url}/chat/completions",
+                headers=headers,
+                json=payload,
+                timeout=timeout_for(self.timeout)
+            )
+            if response.status_code == 200:
+                return self._handle_success(response.json(), estimated_tokens, start_time)
+            self._handle_rate_limit(response)
+            self.breaker.record_failure(f"HTTP {response.status_code}", time.time() - start_time)
+            logger.error(f"[OPENROUTER] API error {response.status_code}: {response.text}")
+            return None
+        except httpx.TimeoutException:
+            # A timeout forced by the request deadline says nothing about the backend's health
+            if not deadline_expired():
+                self.breaker.record_failure("timeout", time.time() - start_time)
+            logger.error(f"[OPENROUTER] API timeout after {time.time() - start_time:.1f}s")
+            return None
+        except httpx.RequestError as e:
+            self.breaker.record_failure(str(e), time.time() - start_time)
+            logger.error(f"[OPENROUTER] Network error: {e}")
+            return None
+        except Exception as e:
+            self.breaker.record_failure(str(e), time.time() - start_time)
+            logger.error(f"[OPENROUTER] Unexpected error: {e}")
+            return None
+        finally:
+            # Also runs when the task is cancelled mid-request
+            self.breaker.release_probe()
+    
+    def _allow_request(self) -> bool:
+        """Check the circuit breaker; an open breaker skips the call (caller falls back to neutral scores)."""
+        if self.breaker.allow_request():
+            return True
+        logger.warning(f"[OPENROUTER] Circuit open for {self.model_key}; skipping API call")
+        return False
+    
+    def _handle_rate_limit(self, response):
+        """On 429, pause the shared rate limiter for the provider's Retry-After."""
+        if response.status_code == 429:
+            self.rate_limiter.pause(parse_retry_after(response.headers))
+    
+    def _handle_success(self, data: Dict, estimated_tokens: int, start_time: float) -> Optional[str]:
+        """Settle and record token usage and report a 200 response to the breaker (an empty/malformed body counts as a failure)."""
+        usage = data.get('usage') or {}
+        self.rate_limiter.record_usage(estimated_tokens, usage.get('total_tokens'))
+        content = self._extract_content(data)
+        record_llm_usage(self.model_info['model_id'], 'reranker', usage, time.time() - start_time,
+                         error=content is None, cost_per_1k_tokens=self.model_info.get('cost_per_1k_tokens'))
+        if content is None:
+            self.breaker.record_failure("unexpected response format", time.time() - start_time)
+        else:
+            self.breaker.record_success(time.time() - start_time)
+        return content
+    
+    def _build_request(self, prompt: str, max_tokens: int) -> Tuple[Dict, Dict]:
+        """Headers and chat-completion payload for a reranking prompt."""
+        headers = {
+            "Authorization": f"Bearer {self.api_key}",
+            "Content-Type": "application/json",
+            "HTTP-Referer": "https://hnzradtools.nz",
+            "X-Title": "HNZ Radiology Cleaner"
+        }
+        
+        payload = {
+            "model": self.model_info['model_id'],
+            "messages": [
+                {
+                    "role": "user",
+                    "content": prompt
+                }
+            ],
+            "temperature": 0.1,  # Low temperature for consistent scoring
+            "max_tokens": max_tokens,  # 500 is enough for a single exam's score array
+            "top_p": 0.9
+        }
+        return headers, payload
+    
+    @staticmethod
+    def _extract_content(data: Dict) -> Optional[str]:
+        """Message content from a chat-completion response body."""
+        if 'choices' in data and len(data['choices']) > 0:
+            content = data['choices'][0]['message']['content']
+            logger.debug(f"[OPENROUTER] API response: {content[:100]}...")
+            return content
+        logger.error(f"[OPENROUTER] Unexpected response format: {data}")
+        return None
     
     # In class OpenRouterReranker
 
@@ -369,10 +703,8 @@ The ideal candidate has **NO MORE clinical detail** than explicitly stated in th
                 candidate_index = candidate_num - 1  # Convert to 0-based index
                 
                 if 0 <= candidate_index < expected_count:
-                    # Linear scoring: 1st place = 1.0, last place = ~0.1
-                    # This ensures the top-ranked item gets a high score.
-                    score = 1.0 - (rank_position * 0.9 / (num_ranked_items - 1)) if num_ranked_items > 1 else 1.0
-                    scores[candidate_index] = max(0.1, score)
+                    # Linear scoring ensures the top-ranked item gets a high score.
+                    scores[candidate_index] = self._rank_position_score(rank_position, num_ranked_items)
                 else:
                     logger.warning(f"[OPENROUTER] Ranking contained an out-of-bounds candidate number: {candidate_num}")
 
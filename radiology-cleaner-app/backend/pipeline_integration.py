@@ -5,18 +5,55 @@ Provides hooks and utilities for seamless integration.
 """
 
 import asyncio
+import hashlib
+import heapq
+import itertools
 import json
 import logging
 import statistics
+import threading
+import time
+from collections import Counter, deque
 from typing import Dict, List, Optional, Any
 from datetime import datetime
 import os
 from pathlib import Path
 
-from secondary_pipeline import SecondaryPipeline
+from secondary_pipeline import get_secondary_pipeline
+from async_runtime import get_async_runtime
+from llm_usage import budget_exhausted
 
 logger = logging.getLogger(__name__)
 
+def result_merge_key(record: Dict) -> str:
+    """
+    Key joining a secondary adjudication back to its batch row: the row's request_hash,
+    or a hash of its input if it has none. Unlike exam_name, rows from different
+    sources or codes that share a name don't collide.
+    """
+    request_hash = record.get('output', {}).get('request_hash')
+    if request_hash:
+        return request_hash
+    return hashlib.sha256(json.dumps(record.get('input', {}), sort_keys=True).encode('utf-8')).hexdigest()
+
+def apply_improvement(record: Dict, improvement: Dict) -> Dict:
+    """Overwrite a batch row's match with its secondary consensus and record the details."""
+    output = record['output']
+    output['clean_name'] = improvement['consensus_best_match_procedure_name']
+    output.setdefault('snomed', {})
+    output['snomed']['id'] = improvement['consensus_best_match_snomed_id']
+    output['snomed']['fsn'] = improvement.get('consensus_snomed_fsn')
+    output.setdefault('components', {})['confidence'] = improvement['consensus_confidence']
+    output['secondary_pipeline_applied'] = True
+    output['secondary_pipeline_details'] = {
+        'improved': improvement.get('improved', False),
+        'original_confidence': improvement.get('original_confidence'),
+        'consensus_confidence': improvement.get('consensus_confidence'),
+        'agreement_score': improvement.get('agreement_score'),
+        'cached': improvement.get('cached', False),
+    }
+    return record
+
 class PipelineIntegration:
     """Integration layer for secondary pipeline with main application"""
     
@@ -35,9 +72,9 @@ class PipelineIntegration:
             logger.info("Secondary pipeline disabled (OPENROUTER_API_KEY not set)")
             return None
         
-        # Initialize pipeline if needed. It loads its own config.
+        # Use the shared pipeline (and its pooled OpenRouter client). It loads its own config.
         if not self.secondary_pipeline:
-            self.secondary_pipeline = SecondaryPipeline()
+            self.secondary_pipeline = get_secondary_pipeline()
         
         try:
             # Identify low-confidence results based on the threshold from its own config
@@ -67,6 +104,257 @@ class PipelineIntegration:
             logger.error(f"Secondary pipeline error: {e}", exc_info=True)
             return {'error': str(e), 'processed': 0, 'improved': 0}
 
+    def start_concurrent_processing(self) -> Optional['ConcurrentSecondaryProcessor']:
+        """
+        Start a secondary work queue that adjudicates low-confidence results while the
+        primary batch is still producing them (None if the pipeline is disabled).
+        
+        Call from inside the batch's usage_budget so adjudications are charged to it.
+        """
+        if not self.is_enabled():
+            logger.info("Secondary pipeline disabled (OPENROUTER_API_KEY not set)")
+            return None
+        if not self.secondary_pipeline:
+            self.secondary_pipeline = get_secondary_pipeline()
+        return ConcurrentSecondaryProcessor(self.secondary_pipeline)
+
+class ConcurrentSecondaryProcessor:
+    """
+    Secondary work queue fed by the primary batch.
+    
+    submit() is called (from any thread) as each primary result is written; results
+    below the confidence threshold are queued to a consumer on the background event
+    loop, which streams them through the ensemble alongside the remaining primary
+    work. finish() closes the queue, waits for the last adjudications and returns
+    the improvement report plus an index of improvements keyed by result_merge_key.
+    
+    Whenever an ensemble slot frees up, the queued result with the highest expected
+    benefit goes next: lowest confidence, smallest top-2 candidate margin, and most
+    frequent exam name in the batch (its adjudication is reused for the repeats via
+    the result cache, so repeats of a name already in flight wait for it). Once the
+    batch LLM budget or max_wall_seconds is spent, remaining results are skipped and
+    reported. Settings: secondary_pipeline.scheduling.
+    """
+    
+    def __init__(self, secondary_pipeline):
+        self.secondary_pipeline = secondary_pipeline
+        pipeline_config = secondary_pipeline.config.get('secondary_pipeline', {})
+        self.confidence_threshold = pipeline_config.get('confidence_threshold', 0.8)
+        scheduling = pipeline_config.get('scheduling', {}) or {}
+        self.prioritize = scheduling.get('enabled', True)
+        self.weights = {'confidence': 1.0, 'margin': 0.5, 'frequency': 0.5, **(scheduling.get('weights', {}) or {})}
+        self.max_wall_seconds = scheduling.get('max_wall_seconds')
+        self.request_timeout = pipeline_config.get('request_timeout', 60)
+        self.queued = 0
+        self.skipped = {}
+        self.skipped_exams = []
+        self._name_counts = Counter()
+        self._counts_changed = set()
+        self._lock = threading.Lock()
+        self._started = time.monotonic()
+        # Loop-side state (only touched on the background loop). Prioritised results wait in
+        # a heap per exam name; _name_heap holds one entry per name with pending results,
+        # re-pushed (older versions are dropped on pop) when its count, head or in-flight
+        # status changes.
+        self._fifo = deque()
+        self._pending = {}
+        self._pending_count = 0
+        self._name_heap = []
+        self._name_versions = {}
+        self._loop_counts = {}
+        self._stale_names = set()
+        self._seq = itertools.count()
+        self._in_flight_names = Counter()
+        self._closed = False
+        self._available = asyncio.Event()
+        self._runtime = get_async_runtime()
+        # Runs in a copy of the caller's context (LLM budget, rate-limit lane)
+        self._future = self._runtime.submit(self._consume())
+    
+    @staticmethod
+    def _exam_name(result: Dict) -> str:
+        exam_input = result.get('input', {})
+        return result.get('output', {}).get('exam_name') or exam_input.get('exam_name') or exam_input.get('EXAM_NAME') or ''
+    
+    def submit(self, result: Dict):
+        """Count the row's exam name and queue it for adjudication if it is low-confidence."""
+        name = self._exam_name(result)
+        with self._lock:
+            self._name_counts[name] += 1
+            self._counts_changed.add(name)
+        if result.get('output', {}).get('components', {}).get('confidence', 1.0) >= self.confidence_threshold:
+            return
+        with self._lock:
+            self.queued += 1
+        self._runtime.loop.call_soon_threadsafe(self._enqueue, result)
+    
+    def _enqueue(self, result: Dict):
+        if self.prioritize:
+            name = self._exam_name(result)
+            heapq.heappush(self._pending.setdefault(name, []), (-self._result_benefit(result), next(self._seq), result))
+            self._stale_names.add(name)
+        else:
+            self._fifo.append(result)
+        self._pending_count += 1
+        self._available.set()
+    
+    def _close(self):
+        self._closed = True
+        self._available.set()
+    
+    def _result_benefit(self, result: Dict) -> float:
+        """The confidence and margin terms of _benefit, which don't change while a result waits."""
+        output = result.get('output', {})
+        confidence = output.get('components', {}).get('confidence', 0.0)
+        candidates = output.get('all_candidates', [])
+        margin = candidates[0].get('confidence', 0.0) - candidates[1].get('confidence', 0.0) if len(candidates) > 1 else 1.0
+        return (self.weights['confidence'] * (1.0 - confidence)
+                + self.weights['margin'] * (1.0 - min(1.0, max(0.0, margin))))
+    
+    def _frequency_benefit(self, count: int) -> float:
+        return self.weights['frequency'] * (1.0 - 1.0 / max(1, count))
+    
+    def _benefit(self, result: Dict) -> float:
+        """Expected gain from adjudicating a result (higher goes first)."""
+        with self._lock:
+            count = self._name_counts[self._exam_name(result)]
+        return self._result_benefit(result) + self._frequency_benefit(count)
+    
+    def _push_name(self, name: str):
+        queue = self._pending.get(name)
+        if not queue:
+            return
+        version = self._name_versions[name] = self._name_versions.get(name, 0) + 1
+        benefit = -queue[0][0] + self._frequency_benefit(self._loop_counts.get(name, 0))
+        # Prefer names not already being adjudicated: repeats can reuse the cached result
+        heapq.heappush(self._name_heap, (name in self._in_flight_names, -benefit, queue[0][1], name, version))
+    
+    def _pop_next(self) -> Dict:
+        self._pending_count -= 1
+        if not self.prioritize:
+            return self._fifo.popleft()
+        with self._lock:
+            changed, self._counts_changed = self._counts_changed, set()
+            for name in changed:
+                self._loop_counts[name] = self._name_counts[name]
+        for name in changed | self._stale_names:
+            self._push_name(name)
+        self._stale_names.clear()
+        while True:
+            _, _, _, name, version = heapq.heappop(self._name_heap)
+            if version == self._name_versions.get(name):
+                break
+        queue = self._pending[name]
+        _, _, result = heapq.heappop(queue)
+        if not queue:
+            del self._pending[name]
+        self._stale_names.add(name)
+        return result
+    
+    def _settled(self, result: Dict):
+        """The stream is done with a scheduled result (adjudicated, cached, skipped or cancelled)."""
+        name = self._exam_name(result)
+        self._in_flight_names[name] -= 1
+        if self._in_flight_names[name] <= 0:
+            del self._in_flight_names[name]
+        self._stale_names.add(name)
+    
+    def _limit_reached(self) -> Optional[str]:
+        if budget_exhausted(count_skip=False):
+            return 'llm_budget'
+        if self.max_wall_seconds is not None and time.monotonic() - self._started > self.max_wall_seconds:
+            return 'wall_time'
+        return None
+    
+    def _skip_pending(self, reason: str):
+        self.skipped[reason] = self.skipped.get(reason, 0) + self._pending_count
+        pending = itertools.chain(self._fifo, (entry[2] for queue in self._pending.values() for entry in queue))
+        room = 50 - len(self.skipped_exams)
+        if room > 0:
+            self.skipped_exams.extend(self._exam_name(result) for result in itertools.islice(pending, room))
+        self._fifo.clear()
+        self._pending.clear()
+        self._name_heap.clear()
+        self._pending_count = 0
+    
+    async def _scheduled_results(self):
+        while True:
+            while not self._pending_count and not self._closed:
+                self._available.clear()
+                await self._available.wait()
+            if not self._pending_count:
+                return
+            reason = self._limit_reached()
+            if reason:
+                self._skip_pending(reason)
+                continue
+            result = self._pop_next()
+            self._in_flight_names[self._exam_name(result)] += 1
+            yield result
+    
+    async def _consume(self) -> List:
+        ensemble_results = []
+        async for ensemble_result in self.secondary_pipeline.stream_low_confidence_results(self._scheduled_results(),
+                                                                                           on_settled=self._settled):
+            # The full primary row is already in the batch JSONL; keep only what the report and merge need
+            original = ensemble_result.original_result
+            ensemble_result.original_result = {
+                'merge_key': result_merge_key(original),
+                'output': {'components': {'confidence': original.get('output', {}).get('components', {}).get('confidence', 0.0)}},
+            }
+            ensemble_results.append(ensemble_result)
+        return ensemble_results
+    
+    def finish_timeout(self) -> Optional[float]:
+        """Bound for finish(): what is left of max_wall_seconds plus one request for calls in flight (None = unbounded)."""
+        if self.max_wall_seconds is None:
+            return None
+        return max(0.0, self.max_wall_seconds - (time.monotonic() - self._started)) + self.request_timeout
+    
+    def finish(self, timeout: Optional[float] = None) -> Dict:
+        """
+        Close the queue and wait for outstanding adjudications.
+        
+        Returns the improvement report with 'improvements': {merge key: consensus
+        fields} for streaming the results into the batch output (see apply_improvement).
+        """
+        self._runtime.loop.call_soon_threadsafe(self._close)
+        try:
+            ensemble_results = self._future.result(timeout=timeout)
+        except Exception as e:
+            self._future.cancel()
+            logger.error(f"Secondary pipeline error: {e}", exc_info=True)
+            return {'error': str(e), 'processed': 0, 'improved': 0}
+        
+        if not self.queued:
+            logger.info("No low-confidence results found, skipping secondary processing")
+            return {'processed': 0, 'improved': 0, 'skipped_reason': 'no_low_confidence_results'}
+        
+        report = self.secondary_pipeline.generate_improvement_report(ensemble_results)
+        if self.skipped:
+            skipped_total = sum(self.skipped.values())
+            logger.warning(f"Secondary pipeline skipped {skipped_total} low-confidence results: {self.skipped}")
+            report['skipped'] = {'total': skipped_total, 'by_reason': dict(self.skipped), 'exams': self.skipped_exams}
+        report['improvements'] = {
+            res.original_result['merge_key']: {
+                'consensus_best_match_procedure_name': res.consensus_best_match_procedure_name,
+                'consensus_best_match_snomed_id': res.consensus_best_match_snomed_id,
+                'consensus_snomed_fsn': res.consensus_snomed_fsn,
+                'consensus_confidence': res.consensus_confidence,
+                'original_confidence': res.original_result['output']['components']['confidence'],
+                'agreement_score': res.agreement_score,
+                'improved': res.improved,
+                'cached': res.cached,
+            }
+            for res in ensemble_results
+        }
+        logger.info(f"Secondary processing completed: {report.get('improved_results', 0)}/{report.get('total_processed', 0)} improved")
+        return report
+    
+    def cancel(self):
+        """Abandon the queue (e.g. the primary batch failed)."""
+        self._future.cancel()
+
 class BatchResultProcessor:
     """Processor for handling batch results with secondary pipeline integration"""
     
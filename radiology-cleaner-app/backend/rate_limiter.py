@@ -0,0 +1,307 @@
+"""
+Process-wide rate-limit scheduler for outbound model APIs.
+
+Every provider (huggingface, openrouter) and every model under it gets a
+RateLimiter with two token buckets: one for requests and one for LLM tokens.
+A call must fit both its model's buckets and its provider's buckets before it
+is sent, so quota is shared across NLPProcessor, MedCPTClient,
+OpenRouterReranker and OpenRouterEnsemble instead of each discovering the
+limit via 429s.
+
+Two priority lanes:
+- interactive: single-exam UI calls (/parse_enhanced); set with priority_lane()
+- batch:       everything else (batch processing, secondary pipeline)
+
+Batch callers wait while any interactive caller is queued and may not dip into
+the share of each bucket reserved for interactive traffic. A Retry-After from
+the provider pauses the whole limiter for that long.
+
+Settings come from the 'rate_limits' config section; a bucket with no limit
+configured never blocks.
+"""
+
+import asyncio
+import contextvars
+import logging
+import threading
+import time
+from contextlib import contextmanager
+from typing import Dict, Optional
+
+from deadline import timeout_for
+
+logger = logging.getLogger(__name__)
+
+INTERACTIVE = 'interactive'
+BATCH = 'batch'
+
+_current_priority: contextvars.ContextVar = contextvars.ContextVar('rate_limit_priority', default=BATCH)
+
+# One lock/condition for all limiters: a call checks its model and provider buckets together
+_scheduler_lock = threading.Condition(threading.Lock())
+
+
+def get_priority() -> str:
+    return _current_priority.get()
+
+
+@contextmanager
+def priority_lane(priority: str):
+    """Run outbound calls made in this context (thread or task) in the given lane."""
+    token = _current_priority.set(priority)
+    try:
+        yield
+    finally:
+        _current_priority.reset(token)
+
+
+def estimate_tokens(text: str) -> int:
+    """Rough token count for rate accounting (~4 characters per token)."""
+    return max(1, len(text or '') // 4)
+
+
+def parse_retry_after(headers) -> Optional[float]:
+    """Seconds from a Retry-After header (delta-seconds form), or None."""
+    if not headers:
+        return None
+    value = headers.get('Retry-After') or headers.get('retry-after')
+    try:
+        return max(0.0, float(value)) if value is not None else None
+    except (TypeError, ValueError):
+        return None
+
+
+class TokenBucket:
+    """Token bucket refilled continuously at per_minute / 60 per second."""
+
+    def __init__(self, per_minute: float, burst_seconds: float = 10.0):
+        self.rate = per_minute / 60.0
+        self.capacity = max(1.0, self.rate * burst_seconds)
+        self.level = self.capacity
+        self._updated = time.monotonic()
+
+    def refill(self, now: float):
+        self.level = min(self.capacity, self.level + (now - self._updated) * self.rate)
+        self._updated = now
+
+    def wait_time(self, amount: float, reserve: float = 0.0) -> float:
+        """Seconds until `amount` can be taken while leaving `reserve` of capacity behind."""
+        # A single call larger than the bucket goes through once the bucket is full (leaving debt)
+        needed = min(amount, self.capacity) + reserve * self.capacity
+        needed = min(needed, self.capacity)
+        if self.level >= needed:
+            return 0.0
+        return (needed - self.level) / self.rate
+
+    def take(self, amount: float):
+        self.level -= amount
+
+
+class RateLimiter:
+    """Request and token buckets for one provider or one model (checked together with its parent)."""
+
+    def __init__(self, name: str, requests_per_minute: Optional[float] = None,
+                 tokens_per_minute: Optional[float] = None, burst_seconds: float = 10.0,
+                 interactive_reserve: float = 0.2, parent: Optional['RateLimiter'] = None):
+        self.name = name
+        self.request_bucket = TokenBucket(requests_per_minute, burst_seconds) if requests_per_minute else None
+        self.token_bucket = TokenBucket(tokens_per_minute, burst_seconds) if tokens_per_minute else None
+        self.interactive_reserve = interactive_reserve
+        self.parent = parent
+        self.blocked_until = 0.0
+        self.waiting = {INTERACTIVE: 0, BATCH: 0}
+        self.stats = {'granted': 0, 'waited': 0, 'wait_seconds': 0.0, 'timeouts': 0, 'retry_after_pauses': 0}
+
+    def _chain(self):
+        limiter = self
+        while limiter is not None:
+            yield limiter
+            limiter = limiter.parent
+
+    def _wait_time(self, tokens: int, priority: str, now: float) -> float:
+        """Seconds to wait before this call may go (0 = go now). Caller holds the scheduler lock."""
+        wait = 0.0
+        for limiter in self._chain():
+            wait = max(wait, limiter.blocked_until - now)
+            reserve = 0.0
+            if priority == BATCH:
+                if limiter.waiting[INTERACTIVE] > 0:
+                    # Interactive callers are queued on this limiter - let them go first
+                    return max(wait, 0.05)
+                reserve = limiter.interactive_reserve
+            for bucket, amount in ((limiter.request_bucket, 1), (limiter.token_bucket, tokens)):
+                if bucket is None:
+                    continue
+                bucket.refill(now)
+                wait = max(wait, bucket.wait_time(amount, reserve))
+        return wait
+
+    def _take(self, tokens: int):
+        for limiter in self._chain():
+            if limiter.request_bucket:
+                limiter.request_bucket.take(1)
+            if limiter.token_bucket:
+                limiter.token_bucket.take(tokens)
+            limiter.stats['granted'] += 1
+
+    def _set_waiting(self, priority: str, delta: int):
+        for limiter in self._chain():
+            limiter.waiting[priority] += delta
+
+    def _record_wait(self, started: float, granted: bool):
+        waited = time.monotonic() - started
+        if waited > 0.001:
+            self.stats['waited'] += 1
+            self.stats['wait_seconds'] += waited
+        if not granted:
+            self.stats['timeouts'] += 1
+            logger.warning(f"[RATE-LIMIT] {self.name}: gave up after waiting {waited:.1f}s for quota")
+
+    def acquire(self, tokens: int = 0, priority: Optional[str] = None, max_wait: Optional[float] = None) -> bool:
+        """Block until the call fits the rate limits; False if max_wait elapses first."""
+        priority = priority or get_priority()
+        # Never queue past the caller's request deadline
+        max_wait = timeout_for(_max_wait(priority) if max_wait is None else max_wait, minimum=0.0)
+        started = time.monotonic()
+        deadline = started + max_wait
+        with _scheduler_lock:
+            self._set_waiting(priority, 1)
+            try:
+                while True:
+                    now = time.monotonic()
+                    wait = self._wait_time(tokens, priority, now)
+                    if wait <= 0:
+                        self._take(tokens)
+                        granted = True
+                        break
+                    if now + wait > deadline:
+                        granted = False
+                        break
+                    _scheduler_lock.wait(timeout=wait)
+            finally:
+                self._set_waiting(priority, -1)
+                _scheduler_lock.notify_all()
+        self._record_wait(started, granted)
+        return granted
+
+    async def acquire_async(self, tokens: int = 0, priority: Optional[str] = None,
+                            max_wait: Optional[float] = None) -> bool:
+        """Async variant of acquire(); waits on the event loop instead of blocking a thread."""
+        priority = priority or get_priority()
+        # Never queue past the caller's request deadline
+        max_wait = timeout_for(_max_wait(priority) if max_wait is None else max_wait, minimum=0.0)
+        started = time.monotonic()
+        deadline = started + max_wait
+        with _scheduler_lock:
+            self._set_waiting(priority, 1)
+        try:
+            while True:
+                with _scheduler_lock:
+                    now = time.monotonic()
+                    wait = self._wait_time(tokens, priority, now)
+                    if wait <= 0:
+                        self._take(tokens)
+                        granted = True
+                        break
+                if now + wait > deadline:
+                    granted = False
+                    break
+                await asyncio.sleep(wait)
+        finally:
+            with _scheduler_lock:
+                self._set_waiting(priority, -1)
+                _scheduler_lock.notify_all()
+        self._record_wait(started, granted)
+        return granted
+
+    def record_usage(self, estimated_tokens: int, actual_tokens: Optional[int]):
+        """Correct the token buckets once the provider reports real usage."""
+        if not actual_tokens:
+            return
+        with _scheduler_lock:
+            for limiter in self._chain():
+                if limiter.token_bucket:
+                    limiter.token_bucket.take(actual_tokens - estimated_tokens)
+
+    def pause(self, retry_after: Optional[float]):
+        """Honour a provider Retry-After: hold every call on this limiter (and its provider) that long."""
+        if not retry_after:
+            return
+        with _scheduler_lock:
+            until = time.monotonic() + retry_after
+            for limiter in self._chain():
+                limiter.blocked_until = max(limiter.blocked_until, until)
+            self.stats['retry_after_pauses'] += 1
+        logger.warning(f"[RATE-LIMIT] {self.name}: provider asked to retry after {retry_after:.1f}s - pausing")
+
+    def snapshot(self) -> Dict:
+        with _scheduler_lock:
+            now = time.monotonic()
+            for bucket in (self.request_bucket, self.token_bucket):
+                if bucket:
+                    bucket.refill(now)
+            return {
+                'requests_available': round(self.request_bucket.level, 1) if self.request_bucket else None,
+                'tokens_available': round(self.token_bucket.level) if self.token_bucket else None,
+                'paused_for_seconds': round(max(0.0, self.blocked_until - now), 1),
+                'waiting': dict(self.waiting),
+                **{key: round(value, 2) if isinstance(value, float) else value for key, value in self.stats.items()},
+            }
+
+
+# Limiter registry: 'provider' and 'provider:model' keys
+_limiters: Dict[str, RateLimiter] = {}
+_limiters_lock = threading.Lock()
+
+
+def _rate_limit_settings() -> Dict:
+    try:
+        from config_manager import get_config
+        return get_config().get('rate_limits', {}) or {}
+    except Exception as e:
+        logger.warning(f"[RATE-LIMIT] Config unavailable, using defaults: {e}")
+        return {}
+
+
+def _max_wait(priority: str) -> float:
+    max_wait = _rate_limit_settings().get('max_wait_seconds', {}) or {}
+    return max_wait.get(priority, 15 if priority == INTERACTIVE else 120)
+
+
+def _build_limiter(name: str, limits: Dict, settings: Dict, parent: Optional[RateLimiter]) -> RateLimiter:
+    return RateLimiter(
+        name,
+        requests_per_minute=limits.get('requests_per_minute'),
+        tokens_per_minute=limits.get('tokens_per_minute'),
+        burst_seconds=settings.get('burst_seconds', 10),
+        interactive_reserve=settings.get('interactive_reserve', 0.2),
+        parent=parent,
+    )
+
+
+def get_rate_limiter(provider: str, model: str) -> RateLimiter:
+    """Limiter for one model, chained to its provider-wide limiter."""
+    key = f"{provider}:{model}"
+    with _limiters_lock:
+        limiter = _limiters.get(key)
+        if limiter is not None:
+            return limiter
+        settings = _rate_limit_settings()
+        if not settings.get('enabled', True):
+            settings = {}
+        provider_limiter = _limiters.get(provider)
+        if provider_limiter is None:
+            provider_limiter = _build_limiter(provider, (settings.get('providers', {}) or {}).get(provider, {}) or {},
+                                              settings, None)
+            _limiters[provider] = provider_limiter
+        model_limits = (settings.get('models', {}) or {}).get(key, {}) or {}
+        limiter = _build_limiter(key, model_limits, settings, provider_limiter)
+        _limiters[key] = limiter
+        return limiter
+
+
+def get_all_rate_limiter_states() -> Dict[str, Dict]:
+    """Snapshot of every registered limiter, keyed by 'provider' or 'provider:model'."""
+    with _limiters_lock:
+        limiters = list(_limiters.values())
+    return {limiter.name: limiter.snapshot() for limiter in limiters}
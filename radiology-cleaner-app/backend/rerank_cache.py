@@ -0,0 +1,139 @@
+"""
+Reranker score cache.
+
+Stores reranker outputs in the shared tiered cache (memory LRU + SQLite tier)
+so repeated (cleaned input, candidate) pairs from batches and UI lookups are not
+re-sent to the backend.
+
+Two granularities, because rerankers differ in what a score means:
+- Pair scores ('rerank_pairs'): pointwise rerankers such as MedCPT, where the raw
+  probability of a (query, doc) pair doesn't depend on the other candidates.
+  Keyed by (reranker_key, model id, query, doc); callers send only the missing
+  docs and normalize over the full list afterwards.
+- List scores ('rerank_lists'): listwise LLM rerankers, whose scores come from a
+  rank over the whole candidate list. Keyed by (reranker_key, model id, query,
+  ordered docs); a partial hit is a miss.
+"""
+
+import hashlib
+import json
+import logging
+import threading
+from typing import Dict, List, Optional
+
+logger = logging.getLogger(__name__)
+
+
+class RerankScoreCache:
+    """Pair- and list-level reranker score cache backed by the tiered cache."""
+
+    PAIR_NAMESPACE = 'rerank_pairs'
+    LIST_NAMESPACE = 'rerank_lists'
+
+    def __init__(self, cache=None, ttl_seconds: Optional[float] = 604800, enabled: bool = True):
+        """
+        Args:
+            cache: TieredCache instance (shared get_cache() if None)
+            ttl_seconds: Lifetime of cached scores
+            enabled: When False every lookup misses and nothing is stored
+        """
+        self._cache = cache
+        self.ttl_seconds = ttl_seconds
+        self.enabled = enabled
+        self._lock = threading.Lock()
+        self._counters = {
+            'pair_lookups': 0, 'pair_hits': 0, 'docs_sent': 0,
+            'list_lookups': 0, 'list_hits': 0,
+        }
+
+    @property
+    def cache(self):
+        if self._cache is None:
+            from tiered_cache import get_cache
+            self._cache = get_cache()
+        return self._cache
+
+    @staticmethod
+    def make_key(reranker_key: str, model_id: str, query: str, *docs: str) -> str:
+        payload = json.dumps([reranker_key, model_id, query, *docs], ensure_ascii=False)
+        return hashlib.sha256(payload.encode('utf-8')).hexdigest()
+
+    def _count(self, **increments):
+        with self._lock:
+            for name, value in increments.items():
+                self._counters[name] += value
+
+    # ------------------------------------------------------------------
+    # Pointwise (pair) scores
+    # ------------------------------------------------------------------
+
+    def get_pair_scores(self, reranker_key: str, model_id: str, query: str,
+                        documents: List[str]) -> List[Optional[float]]:
+        """Cached raw score per document, None where missing."""
+        if not self.enabled:
+            return [None] * len(documents)
+        scores = [self.cache.get(self.PAIR_NAMESPACE, self.make_key(reranker_key, model_id, query, doc))
+                  for doc in documents]
+        hits = sum(score is not None for score in scores)
+        self._count(pair_lookups=len(documents), pair_hits=hits, docs_sent=len(documents) - hits)
+        return scores
+
+    def set_pair_scores(self, reranker_key: str, model_id: str, query: str,
+                        documents: List[str], scores: List[float]):
+        if not self.enabled:
+            return
+        for doc, score in zip(documents, scores):
+            self.cache.set(self.PAIR_NAMESPACE, self.make_key(reranker_key, model_id, query, doc),
+                           score, ttl=self.ttl_seconds)
+
+    # ------------------------------------------------------------------
+    # Listwise scores
+    # ------------------------------------------------------------------
+
+    def get_list_scores(self, reranker_key: str, model_id: str, query: str,
+                        documents: List[str]) -> Optional[List[float]]:
+        if not self.enabled:
+            return None
+        scores = self.cache.get(self.LIST_NAMESPACE, self.make_key(reranker_key, model_id, query, *documents))
+        hit = scores is not None and len(scores) == len(documents)
+        self._count(list_lookups=1, list_hits=int(hit))
+        return scores if hit else None
+
+    def set_list_scores(self, reranker_key: str, model_id: str, query: str,
+                        documents: List[str], scores: List[float]):
+        if not self.enabled:
+            return
+        self.cache.set(self.LIST_NAMESPACE, self.make_key(reranker_key, model_id, query, *documents),
+                       scores, ttl=self.ttl_seconds)
+
+    def stats(self) -> Dict:
+        with self._lock:
+            counters = dict(self._counters)
+        counters['pair_hit_rate'] = counters['pair_hits'] / counters['pair_lookups'] if counters['pair_lookups'] else 0.0
+        counters['list_hit_rate'] = counters['list_hits'] / counters['list_lookups'] if counters['list_lookups'] else 0.0
+        counters['enabled'] = self.enabled
+        return counters
+
+
+# Global shared score cache
+_shared_score_cache = None
+_shared_score_cache_lock = threading.Lock()
+
+
+def get_rerank_score_cache() -> RerankScoreCache:
+    """Get the process-wide reranker score cache, configured from 'reranking.score_cache'."""
+    global _shared_score_cache
+    if _shared_score_cache is None:
+        with _shared_score_cache_lock:
+            if _shared_score_cache is None:
+                try:
+                    from config_manager import get_config
+                    cache_config = get_config().get('reranking.score_cache', {}) or {}
+                except Exception as e:
+                    logger.warning(f"[RERANK-CACHE] Config unavailable, using defaults: {e}")
+                    cache_config = {}
+                _shared_score_cache = RerankScoreCache(
+                    ttl_seconds=cache_config.get('ttl_seconds', 604800),
+                    enabled=cache_config.get('enabled', True),
+                )
+    return _shared_score_cache
@@ -1,12 +1,18 @@
 """
 Reranker Manager for handling multiple reranker backends.
-Supports both HuggingFace models (MedCPT) and OpenRouter LLMs (GPT/Claude/Gemini).
+Supports HuggingFace models (MedCPT), a local CPU cross-encoder and OpenRouter LLMs (GPT/Claude/Gemini).
 """
 
+import asyncio
 import logging
-from typing import List, Dict, Optional, Union
+from typing import List, Dict, Optional, Union, Tuple
 from openrouter_reranker import OpenRouterReranker
 from nlp_processor import NLPProcessor
+from medcpt_client import get_medcpt_client, MedCPTClient
+from local_reranker import LocalCrossEncoderReranker, build_local_reranker
+from rerank_cache import get_rerank_score_cache
+from circuit_breaker import get_breaker
+from llm_usage import budget_exhausted
 
 logger = logging.getLogger(__name__)
 
@@ -20,13 +26,24 @@ class RerankerManager:
         """Initialize the reranker manager with available backends."""
         self.rerankers = {}
         self.available_rerankers = {}
+        self.score_cache = get_rerank_score_cache()
         
         # Initialize HuggingFace reranker (existing MedCPT)
         self._init_huggingface_rerankers()
         
+        # Initialize local CPU cross-encoder (if enabled in config)
+        self._init_local_rerankers()
+        
         # Initialize OpenRouter rerankers
         self._init_openrouter_rerankers()
         
+        # Register the adaptive cascade (needs the concrete rerankers above)
+        self.cascade_config = None
+        self._init_cascade()
+        
+        # Healthy rerankers to use instead of one whose circuit breaker is open
+        self.fallback_order = self._load_fallback_order()
+        
         logger.info(f"🔄 [RERANKER-MGR] Initialized with {len(self.available_rerankers)} reranker options")
     
     def _init_huggingface_rerankers(self):
@@ -49,14 +66,52 @@ class RerankerManager:
         except Exception as e:
             logger.error(f"[RERANKER-MGR] Error initializing HuggingFace rerankers: {e}")
     
+    def _init_local_rerankers(self):
+        """Initialize the local CPU cross-encoder reranker from 'reranking.local_cross_encoder'."""
+        try:
+            from config_manager import get_config
+            local_config = get_config().get('reranking.local_cross_encoder', {}) or {}
+            reranker = build_local_reranker(local_config)
+            if reranker is None:
+                return
+            
+            reranker_key = local_config.get('key', 'local-cross-encoder')
+            if reranker.is_available():
+                self.rerankers[reranker_key] = reranker
+                status = 'available'
+                logger.info(f"✅ [RERANKER-MGR] Local cross-encoder registered as '{reranker_key}' ({reranker.model_id})")
+            else:
+                status = 'unavailable'
+                logger.warning(f"⚠️ [RERANKER-MGR] Local cross-encoder unavailable: {reranker.load_error}")
+            
+            self.available_rerankers[reranker_key] = {
+                'name': local_config.get('name', 'Local Cross-Encoder (CPU)'),
+                'description': 'Cross-encoder loaded from local disk, scored on CPU threads (no network calls)',
+                'type': 'local',
+                'model_id': reranker.model_id,
+                'status': status
+            }
+        except Exception as e:
+            logger.error(f"[RERANKER-MGR] Error initializing local reranker: {e}")
+    
     def _init_openrouter_rerankers(self):
         """Initialize OpenRouter-based rerankers."""
         try:
             openrouter_models = OpenRouterReranker.get_available_models()
+            try:
+                from config_manager import get_config
+                packing_config = get_config().get('reranking.openrouter', {}) or {}
+            except Exception as e:
+                logger.warning(f"[RERANKER-MGR] OpenRouter config unavailable, using defaults: {e}")
+                packing_config = {}
             
             for model_key, model_info in openrouter_models.items():
                 try:
-                    reranker = OpenRouterReranker(model_key=model_key)
+                    reranker = OpenRouterReranker(
+                        model_key=model_key,
+                        pack_size=packing_config.get('pack_size', 8),
+                        max_candidates_per_pack=packing_config.get('max_candidates_per_pack', 120)
+                    )
                     
                     if reranker.is_available():
                         self.rerankers[model_key] = reranker
@@ -88,7 +143,110 @@ class RerankerManager:
         except Exception as e:
             logger.error(f"[RERANKER-MGR] Error initializing OpenRouter rerankers: {e}")
     
-    def get_reranker(self, reranker_key: str) -> Optional[Union[NLPProcessor, OpenRouterReranker]]:
+    def _init_cascade(self):
+        """
+        Register the adaptive cascade from 'reranking.cascade'.
+        
+        The cascade reranks with the first available cheap tier and escalates to
+        the LLM reranker only when the match is unclear (see get_cascade_config).
+        """
+        try:
+            from config_manager import get_config
+            cascade_config = get_config().get('reranking.cascade', {}) or {}
+            if not cascade_config.get('enabled', False):
+                return
+            
+            cheap_tier = next((key for key in cascade_config.get('cheap_tiers', ['local-cross-encoder', 'medcpt'])
+                               if self.available_rerankers.get(key, {}).get('status') == 'available'), None)
+            escalation_tier = cascade_config.get('escalate_to', 'gemini-2.5-flash-lite')
+            if escalation_tier not in self.rerankers:
+                logger.warning(f"⚠️ [RERANKER-MGR] Cascade escalation reranker '{escalation_tier}' unavailable - cascade will not escalate")
+                escalation_tier = None
+            if not cheap_tier:
+                logger.warning("⚠️ [RERANKER-MGR] No cheap cascade tier available - cascade disabled")
+                return
+            
+            cascade_key = cascade_config.get('key', 'cascade')
+            tiers = [cheap_tier] + ([escalation_tier] if escalation_tier else [])
+            self.cascade_config = {
+                'key': cascade_key,
+                'tiers': tiers,
+                'min_margin': cascade_config.get('min_margin', 0.05),
+                'min_confidence': cascade_config.get('min_confidence', 0.75),
+            }
+            self.available_rerankers[cascade_key] = {
+                'name': 'Adaptive Cascade',
+                'description': f"{' → '.join(tiers)}; escalates when top-1/top-2 margin < {self.cascade_config['min_margin']} "
+                               f"or confidence < {self.cascade_config['min_confidence']}",
+                'type': 'cascade',
+                'model_id': '+'.join(tiers),
+                'tiers': tiers,
+                'status': 'available'
+            }
+            logger.info(f"✅ [RERANKER-MGR] Cascade registered as '{cascade_key}': {' → '.join(tiers)}")
+        except Exception as e:
+            logger.error(f"[RERANKER-MGR] Error initializing reranker cascade: {e}")
+    
+    def _load_fallback_order(self) -> List[str]:
+        """Reranker keys tried, in order, when the selected backend's circuit is open."""
+        try:
+            from config_manager import get_config
+            breaker_config = get_config().get('circuit_breaker', {}) or {}
+        except Exception as e:
+            logger.warning(f"[RERANKER-MGR] Circuit breaker config unavailable, using defaults: {e}")
+            breaker_config = {}
+        return list(breaker_config.get('fallback_rerankers', ['local-cross-encoder', 'medcpt']))
+    
+    def _breaker_name(self, reranker_key: str) -> Optional[str]:
+        """Circuit breaker guarding a reranker's remote backend (None for local/unknown rerankers)."""
+        if reranker_key == 'medcpt':
+            return 'medcpt'
+        if self.available_rerankers.get(reranker_key, {}).get('type') == 'openrouter':
+            return f"openrouter:{reranker_key}"
+        return None
+    
+    def is_reranker_healthy(self, reranker_key: str) -> bool:
+        """
+        False if the reranker's backend circuit is open, or it is an LLM reranker
+        and the current batch's LLM budget is spent (a cascade is judged by its first tier).
+        """
+        cascade_config = self.get_cascade_config(reranker_key)
+        if cascade_config:
+            reranker_key = cascade_config['tiers'][0]
+        if self.available_rerankers.get(reranker_key, {}).get('type') == 'openrouter' and budget_exhausted(count_skip=False):
+            return False
+        breaker_name = self._breaker_name(reranker_key)
+        return breaker_name is None or get_breaker(breaker_name).is_available()
+    
+    def _resolve_healthy_reranker(self, reranker_key: str) -> str:
+        """
+        Swap a reranker whose circuit is open for the first healthy fallback.
+        
+        Keeps the original key if nothing healthy is configured; its backend
+        then fails fast and the caller gets neutral scores.
+        """
+        if self.is_reranker_healthy(reranker_key):
+            return reranker_key
+        for fallback_key in self.fallback_order:
+            usable = fallback_key == 'medcpt' or fallback_key in self.rerankers
+            if fallback_key != reranker_key and usable and self.is_reranker_healthy(fallback_key):
+                logger.warning(f"[RERANKER-MGR] '{reranker_key}' unavailable (circuit open or LLM budget spent) - falling back to '{fallback_key}'")
+                return fallback_key
+        logger.warning(f"[RERANKER-MGR] '{reranker_key}' unavailable and no healthy fallback - using neutral scores")
+        return reranker_key
+    
+    def get_cascade_config(self, reranker_key: Optional[str]) -> Optional[Dict]:
+        """
+        Cascade settings if reranker_key selects the cascade, else None.
+        
+        Returns:
+            Dict with 'tiers' (cheap first), 'min_margin' and 'min_confidence'
+        """
+        if self.cascade_config and reranker_key == self.cascade_config['key']:
+            return self.cascade_config
+        return None
+    
+    def get_reranker(self, reranker_key: str) -> Optional[Union[NLPProcessor, OpenRouterReranker, LocalCrossEncoderReranker]]:
         """
         Get a reranker by key.
         
@@ -105,9 +263,17 @@ class RerankerManager:
         Get information about all available rerankers.
         
         Returns:
-            Dictionary mapping reranker keys to their info
+            Dictionary mapping reranker keys to their info, with the backend's
+            circuit breaker state under 'circuit' where one applies
         """
-        return self.available_rerankers.copy()
+        rerankers = {}
+        for key, info in self.available_rerankers.items():
+            info = dict(info)
+            breaker_name = self._breaker_name(key)
+            if breaker_name:
+                info['circuit'] = get_breaker(breaker_name).state
+            rerankers[key] = info
+        return rerankers
     
     def get_default_reranker_key(self) -> str:
         """
@@ -148,27 +314,119 @@ class RerankerManager:
         if not reranker_key:
             reranker_key = self.get_default_reranker_key()
         
+        # Without final scores to judge the margin, a direct cascade call uses its cheap tier
+        cascade_config = self.get_cascade_config(reranker_key)
+        if cascade_config:
+            reranker_key = cascade_config['tiers'][0]
+        reranker_key = self._resolve_healthy_reranker(reranker_key)
+        
         logger.info(f"[RERANKER-MGR] Using {self.available_rerankers.get(reranker_key, {}).get('name', reranker_key)} for reranking")
         
         # Handle MedCPT specially since it's no longer in NLPProcessor
         if reranker_key == 'medcpt':
             return self._get_medcpt_scores(query, documents)
         
-        # Handle OpenRouter rerankers
+        # Handle OpenRouter and local rerankers
         reranker = self.get_reranker(reranker_key)
         if not reranker:
             logger.warning(f"[RERANKER-MGR] Reranker '{reranker_key}' not available, using neutral scores")
             return [0.5] * len(documents)
         
+        # Local cross-encoder is pointwise like MedCPT, so it shares the pair-score cache path
+        if isinstance(reranker, LocalCrossEncoderReranker):
+            raw_scores = self._get_pointwise_raw_scores(reranker_key, [(query, documents)], reranker.score_raw_batch)[0]
+            return reranker.normalize(raw_scores, len(documents))
+        
+        # LLM rerankers score the list as a whole, so only an identical candidate list can be reused
+        model_id = self.available_rerankers.get(reranker_key, {}).get('model_id', reranker_key)
+        cached_scores = self.score_cache.get_list_scores(reranker_key, model_id, query, documents)
+        if cached_scores is not None:
+            logger.info(f"[RERANKER-MGR] Using cached {reranker_key} scores for {len(documents)} candidates")
+            return cached_scores
+        
         try:
-            return reranker.get_rerank_scores(query, documents)
+            scores = reranker.get_rerank_scores(query, documents)
         except Exception as e:
             logger.error(f"[RERANKER-MGR] Error getting rerank scores with {reranker_key}: {e}")
             return [0.5] * len(documents)
+        
+        # All-neutral scores are the reranker's failure fallback - don't cache those
+        if len(scores) == len(documents) and any(score != 0.5 for score in scores):
+            self.score_cache.set_list_scores(reranker_key, model_id, query, documents, scores)
+        return scores
+    
+    def get_rerank_scores_batch(self, items: List[Tuple[str, List[str]]], reranker_key: Optional[str] = None) -> List[List[float]]:
+        """
+        Get reranking scores for several exams at once.
+        
+        MedCPT packs every exam's (query, doc) pairs into as few inference calls
+        as possible, OpenRouter rerankers pack several exams into one prompt,
+        and the local cross-encoder scores all pairs in one threaded pass.
+        
+        Args:
+            items: List of (query, documents) tuples, one per exam
+            reranker_key: Which reranker to use (defaults to default_reranker)
+            
+        Returns:
+            List of score lists (0.0-1.0), aligned with items
+        """
+        if not reranker_key:
+            reranker_key = self.get_default_reranker_key()
+        cascade_config = self.get_cascade_config(reranker_key)
+        if cascade_config:
+            reranker_key = cascade_config['tiers'][0]
+        reranker_key = self._resolve_healthy_reranker(reranker_key)
+        
+        if reranker_key == 'medcpt':
+            try:
+                raw_results = self._get_medcpt_raw_scores(items, coalesce=False)
+                return [MedCPTClient.normalize(raw, query, len(documents))
+                        for raw, (query, documents) in zip(raw_results, items)]
+            except Exception as e:
+                logger.error(f"[RERANKER-MGR] MedCPT batch scoring error: {e}")
+                return [[0.5] * len(documents) for _, documents in items]
+        
+        reranker = self.get_reranker(reranker_key)
+        if isinstance(reranker, LocalCrossEncoderReranker):
+            raw_results = self._get_pointwise_raw_scores(reranker_key, items, reranker.score_raw_batch)
+            return [reranker.normalize(raw, len(documents)) for raw, (_, documents) in zip(raw_results, items)]
+        
+        if isinstance(reranker, OpenRouterReranker):
+            return self._get_openrouter_scores_batch(reranker_key, reranker, items)
+        
+        return [self.get_rerank_scores(query, documents, reranker_key) for query, documents in items]
+    
+    def _get_openrouter_scores_batch(self, reranker_key: str, reranker: OpenRouterReranker,
+                                     items: List[Tuple[str, List[str]]]) -> List[List[float]]:
+        """Packed OpenRouter scoring for the exams missing from the list-score cache."""
+        model_id = self.available_rerankers.get(reranker_key, {}).get('model_id', reranker_key)
+        results = [self.score_cache.get_list_scores(reranker_key, model_id, query, documents)
+                   for query, documents in items]
+        missing = [idx for idx, scores in enumerate(results) if scores is None]
+        if not missing:
+            return results
+        
+        try:
+            fetched = reranker.get_rerank_scores_batch([items[idx] for idx in missing])
+        except Exception as e:
+            logger.error(f"[RERANKER-MGR] Packed scoring error with {reranker_key}: {e}")
+            fetched = [[0.5] * len(items[idx][1]) for idx in missing]
+        
+        for idx, scores in zip(missing, fetched):
+            query, documents = items[idx]
+            results[idx] = scores
+            if len(scores) == len(documents) and any(score != 0.5 for score in scores):
+                self.score_cache.set_list_scores(reranker_key, model_id, query, documents, scores)
+        
+        logger.info(f"[RERANKER-MGR] {reranker_key} batch: {len(items) - len(missing)}/{len(items)} exams cached")
+        return results
     
     def _get_medcpt_scores(self, query: str, documents: List[str]) -> List[float]:
         """
-        Get MedCPT reranking scores using direct HuggingFace API.
+        Get MedCPT reranking scores via the shared pooled MedCPT client.
+        
+        Concurrent callers (e.g. batch worker threads) are coalesced into a
+        single inference call by the client's micro-batching.
         
         Args:
             query: Input query/exam name
@@ -178,99 +436,152 @@ class RerankerManager:
             List of similarity scores (0.0-1.0)
         """
         try:
-            import os
-            import requests
-            import json
+            raw_scores = self._get_medcpt_raw_scores([(query, documents)], coalesce=True)[0]
+            return MedCPTClient.normalize(raw_scores, query, len(documents))
+        except Exception as e:
+            logger.error(f"[RERANKER-MGR] MedCPT scoring error: {e}")
+            return [0.5] * len(documents)
+    
+    def _get_medcpt_raw_scores(self, items: List[Tuple[str, List[str]]], coalesce: bool) -> List[Optional[List[float]]]:
+        """
+        Raw MedCPT pair probabilities per exam, served from the pair-score cache
+        where possible. Only pairs missing from the cache are sent to the API.
+        
+        Args:
+            items: List of (query, documents) tuples
+            coalesce: Use the client's micro-batching (single exam) instead of one explicit batch
             
-            api_token = os.environ.get('HUGGING_FACE_TOKEN')
-            if not api_token:
-                logger.warning("[RERANKER-MGR] MedCPT requires HUGGING_FACE_TOKEN, using neutral scores")
-                return [0.5] * len(documents)
+        Returns:
+            Raw scores per exam, or None for exams whose API call failed
+        """
+        client = get_medcpt_client()
+        if not client.is_available():
+            logger.warning("[RERANKER-MGR] MedCPT requires HUGGING_FACE_TOKEN, using neutral scores")
+        
+        def fetch(missing_items):
+            if coalesce and len(missing_items) == 1:
+                return [client.score_raw(*missing_items[0])]
+            return client.score_raw_batch(missing_items)
+        
+        return self._get_pointwise_raw_scores('medcpt', items, fetch)
+    
+    def _get_pointwise_raw_scores(self, reranker_key: str, items: List[Tuple[str, List[str]]],
+                                  fetch_raw_batch) -> List[Optional[List[float]]]:
+        """
+        Raw pair scores per exam for a pointwise reranker, served from the
+        pair-score cache where possible.
+        
+        Args:
+            reranker_key: Reranker whose scores are cached
+            items: List of (query, documents) tuples
+            fetch_raw_batch: Callable scoring [(query, missing_docs), ...] -> raw scores (None on failure)
             
-            # Prepare query-document pairs for MedCPT cross-encoder in correct format
-            pairs = [{"text": query, "text_pair": doc} for doc in documents]
+        Returns:
+            Raw scores per exam, or None for exams whose scoring failed
+        """
+        lookup = self._lookup_pair_scores(reranker_key, items)
+        fetched = fetch_raw_batch(lookup['missing_items']) if lookup['missing_items'] else []
+        return self._merge_pair_scores(reranker_key, items, lookup, fetched)
+    
+    async def _get_pointwise_raw_scores_async(self, reranker_key: str, items: List[Tuple[str, List[str]]],
+                                              fetch_raw_batch_async) -> List[Optional[List[float]]]:
+        """Async variant of `_get_pointwise_raw_scores` taking a coroutine fetcher."""
+        lookup = self._lookup_pair_scores(reranker_key, items)
+        fetched = await fetch_raw_batch_async(lookup['missing_items']) if lookup['missing_items'] else []
+        return self._merge_pair_scores(reranker_key, items, lookup, fetched)
+    
+    def _lookup_pair_scores(self, reranker_key: str, items: List[Tuple[str, List[str]]]) -> Dict:
+        """Cached pair scores per exam plus the (query, missing_docs) still to be scored."""
+        model_id = self.available_rerankers.get(reranker_key, {}).get('model_id', reranker_key)
+        results: List[Optional[List[Optional[float]]]] = []
+        missing_items = []
+        missing_positions = []
+        
+        for item_idx, (query, documents) in enumerate(items):
+            cached = self.score_cache.get_pair_scores(reranker_key, model_id, query, documents)
+            results.append(cached)
+            missing = [i for i, score in enumerate(cached) if score is None]
+            if missing:
+                missing_items.append((query, [documents[i] for i in missing]))
+                missing_positions.append((item_idx, missing))
+        
+        return {'model_id': model_id, 'results': results,
+                'missing_items': missing_items, 'missing_positions': missing_positions}
+    
+    def _merge_pair_scores(self, reranker_key: str, items: List[Tuple[str, List[str]]], lookup: Dict,
+                           fetched: List[Optional[List[float]]]) -> List[Optional[List[float]]]:
+        """Merge freshly scored pairs into the cached ones and store them."""
+        results = lookup['results']
+        missing_items = lookup['missing_items']
+        if not missing_items:
+            return results
+        
+        for (item_idx, missing), (query, missing_docs), raw in zip(lookup['missing_positions'], missing_items, fetched):
+            if raw is None:
+                # Can't normalize a partially scored list - treat the whole exam as failed
+                results[item_idx] = None
+                continue
+            self.score_cache.set_pair_scores(reranker_key, lookup['model_id'], query, missing_docs, raw)
+            for position, score in zip(missing, raw):
+                results[item_idx][position] = score
+        
+        sent = sum(len(docs) for _, docs in missing_items)
+        total = sum(len(docs) for _, docs in items)
+        logger.info(f"[RERANKER-MGR] {reranker_key} pair cache: {total - sent}/{total} cached, scored {sent} pairs")
+        return results
+    
+    async def get_rerank_scores_async(self, query: str, documents: List[str], reranker_key: Optional[str] = None) -> List[float]:
+        """
+        Async variant of `get_rerank_scores` for the async pipeline.
+        
+        Remote rerankers are awaited on the shared httpx.AsyncClient and use
+        the same score caches; the local cross-encoder runs off the loop.
+        """
+        if not reranker_key:
+            reranker_key = self.get_default_reranker_key()
+        cascade_config = self.get_cascade_config(reranker_key)
+        if cascade_config:
+            reranker_key = cascade_config['tiers'][0]
+        reranker_key = self._resolve_healthy_reranker(reranker_key)
+        
+        try:
+            if reranker_key == 'medcpt':
+                client = get_medcpt_client()
+                raw_scores = (await self._get_pointwise_raw_scores_async(
+                    'medcpt', [(query, documents)], client.score_raw_batch_async))[0]
+                return MedCPTClient.normalize(raw_scores, query, len(documents))
             
-            headers = {"Authorization": f"Bearer {api_token}"}
-            api_url = "https://api-inference.huggingface.co/models/ncbi/MedCPT-Cross-Encoder"
+            reranker = self.get_reranker(reranker_key)
+            if not reranker:
+                logger.warning(f"[RERANKER-MGR] Reranker '{reranker_key}' not available, using neutral scores")
+                return [0.5] * len(documents)
             
-            response = requests.post(
-                api_url,
-                headers=headers,
-                json={"inputs": pairs, "options": {"wait_for_model": True}},
-                timeout=30
-            )
+            if isinstance(reranker, LocalCrossEncoderReranker):
+                raw_scores = (await self._get_pointwise_raw_scores_async(
+                    reranker_key, [(query, documents)], reranker.score_raw_batch_async))[0]
+                return reranker.normalize(raw_scores, len(documents))
             
-            if response.status_code == 200:
-                result = response.json()
-                
-                # Handle new API format: nested array with label/score objects
-                if (isinstance(result, list) and len(result) == 1 and 
-                    isinstance(result[0], list) and len(result[0]) == len(documents)):
-                    # New format: [[{'label': 'LABEL_0', 'score': 0.123}, ...]]
-                    scores_data = result[0]
-                    raw_scores = []
-                    for item in scores_data:
-                        if isinstance(item, dict) and 'score' in item:
-                            raw_scores.append(float(item['score']))
-                        else:
-                            logger.warning(f"[RERANKER-MGR] Unexpected item format: {item}")
-                            raw_scores.append(0.5)
-                    
-                    # Normalize scores to 0-1 range to prevent confidence > 100%
-                    if raw_scores:
-                        max_score = max(raw_scores)
-                        min_score = min(raw_scores)
-                        if max_score > min_score:
-                            # Min-max normalization
-                            scores = [(score - min_score) / (max_score - min_score) for score in raw_scores]
-                        else:
-                            # All scores are the same, normalize to 0.5
-                            scores = [0.5] * len(raw_scores)
-                        logger.info(f"[RERANKER-MGR] MedCPT normalized {len(scores)} candidates: {min(raw_scores):.3f}-{max(raw_scores):.3f} → {min(scores):.3f}-{max(scores):.3f}")
-                    else:
-                        scores = [0.5] * len(documents)
-                    
-                    return scores
-                
-                # Handle old API format: direct list of logits/scores
-                elif isinstance(result, list) and len(result) == len(documents):
-                    # Check if these are logits (need sigmoid) or probabilities (0-1 range)
-                    if all(isinstance(x, (int, float)) for x in result):
-                        raw_scores = []
-                        # If values are mostly outside 0-1 range, treat as logits
-                        if any(abs(x) > 2 for x in result):
-                            import math
-                            raw_scores = [1.0 / (1.0 + math.exp(-float(logit))) for logit in result]
-                        else:
-                            # Treat as direct probabilities
-                            raw_scores = [float(x) for x in result]
-                        
-                        # Apply same normalization to prevent confidence > 100%
-                        if raw_scores:
-                            max_score = max(raw_scores)
-                            min_score = min(raw_scores)
-                            if max_score > min_score:
-                                # Min-max normalization
-                                scores = [(score - min_score) / (max_score - min_score) for score in raw_scores]
-                            else:
-                                # All scores are the same, normalize to 0.5
-                                scores = [0.5] * len(raw_scores)
-                            logger.info(f"[RERANKER-MGR] MedCPT normalized {len(scores)} candidates (old format): {min(raw_scores):.3f}-{max(raw_scores):.3f} → {min(scores):.3f}-{max(scores):.3f}")
-                        else:
-                            scores = [0.5] * len(documents)
-                        
-                        return scores
-                
-                logger.error(f"[RERANKER-MGR] MedCPT unexpected response format: {result}")
-                return [0.5] * len(documents)
-            else:
-                logger.error(f"[RERANKER-MGR] MedCPT API error {response.status_code}: {response.text}")
-                return [0.5] * len(documents)
-                
+            if isinstance(reranker, OpenRouterReranker):
+                model_id = self.available_rerankers.get(reranker_key, {}).get('model_id', reranker_key)
+                cached_scores = self.score_cache.get_list_scores(reranker_key, model_id, query, documents)
+                if cached_scores is not None:
+                    return cached_scores
+                scores = await reranker.get_rerank_scores_async(query, documents)
+                if len(scores) == len(documents) and any(score != 0.5 for score in scores):
+                    self.score_cache.set_list_scores(reranker_key, model_id, query, documents, scores)
+                return scores
+            
+            # No async transport for this reranker - keep the event loop free
+            loop = asyncio.get_running_loop()
+            return await loop.run_in_executor(None, self.get_rerank_scores, query, documents, reranker_key)
         except Exception as e:
-            logger.error(f"[RERANKER-MGR] MedCPT scoring error: {e}")
+            logger.error(f"[RERANKER-MGR] Async rerank error with {reranker_key}: {e}")
             return [0.5] * len(documents)
     
+    def get_cache_stats(self) -> Dict:
+        """Reranker score cache statistics."""
+        return self.score_cache.stats()
+    
     def test_reranker(self, reranker_key: str) -> bool:
         """
         Test a specific reranker with a simple query.
@@ -316,6 +316,9 @@ class ScalableTrainingFramework:
         if chunk_metrics.processed_cases > 0:
             chunk_metrics.average_confidence /= chunk_metrics.processed_cases
         
+        # Persist this chunk's buffered training results
+        self.db_manager.flush_writes()
+        
         # Memory cleanup
         del nlp_processor, semantic_parser, nhs_engine
         gc.collect()
@@ -328,18 +331,17 @@ class ScalableTrainingFramework:
                             actual_output: str, confidence: float, 
                             processing_time: float, success: bool, 
                             chunk_number: int, error_message: str = None):
-        """Store individual training result in database."""
-        with self.db_manager.get_connection() as conn:
-            conn.execute("""
-                INSERT INTO training_results 
-                (session_id, input_exam, expected_output, actual_output, 
-                 confidence, processing_time, success, error_message, chunk_number)
-                VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)
-            """, (
-                self.training_session_id, input_exam, expected_output, 
-                actual_output, confidence, processing_time, success, 
-                error_message, chunk_number
-            ))
+        """Queue individual training result for a batched database write."""
+        self.db_manager.buffer_write("""
+            INSERT INTO training_results 
+            (session_id, input_exam, expected_output, actual_output, 
+             confidence, processing_time, success, error_message, chunk_number)
+            VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)
+        """, (
+            self.training_session_id, input_exam, expected_output, 
+            actual_output, confidence, processing_time, success, 
+            error_message, chunk_number
+        ))
     
     def create_checkpoint(self, chunk_number: int, cumulative_metrics: TrainingMetrics):
         """Create a training checkpoint."""
@@ -552,6 +554,7 @@ class ScalableTrainingFramework:
     
     def fail_training_session(self, error_message: str):
         """Mark training session as failed."""
+        self.db_manager.flush_writes()
         with self.db_manager.get_connection() as conn:
             conn.execute("""
                 UPDATE training_sessions 
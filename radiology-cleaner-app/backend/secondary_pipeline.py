@@ -8,8 +8,8 @@ import asyncio
 import json
 import logging
 import re
-from typing import Dict, List, Optional, Any
-from dataclasses import dataclass, asdict
+from typing import AsyncIterator, Callable, Dict, List, Optional, Any, Union
+from dataclasses import dataclass, asdict, field
 from enum import Enum
 import statistics
 import openai
@@ -17,11 +17,22 @@ from datetime import datetime
 import os
 import yaml
 import threading
+from collections import deque
+from rate_limiter import get_rate_limiter, estimate_tokens, parse_retry_after
+from deadline import timeout_for, expired as deadline_expired
+from llm_usage import record_llm_usage, budget_exhausted
+from ensemble_cache import EnsembleResultCache
+from candidate_encoding import select_candidates, encode_candidates, resolve_candidate_id, encoding_savings
+from async_runtime import get_async_runtime
+from async_http import get_async_pipeline_config
 
 # Configure logging
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
+# Calls whose candidates are kept for estimating the pretty-JSON baseline in candidate_encoding_stats()
+ENCODING_SAMPLE_SIZE = 100
+
 # Global cache for shared secondary pipeline instance
 _shared_secondary_pipeline = None
 _shared_config = None
@@ -71,7 +82,8 @@ def reset_shared_secondary_pipeline():
             # Close the existing client if it has one
             try:
                 if hasattr(_shared_secondary_pipeline, 'ensemble') and hasattr(_shared_secondary_pipeline.ensemble, 'client'):
-                    asyncio.create_task(_shared_secondary_pipeline.ensemble.client.close())
+                    # The client's pool lives on the background loop; close it there
+                    get_async_runtime().submit(_shared_secondary_pipeline.ensemble.aclose())
             except Exception as e:
                 logger.warning(f"Error closing existing secondary pipeline client: {e}")
             
@@ -79,6 +91,14 @@ def reset_shared_secondary_pipeline():
         _shared_config = None
         logger.info("Shared SecondaryPipeline instance reset successfully")
 
+async def _iterate(items: List[Dict]) -> AsyncIterator[Dict]:
+    for item in items:
+        yield item
+
+def _settle(on_settled: Optional[Callable[[Dict], None]], result: Dict):
+    if on_settled is not None:
+        on_settled(result)
+
 class ModelType(Enum):
     """Available OpenRouter models for ensemble processing"""
     CLAUDE_OPUS = "anthropic/claude-opus-4.1"
@@ -95,6 +115,9 @@ class ModelResponse:
     reasoning: str
     raw_response: str
     processing_time: float
+    prompt_tokens: int = 0
+    completion_tokens: int = 0
+    cached_prompt_tokens: int = 0
 
 @dataclass
 class EnsembleResult:
@@ -109,6 +132,8 @@ class EnsembleResult:
     final_reasoning: str
     improved: bool
     timestamp: str
+    cached: bool = False
+    unanswered_models: List[str] = field(default_factory=list)
 
     def to_dict(self) -> Dict[str, Any]:
         """Convert dataclass to dictionary"""
@@ -126,12 +151,18 @@ class OpenRouterEnsemble:
         if not self.api_key:
             raise ValueError("OPENROUTER_API_KEY environment variable not set.")
 
-        # Create a custom httpx client without the proxies argument
-        httpx_client = httpx.AsyncClient()
+        # Create a custom httpx client without the proxies argument. All ensemble calls run on the
+        # worker's background loop (async_runtime.py), so its connection pool is reused across exams.
+        pipeline_config = get_async_pipeline_config()
+        httpx_client = httpx.AsyncClient(limits=httpx.Limits(
+            max_connections=pipeline_config.get('max_connections', 64),
+            max_keepalive_connections=pipeline_config.get('max_keepalive_connections', 32),
+        ))
 
         self.client = openai.AsyncOpenAI(
             api_key=self.api_key,
-            base_url="https://openrouter.ai/api/v1",
+            # OPENROUTER_BASE_URL points the ensemble at another endpoint (e.g. the offline benchmark stub)
+            base_url=os.getenv('OPENROUTER_BASE_URL') or self.config.get('base_url', 'https://openrouter.ai/api/v1'),
             http_client=httpx_client
         )
         
@@ -140,25 +171,81 @@ class OpenRouterEnsemble:
             ModelType.GPT4.value, 
             ModelType.CLAUDE_OPUS.value
         ])
-    
-    async def query_model(self, model: str, exam_name: str, context: Dict) -> ModelResponse:
-        """Query a single model for exam classification using forced tool-use (function calling)."""
-        start_time = asyncio.get_event_loop().time()
-        
-        # The user prompt is now much simpler. It only provides the raw data.
-        # The complex instructions are now part of the tool definition.
-        user_prompt = f"Please analyze the following radiology exam and select the best match from the candidates.\n\nInput Exam: `{exam_name}`\n\nCandidate Procedures:\n{json.dumps(context.get('similar_exams', [])[:10], indent=2)}"
-        
-        system_prompt = self.config.get('system_prompt', '') # The original system prompt is fine.
+        # Quorum mode: finalize once enough models agree instead of waiting for the slowest
+        self.quorum_config = self.config.get('quorum', {}) or {}
+        # Candidate encoding and per-model candidate token budgets (see candidate_encoding.py)
+        self.candidate_config = self.config.get('candidates', {}) or {}
+        self.candidate_encoding = self.candidate_config.get('encoding', 'compact')
+        self._encoding_stats = {'calls': 0, 'candidates': 0, 'encoded_tokens': 0}
+        # Recent (candidates, encoded tokens) pairs; the JSON baseline is only serialised when stats are read
+        self._encoding_sample = deque(maxlen=ENCODING_SAMPLE_SIZE)
+        self._encoding_lock = threading.Lock()
+        # Static request prefix (tool schema + system prompt), built once so it is byte-identical
+        # across calls and providers can serve it from their prompt cache
+        self.prompt_cache_config = self.config.get('prompt_cache', {}) or {}
+        self.system_prompt = self._build_system_prompt()
+        self.tools = self._build_tools()
+        self._tools_tokens = estimate_tokens(json.dumps(self.tools))
+        # Closed at shutdown unless aclose() runs first (e.g. reset_shared_secondary_pipeline)
+        self._runtime = get_async_runtime()
+        self._runtime.add_shutdown_hook(self.aclose)
+
+    async def aclose(self):
+        """Close the AsyncOpenAI client and its connection pool."""
+        self._runtime.remove_shutdown_hook(self.aclose)
+        await self.client.close()
+
+    def candidates_for(self, model: str, candidates: List[Dict]) -> List[Dict]:
+        """The leading candidates that fit in this model's candidate token budget."""
+        budgets = self.candidate_config.get('model_token_budgets', {}) or {}
+        return select_candidates(candidates, budgets.get(model, self.candidate_config.get('token_budget')),
+                                 self.candidate_config.get('max_candidates', 10), self.candidate_encoding)
+
+    def _record_encoding(self, candidates: List[Dict], encoded_tokens: int):
+        with self._encoding_lock:
+            self._encoding_stats['calls'] += 1
+            self._encoding_stats['candidates'] += len(candidates)
+            self._encoding_stats['encoded_tokens'] += encoded_tokens
+            if self.candidate_encoding == 'compact':
+                self._encoding_sample.append((candidates, encoded_tokens))
+
+    def candidate_encoding_stats(self) -> Dict:
+        """
+        Estimated candidate tokens sent vs the same candidates as pretty JSON, since startup.
         
-        messages = [
-            {"role": "system", "content": system_prompt},
-            {"role": "user", "content": user_prompt}
-        ]
-
-        # Define the "tool" (function) that we will force the model to call.
-        # This provides a rigid schema for the output JSON.
-        tools = [
+        For compact encoding the JSON baseline is extrapolated from the JSON/compact
+        ratio of the last ENCODING_SAMPLE_SIZE calls.
+        """
+        with self._encoding_lock:
+            stats = dict(self._encoding_stats)
+            sample = list(self._encoding_sample)
+        stats['encoding'] = self.candidate_encoding
+        if self.candidate_encoding != 'compact':
+            stats['json_tokens'] = stats['encoded_tokens']
+        else:
+            sample_json = sum(encoding_savings(candidates)['json_tokens'] for candidates, _ in sample)
+            sample_encoded = sum(encoded_tokens for _, encoded_tokens in sample)
+            stats['json_tokens'] = round(stats['encoded_tokens'] * sample_json / sample_encoded) if sample_encoded else 0
+            stats['json_sample_calls'] = len(sample)
+        stats['saved_tokens'] = stats['json_tokens'] - stats['encoded_tokens']
+        stats['saved_pct'] = round(100.0 * stats['saved_tokens'] / stats['json_tokens'], 1) if stats['json_tokens'] else 0.0
+        return stats
+    
+    def _build_system_prompt(self) -> str:
+        """Configured instructions plus the fixed task and candidate-format note (identical on every call)."""
+        task = "Analyze the input radiology exam in the user message and select the best match from its candidate procedures."
+        if self.candidate_encoding == 'compact':
+            task += (" Candidates are listed one per line as id|primary_name|snomed_fsn|score, where score is the"
+                     " primary pipeline's ranking score; answer with the chosen candidate's id.")
+        system_prompt = self.config.get('system_prompt', '')
+        return f"{system_prompt.rstrip()}\n\n{task}" if system_prompt else task
+
+    def _build_tools(self) -> List[Dict]:
+        """The select_best_match tool schema forced on every call."""
+        # Compact candidates are answered by their short id (C1, C2, ...)
+        id_description = ("The id (e.g. C1) of the chosen candidate" if self.candidate_encoding == 'compact'
+                          else "The SNOMED ID of the chosen procedure")
+        return [
             {
                 "type": "function",
                 "function": {
@@ -169,7 +256,7 @@ class OpenRouterEnsemble:
                         "properties": {
                             "best_match_snomed_id": {
                                 "type": ["string", "null"],
-                                "description": "The SNOMED ID of the chosen procedure. Use null if no suitable match is found."
+                                "description": f"{id_description}. Use null if no suitable match is found."
                             },
                             "best_match_procedure_name": {
                                 "type": ["string", "null"],
@@ -190,17 +277,65 @@ class OpenRouterEnsemble:
             }
         ]
 
+    def _uses_cache_control(self, model: str) -> bool:
+        if not self.prompt_cache_config.get('enabled', True):
+            return False
+        return any(model.startswith(prefix) for prefix in self.prompt_cache_config.get('cache_control_models', ['anthropic/']) or [])
+
+    def _system_message(self, model: str) -> Dict:
+        """System message, with a cache breakpoint after it for models that need explicit cache_control."""
+        if self._uses_cache_control(model):
+            return {"role": "system", "content": [
+                {"type": "text", "text": self.system_prompt, "cache_control": {"type": "ephemeral"}}
+            ]}
+        return {"role": "system", "content": self.system_prompt}
+    
+    async def query_model(self, model: str, exam_name: str, context: Dict) -> ModelResponse:
+        """Query a single model for exam classification using forced tool-use (function calling)."""
+        start_time = asyncio.get_event_loop().time()
+        
+        # Tools + system message are the same bytes on every call (a cacheable prefix);
+        # only the user message varies: the exam and its candidates.
+        candidates = self.candidates_for(model, context.get('similar_exams', []))
+        candidates_text, id_map = encode_candidates(candidates, self.candidate_encoding)
+        self._record_encoding(candidates, estimate_tokens(candidates_text))
+        user_prompt = f"Input Exam: `{exam_name}`\n\nCandidate Procedures:\n{candidates_text}"
+        
+        messages = [
+            self._system_message(model),
+            {"role": "user", "content": user_prompt}
+        ]
+
+        # Runs in the caller's lane: inline /parse_enhanced adjudication is interactive, batch passes are not
+        max_tokens = self.config.get('max_tokens', 800)
+        rate_limiter = get_rate_limiter('openrouter', model)
+        estimated_tokens = estimate_tokens(self.system_prompt + user_prompt) + self._tools_tokens + max_tokens
+
         try:
-            response = await self.client.chat.completions.create(
-                model=model,
-                messages=messages,
-                tools=tools,
-                tool_choice={"type": "function", "function": {"name": "select_best_match"}}, # This FORCES the model to use our function.
-                temperature=self.config.get('temperature', 0.0),
-                max_tokens=self.config.get('max_tokens', 800) # Give a bit more room for tool use
-            )
+            if deadline_expired():
+                raise TimeoutError(f"Request deadline passed before querying {model}")
+            if budget_exhausted():
+                raise RuntimeError(f"Batch LLM budget exhausted; not querying {model}")
+            if not await rate_limiter.acquire_async(tokens=estimated_tokens):
+                raise RuntimeError(f"Timed out waiting for OpenRouter rate-limit quota for {model}")
+
+            try:
+                response = await self.client.chat.completions.create(
+                    model=model,
+                    messages=messages,
+                    tools=self.tools,
+                    tool_choice={"type": "function", "function": {"name": "select_best_match"}}, # This FORCES the model to use our function.
+                    temperature=self.config.get('temperature', 0.0),
+                    max_tokens=max_tokens, # Give a bit more room for tool use
+                    timeout=timeout_for(self.config.get('request_timeout', 60))
+                )
+            except openai.RateLimitError as e:
+                rate_limiter.pause(parse_retry_after(getattr(e.response, 'headers', None)))
+                raise
             
             processing_time = asyncio.get_event_loop().time() - start_time
+            rate_limiter.record_usage(estimated_tokens, getattr(response.usage, 'total_tokens', None))
+            usage = record_llm_usage(model, 'ensemble', response.usage, processing_time)
             
             # The JSON is now in a different place in the response object
             if not response.choices or not response.choices[0].message.tool_calls:
@@ -215,12 +350,15 @@ class OpenRouterEnsemble:
 
             return ModelResponse(
                 model=model,
-                best_match_snomed_id=parsed.get('best_match_snomed_id'),
+                best_match_snomed_id=resolve_candidate_id(parsed.get('best_match_snomed_id'), id_map),
                 best_match_procedure_name=parsed.get('best_match_procedure_name'),
                 confidence=float(parsed.get('confidence', 0.0)),
                 reasoning=parsed.get('reasoning', 'No reasoning provided'),
                 raw_response=content,
-                processing_time=processing_time
+                processing_time=processing_time,
+                prompt_tokens=usage['prompt_tokens'],
+                completion_tokens=usage['completion_tokens'],
+                cached_prompt_tokens=usage['cached_prompt_tokens']
             )
             
         except Exception as e:
@@ -269,9 +407,13 @@ class OpenRouterEnsemble:
             return {'best_match_snomed_id': None, 'best_match_procedure_name': None, 'confidence': 0.0, 'reasoning': f'Failed to parse response: {str(e)}'}
     
     async def process_ensemble(self, exam_name: str, context: Dict) -> EnsembleResult:
-        """Process exam through all models and generate ensemble result"""
-        tasks = [self.query_model(model, exam_name, context) for model in self.models]
-        model_responses = await asyncio.gather(*tasks)
+        """Process exam through all models (or until a quorum agrees) and generate ensemble result"""
+        if self.quorum_config.get('enabled', False):
+            model_responses, unanswered_models = await self._query_until_quorum(exam_name, context)
+        else:
+            tasks = [self.query_model(model, exam_name, context) for model in self.models]
+            model_responses = await asyncio.gather(*tasks)
+            unanswered_models = []
         
         consensus_result = self._calculate_consensus(model_responses, context.get('similar_exams', []))
         
@@ -288,9 +430,56 @@ class OpenRouterEnsemble:
             agreement_score=consensus_result['agreement_score'],
             final_reasoning=consensus_result['reasoning'],
             improved=improved,
-            timestamp=datetime.now().isoformat()
+            timestamp=datetime.now().isoformat(),
+            unanswered_models=unanswered_models
         )
     
+    async def _query_until_quorum(self, exam_name: str, context: Dict):
+        """
+        Query all models concurrently, consuming responses as they complete, and stop
+        as soon as `min_agreement` models have picked the same SNOMED id.
+        
+        Outstanding calls are cancelled, or with `outstanding: log` left to finish
+        and only logged (they no longer affect the result).
+        
+        Returns:
+            (responses received so far, models whose responses were not waited for)
+        """
+        quorum = self.quorum_config.get('min_agreement') or len(self.models) // 2 + 1
+        tasks = {asyncio.ensure_future(self.query_model(model, exam_name, context)): model for model in self.models}
+        responses = []
+        votes = {}
+        for next_done in asyncio.as_completed(list(tasks)):
+            response = await next_done
+            responses.append(response)
+            if response.best_match_snomed_id is None:
+                continue
+            snomed_id = str(response.best_match_snomed_id)
+            votes[snomed_id] = votes.get(snomed_id, 0) + 1
+            if votes[snomed_id] >= quorum:
+                break
+
+        outstanding = [task for task in tasks if not task.done()]
+        if not outstanding:
+            return responses, []
+        unanswered_models = [tasks[task] for task in outstanding]
+        if self.quorum_config.get('outstanding', 'cancel') == 'log':
+            for task in outstanding:
+                task.add_done_callback(lambda t, exam=exam_name: self._log_late_response(exam, t))
+        else:
+            for task in outstanding:
+                task.cancel()
+        logger.info(f"Quorum of {quorum} reached for '{exam_name}'; not waiting for {', '.join(unanswered_models)}")
+        return responses, unanswered_models
+
+    @staticmethod
+    def _log_late_response(exam_name: str, task: asyncio.Task):
+        if task.cancelled() or task.exception() is not None:
+            return
+        response = task.result()
+        logger.info(f"Late response for '{exam_name}' from {response.model} (after quorum): "
+                    f"SNOMED {response.best_match_snomed_id}, confidence {response.confidence:.2f}")
+    
     def _calculate_consensus(self, responses: List[ModelResponse], candidates: List[Dict]) -> Dict:
         """Calculate consensus based on the selected best match SNOMED ID."""
         valid_responses = [r for r in responses if r.best_match_snomed_id is not None]
@@ -335,6 +524,11 @@ class SecondaryPipeline:
     def __init__(self, preloaded_config=None):
         self.config = preloaded_config if preloaded_config is not None else self._load_config()
         self.ensemble = OpenRouterEnsemble(config=self.config)
+        cache_config = self.config.get('secondary_pipeline', {}).get('result_cache', {}) or {}
+        self.result_cache = EnsembleResultCache(
+            ttl_seconds=cache_config.get('ttl_seconds', 2592000),
+            enabled=cache_config.get('enabled', True),
+        )
         
     def _load_config(self) -> Dict:
         """Load configuration, preferring R2 but falling back to local file."""
@@ -359,32 +553,131 @@ class SecondaryPipeline:
                 return {}
 
     async def process_low_confidence_results(self, results: List[Dict]) -> List[EnsembleResult]:
-        """Process list of low-confidence results through ensemble"""
-        low_confidence = results
-        logger.info(f"Processing {len(low_confidence)} low-confidence results")
-        if not low_confidence:
-            return []
-
-        ensemble_results = []
-        batch_size = self.config.get('secondary_pipeline', {}).get('max_concurrent_requests', 5)
-
-        for i in range(0, len(low_confidence), batch_size):
-            batch = low_confidence[i:i + batch_size]
-            tasks = []
-            for result in batch:
-                output_data = result.get('output', {})
-                context = {
-                    'original_confidence': output_data.get('components', {}).get('confidence', 0.0),
-                    'similar_exams': output_data.get('all_candidates', []),
-                    'original_result': result
-                }
-                tasks.append(self.ensemble.process_ensemble(output_data.get('exam_name', 'Unknown'), context))
+        """Process list of low-confidence results through ensemble, reusing cached adjudications"""
+        return [ensemble_result async for ensemble_result in self.stream_low_confidence_results(results)]
 
-            batch_results = await asyncio.gather(*tasks)
-            ensemble_results.extend(batch_results)
-            logger.info(f"Completed batch {i//batch_size + 1}/{(len(low_confidence) - 1) // batch_size + 1}")
-
-        return ensemble_results
+    async def stream_low_confidence_results(self, results: Union[List[Dict], AsyncIterator[Dict]],
+                                            on_settled: Optional[Callable[[Dict], None]] = None) -> AsyncIterator[EnsembleResult]:
+        """
+        Yield EnsembleResults as they complete.
+        
+        `results` is a list, or an async iterator that keeps producing results while
+        earlier ones are adjudicated (e.g. a queue fed by the primary batch). Cached
+        adjudications are yielded immediately. Up to max_concurrent_requests exams
+        are adjudicated at once, and a new one starts as soon as any finishes, so a
+        slow exam holds one slot rather than a whole group. Callers can persist
+        each result as it arrives; closing the iterator early cancels the exams
+        still in flight. on_settled(result) is called once for every result taken
+        from `results` when it leaves the stream: adjudicated, served from cache,
+        skipped or cancelled.
+        """
+        if isinstance(results, list):
+            logger.info(f"Processing {len(results)} low-confidence results")
+            source = _iterate(results)
+        else:
+            source = results
+
+        max_in_flight = max(1, self.config.get('secondary_pipeline', {}).get('max_concurrent_requests', 5))
+        in_flight = {}
+        fetch = None
+        source_done = False
+        received = cache_hits = completed = skipped = 0
+        try:
+            while True:
+                # Only pull the next result while a slot is free
+                if fetch is None and not source_done and len(in_flight) < max_in_flight:
+                    fetch = asyncio.ensure_future(source.__anext__())
+                waiting = set(in_flight) | ({fetch} if fetch else set())
+                if not waiting:
+                    break
+
+                done, _ = await asyncio.wait(waiting, return_when=asyncio.FIRST_COMPLETED)
+                if fetch in done:
+                    try:
+                        result = fetch.result()
+                    except StopAsyncIteration:
+                        source_done = True
+                        result = None
+                    fetch = None
+                    if result is not None:
+                        received += 1
+                        exam_name, context = self._build_context(result)
+                        cache_key = self._result_cache_key(exam_name, context)
+                        cached_entry = self.result_cache.get(cache_key)
+                        if cached_entry is not None:
+                            cache_hits += 1
+                            _settle(on_settled, result)
+                            yield self._result_from_cache(cached_entry, context)
+                        elif skipped or budget_exhausted():
+                            skipped += 1
+                            _settle(on_settled, result)
+                        else:
+                            in_flight[asyncio.ensure_future(self.ensemble.process_ensemble(exam_name, context))] = (cache_key, result)
+
+                for task in done:
+                    if task not in in_flight:
+                        continue
+                    cache_key, result = in_flight.pop(task)
+                    try:
+                        ensemble_result = task.result()
+                    finally:
+                        _settle(on_settled, result)
+                    self._store_in_cache(cache_key, ensemble_result)
+                    completed += 1
+                    yield ensemble_result
+                    if completed % 10 == 0:
+                        logger.info(f"Adjudicated {completed} results ({len(in_flight)} in flight)")
+        finally:
+            for task, (_, result) in in_flight.items():
+                task.cancel()
+                _settle(on_settled, result)
+            if fetch is not None:
+                fetch.cancel()
+
+        logger.info(f"Secondary pipeline: {received} results, {cache_hits} cached adjudications, {completed} adjudicated")
+        if skipped:
+            logger.warning(f"Batch LLM budget exhausted; left {skipped} results unadjudicated")
+
+    @staticmethod
+    def _build_context(result: Dict):
+        """Exam name and ensemble context for one primary result."""
+        output_data = result.get('output', {})
+        context = {
+            'original_confidence': output_data.get('components', {}).get('confidence', 0.0),
+            'similar_exams': output_data.get('all_candidates', []),
+            'original_result': result
+        }
+        return output_data.get('exam_name', 'Unknown'), context
+
+    def _result_cache_key(self, exam_name: str, context: Dict) -> str:
+        # Only the candidates actually shown to the models (see query_model) are part of the key
+        shown = max((self.ensemble.candidates_for(model, context.get('similar_exams', [])) for model in self.ensemble.models),
+                    key=len, default=[])
+        candidate_ids = [c.get('snomed_id') for c in shown]
+        return self.result_cache.make_key(exam_name, candidate_ids, self.ensemble.models, self.ensemble.system_prompt)
+
+    def _store_in_cache(self, cache_key: str, ensemble_result: EnsembleResult):
+        """Cache an adjudication unless a model call failed (a retry may do better)."""
+        if not all(r.raw_response for r in ensemble_result.model_responses):
+            return
+        entry = ensemble_result.to_dict()
+        entry.pop('original_result', None)
+        entry.pop('cached', None)
+        try:
+            self.result_cache.set(cache_key, entry)
+        except Exception as e:
+            logger.warning(f"Failed to cache ensemble result: {e}")
+
+    @staticmethod
+    def _result_from_cache(entry: Dict, context: Dict) -> EnsembleResult:
+        """Rebuild a cached adjudication around the current primary result."""
+        fields = dict(entry)
+        fields['model_responses'] = [ModelResponse(**r) for r in fields.get('model_responses', [])]
+        fields['original_result'] = context.get('original_result', {})
+        # Improvement is judged against this run's primary confidence, not the cached run's
+        fields['improved'] = fields['consensus_confidence'] > context.get('original_confidence', 0.0)
+        fields['cached'] = True
+        return EnsembleResult(**fields)
     
     def save_results(self, results: List[EnsembleResult], output_path: str = None):
         """Save ensemble results to file"""
@@ -396,6 +689,11 @@ class SecondaryPipeline:
         
         logger.info(f"Results saved to {path}")
     
+    def append_result(self, result: EnsembleResult, output_path: str):
+        """Append one ensemble result to a JSONL file (for incremental persistence while streaming)"""
+        with open(output_path, 'a', encoding='utf-8') as f:
+            f.write(json.dumps(result.to_dict()) + '\n')
+    
     def generate_improvement_report(self, results: List[EnsembleResult]) -> Dict:
         """Generate report on improvements achieved"""
         if not results:
@@ -411,6 +709,7 @@ class SecondaryPipeline:
         new_avg_confidence = statistics.mean(new_confidences) if new_confidences else 0.0
         
         high_agreement = sum(1 for r in results if r.agreement_score >= 0.67)
+        cache_hits = sum(1 for r in results if r.cached)
         
         return {
             'total_processed': total_count,
@@ -420,7 +719,8 @@ class SecondaryPipeline:
             'new_avg_confidence': new_avg_confidence,
             'confidence_improvement': new_avg_confidence - original_avg_confidence,
             'high_agreement_results': high_agreement,
-            'high_agreement_rate': high_agreement / total_count if total_count > 0 else 0
+            'high_agreement_rate': high_agreement / total_count if total_count > 0 else 0,
+            'cache_hits': cache_hits
         }
 
 
@@ -472,7 +772,12 @@ async def run_secondary_pipeline(primary_results_file: str):
         logger.info("No low-confidence results to process.")
         return
 
-    ensemble_results = await pipeline.process_low_confidence_results(low_confidence_results)
+    # Persist each adjudication as it completes so an interrupted run keeps its partial results
+    partial_path = pipeline.config.get('secondary_pipeline', {}).get('output_path', '/tmp/secondary_pipeline_results.json') + '.partial.jsonl'
+    ensemble_results = []
+    async for ensemble_result in pipeline.stream_low_confidence_results(low_confidence_results):
+        pipeline.append_result(ensemble_result, partial_path)
+        ensemble_results.append(ensemble_result)
     
     if ensemble_results:
         pipeline.save_results(ensemble_results)
@@ -0,0 +1,256 @@
+"""
+Shared SQLite access layer.
+
+One SQLitePool per database file (see get_pool). It keeps a bounded set of
+long-lived connections configured for WAL journaling; a thread checks one out
+for the duration of a connection() block and returns it afterwards, so readers
+never block the writer, multi-threaded batch/training runs no longer serialize
+on a process-wide lock or reopen the database per operation, and short-lived
+threads (per-chunk executors, per-request Flask threads) don't each leave an
+open connection behind.
+
+High-volume inserts (training results, performance metrics, ...) go through
+buffer_write(), which groups rows by statement and writes them with
+executemany in a single transaction once `write_batch_size` rows are queued
+or `flush_interval` seconds have passed.
+"""
+
+import atexit
+import logging
+import os
+import queue
+import sqlite3
+import threading
+import time
+from collections import defaultdict
+from contextlib import contextmanager
+from typing import Callable, Dict, List, Optional, Sequence
+
+logger = logging.getLogger(__name__)
+
+# Pragmas applied to every pooled connection
+DEFAULT_PRAGMAS = {
+    'journal_mode': 'WAL',
+    'synchronous': 'NORMAL',     # Safe with WAL; fsync at checkpoint instead of every commit
+    'temp_store': 'MEMORY',
+    'cache_size': -20000,        # ~20 MB page cache per connection
+    'mmap_size': 134217728,      # 128 MB memory-mapped I/O
+    'busy_timeout': 30000,       # Wait up to 30s for the write lock instead of failing
+}
+
+
+class SQLitePool:
+    """Bounded pool of WAL connections plus a batched write buffer for one database file."""
+
+    def __init__(self, db_path: str, pragmas: Optional[Dict] = None,
+                 write_batch_size: int = 200, flush_interval: float = 2.0,
+                 max_connections: int = 8):
+        self.db_path = db_path
+        self.pragmas = {**DEFAULT_PRAGMAS, **(pragmas or {})}
+        self.write_batch_size = write_batch_size
+        self.flush_interval = flush_interval
+        self.max_connections = max(1, max_connections)
+
+        self._local = threading.local()
+        self._idle: queue.LifoQueue = queue.LifoQueue()
+        self._connections: List[sqlite3.Connection] = []
+        self._connections_lock = threading.Lock()
+        # Per-connection setup registered by pool users (e.g. pragmas only one module needs);
+        # _hooks_applied counts how many hooks each connection has run
+        self._hooks: List[Callable[[sqlite3.Connection], None]] = []
+        self._hooks_applied: Dict[sqlite3.Connection, int] = {}
+
+        self._buffer: Dict[str, List[Sequence]] = defaultdict(list)
+        self._buffered_rows = 0
+        self._buffer_lock = threading.Lock()
+        self._flush_lock = threading.Lock()
+        self._last_flush = time.time()
+
+        self._stop_event = threading.Event()
+        self._flusher = threading.Thread(target=self._flush_loop, name=f"sqlite-flush-{os.path.basename(db_path)}", daemon=True)
+        self._flusher.start()
+
+    # ------------------------------------------------------------------
+    # Connections
+    # ------------------------------------------------------------------
+
+    def add_connection_hook(self, hook: Callable[[sqlite3.Connection], None]):
+        """Run hook(conn) once on every pooled connection (existing ones on their next checkout)."""
+        with self._connections_lock:
+            if hook not in self._hooks:
+                self._hooks.append(hook)
+
+    def _open_connection(self) -> sqlite3.Connection:
+        conn = sqlite3.connect(self.db_path, timeout=self.pragmas['busy_timeout'] / 1000.0, check_same_thread=False)
+        conn.row_factory = sqlite3.Row
+        for name, value in self.pragmas.items():
+            conn.execute(f'PRAGMA {name} = {value}')
+        return conn
+
+    def _checkout(self) -> sqlite3.Connection:
+        """Take an idle connection, open a new one below max_connections, or wait for one."""
+        try:
+            conn = self._idle.get_nowait()
+        except queue.Empty:
+            conn = None
+            with self._connections_lock:
+                if len(self._connections) < self.max_connections:
+                    conn = self._open_connection()
+                    self._connections.append(conn)
+                    self._hooks_applied[conn] = 0
+            if conn is None:
+                try:
+                    conn = self._idle.get(timeout=self.pragmas['busy_timeout'] / 1000.0)
+                except queue.Empty:
+                    raise sqlite3.OperationalError(
+                        f"No pooled connection to {self.db_path} became free "
+                        f"({self.max_connections} in use)") from None
+        with self._connections_lock:
+            pending_hooks = self._hooks[self._hooks_applied.get(conn, 0):]
+            self._hooks_applied[conn] = len(self._hooks)
+        for hook in pending_hooks:
+            hook(conn)
+        return conn
+
+    def _return(self, conn: sqlite3.Connection):
+        with self._connections_lock:
+            pooled = conn in self._hooks_applied
+        if pooled:
+            self._idle.put(conn)
+        else:
+            # The pool was closed while this connection was checked out
+            conn.close()
+
+    @contextmanager
+    def connection(self):
+        """
+        Check out a pooled connection for the duration of the block, inside a transaction.
+
+        Nested use on the same thread shares the outer block's connection and
+        transaction; only the outermost block commits (or rolls back on error)
+        and returns the connection to the pool.
+        """
+        conn = getattr(self._local, 'conn', None)
+        outermost = conn is None
+        if outermost:
+            conn = self._checkout()
+            self._local.conn = conn
+        try:
+            yield conn
+            if outermost:
+                conn.commit()
+        except Exception:
+            if outermost:
+                conn.rollback()
+            raise
+        finally:
+            if outermost:
+                self._local.conn = None
+                self._return(conn)
+
+    def connection_count(self) -> int:
+        """Connections currently open (idle or checked out)."""
+        with self._connections_lock:
+            return len(self._connections)
+
+    # ------------------------------------------------------------------
+    # Batched writes
+    # ------------------------------------------------------------------
+
+    def buffer_write(self, sql: str, params: Sequence):
+        """Queue a write; flushed with executemany on size or interval."""
+        with self._buffer_lock:
+            self._buffer[sql].append(tuple(params))
+            self._buffered_rows += 1
+            should_flush = (self._buffered_rows >= self.write_batch_size or
+                            time.time() - self._last_flush >= self.flush_interval)
+        if should_flush:
+            self.flush()
+
+    def flush(self) -> int:
+        """Write all buffered rows in one transaction; returns the number of rows written."""
+        with self._flush_lock:
+            with self._buffer_lock:
+                pending = self._buffer
+                rows = self._buffered_rows
+                self._buffer = defaultdict(list)
+                self._buffered_rows = 0
+                self._last_flush = time.time()
+            if not rows:
+                return 0
+            try:
+                with self.connection() as conn:
+                    for sql, params_list in pending.items():
+                        conn.executemany(sql, params_list)
+            except sqlite3.Error as e:
+                logger.error(f"[SQLITE-POOL] Failed to flush {rows} buffered rows to {self.db_path}: {e}")
+                # Re-queue so a transient lock error doesn't lose data
+                with self._buffer_lock:
+                    for sql, params_list in pending.items():
+                        self._buffer[sql][:0] = params_list
+                    self._buffered_rows += rows
+                return 0
+            logger.debug(f"[SQLITE-POOL] Flushed {rows} buffered rows to {self.db_path}")
+            return rows
+
+    def pending_writes(self) -> int:
+        with self._buffer_lock:
+            return self._buffered_rows
+
+    def _flush_loop(self):
+        while not self._stop_event.wait(self.flush_interval):
+            if self.pending_writes():
+                try:
+                    self.flush()
+                except Exception as e:
+                    logger.error(f"[SQLITE-POOL] Background flush failed: {e}")
+
+    # ------------------------------------------------------------------
+    # Shutdown
+    # ------------------------------------------------------------------
+
+    def close(self):
+        """Flush pending writes and close every idle connection (checked-out ones close on return)."""
+        self._stop_event.set()
+        self.flush()
+        with self._connections_lock:
+            self._connections.clear()
+            self._hooks_applied.clear()
+        while True:
+            try:
+                conn = self._idle.get_nowait()
+            except queue.Empty:
+                break
+            try:
+                conn.close()
+            except sqlite3.Error:
+                pass
+
+
+# Pool registry: one pool per database file
+_pools: Dict[str, SQLitePool] = {}
+_pools_lock = threading.Lock()
+
+
+def get_pool(db_path: str, **kwargs) -> SQLitePool:
+    """Get (or create) the shared pool for a database file."""
+    key = os.path.abspath(db_path)
+    with _pools_lock:
+        pool = _pools.get(key)
+        if pool is None:
+            pool = SQLitePool(db_path, **kwargs)
+            _pools[key] = pool
+            logger.info(f"[SQLITE-POOL] Opened WAL pool for {db_path}")
+        return pool
+
+
+def close_all_pools():
+    """Flush and close every pool (registered with atexit)."""
+    with _pools_lock:
+        pools = list(_pools.values())
+        _pools.clear()
+    for pool in pools:
+        pool.close()
+
+
+atexit.register(close_all_pools)
@@ -0,0 +1,67 @@
+"""
+Batch string similarity helpers.
+
+Scores one query against many candidate strings in a single call. When
+rapidfuzz is installed the whole candidate array is scored natively via
+``process.cdist``; otherwise we fall back to a per-candidate fuzzywuzzy loop
+so results stay available (just slower).
+
+Candidates are expected to be pre-normalized with ``normalize_for_similarity``
+(the NHS catalog does this once at load time) so the hot path never re-lowercases
+or re-strips catalog names.
+"""
+
+import logging
+from typing import List, Sequence
+
+logger = logging.getLogger(__name__)
+
+try:
+    from rapidfuzz import fuzz as _rf_fuzz, process as _rf_process
+    RAPIDFUZZ_AVAILABLE = True
+except ImportError:
+    from fuzzywuzzy import fuzz as _fw_fuzz
+    RAPIDFUZZ_AVAILABLE = False
+    logger.warning("[SIMILARITY] rapidfuzz not installed - falling back to per-candidate fuzzywuzzy scoring")
+
+
+def normalize_for_similarity(text: str) -> str:
+    """Normalize a string the same way for queries and catalog names."""
+    return (text or '').lower().strip()
+
+
+def batch_ratio(query: str, choices: Sequence[str], normalized: bool = False) -> List[float]:
+    """
+    Levenshtein ratio of ``query`` against every string in ``choices``.
+
+    Args:
+        query: Query string
+        choices: Candidate strings
+        normalized: True if both query and choices are already normalized
+
+    Returns:
+        List of similarity scores between 0.0 and 1.0, aligned with ``choices``.
+        Empty strings always score 0.0.
+    """
+    if not choices:
+        return []
+    if not normalized:
+        query = normalize_for_similarity(query)
+        choices = [normalize_for_similarity(c) for c in choices]
+    if not query:
+        return [0.0] * len(choices)
+
+    if RAPIDFUZZ_AVAILABLE:
+        matrix = _rf_process.cdist([query], choices, scorer=_rf_fuzz.ratio, processor=None)
+        scores = [float(s) / 100.0 for s in matrix[0]]
+    else:
+        scores = [_fw_fuzz.ratio(query, c) / 100.0 for c in choices]
+
+    return [score if choice else 0.0 for score, choice in zip(scores, choices)]
+
+
+def ratio(text1: str, text2: str) -> float:
+    """Single-pair convenience wrapper around ``batch_ratio``."""
+    if not text1 or not text2:
+        return 0.0
+    return batch_ratio(text1, [text2])[0]
@@ -0,0 +1,456 @@
+"""
+Unified tiered cache for the radiology cleaner backend.
+
+Tier 1 is an in-memory LRU (OrderedDict, O(1) get/set/evict) bounded by both
+entry count and approximate byte size. Tier 2 is an optional SQLite table
+that survives restarts; writes to it are buffered and flushed in batches with
+executemany so hot paths never wait on a per-row commit.
+
+Keys are namespaced and versioned via cache_version.format_cache_key, so a
+processing-rule change (new cache version) naturally invalidates old entries.
+Values must be JSON-serializable; the serialized length is used for byte
+accounting and as the tier-2 payload.
+"""
+
+import json
+import logging
+import sqlite3
+import threading
+import time
+from collections import OrderedDict, defaultdict
+from dataclasses import dataclass, asdict
+from typing import Any, Callable, Dict, List, Optional, Tuple, Union
+
+from cache_version import format_cache_key
+from sqlite_pool import get_pool
+
+logger = logging.getLogger(__name__)
+
+_MISSING = object()
+
+
+@dataclass
+class NamespaceStats:
+    """Hit/miss/eviction counters for one cache namespace."""
+    hits: int = 0
+    misses: int = 0
+    sqlite_hits: int = 0
+    sets: int = 0
+    evictions: int = 0
+    expirations: int = 0
+    entries: int = 0
+    bytes: int = 0
+
+    def to_dict(self) -> Dict[str, Any]:
+        data = asdict(self)
+        lookups = self.hits + self.misses
+        data['hit_rate'] = self.hits / lookups if lookups else 0.0
+        return data
+
+
+class SQLiteCacheTier:
+    """
+    Persistent second tier stored in a `cache_entries` table.
+
+    Writes go to an in-memory buffer that is flushed with executemany when it
+    reaches `batch_size` entries or `flush_interval` seconds have passed.
+    """
+
+    def __init__(self, db_path: str, batch_size: int = 100, flush_interval: float = 5.0):
+        self.db_path = db_path
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.lock = threading.RLock()
+        self._pending: Dict[str, Tuple[str, str, Optional[float]]] = {}
+        self._last_flush = time.time()
+        self.pool = get_pool(db_path)
+        with self.pool.connection() as conn:
+            conn.execute('''
+                CREATE TABLE IF NOT EXISTS cache_entries (
+                    cache_key TEXT PRIMARY KEY,
+                    namespace TEXT NOT NULL,
+                    value TEXT NOT NULL,
+                    expires_at REAL,
+                    created_at REAL NOT NULL
+                )
+            ''')
+            conn.execute('CREATE INDEX IF NOT EXISTS idx_cache_entries_namespace ON cache_entries(namespace)')
+            conn.execute('CREATE INDEX IF NOT EXISTS idx_cache_entries_expires ON cache_entries(expires_at)')
+
+    def get(self, cache_key: str) -> Optional[Tuple[str, Optional[float]]]:
+        """Return (serialized value, expires_at) or None; pending writes are visible."""
+        with self.lock:
+            pending = self._pending.get(cache_key)
+            if pending is not None:
+                return pending[1], pending[2]
+        with self.pool.connection() as conn:
+            row = conn.execute(
+                'SELECT value, expires_at FROM cache_entries WHERE cache_key = ?', (cache_key,)
+            ).fetchone()
+        return (row[0], row[1]) if row else None
+
+    def set(self, cache_key: str, namespace: str, serialized: str, expires_at: Optional[float]):
+        with self.lock:
+            self._pending[cache_key] = (namespace, serialized, expires_at)
+            if len(self._pending) >= self.batch_size or time.time() - self._last_flush >= self.flush_interval:
+                self.flush()
+
+    def delete(self, cache_key: str):
+        with self.lock:
+            self._pending.pop(cache_key, None)
+            with self.pool.connection() as conn:
+                conn.execute('DELETE FROM cache_entries WHERE cache_key = ?', (cache_key,))
+
+    def flush(self) -> int:
+        """Write buffered entries in one transaction; returns the number written."""
+        with self.lock:
+            if not self._pending:
+                self._last_flush = time.time()
+                return 0
+            now = time.time()
+            rows = [(key, ns, value, expires_at, now) for key, (ns, value, expires_at) in self._pending.items()]
+            try:
+                with self.pool.connection() as conn:
+                    conn.executemany('''
+                        INSERT OR REPLACE INTO cache_entries (cache_key, namespace, value, expires_at, created_at)
+                        VALUES (?, ?, ?, ?, ?)
+                    ''', rows)
+            except sqlite3.Error as e:
+                logger.error(f"[CACHE] Failed to flush {len(rows)} entries to SQLite tier: {e}")
+                return 0
+            self._pending.clear()
+            self._last_flush = now
+            return len(rows)
+
+    def clear(self, namespace: Optional[str] = None):
+        with self.lock:
+            if namespace is None:
+                self._pending.clear()
+            else:
+                self._pending = {k: v for k, v in self._pending.items() if v[0] != namespace}
+            with self.pool.connection() as conn:
+                if namespace is None:
+                    conn.execute('DELETE FROM cache_entries')
+                else:
+                    conn.execute('DELETE FROM cache_entries WHERE namespace = ?', (namespace,))
+
+    def cleanup_expired(self) -> int:
+        with self.lock:
+            self.flush()
+            with self.pool.connection() as conn:
+                cursor = conn.execute(
+                    'DELETE FROM cache_entries WHERE expires_at IS NOT NULL AND expires_at < ?', (time.time(),)
+                )
+                return cursor.rowcount
+
+    def namespace_counts(self) -> Dict[str, int]:
+        with self.lock:
+            self.flush()
+        with self.pool.connection() as conn:
+            rows = conn.execute(
+                'SELECT namespace, COUNT(*) FROM cache_entries GROUP BY namespace'
+            ).fetchall()
+        return {ns: count for ns, count in rows}
+
+    def close(self):
+        """Flush pending writes; the shared pool owns the connections."""
+        with self.lock:
+            self.flush()
+
+
+class TieredCache:
+    """
+    Namespaced, versioned LRU cache with optional SQLite persistence.
+
+    Usage:
+        cache = get_cache()
+        cache.set('rerank_scores', key, value)
+        value = cache.get('rerank_scores', key)
+    """
+
+    def __init__(self, max_entries: int = 10000, max_bytes: int = 256 * 1024 * 1024,
+                 default_ttl: Optional[float] = 86400,
+                 version: Union[str, Callable[[], str], None] = None,
+                 sqlite_tier: Optional[SQLiteCacheTier] = None,
+                 version_refresh_seconds: Optional[float] = None):
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.default_ttl = default_ttl
+        self._version_source = version
+        # The version is resolved once; None never re-resolves except via refresh_version()
+        self.version_refresh_seconds = version_refresh_seconds
+        self.sqlite_tier = sqlite_tier
+        self.lock = threading.RLock()
+        # cache_key -> (namespace, value, size_bytes, expires_at)
+        self._entries: "OrderedDict[str, Tuple[str, Any, int, Optional[float]]]" = OrderedDict()
+        self._bytes = 0
+        self._stats: Dict[str, NamespaceStats] = defaultdict(NamespaceStats)
+        self._active_version = self._resolve_version() or 'unversioned'
+        self._version_resolved_at = time.monotonic()
+
+    def _resolve_version(self) -> Optional[str]:
+        """The source's version, or None if it cannot be resolved right now."""
+        source = self._version_source
+        if callable(source):
+            try:
+                return str(source())
+            except Exception as e:
+                logger.warning(f"[CACHE] Could not resolve cache version: {e}")
+                return None
+        return str(source) if source else 'unversioned'
+
+    @property
+    def version(self) -> str:
+        """Current cache version, re-resolved at most once per version_refresh_seconds."""
+        if (self.version_refresh_seconds is not None and
+                time.monotonic() - self._version_resolved_at >= self.version_refresh_seconds):
+            with self.lock:
+                if time.monotonic() - self._version_resolved_at < self.version_refresh_seconds:
+                    return self._active_version
+                # Claim the refresh first so a failing source is retried once per interval, not per call
+                self._version_resolved_at = time.monotonic()
+            self.refresh_version()
+        return self._active_version
+
+    def refresh_version(self) -> str:
+        """
+        Re-resolve the version now; the memory tier is dropped when it changes.
+        A version that cannot be resolved keeps the current one.
+        """
+        current = self._resolve_version()
+        with self.lock:
+            self._version_resolved_at = time.monotonic()
+            if current is not None and current != self._active_version:
+                logger.info(f"[CACHE] Cache version changed from {self._active_version} to {current}, clearing memory tier")
+                self._clear_memory()
+                self._active_version = current
+            return self._active_version
+
+    def make_key(self, namespace: str, *parts: Any) -> str:
+        """Build the namespaced, versioned storage key for the given key parts."""
+        return format_cache_key(namespace, self.version, *parts)
+
+    # ------------------------------------------------------------------
+    # Core operations
+    # ------------------------------------------------------------------
+
+    def get(self, namespace: str, key: Any, default: Any = None) -> Any:
+        cache_key = self.make_key(namespace, key)
+        now = time.time()
+        with self.lock:
+            stats = self._stats[namespace]
+            entry = self._entries.get(cache_key)
+            if entry is not None:
+                _, value, _, expires_at = entry
+                if expires_at is None or expires_at > now:
+                    self._entries.move_to_end(cache_key)
+                    stats.hits += 1
+                    return value
+                self._remove(cache_key)
+                stats.expirations += 1
+
+        if self.sqlite_tier is not None:
+            stored = self.sqlite_tier.get(cache_key)
+            if stored is not None:
+                serialized, expires_at = stored
+                if expires_at is None or expires_at > now:
+                    value = json.loads(serialized)
+                    with self.lock:
+                        self._insert(cache_key, namespace, value, len(serialized), expires_at)
+                        self._stats[namespace].hits += 1
+                        self._stats[namespace].sqlite_hits += 1
+                    return value
+
+        with self.lock:
+            self._stats[namespace].misses += 1
+        return default
+
+    def set(self, namespace: str, key: Any, value: Any, ttl: Optional[float] = _MISSING,
+            persist: bool = True) -> str:
+        """
+        Store a value. ttl=None means no expiry; omitted means the default TTL.
+        persist=False keeps the entry in memory only. Returns the storage key.
+        """
+        cache_key = self.make_key(namespace, key)
+        ttl = self.default_ttl if ttl is _MISSING else ttl
+        expires_at = time.time() + ttl if ttl else None
+        serialized = json.dumps(value, default=str)
+
+        with self.lock:
+            self._insert(cache_key, namespace, value, len(serialized), expires_at)
+            self._stats[namespace].sets += 1
+
+        if persist and self.sqlite_tier is not None:
+            self.sqlite_tier.set(cache_key, namespace, serialized, expires_at)
+        return cache_key
+
+    def get_many(self, namespace: str, keys: List[Any]) -> Dict[Any, Any]:
+        """Return {key: value} for the keys that are cached."""
+        found = {}
+        for key in keys:
+            value = self.get(namespace, key, _MISSING)
+            if value is not _MISSING:
+                found[key] = value
+        return found
+
+    def set_many(self, namespace: str, items: Dict[Any, Any], ttl: Optional[float] = _MISSING,
+                 persist: bool = True):
+        for key, value in items.items():
+            self.set(namespace, key, value, ttl=ttl, persist=persist)
+
+    def delete(self, namespace: str, key: Any):
+        cache_key = self.make_key(namespace, key)
+        with self.lock:
+            if cache_key in self._entries:
+                self._remove(cache_key)
+        if self.sqlite_tier is not None:
+            self.sqlite_tier.delete(cache_key)
+
+    def clear(self, namespace: Optional[str] = None):
+        """Clear one namespace (or everything) from both tiers."""
+        with self.lock:
+            if namespace is None:
+                self._clear_memory()
+            else:
+                for cache_key in [k for k, v in self._entries.items() if v[0] == namespace]:
+                    self._remove(cache_key)
+        if self.sqlite_tier is not None:
+            self.sqlite_tier.clear(namespace)
+
+    def flush(self) -> int:
+        """Flush pending tier-2 writes."""
+        return self.sqlite_tier.flush() if self.sqlite_tier is not None else 0
+
+    def cleanup_expired(self) -> int:
+        """Drop expired entries from both tiers; returns the number removed."""
+        now = time.time()
+        removed = 0
+        with self.lock:
+            for cache_key in [k for k, v in self._entries.items() if v[3] is not None and v[3] <= now]:
+                namespace = self._entries[cache_key][0]
+                self._remove(cache_key)
+                self._stats[namespace].expirations += 1
+                removed += 1
+        if self.sqlite_tier is not None:
+            removed += self.sqlite_tier.cleanup_expired()
+        return removed
+
+    def stats(self) -> Dict[str, Any]:
+        """Overall and per-namespace statistics."""
+        with self.lock:
+            namespaces = {ns: s.to_dict() for ns, s in self._stats.items()}
+            summary = {
+                'version': self._active_version,
+                'entries': len(self._entries),
+                'max_entries': self.max_entries,
+                'bytes': self._bytes,
+                'max_bytes': self.max_bytes,
+                'usage_percent': (len(self._entries) / self.max_entries) * 100 if self.max_entries else 0,
+                'default_ttl_seconds': self.default_ttl,
+                'sqlite_tier_enabled': self.sqlite_tier is not None,
+            }
+        if self.sqlite_tier is not None:
+            for ns, count in self.sqlite_tier.namespace_counts().items():
+                namespaces.setdefault(ns, NamespaceStats().to_dict())['sqlite_entries'] = count
+        summary['namespaces'] = namespaces
+        return summary
+
+    def close(self):
+        if self.sqlite_tier is not None:
+            self.sqlite_tier.close()
+
+    # ------------------------------------------------------------------
+    # Memory-tier internals (caller holds self.lock)
+    # ------------------------------------------------------------------
+
+    def _insert(self, cache_key: str, namespace: str, value: Any, size: int, expires_at: Optional[float]):
+        if cache_key in self._entries:
+            self._remove(cache_key)
+        self._entries[cache_key] = (namespace, value, size, expires_at)
+        self._bytes += size
+        stats = self._stats[namespace]
+        stats.entries += 1
+        stats.bytes += size
+
+        while self._entries and (len(self._entries) > self.max_entries or self._bytes > self.max_bytes):
+            oldest_key = next(iter(self._entries))
+            oldest_namespace = self._entries[oldest_key][0]
+            self._remove(oldest_key)
+            self._stats[oldest_namespace].evictions += 1
+
+    def _remove(self, cache_key: str):
+        namespace, _, size, _ = self._entries.pop(cache_key)
+        self._bytes -= size
+        stats = self._stats[namespace]
+        stats.entries -= 1
+        stats.bytes -= size
+
+    def _clear_memory(self):
+        self._entries.clear()
+        self._bytes = 0
+        for stats in self._stats.values():
+            stats.entries = 0
+            stats.bytes = 0
+
+
+# Global shared cache instance
+_shared_cache = None
+_shared_cache_lock = threading.Lock()
+
+
+def get_cache() -> TieredCache:
+    """Get the process-wide cache, configured from the 'cache' config section."""
+    global _shared_cache
+    if _shared_cache is None:
+        with _shared_cache_lock:
+            if _shared_cache is None:
+                _shared_cache = _build_cache_from_config()
+    return _shared_cache
+
+
+def reset_cache():
+    """Flush and drop the shared cache (used on config reload and in tests)."""
+    global _shared_cache
+    with _shared_cache_lock:
+        if _shared_cache is not None:
+            _shared_cache.close()
+        _shared_cache = None
+
+
+def _build_cache_from_config() -> TieredCache:
+    try:
+        from config_manager import get_config
+        cache_config = get_config().get_section('cache') or {}
+    except Exception as e:
+        logger.warning(f"[CACHE] Config unavailable, using cache defaults: {e}")
+        cache_config = {}
+
+    def _version() -> str:
+        from cache_version import get_current_cache_version
+        return get_current_cache_version()
+
+    enabled = cache_config.get('enabled', True)
+    sqlite_tier = None
+    sqlite_config = cache_config.get('sqlite_tier', {}) or {}
+    if enabled and sqlite_config.get('enabled', False):
+        try:
+            sqlite_tier = SQLiteCacheTier(
+                db_path=sqlite_config.get('db_path', 'radiology_cleaner.db'),
+                batch_size=sqlite_config.get('batch_size', 100),
+                flush_interval=sqlite_config.get('flush_interval_seconds', 5.0),
+            )
+        except sqlite3.Error as e:
+            logger.error(f"[CACHE] Failed to open SQLite cache tier, continuing memory-only: {e}")
+
+    cache = TieredCache(
+        # A disabled cache keeps the same API but stores nothing
+        max_entries=cache_config.get('max_size', 10000) if enabled else 0,
+        max_bytes=int(cache_config.get('max_memory_mb', 256) * 1024 * 1024),
+        default_ttl=cache_config.get('ttl_seconds', 86400),
+        version=_version,
+        sqlite_tier=sqlite_tier,
+        version_refresh_seconds=cache_config.get('version_refresh_seconds', 3600),
+    )
+    logger.info(f"[CACHE] Initialized tiered cache (max_entries={cache.max_entries}, "
+                f"max_bytes={cache.max_bytes}, sqlite_tier={'on' if sqlite_tier else 'off'})")
+    return cache
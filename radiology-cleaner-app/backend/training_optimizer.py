@@ -15,7 +15,7 @@ from typing import Dict, List, Tuple, Optional, Any
 from pathlib import Path
 from dataclasses import dataclass, asdict
 from datetime import datetime
-import sqlite3
+from sqlite_pool import get_pool
 
 from scalable_training import ScalableTrainingFramework, TrainingConfig, TrainingMetrics
 from validation_framework import ValidationFramework
@@ -95,8 +95,9 @@ class TrainingOptimizer:
     def setup_optimization_database(self):
         """Create database tables for optimization tracking."""
         db_path = "optimization_results.db"
+        self.pool = get_pool(db_path)
         
-        with sqlite3.connect(db_path) as conn:
+        with self.pool.connection() as conn:
             conn.executescript("""
                 CREATE TABLE IF NOT EXISTS optimization_runs (
                     id INTEGER PRIMARY KEY AUTOINCREMENT,
@@ -334,23 +335,22 @@ class TrainingOptimizer:
             )
     
     def save_experiment_result(self, result: ExperimentResult, run_id: int):
-        """Save experiment result to database."""
-        with sqlite3.connect(self.db_path) as conn:
-            success_rate = (result.training_metrics.successful_matches / 
-                          result.training_metrics.processed_cases 
-                          if result.training_metrics.processed_cases > 0 else 0.0)
-            
-            conn.execute("""
-                INSERT INTO experiments 
-                (run_id, experiment_id, config_json, training_cases, success_rate, 
-                 avg_confidence, validation_score, processing_speed, memory_usage, error_message)
-                VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
-            """, (
-                run_id, result.experiment_id, json.dumps(result.config_params),
-                result.training_metrics.processed_cases, success_rate,
-                result.training_metrics.average_confidence, result.validation_score,
-                result.processing_speed, result.memory_usage, result.error_message
-            ))
+        """Queue experiment result for a batched database write."""
+        success_rate = (result.training_metrics.successful_matches / 
+                      result.training_metrics.processed_cases 
+                      if result.training_metrics.processed_cases > 0 else 0.0)
+        
+        self.pool.buffer_write("""
+            INSERT INTO experiments 
+            (run_id, experiment_id, config_json, training_cases, success_rate, 
+             avg_confidence, validation_score, processing_speed, memory_usage, error_message)
+            VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+        """, (
+            run_id, result.experiment_id, json.dumps(result.config_params),
+            result.training_metrics.processed_cases, success_rate,
+            result.training_metrics.average_confidence, result.validation_score,
+            result.processing_speed, result.memory_usage, result.error_message
+        ))
     
     def optimize(self, dataset_paths: List[str], run_name: str = None) -> ExperimentResult:
         """
@@ -369,7 +369,7 @@ class TrainingOptimizer:
         logger.info(f"Starting optimization run: {run_name}")
         
         # Create optimization run record
-        with sqlite3.connect(self.db_path) as conn:
+        with self.pool.connection() as conn:
             cursor = conn.execute("""
                 INSERT INTO optimization_runs 
                 (run_name, strategy, start_time, total_experiments)
@@ -408,8 +408,9 @@ class TrainingOptimizer:
                     logger.info(f"Early stopping: achieved threshold {self.config.early_stopping_threshold}")
                     break
             
-            # Update optimization run
-            with sqlite3.connect(self.db_path) as conn:
+            # Update optimization run (after persisting buffered experiment rows)
+            self.pool.flush()
+            with self.pool.connection() as conn:
                 conn.execute("""
                     UPDATE optimization_runs 
                     SET end_time = ?, total_experiments = ?, best_score = ?, best_config_json = ?
@@ -454,20 +455,22 @@ class TrainingOptimizer:
         # Calculate correlations
         scores_array = np.array(scores)
         
-        with sqlite3.connect(self.db_path) as conn:
-            for param_name, values in param_values.items():
-                if len(set(values)) > 1:  # Only if parameter varies
-                    values_array = np.array(values)
-                    correlation = np.corrcoef(values_array, scores_array)[0, 1]
-                    
-                    # Calculate importance as absolute correlation
-                    importance = abs(correlation) if not np.isnan(correlation) else 0.0
-                    
-                    conn.execute("""
-                        INSERT INTO parameter_importance 
-                        (run_id, parameter_name, importance_score, correlation_with_performance)
-                        VALUES (?, ?, ?, ?)
-                    """, (run_id, param_name, importance, correlation))
+        importance_rows = []
+        for param_name, values in param_values.items():
+            if len(set(values)) > 1:  # Only if parameter varies
+                values_array = np.array(values)
+                correlation = np.corrcoef(values_array, scores_array)[0, 1]
+                
+                # Calculate importance as absolute correlation
+                importance = abs(correlation) if not np.isnan(correlation) else 0.0
+                importance_rows.append((run_id, param_name, importance, correlation))
+        
+        with self.pool.connection() as conn:
+            conn.executemany("""
+                INSERT INTO parameter_importance 
+                (run_id, parameter_name, importance_score, correlation_with_performance)
+                VALUES (?, ?, ?, ?)
+            """, importance_rows)
         
         logger.info("Parameter importance analysis completed")
     
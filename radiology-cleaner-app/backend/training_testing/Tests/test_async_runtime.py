@@ -0,0 +1,124 @@
+#!/usr/bin/env python3
+"""
+Test script for the background event loop: context propagation, cancellation, shutdown hooks.
+"""
+
+import sys
+import os
+import asyncio
+import threading
+import concurrent.futures
+sys.path.append(os.path.join(os.path.dirname(__file__), '..', '..'))
+
+import secondary_pipeline
+from async_runtime import AsyncRuntime
+from deadline import request_deadline, remaining
+from rate_limiter import priority_lane, get_priority, INTERACTIVE, BATCH
+from llm_usage import UsageBudget, usage_budget, current_budget
+
+def test_task_inherits_caller_context():
+    """The submitted task sees the caller's deadline, rate-limit lane and LLM budget."""
+    runtime = AsyncRuntime(name='test-context')
+    async def snapshot():
+        return remaining(), get_priority(), current_budget()
+    try:
+        budget = UsageBudget()
+        with request_deadline(5), priority_lane(INTERACTIVE), usage_budget(budget):
+            left, lane, seen_budget = runtime.run(snapshot(), timeout=5)
+        print(f"=== task saw {left:.2f}s left, lane {lane}")
+        assert left is not None and 4 < left <= 5
+        assert lane == INTERACTIVE and seen_budget is budget
+        assert runtime.run(snapshot(), timeout=5) == (None, BATCH, None)
+    finally:
+        runtime.shutdown()
+
+def test_timeout_cancels_task():
+    """A run() that times out cancels the task on the loop."""
+    runtime = AsyncRuntime(name='test-cancel')
+    cancelled = threading.Event()
+    async def slow():
+        try:
+            await asyncio.sleep(5)
+        except asyncio.CancelledError:
+            cancelled.set()
+            raise
+    try:
+        try:
+            runtime.run(slow(), timeout=0.05)
+            assert False, "expected a timeout"
+        except concurrent.futures.TimeoutError:
+            pass
+        assert cancelled.wait(timeout=2)
+    finally:
+        runtime.shutdown()
+
+def test_run_from_loop_thread_raises():
+    """Blocking on the loop from its own thread would deadlock, so run() refuses."""
+    runtime = AsyncRuntime(name='test-reentrant')
+    async def inner():
+        return 'never'
+    async def outer():
+        return runtime.run(inner(), timeout=1)
+    try:
+        try:
+            runtime.run(outer(), timeout=5)
+            assert False, "expected RuntimeError"
+        except RuntimeError as e:
+            assert 'own loop thread' in str(e)
+    finally:
+        runtime.shutdown()
+
+def test_shutdown_runs_hooks():
+    """shutdown() cancels outstanding tasks, awaits every hook (even after one fails) and refuses new work."""
+    runtime = AsyncRuntime(name='test-shutdown')
+    calls = []
+    async def failing_hook():
+        calls.append('failing')
+        raise ValueError('boom')
+    async def closing_hook():
+        calls.append('closing')
+    runtime.add_shutdown_hook(failing_hook)
+    runtime.add_shutdown_hook(closing_hook)
+    outstanding = runtime.submit(asyncio.sleep(5))
+    runtime.shutdown(timeout=5)
+    assert calls == ['failing', 'closing']
+    assert outstanding.cancelled()
+    assert not runtime.thread.is_alive() and runtime.loop.is_closed()
+    coro = asyncio.sleep(0)
+    try:
+        runtime.submit(coro)
+        assert False, "expected RuntimeError"
+    except RuntimeError:
+        pass
+    runtime.shutdown()  # idempotent
+
+def test_ensemble_hooks_do_not_accumulate():
+    """Each ensemble registers one close hook and aclose() removes it, so re-created ensembles don't pile up."""
+    runtime = AsyncRuntime(name='test-ensemble-hooks')
+    original_runtime, original_key = secondary_pipeline.get_async_runtime, os.environ.get('OPENROUTER_API_KEY')
+    secondary_pipeline.get_async_runtime = lambda: runtime
+    os.environ['OPENROUTER_API_KEY'] = 'test'
+    try:
+        for _ in range(3):
+            ensemble = secondary_pipeline.OpenRouterEnsemble({'secondary_pipeline': {'models': ['stub/model']}})
+            assert len(runtime._shutdown_hooks) == 1
+            runtime.run(ensemble.aclose(), timeout=5)
+            assert runtime._shutdown_hooks == []
+        survivor = secondary_pipeline.OpenRouterEnsemble({'secondary_pipeline': {'models': ['stub/model']}})
+        assert runtime._shutdown_hooks == [survivor.aclose]
+    finally:
+        runtime.shutdown()
+        secondary_pipeline.get_async_runtime = original_runtime
+        if original_key is None:
+            os.environ.pop('OPENROUTER_API_KEY', None)
+        else:
+            os.environ['OPENROUTER_API_KEY'] = original_key
+    assert runtime._shutdown_hooks == []
+
+if __name__ == "__main__":
+    test_task_inherits_caller_context()
+    test_timeout_cancels_task()
+    test_run_from_loop_thread_raises()
+    test_shutdown_runs_hooks()
+    test_ensemble_hooks_do_not_accumulate()
+    print("\nAll async runtime tests passed")
@@ -0,0 +1,128 @@
+#!/usr/bin/env python3
+"""
+Test script for the batched engine path: reranker calls from many exams are packed per tier.
+"""
+
+import sys
+import os
+import time
+sys.path.append(os.path.join(os.path.dirname(__file__), '..', '..'))
+
+from nhs_lookup_engine import NHSLookupEngine
+from medcpt_client import MedCPTClient
+from deadline import remaining
+from rate_limiter import priority_lane, INTERACTIVE
+import app
+
+class RecordingRerankerManager:
+    def __init__(self):
+        self.batch_calls = []
+        self.single_calls = []
+
+    def get_rerank_scores(self, query, documents, reranker_key=None):
+        self.single_calls.append((reranker_key, query))
+        return [0.9] + [0.1] * (len(documents) - 1)
+
+    def get_rerank_scores_batch(self, items, reranker_key=None):
+        self.batch_calls.append((reranker_key, [query for query, _ in items]))
+        return [[0.9] + [0.1] * (len(documents) - 1) for _, documents in items]
+
+def fake_steps(input_exam, extracted_input_components, is_input_simple, debug, reranker_key, data_source, exam_code):
+    """Embed, rerank on the cheap tier, and escalate exams marked 'hard' to a second tier."""
+    embedding = yield ('embed', input_exam)
+    scores = yield ('rerank', input_exam, ['A', 'B'], 'medcpt')
+    if extracted_input_components.get('hard'):
+        scores = yield ('rerank', input_exam, ['A', 'B', 'C'], 'openrouter_model')
+    if extracted_input_components.get('boom'):
+        raise ValueError('pipeline failure')
+    return {'exam': input_exam, 'embedding': embedding, 'scores': scores}
+
+def make_engine():
+    engine = NHSLookupEngine.__new__(NHSLookupEngine)
+    engine.reranker_manager = RecordingRerankerManager()
+    engine._standardize_exam_steps = fake_steps
+    engine._run_pipeline_request = lambda request: f"emb:{request[1]}"
+    return engine
+
+def test_rerank_calls_packed_per_tier():
+    """One get_rerank_scores_batch call per tier per round; results stay aligned with their exams."""
+    engine = make_engine()
+    exams = [{'input_exam': f"exam {i}", 'extracted_input_components': {'hard': i % 2 == 0}} for i in range(6)]
+    outcomes = engine.standardize_exams_batch(exams)
+
+    calls = engine.reranker_manager.batch_calls
+    print(f"=== batch calls: {calls}")
+    assert calls == [('medcpt', [f"exam {i}" for i in range(6)]),
+                     ('openrouter_model', ['exam 0', 'exam 2', 'exam 4'])]
+    assert engine.reranker_manager.single_calls == []
+    for i, (result, error) in enumerate(outcomes):
+        assert error is None
+        assert result['exam'] == f"exam {i}" and result['embedding'] == f"emb:exam {i}"
+        assert len(result['scores']) == (3 if i % 2 == 0 else 2)
+
+def test_single_exam_rounds_and_failures():
+    """A lone rerank request uses the single-exam path; a failing exam does not stop the others."""
+    engine = make_engine()
+    exams = [{'input_exam': 'ok', 'extracted_input_components': {'hard': True}},
+             {'input_exam': 'bad', 'extracted_input_components': {'boom': True}}]
+    outcomes = engine.standardize_exams_batch(exams)
+
+    assert engine.reranker_manager.batch_calls == [('medcpt', ['ok', 'bad'])]
+    assert engine.reranker_manager.single_calls == [('openrouter_model', 'ok')]
+    assert outcomes[0][0]['exam'] == 'ok' and outcomes[0][1] is None
+    assert outcomes[1][0] is None and isinstance(outcomes[1][1], ValueError)
+
+def test_medcpt_rate_limits_left_to_parse_response():
+    """429/503 are handled by _parse_response (rate limiter pause), not retried by urllib3."""
+    client = MedCPTClient(api_token='test')
+    retry = client.session.get_adapter('https://api-inference.huggingface.co').max_retries
+    assert 429 not in retry.status_forcelist and 503 not in retry.status_forcelist
+    assert 500 in retry.status_forcelist
+
+def test_interactive_calls_skip_micro_batch_wait():
+    """Interactive requests are scored immediately; batch-lane callers wait the window to coalesce."""
+    client = MedCPTClient(api_token='test', micro_batch_wait_ms=200)
+    sent = []
+    client.score_raw_batch = lambda items: sent.append(len(items)) or [[0.5] * len(docs) for _, docs in items]
+
+    started = time.monotonic()
+    with priority_lane(INTERACTIVE):
+        assert client.score_raw('ct head', ['CT Head']) == [0.5]
+    assert time.monotonic() - started < 0.1
+
+    started = time.monotonic()
+    assert client.score_raw('ct head', ['CT Head']) == [0.5]
+    assert time.monotonic() - started >= 0.2
+    assert sent == [1, 1]
+
+def test_batch_chunk_deadline_scales_with_exams():
+    """Each exam in a lockstep chunk sees the per-exam budget times the chunk size, not one shared per-exam budget."""
+    seen = []
+    class RecordingEngine:
+        def standardize_exams_batch(self, exams, max_workers=2):
+            seen.extend(remaining() for _ in exams)
+            return [({'exam': exam['input_exam']}, None) for exam in exams]
+
+    originals = (app.nhs_lookup_engine, app._prepare_exam_input, app._build_exam_response)
+    app.nhs_lookup_engine = RecordingEngine()
+    app._prepare_exam_input = lambda exam_name, modality_code: (None, exam_name, False, {})
+    app._build_exam_response = lambda nhs_result, *args: nhs_result
+    try:
+        exams = [{'exam_name': f"exam {i}"} for i in range(4)]
+        outcomes = app.process_exam_requests_batch(exams, deadline_seconds=10)
+        app.process_exam_requests_batch(exams[:1], deadline_seconds=10)
+    finally:
+        app.nhs_lookup_engine, app._prepare_exam_input, app._build_exam_response = originals
+    print(f"=== remaining per exam: {seen}")
+    assert [result['exam'] for result, _ in outcomes] == [exam['exam_name'] for exam in exams]
+    assert all(39 < left <= 40 for left in seen[:4])
+    assert 9 < seen[4] <= 10
+    assert remaining() is None
+
+if __name__ == "__main__":
+    test_rerank_calls_packed_per_tier()
+    test_single_exam_rounds_and_failures()
+    test_medcpt_rate_limits_left_to_parse_response()
+    test_interactive_calls_skip_micro_batch_wait()
+    test_batch_chunk_deadline_scales_with_exams()
+    print("\nAll batch rerank tests passed")
@@ -0,0 +1,103 @@
+#!/usr/bin/env python3
+"""
+Test script for compact candidate encoding in ensemble prompts.
+"""
+
+import sys
+import os
+sys.path.append(os.path.join(os.path.dirname(__file__), '..', '..'))
+
+from candidate_encoding import select_candidates, encode_candidates, resolve_candidate_id, encoding_savings
+from rate_limiter import estimate_tokens
+import secondary_pipeline
+
+CANDIDATES = [
+    {'snomed_id': '169069000', 'primary_name': 'CT Head', 'snomed_fsn': 'Computed tomography of head (procedure)', 'confidence': 0.82},
+    {'snomed_id': '408754009', 'primary_name': 'CT Head with contrast',
+     'snomed_fsn': 'Computed tomography of head with contrast (procedure)', 'confidence': 0.74},
+    {'snomed_id': '429858000', 'primary_name': 'CT Head | Neck', 'snomed_fsn': 'Computed tomography of head and neck (procedure)',
+     'confidence': 0.61},
+]
+
+def test_compact_encoding_round_trip():
+    """Short ids in the compact encoding map back to SNOMED ids."""
+    text, id_map = encode_candidates(CANDIDATES, 'compact')
+    lines = text.split('\n')
+    print(f"=== Compact candidates:\n{text}")
+    assert lines[0] == 'id|primary_name|snomed_fsn|score'
+    assert lines[1] == 'C1|CT Head|Computed tomography of head|0.82'
+    assert lines[3].count('|') == 3  # separator inside a name is escaped
+    assert resolve_candidate_id('c2', id_map) == '408754009'
+    assert resolve_candidate_id('169069000', id_map) == '169069000'
+    assert resolve_candidate_id(None, id_map) is None
+
+    json_text, json_map = encode_candidates(CANDIDATES, 'json')
+    assert json_map == {}
+    assert resolve_candidate_id('408754009', json_map) == '408754009'
+
+def test_token_budget_limits_candidates():
+    """The candidate count follows the token budget, keeping at least one candidate."""
+    many = CANDIDATES * 10
+    assert len(select_candidates(many, None, max_candidates=10)) == 10
+    assert len(select_candidates(many, 60, max_candidates=30)) < 10
+    assert len(select_candidates(many, 1, max_candidates=30)) == 1
+
+def test_compact_encoding_saves_tokens():
+    """Compact lines cost far fewer tokens than pretty-printed JSON."""
+    savings = encoding_savings(CANDIDATES * 4)
+    print(f"=== Savings: {savings}")
+    assert savings['compact_tokens'] < savings['json_tokens']
+    assert savings['saved_pct'] > 40
+
+def make_ensemble(encoding):
+    os.environ.setdefault('OPENROUTER_API_KEY', 'test')
+    return secondary_pipeline.OpenRouterEnsemble({'secondary_pipeline': {'candidates': {'encoding': encoding}}})
+
+def test_encoding_stats_baseline_is_lazy():
+    """Recording a call doesn't serialise JSON; the baseline is computed from a sample when stats are read."""
+    ensemble = make_ensemble('compact')
+    calls = []
+    original = secondary_pipeline.encoding_savings
+    secondary_pipeline.encoding_savings = lambda candidates: calls.append(candidates) or original(candidates)
+    try:
+        for size in (1, 2, 3):
+            candidates = CANDIDATES[:size]
+            ensemble._record_encoding(candidates, estimate_tokens(encode_candidates(candidates, 'compact')[0]))
+        assert calls == []
+        stats = ensemble.candidate_encoding_stats()
+    finally:
+        secondary_pipeline.encoding_savings = original
+    print(f"=== Encoding stats: {stats}")
+    exact_json = sum(encoding_savings(CANDIDATES[:size])['json_tokens'] for size in (1, 2, 3))
+    assert len(calls) == 3 and stats['json_sample_calls'] == 3
+    assert stats['calls'] == 3 and stats['candidates'] == 6
+    assert abs(stats['json_tokens'] - exact_json) <= 1  # whole history sampled: the estimate is exact
+    assert stats['saved_tokens'] == stats['json_tokens'] - stats['encoded_tokens'] and stats['saved_pct'] > 40
+
+def test_encoding_stats_sample_is_bounded():
+    """Past ENCODING_SAMPLE_SIZE calls the baseline is extrapolated from the most recent calls."""
+    original_size = secondary_pipeline.ENCODING_SAMPLE_SIZE
+    secondary_pipeline.ENCODING_SAMPLE_SIZE = 2
+    try:
+        ensemble = make_ensemble('compact')
+    finally:
+        secondary_pipeline.ENCODING_SAMPLE_SIZE = original_size
+    encoded = estimate_tokens(encode_candidates(CANDIDATES, 'compact')[0])
+    for _ in range(5):
+        ensemble._record_encoding(CANDIDATES, encoded)
+    stats = ensemble.candidate_encoding_stats()
+    assert stats['json_sample_calls'] == 2
+    assert stats['json_tokens'] == 5 * encoding_savings(CANDIDATES)['json_tokens']
+
+    json_ensemble = make_ensemble('json')
+    json_ensemble._record_encoding(CANDIDATES, 120)
+    stats = json_ensemble.candidate_encoding_stats()
+    assert stats['json_tokens'] == 120 and stats['saved_tokens'] == 0
+
+if __name__ == "__main__":
+    test_compact_encoding_round_trip()
+    test_token_budget_limits_candidates()
+    test_compact_encoding_saves_tokens()
+    test_encoding_stats_baseline_is_lazy()
+    test_encoding_stats_sample_is_bounded()
+    print("\nAll candidate encoding tests passed")
@@ -0,0 +1,152 @@
+#!/usr/bin/env python3
+"""
+Test script for the per-backend circuit breaker state machine.
+"""
+
+import sys
+import os
+import time
+import asyncio
+import requests
+sys.path.append(os.path.join(os.path.dirname(__file__), '..', '..'))
+
+from circuit_breaker import CircuitBreaker, CLOSED, OPEN, HALF_OPEN
+from deadline import request_deadline
+from medcpt_client import MedCPTClient
+import async_http
+
+def test_trips_on_consecutive_failures():
+    """Consecutive failures open the breaker and further calls are rejected."""
+    breaker = CircuitBreaker('test-consecutive', failure_threshold=3, min_calls=100, cooldown_seconds=60)
+    for _ in range(2):
+        assert breaker.allow_request()
+        breaker.record_failure('HTTP 503', latency=0.2)
+    assert breaker.state == CLOSED
+    breaker.record_failure('HTTP 503', latency=0.2)
+
+    snapshot = breaker.snapshot()
+    print(f"=== After 3 failures: {snapshot}")
+    assert snapshot['state'] == OPEN
+    assert snapshot['retry_in_seconds'] > 0
+    assert not breaker.allow_request()
+    assert breaker.snapshot()['rejected'] == 1
+
+def test_trips_on_failure_rate():
+    """An intermittent backend trips once the windowed failure rate crosses the threshold."""
+    breaker = CircuitBreaker('test-rate', failure_threshold=100, failure_rate_threshold=0.5,
+                             window_size=10, min_calls=6)
+    for _ in range(3):
+        breaker.record_success(latency=0.1)
+        breaker.record_failure('timeout')
+    assert breaker.state == OPEN
+
+def test_half_open_probe():
+    """After the cool-down one probe is allowed; success closes, failure re-opens."""
+    breaker = CircuitBreaker('test-probe', failure_threshold=1, cooldown_seconds=0.05)
+    breaker.record_failure('network error')
+    assert breaker.state == OPEN
+    time.sleep(0.06)
+
+    assert breaker.state == HALF_OPEN
+    assert breaker.allow_request()
+    assert not breaker.allow_request()  # only one probe in flight
+    breaker.record_failure('still down')
+    assert breaker.state == OPEN
+
+    time.sleep(0.06)
+    assert breaker.allow_request()
+    breaker.record_success(latency=0.3)
+    assert breaker.state == CLOSED
+    assert breaker.allow_request()
+
+def test_released_probe_frees_slot():
+    """A probe that ends without an outcome (deadline, cancellation) frees its slot for the next probe."""
+    breaker = CircuitBreaker('test-release', failure_threshold=1, cooldown_seconds=0.05)
+    breaker.record_failure('network error')
+    time.sleep(0.06)
+
+    assert breaker.allow_request()
+    assert not breaker.allow_request()
+    breaker.release_probe()
+    assert breaker.state == HALF_OPEN
+    assert breaker.allow_request()
+
+    # After a reported outcome, releasing is a no-op
+    breaker.record_success()
+    breaker.release_probe()
+    assert breaker.state == CLOSED
+
+def test_silent_probe_reopens():
+    """A half-open probe with no result within the cool-down re-opens the breaker."""
+    breaker = CircuitBreaker('test-silent', failure_threshold=1, cooldown_seconds=0.05)
+    breaker.record_failure('network error')
+    time.sleep(0.06)
+    assert breaker.allow_request()
+    time.sleep(0.06)
+
+    assert breaker.state == OPEN
+    assert breaker.snapshot()['trips'] == 2
+    time.sleep(0.06)
+    assert breaker.allow_request()
+
+def half_open_client(name):
+    client = MedCPTClient(api_token='test')
+    client.breaker = CircuitBreaker(name, failure_threshold=1, cooldown_seconds=0.05)
+    client.breaker.record_failure('network error')
+    time.sleep(0.06)
+    return client
+
+def test_client_releases_probe_on_deadline_timeout():
+    """A probe timed out by our own deadline reports nothing, so the client must free its slot."""
+    client = half_open_client('test-client-deadline')
+    def slow_post(*args, **kwargs):
+        time.sleep(0.03)
+        raise requests.exceptions.Timeout('read timed out')
+    client.session.post = slow_post
+
+    with request_deadline(0.02):
+        assert client._request_raw_scores([{'query': 'ct head', 'document': 'CT Head'}]) is None
+    assert client.breaker.state == HALF_OPEN
+    assert client.breaker.allow_request()
+
+def test_client_releases_probe_on_cancellation():
+    """Cancelling an async probe mid-request frees its half-open slot."""
+    client = half_open_client('test-client-cancel')
+    class HangingClient:
+        async def post(self, *args, **kwargs):
+            await asyncio.sleep(10)
+    original = async_http.get_async_client
+    async_http.get_async_client = lambda: HangingClient()
+
+    async def run():
+        task = asyncio.create_task(client._request_raw_scores_async([{'query': 'ct head', 'document': 'CT Head'}]))
+        await asyncio.sleep(0.01)
+        task.cancel()
+        try:
+            await task
+        except asyncio.CancelledError:
+            pass
+    try:
+        asyncio.run(run())
+    finally:
+        async_http.get_async_client = original
+    assert client.breaker.state == HALF_OPEN
+    assert client.breaker.allow_request()
+
+def test_latency_ewma():
+    """Latency EWMA tracks successful call times."""
+    breaker = CircuitBreaker('test-latency', ewma_alpha=0.5)
+    breaker.record_success(latency=1.0)
+    breaker.record_success(latency=0.0)
+    assert breaker.snapshot()['latency_ewma_ms'] == 500.0
+
+if __name__ == "__main__":
+    test_trips_on_consecutive_failures()
+    test_trips_on_failure_rate()
+    test_half_open_probe()
+    test_released_probe_frees_slot()
+    test_silent_probe_reopens()
+    test_client_releases_probe_on_deadline_timeout()
+    test_client_releases_probe_on_cancellation()
+    test_latency_ewma()
+    print("\nAll circuit breaker tests passed")
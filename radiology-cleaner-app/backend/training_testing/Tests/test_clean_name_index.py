@@ -0,0 +1,90 @@
+#!/usr/bin/env python3
+"""
+Test script comparing indexed fuzzy clean-name matching with a full scan.
+"""
+
+import sys
+import os
+import re
+from difflib import SequenceMatcher
+sys.path.append(os.path.join(os.path.dirname(__file__), '..', '..'))
+
+from database_models import DatabaseManager, CleanNameIndex
+
+CLEAN_NAMES = [
+    'CT Head', 'CT Head with contrast', 'CT Head and Neck', 'CT Abdomen', 'CT Abdomen Pelvis',
+    'CT Chest Abdomen Pelvis', 'MRI Brain', 'MRI Brain with contrast', 'MRI Knee Left', 'MRI Knee Right',
+    'US Abdomen', 'US Pelvis', 'XR Chest', 'XR Chest PA and Lateral', 'XR Knee Left', 'MRI Abdomen',
+    'CT Angiogram Head', 'CT Angiogram Neck', 'NM Bone Scan', 'PET CT Whole Body', 'MG Mammogram Bilateral',
+]
+
+def make_manager() -> DatabaseManager:
+    """DatabaseManager with an in-memory clean-name cache (no database needed)."""
+    manager = DatabaseManager.__new__(DatabaseManager)
+    manager.all_clean_names_cache = [
+        {'id': idx, 'clean_name': name, 'snomed_concept_id': str(1000 + idx)} for idx, name in enumerate(CLEAN_NAMES)
+    ]
+    manager.clean_name_index = CleanNameIndex(manager.all_clean_names_cache)
+    return manager
+
+def brute_force_scan(target_clean_name: str, threshold: float):
+    """
+    The original per-entry scan: score every clean name and keep those over threshold.
+    
+    (With the abdomen-only boost applied as intended; the original lost it by
+    overwriting candidate_words before the boost check.)
+    """
+    target_normalized = re.sub(r'[^\w\s]', '', target_clean_name.lower().strip())
+    target_words = set(target_normalized.split())
+    is_ct_or_mri = target_normalized.split()[0] in ['ct', 'mri', 'mr'] if target_words else False
+    matches = []
+    for name in CLEAN_NAMES:
+        candidate_normalized = re.sub(r'[^\w\s]', '', name.lower().strip())
+        candidate_words = set(candidate_normalized.split())
+        target_for_comparison = target_normalized
+        candidate_for_comparison = candidate_normalized
+        equivalent = False
+        if is_ct_or_mri and 'abdomen' in target_words and 'pelvis' not in target_words:
+            if 'abdomen' in candidate_words and 'pelvis' in candidate_words:
+                candidate_for_comparison = candidate_normalized.replace('pelvis', '').strip()
+                equivalent = True
+        seq_similarity = SequenceMatcher(None, target_for_comparison, candidate_for_comparison).ratio()
+        comparison_target_words = set(target_for_comparison.split())
+        comparison_candidate_words = set(candidate_for_comparison.split())
+        word_similarity = (len(comparison_target_words & comparison_candidate_words) /
+                           len(comparison_target_words | comparison_candidate_words))
+        prefix_similarity = 0.0
+        if target_for_comparison.startswith(candidate_for_comparison) or candidate_for_comparison.startswith(target_for_comparison):
+            prefix_similarity = (min(len(target_for_comparison), len(candidate_for_comparison)) /
+                                 max(len(target_for_comparison), len(candidate_for_comparison)))
+        combined_score = seq_similarity * 0.4 + word_similarity * 0.4 + prefix_similarity * 0.2
+        if equivalent:
+            combined_score = min(1.0, combined_score + 0.1)
+        if combined_score >= threshold:
+            matches.append((name, round(combined_score, 9)))
+    return sorted(matches, key=lambda match: (-match[1], match[0]))
+
+def test_index_matches_brute_force():
+    """Indexed lookup returns exactly the full scan's matches and scores, untruncated by default."""
+    manager = make_manager()
+    for target in ['CT Head', 'ct head w contrast', 'MRI knee', 'CT Abdomen', 'XR chest', 'Chest X-ray', 'bone scan']:
+        for threshold in [0.3, 0.5, 0.6, 0.8]:
+            indexed = manager.fuzzy_match_clean_names(target, threshold)
+            indexed = sorted(((m['clean_name'], round(m['similarity_score'], 9)) for m in indexed),
+                             key=lambda match: (-match[1], match[0]))
+            expected = brute_force_scan(target, threshold)
+            print(f"=== '{target}' @ {threshold}: {len(indexed)} matches")
+            assert indexed == expected, (target, threshold, indexed, expected)
+
+def test_top_k_limits_results():
+    """top_k keeps only the best matches when explicitly requested."""
+    manager = make_manager()
+    everything = manager.fuzzy_match_clean_names('CT Head', 0.3)
+    top = manager.fuzzy_match_clean_names('CT Head', 0.3, top_k=2)
+    assert len(everything) > 2
+    assert [m['clean_name'] for m in top] == [m['clean_name'] for m in everything[:2]]
+
+if __name__ == "__main__":
+    test_index_matches_brute_force()
+    test_top_k_limits_results()
+    print("\nAll clean-name index tests passed")
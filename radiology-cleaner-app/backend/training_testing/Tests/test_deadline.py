@@ -0,0 +1,145 @@
+#!/usr/bin/env python3
+"""
+Test script for request deadlines bounding pipeline stages, and hedged embedding requests.
+"""
+
+import sys
+import os
+import time
+import threading
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+sys.path.append(os.path.join(os.path.dirname(__file__), '..', '..'))
+
+import nlp_processor
+from nlp_processor import NLPProcessor
+from deadline import request_deadline, remaining, expired, timeout_for
+
+class StubResponse:
+    def __init__(self, name):
+        self.name = name
+        self.ok = True
+        self.status_code = 200
+
+    def raise_for_status(self):
+        pass
+
+    def json(self):
+        return [[0.1, 0.2]]
+
+class StubPost:
+    """Stands in for requests.post: call i sleeps delays[i], recording when it was sent and its timeout."""
+    def __init__(self, delays=()):
+        self.delays = list(delays)
+        self.calls = []
+        self.lock = threading.Lock()
+
+    def __call__(self, url, headers=None, json=None, timeout=None):
+        with self.lock:
+            index = len(self.calls)
+            self.calls.append((time.monotonic(), timeout))
+        time.sleep(self.delays[index] if index < len(self.delays) else 0.0)
+        return StubResponse(f"call-{index}")
+
+class StubLimiter:
+    def __init__(self):
+        self.acquired = 0
+
+    def acquire(self, tokens=0, priority=None, max_wait=None):
+        self.acquired += 1
+        return True
+
+class StubBreaker:
+    name = 'stub'
+
+    def allow_request(self):
+        return True
+
+    def record_success(self, latency):
+        pass
+
+    def record_failure(self, reason, latency):
+        pass
+
+    def release_probe(self):
+        pass
+
+def make_processor(hedging=None, latencies=()):
+    processor = NLPProcessor.__new__(NLPProcessor)
+    processor.hf_model_name = 'stub/model'
+    processor.api_url = 'http://embeddings.invalid'
+    processor.headers = {}
+    processor.rate_limiter = StubLimiter()
+    processor.breaker = StubBreaker()
+    processor.hedge_config = hedging or {}
+    processor._latencies = deque(latencies, maxlen=200)
+    processor._latencies_lock = threading.Lock()
+    processor._hedge_executor = ThreadPoolExecutor(max_workers=2) if hedging else None
+    processor.hedge_stats = {'hedged': 0, 'hedge_wins': 0}
+    return processor
+
+def with_post(stub, fn):
+    original = nlp_processor.requests.post
+    nlp_processor.requests.post = stub
+    try:
+        return fn()
+    finally:
+        nlp_processor.requests.post = original
+
+def test_timeout_for_and_expired():
+    """A stage's timeout is capped by the time left; nested deadlines keep the earlier one."""
+    assert remaining() is None and not expired() and timeout_for(30) == 30
+    with request_deadline(5):
+        assert 4.5 < timeout_for(30) <= 5 and timeout_for(1) == 1
+        with request_deadline(60):
+            assert timeout_for(30) <= 5  # the outer, earlier deadline still bounds it
+        with request_deadline(0.01):
+            time.sleep(0.02)
+            assert expired() and remaining() == 0.0
+            assert timeout_for(30) == 0.1 and timeout_for(30, minimum=0.0) == 0.0
+        assert not expired()
+    assert remaining() is None
+
+def test_deadline_bounds_embedding_stage():
+    """The embedding POST timeout shrinks to the deadline, and an expired deadline skips the call."""
+    processor = make_processor()
+    post = StubPost()
+    with request_deadline(2):
+        assert with_post(post, lambda: processor._make_api_call(['ct head'])) == [[0.1, 0.2]]
+    print(f"=== POST timeout under a 2s deadline: {post.calls[0][1]:.2f}s")
+    assert post.calls[0][1] <= 2
+
+    post = StubPost()
+    with request_deadline(0.01):
+        time.sleep(0.02)
+        assert with_post(post, lambda: processor._make_api_call(['ct head'])) is None
+    assert post.calls == [] and processor.rate_limiter.acquired == 1
+
+def test_hedge_sent_after_percentile_delay():
+    """A primary slower than the latency percentile gets a hedge at that delay; the faster hedge wins."""
+    hedging = {'enabled': True, 'min_samples': 5, 'percentile': 0.5, 'min_delay_ms': 10}
+    processor = make_processor(hedging, latencies=[0.05] * 10)
+    assert processor._hedge_delay(timeout=120) == 0.05
+    post = StubPost(delays=[0.5, 0.0])
+    response = with_post(post, lambda: processor._post_with_hedge({'inputs': ['ct head']}))
+    (primary_sent, _), (hedge_sent, _) = post.calls
+    print(f"=== hedge sent {hedge_sent - primary_sent:.3f}s after the primary; winner {response.name}")
+    assert 0.05 <= hedge_sent - primary_sent < 0.4
+    assert response.name == 'call-1'
+    assert processor.hedge_stats == {'hedged': 1, 'hedge_wins': 1}
+
+def test_fast_primary_is_not_hedged():
+    """A primary that answers within the percentile delay is returned without a hedge."""
+    hedging = {'enabled': True, 'min_samples': 5, 'percentile': 0.5, 'min_delay_ms': 10}
+    processor = make_processor(hedging, latencies=[0.2] * 10)
+    post = StubPost(delays=[0.01])
+    response = with_post(post, lambda: processor._post_with_hedge({'inputs': ['ct head']}))
+    assert response.name == 'call-0' and len(post.calls) == 1
+    assert processor.hedge_stats['hedged'] == 0 and processor.rate_limiter.acquired == 0
+
+if __name__ == "__main__":
+    test_timeout_for_and_expired()
+    test_deadline_bounds_embedding_stage()
+    test_hedge_sent_after_percentile_delay()
+    test_fast_primary_is_not_hedged()
+    print("\nAll deadline tests passed")
@@ -0,0 +1,77 @@
+#!/usr/bin/env python3
+"""
+Test script for the feedback FTS5 trigram indexes, their sync triggers and lookups.
+"""
+
+import sys
+import os
+import tempfile
+sys.path.append(os.path.join(os.path.dirname(__file__), '..', '..'))
+
+from feedback_training import FeedbackTrainingManager
+
+def make_manager(directory: str) -> FeedbackTrainingManager:
+    return FeedbackTrainingManager(os.path.join(directory, 'feedback_test.db'))
+
+def assert_fts_in_sync(manager: FeedbackTrainingManager):
+    """FTS5 integrity-check raises if an external-content index disagrees with its table."""
+    with manager._get_connection() as conn:
+        for fts_table in ['learned_patterns_fts', 'organization_mappings_fts']:
+            conn.execute(f"INSERT INTO {fts_table}({fts_table}, rank) VALUES ('integrity-check', 1)")
+
+def test_replace_keeps_fts_in_sync():
+    """INSERT OR REPLACE on organization_mappings fires the delete trigger, leaving no stale index rows."""
+    with tempfile.TemporaryDirectory() as directory:
+        manager = make_manager(directory)
+        assert manager.fts_enabled
+        for confidence in [0.7, 0.8, 0.9]:
+            manager._create_organization_mapping('Org A', 'CT HEAD NON CONTRAST', 'CT', 'CT Head', confidence)
+
+        with manager._get_connection() as conn:
+            assert conn.execute('PRAGMA recursive_triggers').fetchone()[0] == 1
+            assert conn.execute('SELECT COUNT(*) FROM organization_mappings').fetchone()[0] == 1
+            indexed = conn.execute(
+                "SELECT COUNT(*) FROM organization_mappings_fts WHERE organization_mappings_fts MATCH '\"HEAD\"'"
+            ).fetchone()[0]
+        print(f"=== {indexed} indexed mapping rows after 3 replaces")
+        assert indexed == 1
+        assert_fts_in_sync(manager)
+
+def test_substring_search():
+    """Trigram queries find substrings, filtered by organization, verification and confidence."""
+    with tempfile.TemporaryDirectory() as directory:
+        manager = make_manager(directory)
+        manager._create_organization_mapping('Org A', 'CT HEAD NON CONTRAST', 'CT', 'CT Head', 0.9)
+        manager._create_organization_mapping('Org A', 'CT HEAD NON CONTRAST', 'CT', 'CT Head', 0.9)
+        manager._create_organization_mapping('Org A', 'CT HEAD WITH CONTRAST', 'CT', 'CT Head with contrast', 0.9)
+        manager._create_organization_mapping('Org B', 'CT HEAD NON CONTRAST', 'CT', 'CT Head', 0.9)
+        manager._create_organization_mapping('Org B', 'CT HEAD NON CONTRAST', 'CT', 'CT Head', 0.9)
+
+        # Only Org A's twice-verified mapping qualifies
+        matches = manager.search_organization_mappings('Org A', 'HEAD NON')
+        assert [m['exam_name'] for m in matches] == ['CT HEAD NON CONTRAST']
+        assert manager.search_organization_mappings('Org A', 'HEAD WITH') == []
+
+        manager._create_learned_pattern('exact_match', 'Org A', 'MRI LUMBAR SPINE', 'MRI Lumbar spine', 0.9)
+        manager._create_learned_pattern('exact_match', 'Org A', 'XR LUMBAR SPINE', 'XR Lumbar spine', 0.6)
+        manager._create_learned_pattern('exact_match', 'Org A', 'US ABDOMEN', 'US Abdomen', 0.9)
+        patterns = manager.get_learned_patterns('LUMBAR')
+        print(f"=== 'LUMBAR' matched {[p['input_pattern'] for p in patterns]}")
+        # threshold 0.7 allows fuzzy matches down to 0.5
+        assert sorted(p['input_pattern'] for p in patterns) == ['MRI LUMBAR SPINE', 'XR LUMBAR SPINE']
+        assert [p['input_pattern'] for p in manager.get_learned_patterns('MRI LUMBAR SPINE')][0] == 'MRI LUMBAR SPINE'
+        assert_fts_in_sync(manager)
+
+def test_short_queries_fall_back_to_like():
+    """Queries shorter than a trigram use the LIKE scan and still match."""
+    with tempfile.TemporaryDirectory() as directory:
+        manager = make_manager(directory)
+        manager._create_learned_pattern('exact_match', 'Org A', 'US ABDOMEN', 'US Abdomen', 0.9)
+        assert not manager._can_use_fts('US')
+        assert [p['input_pattern'] for p in manager.get_learned_patterns('US')] == ['US ABDOMEN']
+
+if __name__ == "__main__":
+    test_replace_keeps_fts_in_sync()
+    test_substring_search()
+    test_short_queries_fall_back_to_like()
+    print("\nAll feedback FTS tests passed")
@@ -0,0 +1,91 @@
+#!/usr/bin/env python3
+"""
+Test script for LLM token/latency accounting and batch budgets.
+"""
+
+import sys
+import os
+import asyncio
+from concurrent.futures import ThreadPoolExecutor
+sys.path.append(os.path.join(os.path.dirname(__file__), '..', '..'))
+
+from llm_usage import UsageBudget, usage_budget, run_with_budget, budget_exhausted, record_llm_usage, get_usage_tracker
+
+def test_usage_recorded_per_model_and_batch():
+    """Dict and SDK-style usage both land in the per-model tracker and the batch budget."""
+    class SdkUsage:
+        prompt_tokens = 300
+        completion_tokens = 40
+
+    budget = UsageBudget()
+    with usage_budget(budget):
+        record_llm_usage('test/model-a', 'reranker', {'prompt_tokens': 100, 'completion_tokens': 20}, 0.5,
+                         cost_per_1k_tokens=0.001)
+        record_llm_usage('test/model-b', 'ensemble', SdkUsage(), 1.5)
+    record_llm_usage('test/model-a', 'reranker', {'prompt_tokens': 10, 'completion_tokens': 5}, 0.1)
+
+    summary = budget.summary()
+    print(f"=== Batch usage: {summary}")
+    assert summary['calls'] == 2
+    assert summary['total_tokens'] == 460
+    assert summary['per_model']['test/model-b']['prompt_tokens'] == 300
+    assert abs(summary['cost_usd'] - 0.00012) < 1e-9
+
+    model_a = get_usage_tracker().snapshot()['models']['test/model-a']
+    assert model_a['calls'] == 2
+    assert model_a['total_tokens'] == 135
+    assert model_a['p95_latency_ms'] == 500.0
+
+def test_cached_prompt_tokens():
+    """Prompt-cache hits are recorded per call and billed at the cached rate."""
+    usage = {'prompt_tokens': 1000, 'completion_tokens': 50, 'prompt_tokens_details': {'cached_tokens': 800}}
+    budget = UsageBudget()
+    with usage_budget(budget):
+        recorded = record_llm_usage('test/model-e', 'ensemble', usage, 0.3)
+    assert recorded['cached_prompt_tokens'] == 800
+
+    summary = budget.summary()
+    assert summary['cached_prompt_tokens'] == 800
+    assert summary['prompt_cache_hit_rate'] == 0.8
+    assert record_llm_usage('test/model-e', 'ensemble', {'prompt_tokens': 10}, 0.1)['cached_prompt_tokens'] == 0
+
+def test_budget_exhaustion():
+    """A token or call budget stops further calls once spent and counts the skips."""
+    budget = UsageBudget(max_total_tokens=100)
+    with usage_budget(budget):
+        assert not budget_exhausted()
+        record_llm_usage('test/model-c', 'ensemble', {'prompt_tokens': 90, 'completion_tokens': 15}, 0.2)
+        assert budget_exhausted()
+        assert budget_exhausted()
+    assert not budget_exhausted()  # outside the batch there is no budget
+
+    summary = budget.summary()
+    assert summary['budget_exhausted']
+    assert summary['skipped_calls'] == 2
+
+    calls_budget = UsageBudget(max_calls=2)
+    with usage_budget(calls_budget):
+        record_llm_usage('test/model-c', 'ensemble', {'prompt_tokens': 1, 'completion_tokens': 1}, 0.2)
+        assert not budget_exhausted()
+        record_llm_usage('test/model-c', 'ensemble', {'prompt_tokens': 1, 'completion_tokens': 1}, 0.2)
+        assert budget_exhausted()
+
+def test_budget_reaches_workers():
+    """run_with_budget carries the budget into executor threads and event loops."""
+    budget = UsageBudget()
+
+    async def call():
+        record_llm_usage('test/model-d', 'ensemble', {'prompt_tokens': 1, 'completion_tokens': 1}, 0.01)
+
+    with ThreadPoolExecutor(max_workers=2) as executor:
+        futures = [executor.submit(run_with_budget, budget, asyncio.run, call()) for _ in range(4)]
+        for future in futures:
+            future.result()
+    assert budget.summary()['calls'] == 4
+
+if __name__ == "__main__":
+    test_usage_recorded_per_model_and_batch()
+    test_cached_prompt_tokens()
+    test_budget_exhaustion()
+    test_budget_reaches_workers()
+    print("\nAll LLM usage tests passed")
@@ -0,0 +1,61 @@
+#!/usr/bin/env python3
+"""
+Test script for the local CPU cross-encoder reranker using the stand-in model.
+"""
+
+import sys
+import os
+sys.path.append(os.path.join(os.path.dirname(__file__), '..', '..'))
+
+from local_reranker import LocalCrossEncoderReranker, STAND_IN_MODEL_PATH, build_local_reranker
+
+def test_stand_in_scores():
+    """Stand-in model is deterministic and ranks the closest candidate first."""
+    reranker = LocalCrossEncoderReranker(STAND_IN_MODEL_PATH, batch_size=2, num_threads=2, allow_stand_in=True)
+    candidates = ["CT Chest", "CT Chest Abdomen Pelvis", "MRI Brain"]
+    scores = reranker.get_rerank_scores("ct chest", candidates)
+
+    print("=== Stand-in cross-encoder ===")
+    for candidate, score in zip(candidates, scores):
+        print(f"  '{candidate}' -> {score:.3f}")
+
+    assert reranker.is_available()
+    assert scores == reranker.get_rerank_scores("ct chest", candidates)
+    assert scores[0] == 1.0 and scores[-1] == 0.0
+    assert scores[0] > scores[1] > scores[2]
+    assert reranker.test_connection()
+
+def test_batch_matches_single():
+    """Batching across threads gives the same raw scores as scoring exam by exam."""
+    reranker = LocalCrossEncoderReranker(STAND_IN_MODEL_PATH, batch_size=3, num_threads=3, allow_stand_in=True)
+    items = [("ct chest", ["CT Chest", "XR Chest"]), ("us abdomen", []),
+             ("mri knee left", ["MRI Knee Lt", "MRI Knee Rt", "MRI Hip"])]
+    batch = reranker.score_raw_batch(items)
+    assert batch[1] == []
+    for (query, docs), raw in zip(items, batch):
+        assert raw == reranker.score_raw(query, docs)
+
+def test_missing_model_is_unavailable():
+    """A missing model directory disables the reranker with neutral scores."""
+    reranker = LocalCrossEncoderReranker("/nonexistent/cross-encoder")
+    assert not reranker.is_available()
+    assert reranker.get_rerank_scores("ct chest", ["a", "b"]) == [0.5, 0.5]
+    assert build_local_reranker({'enabled': False}) is None
+
+def test_model_path_required_and_stand_in_gated():
+    """An enabled backend needs an explicit model_path; the stand-in only behind allow_stand_in."""
+    os.environ.pop('LOCAL_RERANKER_MODEL_PATH', None)
+    assert build_local_reranker({'enabled': True}) is None
+    assert build_local_reranker({'enabled': True, 'model_path': STAND_IN_MODEL_PATH}) is None
+    assert not LocalCrossEncoderReranker(STAND_IN_MODEL_PATH).is_available()
+
+    reranker = build_local_reranker({'enabled': True, 'model_path': STAND_IN_MODEL_PATH, 'allow_stand_in': True})
+    assert reranker is not None and reranker.is_available()
+    assert build_local_reranker({'enabled': True, 'model_path': '/models/cross-encoder'}).model_path == '/models/cross-encoder'
+
+if __name__ == "__main__":
+    test_stand_in_scores()
+    test_batch_matches_single()
+    test_missing_model_is_unavailable()
+    test_model_path_required_and_stand_in_gated()
+    print("\nAll local reranker tests passed")
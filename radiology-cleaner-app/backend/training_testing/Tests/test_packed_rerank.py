@@ -0,0 +1,92 @@
+#!/usr/bin/env python3
+"""
+Test script for packed multi-exam OpenRouter reranking: prompt contract and response parsing.
+"""
+
+import sys
+import os
+import json
+sys.path.append(os.path.join(os.path.dirname(__file__), '..', '..'))
+
+from openrouter_reranker import OpenRouterReranker
+
+ITEMS = [
+    ("CT Head", ["CT Head", "CT Head with contrast", "MRI Brain"]),
+    ("MRI Did Not Arrive", ["MRI Brain", "MRI Knee"]),
+    ("XR Chest", ["XR Chest", "XR Chest PA and Lateral"]),
+]
+
+def make_reranker() -> OpenRouterReranker:
+    return OpenRouterReranker('claude-3-haiku', api_key='test')
+
+def test_packed_prompt_uses_results_contract():
+    """The packed prompt's triage example matches the {"results": [...]} format, not the single-exam one."""
+    reranker = make_reranker()
+    packed = reranker._build_packed_reranking_prompt(ITEMS)
+    single = reranker._build_reranking_prompt(*ITEMS[0])
+
+    assert '{triage_action}' not in packed and '{triage_action}' not in single
+    assert 'your entire response must be `{"ranking": []}`' not in packed
+    assert '`{"exam": 2, "ranking": []}`' in packed
+    assert 'your entire response must be `{"ranking": []}`' in single
+    assert '"results"' not in single
+
+def test_parse_full_response():
+    """Valid rankings become rank-position scores; an empty ranking marks the exam invalid."""
+    reranker = make_reranker()
+    response = json.dumps({"results": [
+        {"exam": 1, "ranking": [1, 3, 2]},
+        {"exam": 2, "ranking": []},
+        {"exam": 3, "ranking": [2, 1]},
+    ]})
+    scores = reranker._parse_packed_response(response, ITEMS)
+    print(f"=== parsed scores: {scores}")
+    assert scores[0] == [1.0, 0.1, 0.55]
+    assert scores[1] == [0.0, 0.0]
+    assert scores[2] == [0.1, 1.0]
+
+def test_parse_partial_and_malformed_entries():
+    """Missing, malformed, duplicate or out-of-range entries leave only those exams unparsed."""
+    reranker = make_reranker()
+    response = "```json\n" + json.dumps({"results": [
+        {"exam": 1, "ranking": [1, 2]},          # not a permutation of 1..3
+        {"exam": 3, "ranking": [2, 1]},
+        {"exam": 3, "ranking": [1, 2]},          # duplicate: first one wins
+        {"exam": 7, "ranking": [1]},             # unknown exam
+        {"exam": "two", "ranking": [1, 2]},      # malformed exam number
+        {"exam": 2, "ranking": ["a", "b"]},      # non-integer ranking
+        "not an object",
+    ]}) + "\n```"
+    scores = reranker._parse_packed_response(response, ITEMS)
+    assert scores[0] is None
+    assert scores[1] is None
+    assert scores[2] == [0.1, 1.0]
+
+def test_parse_unusable_response():
+    """Non-JSON text or a missing 'results' list yields no scores at all."""
+    reranker = make_reranker()
+    for response in ["I cannot help with that.", '{"ranking": [1, 2, 3]}', '{"results": {"exam": 1}}', '{"results": [']:
+        assert reranker._parse_packed_response(response, ITEMS) == [None, None, None]
+
+def test_batch_falls_back_for_unparsed_exams():
+    """Only exams missing from the packed response are re-scored individually."""
+    reranker = make_reranker()
+    reranker._make_api_call = lambda prompt, max_tokens=None: json.dumps({"results": [{"exam": 1, "ranking": [1, 2, 3]}]})
+    individually_scored = []
+    def single(query, documents):
+        individually_scored.append(query)
+        return [0.5] * len(documents)
+    reranker.get_rerank_scores = single
+
+    results = reranker.get_rerank_scores_batch(ITEMS)
+    assert individually_scored == ["MRI Did Not Arrive", "XR Chest"]
+    assert results[0] == [1.0, 0.55, 0.1]
+    assert [len(scores) for scores in results] == [3, 2, 2]
+
+if __name__ == "__main__":
+    test_packed_prompt_uses_results_contract()
+    test_parse_full_response()
+    test_parse_partial_and_malformed_entries()
+    test_parse_unusable_response()
+    test_batch_falls_back_for_unparsed_exams()
+    print("\nAll packed rerank tests passed")
@@ -0,0 +1,85 @@
+#!/usr/bin/env python3
+"""
+Test script for the shared rate-limit scheduler (token buckets, priority lanes, Retry-After).
+"""
+
+import sys
+import os
+import time
+import asyncio
+import threading
+sys.path.append(os.path.join(os.path.dirname(__file__), '..', '..'))
+
+from rate_limiter import RateLimiter, INTERACTIVE, BATCH, priority_lane, get_priority, parse_retry_after
+
+def test_request_bucket_limits_rate():
+    """Once the burst is spent, calls are admitted at the configured rate."""
+    limiter = RateLimiter('test-requests', requests_per_minute=600, burst_seconds=0.5, interactive_reserve=0.0)
+    start = time.monotonic()
+    for _ in range(10):  # burst of 5, then 10/s
+        assert limiter.acquire(priority=BATCH, max_wait=5)
+    elapsed = time.monotonic() - start
+    print(f"=== 10 requests at 10/s with burst 5: {elapsed:.2f}s")
+    assert 0.4 < elapsed < 1.5
+    assert not limiter.acquire(priority=BATCH, max_wait=0.01)
+
+def test_token_bucket_and_usage():
+    """Token estimates are charged up front and corrected by reported usage."""
+    limiter = RateLimiter('test-tokens', tokens_per_minute=6000, burst_seconds=1, interactive_reserve=0.0)
+    assert limiter.acquire(tokens=100, priority=BATCH, max_wait=0)
+    assert not limiter.acquire(tokens=100, priority=BATCH, max_wait=0.01)
+    limiter.record_usage(estimated_tokens=100, actual_tokens=20)
+    assert limiter.acquire(tokens=50, priority=BATCH, max_wait=0)
+
+def test_interactive_reserve_and_priority():
+    """Batch traffic can't use the interactive reserve, and yields while an interactive call waits."""
+    parent = RateLimiter('test-provider', requests_per_minute=60, burst_seconds=5, interactive_reserve=0.4)
+    limiter = RateLimiter('test-provider:model', parent=parent)
+    granted = [limiter.acquire(priority=BATCH, max_wait=0) for _ in range(5)]
+    assert granted == [True, True, True, False, False]  # 2 of 5 slots held back
+    assert limiter.acquire(priority=INTERACTIVE, max_wait=0)
+
+    order = []
+    def call(priority):
+        limiter.acquire(priority=priority, max_wait=5)
+        order.append(priority)
+    batch_thread = threading.Thread(target=call, args=(BATCH,))
+    batch_thread.start()
+    time.sleep(0.1)
+    interactive_thread = threading.Thread(target=call, args=(INTERACTIVE,))
+    interactive_thread.start()
+    batch_thread.join()
+    interactive_thread.join()
+    print(f"=== Grant order: {order}")
+    assert order == [INTERACTIVE, BATCH]
+
+def test_retry_after_pause():
+    """A provider Retry-After holds every call on the limiter chain."""
+    parent = RateLimiter('test-pause-provider')
+    limiter = RateLimiter('test-pause-provider:model', parent=parent)
+    other = RateLimiter('test-pause-provider:other', parent=parent)
+    limiter.pause(parse_retry_after({'Retry-After': '0.2'}))
+    assert not other.acquire(priority=INTERACTIVE, max_wait=0.05)
+    assert other.acquire(priority=INTERACTIVE, max_wait=1)
+    assert parse_retry_after({'Retry-After': 'soon'}) is None
+
+def test_async_acquire_and_lane():
+    """acquire_async waits on the loop and priority_lane sets the caller's lane."""
+    limiter = RateLimiter('test-async', requests_per_minute=1200, burst_seconds=0.1, interactive_reserve=0.0)
+
+    async def main():
+        with priority_lane(INTERACTIVE):
+            assert get_priority() == INTERACTIVE
+            results = await asyncio.gather(*[limiter.acquire_async(max_wait=2) for _ in range(6)])
+        assert get_priority() == BATCH
+        return results
+
+    assert all(asyncio.run(main()))
+
+if __name__ == "__main__":
+    test_request_bucket_limits_rate()
+    test_token_bucket_and_usage()
+    test_interactive_reserve_and_priority()
+    test_retry_after_pause()
+    test_async_acquire_and_lane()
+    print("\nAll rate limiter tests passed")
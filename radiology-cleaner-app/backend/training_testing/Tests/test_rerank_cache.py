@@ -0,0 +1,94 @@
+#!/usr/bin/env python3
+"""
+Test script for the reranker score cache: pair-level partial hits and list-level keys.
+"""
+
+import sys
+import os
+sys.path.append(os.path.join(os.path.dirname(__file__), '..', '..'))
+
+from reranker_manager import RerankerManager
+from rerank_cache import RerankScoreCache
+from tiered_cache import TieredCache
+from openrouter_reranker import OpenRouterReranker
+
+def make_manager(rerankers=None):
+    manager = RerankerManager.__new__(RerankerManager)
+    manager.available_rerankers = {'medcpt': {'model_id': 'ncbi/MedCPT-Cross-Encoder'},
+                                   'llm': {'model_id': 'anthropic/claude-3-haiku'}}
+    manager.rerankers = rerankers or {}
+    manager.score_cache = RerankScoreCache(cache=TieredCache(default_ttl=None, version='test'))
+    manager.get_cascade_config = lambda reranker_key: None
+    manager._resolve_healthy_reranker = lambda reranker_key: reranker_key
+    return manager
+
+class RecordingFetch:
+    """Scores each missing doc by its length, recording what was sent."""
+    def __init__(self, fail_queries=()):
+        self.sent = []
+        self.fail_queries = set(fail_queries)
+
+    def __call__(self, items):
+        self.sent.append(items)
+        return [None if query in self.fail_queries else [float(len(doc)) for doc in docs] for query, docs in items]
+
+def test_partial_hits_send_only_missing_docs():
+    """Cached pairs are not re-sent; fresh scores merge back in document order and are cached."""
+    manager = make_manager()
+    manager.score_cache.set_pair_scores('medcpt', 'ncbi/MedCPT-Cross-Encoder', 'ct head', ['CT Head'], [0.9])
+    manager.score_cache.set_pair_scores('medcpt', 'ncbi/MedCPT-Cross-Encoder', 'xr chest', ['XR Chest'], [0.8])
+    items = [('ct head', ['MRI Brain', 'CT Head', 'CT Head with contrast']), ('xr chest', ['XR Chest'])]
+
+    fetch = RecordingFetch()
+    scores = manager._get_pointwise_raw_scores('medcpt', items, fetch)
+    print(f"=== sent {fetch.sent}, scores {scores}")
+    assert fetch.sent == [[('ct head', ['MRI Brain', 'CT Head with contrast'])]]
+    assert scores == [[9.0, 0.9, 21.0], [0.8]]
+
+    # Everything is cached now: nothing is sent
+    fetch = RecordingFetch()
+    assert manager._get_pointwise_raw_scores('medcpt', items, fetch) == scores
+    assert fetch.sent == []
+    stats = manager.score_cache.stats()
+    assert stats['pair_lookups'] == 8 and stats['pair_hits'] == 6
+
+def test_failed_fetch_fails_the_exam_only():
+    """An exam whose missing pairs couldn't be scored is None; other exams keep their scores."""
+    manager = make_manager()
+    manager.score_cache.set_pair_scores('medcpt', 'ncbi/MedCPT-Cross-Encoder', 'ct head', ['CT Head'], [0.9])
+    items = [('ct head', ['CT Head', 'MRI Brain']), ('us liver', ['US Abdomen'])]
+    scores = manager._get_pointwise_raw_scores('medcpt', items, RecordingFetch(fail_queries={'ct head'}))
+    assert scores == [None, [10.0]]
+    assert manager.score_cache.get_pair_scores('medcpt', 'ncbi/MedCPT-Cross-Encoder', 'ct head', ['MRI Brain']) == [None]
+
+def test_openrouter_list_cache_keyed_on_whole_list():
+    """LLM list scores are reused only for the identical, identically ordered candidate list."""
+    reranker = OpenRouterReranker('claude-3-haiku', api_key='test')
+    calls = []
+    def rank(query, documents):
+        calls.append(list(documents))
+        return [1.0 - 0.1 * i for i in range(len(documents))]
+    reranker.get_rerank_scores = rank
+    manager = make_manager({'llm': reranker})
+
+    documents = ['CT Head', 'CT Head with contrast', 'MRI Brain']
+    first = manager.get_rerank_scores('ct head', documents, 'llm')
+    assert manager.get_rerank_scores('ct head', list(documents), 'llm') == first
+    assert len(calls) == 1
+
+    manager.get_rerank_scores('ct head', documents[:2], 'llm')                 # subset
+    manager.get_rerank_scores('ct head', list(reversed(documents)), 'llm')     # reordered
+    manager.get_rerank_scores('ct head', documents + ['XR Skull'], 'llm')      # superset
+    assert len(calls) == 4
+
+    # Neutral (failure) scores are not cached
+    reranker.get_rerank_scores = lambda query, documents: calls.append(documents) or [0.5] * len(documents)
+    manager.get_rerank_scores('mri knee', ['MRI Knee'], 'llm')
+    manager.get_rerank_scores('mri knee', ['MRI Knee'], 'llm')
+    assert len(calls) == 6
+
+if __name__ == "__main__":
+    test_partial_hits_send_only_missing_docs()
+    test_failed_fetch_fails_the_exam_only()
+    test_openrouter_list_cache_keyed_on_whole_list()
+    print("\nAll rerank cache tests passed")
@@ -0,0 +1,113 @@
+#!/usr/bin/env python3
+"""
+Test script for the reranker cascade's escalate-or-decide rule with stubbed tier scores.
+"""
+
+import sys
+import os
+sys.path.append(os.path.join(os.path.dirname(__file__), '..', '..'))
+
+from nhs_lookup_engine import NHSLookupEngine
+
+CANDIDATES = [{'primary_source_name': name, '_parsed_components': {}} for name in ['CT Head', 'CT Head with contrast', 'MRI Brain']]
+CASCADE = {'tiers': ['medcpt', 'llm'], 'min_confidence': 0.7, 'min_margin': 0.1}
+
+class StubRerankerManager:
+    def __init__(self, healthy=True):
+        self.healthy = healthy
+
+    def get_cascade_config(self, reranker_key):
+        return CASCADE if reranker_key == 'cascade' else None
+
+    def get_available_rerankers(self):
+        return {}
+
+    def is_reranker_healthy(self, reranker_key):
+        return self.healthy
+
+def make_engine(component_scores, healthy=True):
+    engine = NHSLookupEngine.__new__(NHSLookupEngine)
+    engine.config = {'weights_final': {'reranker': 0.5, 'component': 0.5}}
+    engine.reranker_manager = StubRerankerManager(healthy)
+    engine.component_calls = 0
+    def component_score(input_exam, components, entry):
+        engine.component_calls += 1
+        return component_scores[entry['primary_source_name']]
+    engine._calculate_component_score = component_score
+    return engine
+
+def run_cascade(engine, tier_scores, reranker_key='cascade'):
+    """Drive _rerank_and_score, answering each rerank request with the next tier's stubbed scores."""
+    trace = {}
+    steps = engine._rerank_and_score('ct head', {}, CANDIDATES, [c['primary_source_name'] for c in CANDIDATES],
+                                     reranker_key, False, trace)
+    requested = []
+    reply = None
+    while True:
+        try:
+            request = steps.send(reply)
+        except StopIteration as done:
+            early_result, scoring = done.value
+            return early_result, scoring, trace, requested
+        requested.append(request[3])
+        reply = tier_scores[request[3]]
+
+def test_decisive_first_tier():
+    """A confident top score with a clear margin is decided by the cheap tier."""
+    engine = make_engine({'CT Head': 0.9, 'CT Head with contrast': 0.3, 'MRI Brain': 0.2})
+    _, scoring, trace, requested = run_cascade(engine, {'medcpt': [1.0, 0.2, 0.1]})
+    assert requested == ['medcpt']
+    assert trace['decided_by'] == 'medcpt' and not trace['escalated']
+    assert scoring[1]['primary_source_name'] == 'CT Head'
+    assert abs(scoring[2] - 0.95) < 1e-9
+
+def test_low_confidence_escalates_and_reuses_component_scores():
+    """Below min_confidence the next tier decides; component scores are computed once per candidate."""
+    engine = make_engine({'CT Head': 0.6, 'CT Head with contrast': 0.5, 'MRI Brain': 0.4})
+    _, scoring, trace, requested = run_cascade(engine, {'medcpt': [0.6, 0.5, 0.4], 'llm': [1.0, 0.1, 0.1]})
+    print(f"=== trace: {trace}")
+    assert requested == ['medcpt', 'llm']
+    assert trace['decided_by'] == 'llm' and trace['escalated']
+    assert [tier['reranker'] for tier in trace['tiers']] == ['medcpt', 'llm']
+    assert engine.component_calls == len(CANDIDATES)
+    assert scoring[3] == [0.6, 0.5, 0.4]
+
+def test_small_margin_escalates():
+    """A confident but close call (margin below min_margin) escalates."""
+    engine = make_engine({'CT Head': 0.8, 'CT Head with contrast': 0.8, 'MRI Brain': 0.1})
+    _, _, trace, requested = run_cascade(engine, {'medcpt': [1.0, 0.9, 0.1], 'llm': [1.0, 0.2, 0.1]})
+    assert trace['tiers'][0]['top_score'] >= CASCADE['min_confidence']
+    assert trace['tiers'][0]['margin'] < CASCADE['min_margin']
+    assert requested == ['medcpt', 'llm'] and trace['decided_by'] == 'llm'
+
+def test_failed_tier_uses_neutral_scores():
+    """A tier returning no usable scores falls back to neutral 0.5 rerank scores."""
+    engine = make_engine({'CT Head': 0.6, 'CT Head with contrast': 0.4, 'MRI Brain': 0.2})
+    _, scoring, trace, _ = run_cascade(engine, {'medcpt': [0.5, 0.5, 0.5], 'llm': [0.9]})
+    rerank_scores, _, _, _, final_scores, _ = scoring
+    assert trace['decided_by'] == 'llm'
+    assert rerank_scores == [0.5, 0.5, 0.5]
+    assert [round(score, 9) for score in final_scores] == [0.55, 0.45, 0.35]
+
+def test_open_circuit_blocks_escalation():
+    """An unhealthy next tier keeps the cheap tier's answer and records why."""
+    engine = make_engine({'CT Head': 0.6, 'CT Head with contrast': 0.5, 'MRI Brain': 0.4}, healthy=False)
+    _, _, trace, requested = run_cascade(engine, {'medcpt': [0.6, 0.5, 0.4]})
+    assert requested == ['medcpt']
+    assert trace['decided_by'] == 'medcpt' and 'escalation_skipped' in trace
+
+def test_non_clinical_exits_early():
+    """All-zero scores flag the input as non-clinical; no cascade without a cascade key."""
+    engine = make_engine({'CT Head': 0.6, 'CT Head with contrast': 0.5, 'MRI Brain': 0.4})
+    early_result, scoring, trace, requested = run_cascade(engine, {'medcpt': [0.0, 0.0, 0.0]}, reranker_key='medcpt')
+    assert early_result['error'] == 'EXCLUDED_NON_CLINICAL' and scoring is None
+    assert requested == ['medcpt'] and trace == {}
+
+if __name__ == "__main__":
+    test_decisive_first_tier()
+    test_low_confidence_escalates_and_reuses_component_scores()
+    test_small_margin_escalates()
+    test_failed_tier_uses_neutral_scores()
+    test_open_circuit_blocks_escalation()
+    test_non_clinical_exits_early()
+    print("\nAll reranker cascade tests passed")
@@ -0,0 +1,105 @@
+#!/usr/bin/env python3
+"""
+Test script for joining secondary pipeline improvements back into the consolidated batch artifact.
+"""
+
+import sys
+import os
+import json
+import tempfile
+sys.path.append(os.path.join(os.path.dirname(__file__), '..', '..'))
+
+from pipeline_integration import result_merge_key, apply_improvement
+from app import _write_consolidated_results
+
+def success_row(exam_name, request_hash=None, data_source='RIS-A', confidence=0.5):
+    output = {'exam_name': exam_name, 'clean_name': 'CT Head', 'snomed': {'id': '100', 'fsn': 'CT of head'},
+              'components': {'confidence': confidence}}
+    if request_hash:
+        output['request_hash'] = request_hash
+    return {'input': {'exam_name': exam_name, 'data_source': data_source}, 'output': output, 'status': 'success'}
+
+def improvement(name, snomed_id, confidence=0.92):
+    return {'consensus_best_match_procedure_name': name, 'consensus_best_match_snomed_id': snomed_id,
+            'consensus_snomed_fsn': f"{name} (procedure)", 'consensus_confidence': confidence,
+            'original_confidence': 0.5, 'agreement_score': 1.0, 'improved': True, 'cached': False}
+
+def test_merge_key_prefers_request_hash():
+    """Rows with the same exam name but different request hashes get different keys."""
+    a = success_row('CT HEAD', request_hash='hash-a')
+    b = success_row('CT HEAD', request_hash='hash-b', data_source='RIS-B')
+    assert result_merge_key(a) == 'hash-a' and result_merge_key(b) == 'hash-b'
+
+def test_merge_key_falls_back_to_input_hash():
+    """Without a request hash the key hashes the input, independent of key order."""
+    a = success_row('CT HEAD')
+    reordered = {'input': {'data_source': 'RIS-A', 'exam_name': 'CT HEAD'}, 'output': {}}
+    other_source = success_row('CT HEAD', data_source='RIS-B')
+    assert result_merge_key(a) == result_merge_key(reordered)
+    assert result_merge_key(a) != result_merge_key(other_source)
+    assert len(result_merge_key(a)) == 64
+
+def test_apply_improvement_overwrites_match():
+    """The consensus replaces the match and the original confidence is kept in the details."""
+    record = apply_improvement(success_row('CT HEAD', request_hash='hash-a'), improvement('CT Head and neck', '200'))
+    output = record['output']
+    assert output['clean_name'] == 'CT Head and neck'
+    assert output['snomed'] == {'id': '200', 'fsn': 'CT Head and neck (procedure)'}
+    assert output['components']['confidence'] == 0.92
+    assert output['secondary_pipeline_applied'] is True
+    assert output['secondary_pipeline_details']['original_confidence'] == 0.5
+
+    bare = apply_improvement({'output': {'exam_name': 'XR CHEST'}}, improvement('XR Chest', '300'))
+    assert bare['output']['snomed']['id'] == '300' and bare['output']['components']['confidence'] == 0.92
+
+def test_write_consolidated_results():
+    """Rows stream into valid JSON; improvements land only on the rows whose merge key matches."""
+    rows = [
+        success_row('CT HEAD', request_hash='hash-a'),
+        success_row('CT HEAD', request_hash='hash-b', data_source='RIS-B'),
+        {'input': {'exam_name': 'CT HEAD'}, 'error': 'boom', 'status': 'error'},
+        success_row('XR CHEST'),
+    ]
+    improvements = {'hash-b': improvement('CT Head and neck', '200'),
+                    result_merge_key(rows[3]): improvement('XR Chest PA', '300')}
+    with tempfile.TemporaryDirectory() as tmp:
+        results_path = os.path.join(tmp, 'results.jsonl')
+        consolidated_path = os.path.join(tmp, 'consolidated.json')
+        with open(results_path, 'w', encoding='utf-8') as f:
+            for row in rows:
+                f.write(json.dumps(row) + '\n')
+            f.write('\n')
+        merged = _write_consolidated_results(results_path, consolidated_path, {'total_processed': 4}, improvements)
+        with open(consolidated_path, 'r', encoding='utf-8') as f:
+            consolidated = json.load(f)
+
+    results = consolidated['results']
+    print(f"=== merged {merged}: {[r.get('output', {}).get('clean_name') for r in results]}")
+    assert merged == 2
+    assert consolidated['metadata'] == {'total_processed': 4}
+    assert len(results) == 4
+    assert results[0]['output']['clean_name'] == 'CT Head' and 'secondary_pipeline_applied' not in results[0]['output']
+    assert results[1]['output']['clean_name'] == 'CT Head and neck' and results[1]['output']['snomed']['id'] == '200'
+    assert results[2] == rows[2]
+    assert results[3]['output']['clean_name'] == 'XR Chest PA'
+
+def test_write_consolidated_results_without_improvements():
+    """An empty improvement index copies the rows unchanged."""
+    with tempfile.TemporaryDirectory() as tmp:
+        results_path = os.path.join(tmp, 'results.jsonl')
+        consolidated_path = os.path.join(tmp, 'consolidated.json')
+        with open(results_path, 'w', encoding='utf-8') as f:
+            f.write(json.dumps(success_row('CT HEAD', request_hash='hash-a')) + '\n')
+        merged = _write_consolidated_results(results_path, consolidated_path, {}, {})
+        with open(consolidated_path, 'r', encoding='utf-8') as f:
+            consolidated = json.load(f)
+    assert merged == 0
+    assert consolidated['results'] == [success_row('CT HEAD', request_hash='hash-a')]
+
+if __name__ == "__main__":
+    test_merge_key_prefers_request_hash()
+    test_merge_key_falls_back_to_input_hash()
+    test_apply_improvement_overwrites_match()
+    test_write_consolidated_results()
+    test_write_consolidated_results_without_improvements()
+    print("\nAll result merge tests passed")
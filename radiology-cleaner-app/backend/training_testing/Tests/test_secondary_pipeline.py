@@ -0,0 +1,336 @@
+#!/usr/bin/env python3
+"""
+Test script for the secondary ensemble with stubbed model calls: quorum early exit and the sliding window.
+"""
+
+import sys
+import os
+import asyncio
+import logging
+import time
+import json
+import threading
+from collections import deque
+from types import SimpleNamespace
+sys.path.append(os.path.join(os.path.dirname(__file__), '..', '..'))
+
+from secondary_pipeline import OpenRouterEnsemble, ModelResponse, SecondaryPipeline, EnsembleResult
+from rate_limiter import estimate_tokens
+from ensemble_cache import EnsembleResultCache
+from tiered_cache import TieredCache
+from pipeline_integration import ConcurrentSecondaryProcessor, apply_improvement
+
+CANDIDATES = [{'snomed_id': '1', 'primary_name': 'CT Head'}, {'snomed_id': '2', 'primary_name': 'CT Head with contrast'},
+              {'snomed_id': '3', 'primary_name': 'MRI Brain'}]
+
+class LogCapture(logging.Handler):
+    def __init__(self):
+        super().__init__()
+        self.messages = []
+
+    def emit(self, record):
+        self.messages.append(record.getMessage())
+
+def make_ensemble(answers, **quorum):
+    """answers: model -> (delay seconds, chosen SNOMED id)."""
+    ensemble = OpenRouterEnsemble.__new__(OpenRouterEnsemble)
+    ensemble.models = list(answers)
+    ensemble.quorum_config = {'enabled': True, **quorum}
+    ensemble.cancelled = []
+    async def query_model(model, exam_name, context):
+        delay, snomed_id = answers[model]
+        try:
+            await asyncio.sleep(delay)
+        except asyncio.CancelledError:
+            ensemble.cancelled.append(model)
+            raise
+        return ModelResponse(model=model, best_match_snomed_id=snomed_id, best_match_procedure_name=None,
+                             confidence=0.9, reasoning='', raw_response='{}', processing_time=delay)
+    ensemble.query_model = query_model
+    return ensemble
+
+def adjudicate(ensemble, settle_seconds=0.0):
+    async def run():
+        result = await ensemble.process_ensemble('ct head', {'similar_exams': CANDIDATES, 'original_confidence': 0.5})
+        await asyncio.sleep(settle_seconds)  # let outstanding calls finish or observe their cancellation
+        return result
+    return asyncio.run(run())
+
+def test_quorum_reached_cancels_outstanding():
+    """Two agreeing fast models decide; the slow model is cancelled and reported as unanswered."""
+    ensemble = make_ensemble({'fast-a': (0.01, '1'), 'fast-b': (0.02, '1'), 'slow': (5.0, '2')}, min_agreement=2)
+    result = adjudicate(ensemble, settle_seconds=0.01)
+    print(f"=== consensus {result.consensus_best_match_snomed_id}, unanswered {result.unanswered_models}")
+    assert result.consensus_best_match_snomed_id == '1'
+    assert result.consensus_best_match_procedure_name == 'CT Head'
+    assert [r.model for r in result.model_responses] == ['fast-a', 'fast-b']
+    assert result.unanswered_models == ['slow'] and ensemble.cancelled == ['slow']
+    assert result.agreement_score == 1.0 and result.improved
+
+def test_quorum_not_reached_waits_for_all():
+    """Without enough agreement every model is waited for and the vote uses all responses."""
+    ensemble = make_ensemble({'a': (0.01, '1'), 'b': (0.02, '2'), 'c': (0.03, '3')}, min_agreement=2)
+    result = adjudicate(ensemble)
+    assert len(result.model_responses) == 3
+    assert result.unanswered_models == [] and ensemble.cancelled == []
+    assert abs(result.agreement_score - 1 / 3) < 1e-9
+
+def test_default_quorum_is_majority():
+    """With min_agreement null a simple majority of the configured models is enough."""
+    ensemble = make_ensemble({'a': (0.01, '2'), 'b': (0.02, '2'), 'c': (5.0, '2')}, min_agreement=None)
+    result = adjudicate(ensemble, settle_seconds=0.01)
+    assert result.unanswered_models == ['c'] and result.consensus_best_match_snomed_id == '2'
+
+def test_outstanding_log_lets_calls_finish():
+    """outstanding: log leaves late calls running and logs their answer without changing the result."""
+    capture = LogCapture()
+    logger = logging.getLogger('secondary_pipeline')
+    logger.addHandler(capture)
+    previous_level = logger.level
+    logger.setLevel(logging.INFO)
+    try:
+        ensemble = make_ensemble({'fast-a': (0.01, '1'), 'fast-b': (0.02, '1'), 'late': (0.1, '3')},
+                                 min_agreement=2, outstanding='log')
+        result = adjudicate(ensemble, settle_seconds=0.2)
+    finally:
+        logger.removeHandler(capture)
+        logger.setLevel(previous_level)
+    late = [m for m in capture.messages if m.startswith('Late response')]
+    print(f"=== late log: {late}")
+    assert ensemble.cancelled == []
+    assert result.unanswered_models == ['late'] and len(result.model_responses) == 2
+    assert len(late) == 1 and 'from late' in late[0] and 'SNOMED 3' in late[0]
+
+class StubEnsemble:
+    """Adjudicates each exam after a per-exam delay, tracking concurrency and cancellations."""
+    def __init__(self, delays):
+        self.delays = delays
+        self.models = ['stub/model']
+        self.system_prompt = ''
+        self.in_flight = self.max_in_flight = 0
+        self.cancelled = []
+
+    def candidates_for(self, model, candidates):
+        return candidates
+
+    async def process_ensemble(self, exam_name, context):
+        self.in_flight += 1
+        self.max_in_flight = max(self.max_in_flight, self.in_flight)
+        try:
+            await asyncio.sleep(self.delays[exam_name])
+        except asyncio.CancelledError:
+            self.cancelled.append(exam_name)
+            raise
+        finally:
+            self.in_flight -= 1
+        return EnsembleResult(original_result=context['original_result'], consensus_best_match_snomed_id='1',
+                              consensus_best_match_procedure_name='CT Head', consensus_snomed_fsn=None,
+                              consensus_confidence=0.9, model_responses=[], agreement_score=1.0,
+                              final_reasoning='', improved=True, timestamp='')
+
+def make_pipeline(delays, max_concurrent_requests=2):
+    pipeline = SecondaryPipeline.__new__(SecondaryPipeline)
+    pipeline.config = {'secondary_pipeline': {'max_concurrent_requests': max_concurrent_requests}}
+    pipeline.ensemble = StubEnsemble(delays)
+    pipeline.result_cache = EnsembleResultCache(enabled=False)
+    return pipeline
+
+def rows(names):
+    return [{'input': {'exam_name': name},
+             'output': {'exam_name': name, 'components': {'confidence': 0.5}, 'all_candidates': []}}
+            for name in names]
+
+def test_window_keeps_slots_busy_past_slow_exam():
+    """A slow exam holds one slot while the fast exams stream through the other."""
+    delays = {'slow': 0.3, 'f1': 0.02, 'f2': 0.02, 'f3': 0.02, 'f4': 0.02}
+    pipeline = make_pipeline(delays)
+    settled = []
+    async def run():
+        started = time.monotonic()
+        order = [(r.original_result['input']['exam_name'], time.monotonic() - started)
+                 async for r in pipeline.stream_low_confidence_results(rows(delays), on_settled=settled.append)]
+        return order
+    order = asyncio.run(run())
+    print(f"=== completion order: {order}")
+    assert [name for name, _ in order] == ['f1', 'f2', 'f3', 'f4', 'slow']
+    assert order[3][1] < 0.2  # the fast exams did not wait for the slow one
+    assert order[4][1] < 0.4  # nor did the slow one wait for a whole group
+    assert pipeline.ensemble.max_in_flight == 2
+    assert sorted(r['input']['exam_name'] for r in settled) == sorted(delays)
+
+def test_early_close_cancels_in_flight():
+    """Closing the stream after the first result cancels the exams still in flight and settles them."""
+    delays = {'fast': 0.01, 'slow-a': 5.0, 'slow-b': 5.0, 'queued': 0.01}
+    pipeline = make_pipeline(delays, max_concurrent_requests=3)
+    settled = []
+    async def source():
+        for result in rows(delays):
+            yield result
+    async def run():
+        stream = pipeline.stream_low_confidence_results(source(), on_settled=settled.append)
+        first = await stream.__anext__()
+        await stream.aclose()
+        await asyncio.sleep(0)  # let the cancellations land
+        return first
+    first = asyncio.run(run())
+    assert first.original_result['input']['exam_name'] == 'fast'
+    assert sorted(pipeline.ensemble.cancelled) == ['slow-a', 'slow-b']
+    assert [r['input']['exam_name'] for r in settled] == ['fast', 'slow-a', 'slow-b']
+    assert pipeline.ensemble.in_flight == 0
+
+class CountingEnsemble(OpenRouterEnsemble):
+    """Answers every query_model call with SNOMED 1; models listed in `failing` return an empty raw response."""
+    def __init__(self, models, confidence=0.6, failing=()):
+        self.models = list(models)
+        self.quorum_config = {}
+        self.candidate_config = {}
+        self.candidate_encoding = 'compact'
+        self.system_prompt = 'stub prompt'
+        self.confidence = confidence
+        self.failing = set(failing)
+        self.calls = []
+
+    async def query_model(self, model, exam_name, context):
+        self.calls.append((model, exam_name))
+        raw_response = '' if model in self.failing else '{}'
+        return ModelResponse(model=model, best_match_snomed_id=None if model in self.failing else '1',
+                             best_match_procedure_name=None, confidence=self.confidence, reasoning='',
+                             raw_response=raw_response, processing_time=0.0)
+
+def make_cached_pipeline(ensemble, max_concurrent_requests=1):
+    pipeline = SecondaryPipeline.__new__(SecondaryPipeline)
+    pipeline.config = {'secondary_pipeline': {'max_concurrent_requests': max_concurrent_requests,
+                                              'confidence_threshold': 0.8}}
+    pipeline.ensemble = ensemble
+    pipeline.result_cache = EnsembleResultCache(cache=TieredCache(default_ttl=None, version='test'))
+    return pipeline
+
+def candidate_row(name, confidence):
+    return {'input': {'exam_name': name},
+            'output': {'exam_name': name, 'components': {'confidence': confidence}, 'all_candidates': CANDIDATES}}
+
+def stream(pipeline, results):
+    async def run():
+        return [r async for r in pipeline.stream_low_confidence_results(results)]
+    return asyncio.run(run())
+
+def test_repeat_exam_served_from_cache():
+    """A second identical exam reuses the adjudication without calling a model; improved uses its own confidence."""
+    ensemble = CountingEnsemble(['model-a', 'model-b'], confidence=0.6)
+    pipeline = make_cached_pipeline(ensemble)
+    first, second = stream(pipeline, [candidate_row('CT HEAD', 0.5), candidate_row('CT HEAD', 0.7)])
+    print(f"=== calls {ensemble.calls}; cached {first.cached}/{second.cached}")
+    assert len(ensemble.calls) == 2
+    assert not first.cached and first.improved
+    assert second.cached and not second.improved  # 0.6 beats 0.5 but not 0.7
+    assert second.original_result['output']['components']['confidence'] == 0.7
+    assert second.consensus_best_match_snomed_id == '1' and len(second.model_responses) == 2
+    assert pipeline.result_cache.stats()['hits'] == 1
+
+def test_failed_model_response_not_cached():
+    """An adjudication with an empty raw response is not stored, so the repeat is re-adjudicated."""
+    ensemble = CountingEnsemble(['model-a', 'model-b'], failing={'model-b'})
+    pipeline = make_cached_pipeline(ensemble)
+    first, second = stream(pipeline, [candidate_row('CT HEAD', 0.5), candidate_row('CT HEAD', 0.5)])
+    assert len(ensemble.calls) == 4
+    assert not first.cached and not second.cached
+    assert pipeline.result_cache.stats()['stores'] == 0
+
+def test_cached_flag_reaches_batch_output():
+    """Through the concurrent queue, a cache hit is reported as cached in secondary_pipeline_details."""
+    ensemble = CountingEnsemble(['model-a'], confidence=0.6)
+    pipeline = make_cached_pipeline(ensemble)
+    processor = ConcurrentSecondaryProcessor(pipeline)
+    first, second = candidate_row('CT HEAD', 0.5), candidate_row('CT HEAD', 0.7)
+    first['output']['request_hash'], second['output']['request_hash'] = 'hash-a', 'hash-b'
+    processor.submit(first)
+    processor.submit(second)
+    report = processor.finish(timeout=5)
+    assert len(ensemble.calls) == 1
+    details_a = apply_improvement(first, report['improvements']['hash-a'])['output']['secondary_pipeline_details']
+    details_b = apply_improvement(second, report['improvements']['hash-b'])['output']['secondary_pipeline_details']
+    print(f"=== details {details_a} / {details_b}")
+    assert details_a['cached'] is False and details_a['improved'] is True
+    assert details_b['cached'] is True and details_b['improved'] is False
+    assert details_b['original_confidence'] == 0.7
+
+class RecordingCompletions:
+    """Stands in for client.chat.completions: records each request and answers with candidate C1."""
+    def __init__(self, cached_tokens=0):
+        self.requests = []
+        self.cached_tokens = cached_tokens
+
+    async def create(self, **request):
+        self.requests.append(request)
+        arguments = json.dumps({'best_match_snomed_id': 'C1', 'best_match_procedure_name': 'CT Head',
+                                'confidence': 0.9, 'reasoning': 'exact match'})
+        tool_call = SimpleNamespace(function=SimpleNamespace(name='select_best_match', arguments=arguments))
+        usage = SimpleNamespace(prompt_tokens=1200, completion_tokens=40, total_tokens=1240,
+                                prompt_tokens_details=SimpleNamespace(cached_tokens=self.cached_tokens))
+        return SimpleNamespace(choices=[SimpleNamespace(message=SimpleNamespace(tool_calls=[tool_call]))], usage=usage)
+
+def make_prompt_ensemble(prompt_cache=None, cached_tokens=0):
+    ensemble = OpenRouterEnsemble.__new__(OpenRouterEnsemble)
+    ensemble.config = {'system_prompt': 'You are a radiology coding assistant.', 'max_tokens': 800}
+    ensemble.models = ['anthropic/claude-3.5-sonnet', 'openai/gpt-4o']
+    ensemble.quorum_config = {}
+    ensemble.candidate_config = {}
+    ensemble.candidate_encoding = 'compact'
+    ensemble._encoding_stats = {'calls': 0, 'candidates': 0, 'encoded_tokens': 0}
+    ensemble._encoding_sample = deque(maxlen=10)
+    ensemble._encoding_lock = threading.Lock()
+    ensemble.prompt_cache_config = prompt_cache if prompt_cache is not None else {}
+    ensemble.system_prompt = ensemble._build_system_prompt()
+    ensemble.tools = ensemble._build_tools()
+    ensemble._tools_tokens = estimate_tokens(json.dumps(ensemble.tools))
+    ensemble.client = SimpleNamespace(chat=SimpleNamespace(completions=RecordingCompletions(cached_tokens)))
+    return ensemble
+
+def test_system_message_cache_control():
+    """Anthropic models get a cache_control breakpoint on the system prompt; others get a plain string."""
+    ensemble = make_prompt_ensemble()
+    anthropic = ensemble._system_message('anthropic/claude-3.5-sonnet')
+    assert anthropic['content'] == [{'type': 'text', 'text': ensemble.system_prompt, 'cache_control': {'type': 'ephemeral'}}]
+    assert ensemble._system_message('openai/gpt-4o') == {'role': 'system', 'content': ensemble.system_prompt}
+    assert ensemble.system_prompt.startswith('You are a radiology coding assistant.\n\n')
+    assert 'id|primary_name|snomed_fsn|score' in ensemble.system_prompt
+
+    disabled = make_prompt_ensemble({'enabled': False})
+    assert not disabled._uses_cache_control('anthropic/claude-3.5-sonnet')
+    custom = make_prompt_ensemble({'cache_control_models': ['google/']})
+    assert custom._uses_cache_control('google/gemini-pro') and not custom._uses_cache_control('anthropic/claude-3.5-sonnet')
+
+def test_static_prefix_identical_across_exams():
+    """System message and tools are byte-identical for different exams; only the user message changes."""
+    ensemble = make_prompt_ensemble()
+    async def run():
+        for exam_name in ['CT HEAD', 'MRI KNEE LEFT']:
+            await ensemble.query_model('anthropic/claude-3.5-sonnet', exam_name, {'similar_exams': CANDIDATES})
+    asyncio.run(run())
+    first, second = ensemble.client.chat.completions.requests
+    assert json.dumps(first['messages'][0]) == json.dumps(second['messages'][0])
+    assert json.dumps(first['tools']) == json.dumps(second['tools'])
+    assert first['messages'][1] != second['messages'][1]
+
+def test_cached_prompt_tokens_reach_model_response():
+    """usage.prompt_tokens_details.cached_tokens is reported on the ModelResponse."""
+    ensemble = make_prompt_ensemble(cached_tokens=1024)
+    response = asyncio.run(ensemble.query_model('anthropic/claude-3.5-sonnet', 'CT HEAD', {'similar_exams': CANDIDATES}))
+    print(f"=== {response.prompt_tokens} prompt tokens, {response.cached_prompt_tokens} cached")
+    assert response.raw_response and response.best_match_snomed_id == '1'
+    assert response.prompt_tokens == 1200 and response.cached_prompt_tokens == 1024
+
+if __name__ == "__main__":
+    test_quorum_reached_cancels_outstanding()
+    test_quorum_not_reached_waits_for_all()
+    test_default_quorum_is_majority()
+    test_outstanding_log_lets_calls_finish()
+    test_window_keeps_slots_busy_past_slow_exam()
+    test_early_close_cancels_in_flight()
+    test_repeat_exam_served_from_cache()
+    test_failed_model_response_not_cached()
+    test_cached_flag_reaches_batch_output()
+    test_system_message_cache_control()
+    test_static_prefix_identical_across_exams()
+    test_cached_prompt_tokens_reach_model_response()
+    print("\nAll secondary pipeline tests passed")
@@ -0,0 +1,159 @@
+#!/usr/bin/env python3
+"""
+Test script for the concurrent secondary queue's benefit ordering, in-flight tracking and skip reporting.
+"""
+
+import sys
+import os
+import time
+sys.path.append(os.path.join(os.path.dirname(__file__), '..', '..'))
+
+import pipeline_integration
+from pipeline_integration import ConcurrentSecondaryProcessor
+from secondary_pipeline import EnsembleResult
+
+class InlineRuntime:
+    """Runs loop callbacks immediately and never starts the consumer, so the queue can be driven by hand."""
+    def __init__(self):
+        self.loop = self
+
+    def call_soon_threadsafe(self, callback, *args):
+        callback(*args)
+
+    def submit(self, coro):
+        coro.close()
+        return None
+
+class StubPipeline:
+    """Adjudicates every result it is given, except exam names listed in `drop` (settled but never yielded)."""
+    def __init__(self, drop=(), **scheduling):
+        self.config = {'secondary_pipeline': {'confidence_threshold': 0.8, 'scheduling': scheduling}}
+        self.drop = set(drop)
+        self.seen_in_flight = []
+
+    async def stream_low_confidence_results(self, results, on_settled=None):
+        async for result in results:
+            self.seen_in_flight.append(dict(self.processor._in_flight_names))
+            on_settled(result)
+            if result['input']['exam_name'] in self.drop:
+                continue
+            yield EnsembleResult(original_result=result, consensus_best_match_snomed_id='1',
+                                 consensus_best_match_procedure_name='Adjudicated', consensus_snomed_fsn=None,
+                                 consensus_confidence=0.95, model_responses=[], agreement_score=1.0,
+                                 final_reasoning='', improved=True, timestamp='')
+
+    def generate_improvement_report(self, results):
+        return {'total_processed': len(results), 'improved_results': sum(1 for r in results if r.improved)}
+
+def row(name, confidence, candidates=(0.9, 0.1)):
+    return {'input': {'exam_name': name},
+            'output': {'components': {'confidence': confidence},
+                       'all_candidates': [{'confidence': c} for c in candidates]}}
+
+def make_queue(**scheduling):
+    original = pipeline_integration.get_async_runtime
+    pipeline_integration.get_async_runtime = InlineRuntime
+    try:
+        return ConcurrentSecondaryProcessor(StubPipeline(**scheduling))
+    finally:
+        pipeline_integration.get_async_runtime = original
+
+def pop_names(queue, n):
+    names = []
+    for _ in range(n):
+        result = queue._pop_next()
+        queue._in_flight_names[queue._exam_name(result)] += 1
+        names.append(result['input']['exam_name'])
+    return names
+
+def test_benefit_terms():
+    """Lower confidence, a smaller top-2 margin and a more frequent name all raise the benefit."""
+    queue = make_queue()
+    assert queue._benefit(row('A', 0.2)) > queue._benefit(row('A', 0.6))
+    assert queue._benefit(row('A', 0.5, (0.5, 0.45))) > queue._benefit(row('A', 0.5, (0.9, 0.1)))
+    before = queue._benefit(row('B', 0.5))
+    for _ in range(3):
+        queue.submit(row('B', 0.95))  # high-confidence repeats are counted but not queued
+    assert queue._benefit(row('B', 0.5)) > before
+    assert queue.queued == 0
+    assert abs(queue._benefit(row('C', 0.0, ())) - 1.0) < 1e-9  # no margin term without two candidates
+
+def test_pop_next_orders_by_benefit():
+    """Results leave the queue highest benefit first, with frequency counts refreshed as rows arrive."""
+    queue = make_queue()
+    queue.submit(row('mid', 0.5))
+    queue.submit(row('low', 0.1))
+    queue.submit(row('high', 0.7))
+    queue.submit(row('repeat', 0.6))
+    for _ in range(20):
+        queue.submit(row('repeat', 0.95))  # raises 'repeat' after it was queued
+    order = pop_names(queue, 4)
+    print(f"=== pop order: {order}")
+    assert order == ['low', 'repeat', 'mid', 'high']
+    assert queue._pending_count == 0
+
+def test_pop_next_defers_names_in_flight():
+    """A repeat of a name already being adjudicated waits behind other names, then runs once it settles."""
+    queue = make_queue()
+    queue.submit(row('CT Head', 0.1))
+    queue.submit(row('CT Head', 0.1))
+    queue.submit(row('XR Chest', 0.7))
+    assert pop_names(queue, 2) == ['CT Head', 'XR Chest']
+
+    queue.submit(row('MRI Knee', 0.75))
+    first = queue._pop_next()
+    assert first['input']['exam_name'] == 'MRI Knee'  # 'CT Head' still in flight
+    queue._in_flight_names['MRI Knee'] += 1
+    queue._settled(row('CT Head', 0.1))
+    assert 'CT Head' not in queue._in_flight_names
+    assert pop_names(queue, 1) == ['CT Head']
+
+def test_fifo_when_scheduling_disabled():
+    """With scheduling disabled results are adjudicated in arrival order."""
+    queue = make_queue(enabled=False)
+    for name, confidence in [('a', 0.7), ('b', 0.1), ('c', 0.4)]:
+        queue.submit(row(name, confidence))
+    assert pop_names(queue, 3) == ['a', 'b', 'c']
+
+def test_skip_reporting():
+    """Results still queued at the limit are counted by reason and listed (up to 50 names)."""
+    queue = make_queue()
+    for i in range(60):
+        queue.submit(row(f"exam {i}", 0.5))
+    queue._skip_pending('llm_budget')
+    assert queue.skipped == {'llm_budget': 60}
+    assert len(queue.skipped_exams) == 50
+    assert queue._pending_count == 0 and not queue._pending
+
+def test_wall_time_skips_reported_by_finish():
+    """End to end on the background loop: past max_wall_seconds, finish() reports the skipped rows."""
+    pipeline = StubPipeline(max_wall_seconds=0)
+    pipeline.processor = processor = ConcurrentSecondaryProcessor(pipeline)
+    time.sleep(0.01)
+    processor.submit(row('CT Head', 0.5))
+    processor.submit(row('XR Chest', 0.5))
+    report = processor.finish(timeout=5)
+    print(f"=== report: {report}")
+    assert report['skipped'] == {'total': 2, 'by_reason': {'wall_time': 2}, 'exams': ['CT Head', 'XR Chest']}
+    assert report['improvements'] == {}
+
+def test_dropped_results_leave_flight():
+    """Results the stream settles without yielding still leave the in-flight counts."""
+    pipeline = StubPipeline(drop={'CT Head'})
+    pipeline.processor = processor = ConcurrentSecondaryProcessor(pipeline)
+    for name in ['CT Head', 'CT Head', 'XR Chest']:
+        processor.submit(row(name, 0.5))
+    report = processor.finish(timeout=5)
+    assert report['total_processed'] == 1 and len(report['improvements']) == 1
+    assert all(count == 1 for seen in pipeline.seen_in_flight for count in seen.values())
+    assert not processor._in_flight_names
+
+if __name__ == "__main__":
+    test_benefit_terms()
+    test_pop_next_orders_by_benefit()
+    test_pop_next_defers_names_in_flight()
+    test_fifo_when_scheduling_disabled()
+    test_skip_reporting()
+    test_wall_time_skips_reported_by_finish()
+    test_dropped_results_leave_flight()
+    print("\nAll secondary scheduler tests passed")
@@ -0,0 +1,97 @@
+#!/usr/bin/env python3
+"""
+Test script for the pooled SQLite access layer under concurrency.
+"""
+
+import sys
+import os
+import tempfile
+import threading
+from concurrent.futures import ThreadPoolExecutor
+sys.path.append(os.path.join(os.path.dirname(__file__), '..', '..'))
+
+from sqlite_pool import SQLitePool
+
+def make_pool(directory: str, **kwargs) -> SQLitePool:
+    pool = SQLitePool(os.path.join(directory, 'pool_test.db'), flush_interval=60.0, **kwargs)
+    with pool.connection() as conn:
+        conn.execute('CREATE TABLE IF NOT EXISTS rows (thread TEXT, value INTEGER)')
+    return pool
+
+def test_connections_bounded_across_threads():
+    """Many short-lived threads share at most max_connections connections and lose no writes."""
+    with tempfile.TemporaryDirectory() as directory:
+        pool = make_pool(directory, max_connections=3)
+
+        def work(chunk: int, item: int):
+            with pool.connection() as conn:
+                conn.execute('INSERT INTO rows VALUES (?, ?)', (threading.current_thread().name, chunk * 100 + item))
+
+        # A fresh executor per chunk, like _process_batch
+        for chunk in range(10):
+            with ThreadPoolExecutor(max_workers=8) as executor:
+                for future in [executor.submit(work, chunk, item) for item in range(20)]:
+                    future.result()
+            assert pool.connection_count() <= 3
+
+        with pool.connection() as conn:
+            count = conn.execute('SELECT COUNT(*) FROM rows').fetchone()[0]
+        print(f"=== {count} rows written through {pool.connection_count()} connections")
+        assert count == 200
+        pool.close()
+
+def test_nested_blocks_share_transaction():
+    """A nested block reuses the outer connection; an error rolls back the whole transaction."""
+    with tempfile.TemporaryDirectory() as directory:
+        pool = make_pool(directory, max_connections=1)
+        try:
+            with pool.connection() as outer:
+                outer.execute("INSERT INTO rows VALUES ('outer', 1)")
+                with pool.connection() as inner:
+                    assert inner is outer
+                    inner.execute("INSERT INTO rows VALUES ('inner', 2)")
+                raise RuntimeError('abort')
+        except RuntimeError:
+            pass
+        with pool.connection() as conn:
+            assert conn.execute('SELECT COUNT(*) FROM rows').fetchone()[0] == 0
+        pool.close()
+
+def test_buffered_writes_from_many_threads():
+    """buffer_write from concurrent threads flushes every row exactly once."""
+    with tempfile.TemporaryDirectory() as directory:
+        pool = make_pool(directory, max_connections=2, write_batch_size=50)
+
+        def writer(thread_id: int):
+            for value in range(100):
+                pool.buffer_write('INSERT INTO rows VALUES (?, ?)', (f"t{thread_id}", value))
+
+        with ThreadPoolExecutor(max_workers=8) as executor:
+            for future in [executor.submit(writer, thread_id) for thread_id in range(8)]:
+                future.result()
+        pool.flush()
+
+        assert pool.pending_writes() == 0
+        with pool.connection() as conn:
+            assert conn.execute('SELECT COUNT(*) FROM rows').fetchone()[0] == 800
+            assert conn.execute('SELECT COUNT(DISTINCT thread || value) FROM rows').fetchone()[0] == 800
+        pool.close()
+
+def test_connection_hooks_reach_existing_connections():
+    """Hooks registered after connections exist still run once per connection."""
+    with tempfile.TemporaryDirectory() as directory:
+        pool = make_pool(directory, max_connections=2)
+        calls = []
+        pool.add_connection_hook(lambda conn: (calls.append(id(conn)), conn.execute('PRAGMA recursive_triggers = ON')))
+        for _ in range(3):
+            with pool.connection() as conn:
+                assert conn.execute('PRAGMA recursive_triggers').fetchone()[0] == 1
+        assert len(calls) == len(set(calls)) == pool.connection_count()
+        pool.close()
+
+if __name__ == "__main__":
+    test_connections_bounded_across_threads()
+    test_nested_blocks_share_transaction()
+    test_buffered_writes_from_many_threads()
+    test_connection_hooks_reach_existing_connections()
+    print("\nAll SQLite pool tests passed")
@@ -0,0 +1,40 @@
+#!/usr/bin/env python3
+"""
+Test script for batch string similarity used by the complexity filter.
+"""
+
+import sys
+import os
+sys.path.append(os.path.join(os.path.dirname(__file__), '..', '..'))
+
+from string_similarity import batch_ratio, normalize_for_similarity, ratio, RAPIDFUZZ_AVAILABLE
+
+def test_batch_matches_pairwise():
+    """Batch scores should line up with single-pair scores."""
+    query = "CT Chest"
+    choices = ["ct chest", "ct chest abdomen pelvis", "mri head", ""]
+    batch = batch_ratio(query, choices)
+
+    print(f"=== Batch similarity (rapidfuzz={RAPIDFUZZ_AVAILABLE}) ===")
+    for choice, score in zip(choices, batch):
+        print(f"  '{choice}' -> {score:.3f}")
+
+    assert len(batch) == len(choices)
+    assert batch[0] == 1.0
+    assert batch[-1] == 0.0
+    assert batch[0] > batch[1] > batch[2]
+    for choice, score in zip(choices, batch):
+        assert abs(score - ratio(query, choice)) < 1e-6
+
+def test_prenormalized_choices():
+    """Pre-normalized catalog keys give the same result as raw strings."""
+    raw = ["  US Abdomen ", "XR Chest"]
+    keys = [normalize_for_similarity(c) for c in raw]
+    assert batch_ratio("us abdomen", keys, normalized=True) == batch_ratio("US Abdomen", raw)
+    assert batch_ratio("", raw) == [0.0, 0.0]
+    assert batch_ratio("us abdomen", []) == []
+
+if __name__ == "__main__":
+    test_batch_matches_pairwise()
+    test_prenormalized_choices()
+    print("\nAll string similarity tests passed")
@@ -0,0 +1,34 @@
+#!/usr/bin/env python3
+"""
+Test script for the offline OpenRouter stub's per-model outcome counts.
+"""
+
+import sys
+import os
+import requests
+sys.path.append(os.path.join(os.path.dirname(__file__), '..'))
+
+from stub_openrouter import start_stub_server, stub_base_url
+
+def test_client_hang_up_counted_as_cancelled():
+    """A client that gives up before the response is written is counted as 'cancelled', not 'ok'."""
+    server = start_stub_server({'default': {'latency_ms': {'median': 200, 'sigma': 0.0}}}, seed=1)
+    url = f"{stub_base_url(server)}/chat/completions"
+    try:
+        try:
+            requests.post(url, json={'model': 'stub/model', 'messages': []}, timeout=0.05)
+            assert False, "expected the request to time out"
+        except requests.exceptions.Timeout:
+            pass
+        response = requests.post(url, json={'model': 'stub/model', 'messages': []}, timeout=5)
+        assert response.status_code == 200
+        assert server.state.wait_idle(timeout=5)
+        stats = server.state.stats()
+        print(f"=== stub stats: {stats}")
+        assert stats == {'stub/model': {'cancelled': 1, 'ok': 1}}
+    finally:
+        server.shutdown()
+
+if __name__ == "__main__":
+    test_client_hang_up_counted_as_cancelled()
+    print("\nAll stub OpenRouter tests passed")
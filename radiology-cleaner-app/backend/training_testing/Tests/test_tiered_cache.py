@@ -0,0 +1,104 @@
+#!/usr/bin/env python3
+"""
+Test script for the unified tiered cache (LRU memory tier + SQLite tier).
+"""
+
+import sys
+import os
+import time
+import tempfile
+sys.path.append(os.path.join(os.path.dirname(__file__), '..', '..'))
+
+from tiered_cache import TieredCache, SQLiteCacheTier
+
+def test_lru_eviction_and_stats():
+    """Least recently used entries are evicted and counted per namespace."""
+    cache = TieredCache(max_entries=2, default_ttl=None, version='v1')
+    cache.set('results', 'a', {'value': 1})
+    cache.set('results', 'b', {'value': 2})
+    assert cache.get('results', 'a') == {'value': 1}  # 'a' becomes most recent
+    cache.set('results', 'c', {'value': 3})           # evicts 'b'
+
+    assert cache.get('results', 'b') is None
+    assert cache.get('results', 'c') == {'value': 3}
+
+    stats = cache.stats()['namespaces']['results']
+    print(f"Namespace stats: {stats}")
+    assert stats['evictions'] == 1
+    assert stats['hits'] == 2 and stats['misses'] == 1
+    assert stats['entries'] == 2
+
+def test_ttl_and_byte_budget():
+    """Expired entries miss; the byte budget bounds memory usage."""
+    cache = TieredCache(max_entries=100, max_bytes=40, default_ttl=60, version='v1')
+    cache.set('scores', 'short', [0.1], ttl=0.01)
+    time.sleep(0.02)
+    assert cache.get('scores', 'short') is None
+
+    for i in range(10):
+        cache.set('scores', i, 'x' * 10)
+    assert cache.stats()['bytes'] <= 40
+
+def test_sqlite_tier_persists_across_instances():
+    """Entries flushed to SQLite are visible to a new cache with the same version only."""
+    with tempfile.TemporaryDirectory() as tmp:
+        db_path = os.path.join(tmp, 'cache.db')
+        cache = TieredCache(version='v1', sqlite_tier=SQLiteCacheTier(db_path, batch_size=10))
+        cache.set('results', 'exam', {'snomed_id': '123'})
+        cache.close()
+
+        reopened = TieredCache(version='v1', sqlite_tier=SQLiteCacheTier(db_path))
+        assert reopened.get('results', 'exam') == {'snomed_id': '123'}
+        assert reopened.stats()['namespaces']['results']['sqlite_hits'] == 1
+        reopened.close()
+
+        new_version = TieredCache(version='v2', sqlite_tier=SQLiteCacheTier(db_path))
+        assert new_version.get('results', 'exam') is None
+        new_version.close()
+
+def test_version_resolved_once_and_fallback_memoized():
+    """A failing version source is not retried per call, and a failed refresh keeps the memory tier."""
+    calls = []
+    def failing_source():
+        calls.append(time.monotonic())
+        raise RuntimeError('R2 unavailable')
+
+    cache = TieredCache(version=failing_source, version_refresh_seconds=None)
+    for i in range(50):
+        cache.set('results', i, i)
+        cache.get('results', i)
+    assert cache.version == 'unversioned'
+    assert len(calls) == 1
+
+    versions = iter(['v1'])
+    def flaky_source():
+        version = next(versions, None)
+        if version is None:
+            raise RuntimeError('R2 unavailable')
+        return version
+
+    cache = TieredCache(version=flaky_source, version_refresh_seconds=0.05)
+    cache.set('results', 'exam', {'snomed_id': '123'})
+    time.sleep(0.06)
+    # The refresh fails: the version and its entries survive
+    assert cache.version == 'v1'
+    assert cache.get('results', 'exam') == {'snomed_id': '123'}
+
+def test_refresh_version_clears_memory_on_change():
+    """An explicit refresh picks up a new version and drops entries from the old one."""
+    current = {'version': 'v1'}
+    cache = TieredCache(version=lambda: current['version'])
+    cache.set('results', 'exam', {'snomed_id': '123'})
+    current['version'] = 'v2'
+    assert cache.version == 'v1'  # not re-resolved per call
+    assert cache.refresh_version() == 'v2'
+    assert cache.get('results', 'exam') is None
+    assert cache.stats()['entries'] == 0
+
+if __name__ == "__main__":
+    test_lru_eviction_and_stats()
+    test_ttl_and_byte_budget()
+    test_sqlite_tier_persists_across_instances()
+    test_version_resolved_once_and_fallback_memoized()
+    test_refresh_version_clears_memory_on_change()
+    print("\nAll tiered cache tests passed")
@@ -0,0 +1,227 @@
+#!/usr/bin/env python3
+"""
+Offline replay benchmark for the secondary ensemble.
+
+Replays saved primary results (a batch results JSONL, or a JSON list / {'results': [...]})
+through SecondaryPipeline for every combination of --concurrency and --quorum,
+against the local stub OpenRouter server (stub_openrouter.py) or --base-url.
+For each run it reports throughput, exam latency p50/p95/p99 (time until each
+exam's ensemble result was final), per-call latency, completions, prompt and
+cached prompt tokens recorded, candidate encoding savings and, with the in-process stub,
+HTTP requests by outcome (including client retries and calls cancelled after quorum).
+
+The result cache is disabled unless --use-cache, so repeated exam names are
+adjudicated every time. Rate limits are the configured rate_limits section.
+
+Examples:
+  # Three models with the default stub profile, concurrency sweep with and without quorum
+  python3 benchmark_secondary.py results_batch.jsonl --concurrency 1,5,10 --quorum off,on
+
+  # Per-model latency/error profiles and a JSON report
+  python3 benchmark_secondary.py results_batch.jsonl --profiles stub_profiles.yaml --output bench.json
+"""
+
+import argparse
+import copy
+import json
+import os
+import statistics
+import sys
+import time
+from pathlib import Path
+from typing import Dict, List
+
+import yaml
+
+# Add backend directory to path for imports
+backend_dir = Path(__file__).parent.parent
+sys.path.insert(0, str(backend_dir))
+sys.path.insert(0, str(Path(__file__).parent))
+
+from stub_openrouter import load_profiles, start_stub_server, stub_base_url
+
+
+def load_results(paths: List[str]) -> List[Dict]:
+    """Primary results from JSONL batch files or JSON files (list or {'results': [...]})."""
+    results = []
+    for path in paths:
+        with open(path, 'r', encoding='utf-8') as f:
+            if path.endswith('.jsonl'):
+                results.extend(json.loads(line) for line in f if line.strip())
+                continue
+            data = json.load(f)
+        results.extend(data.get('results', []) if isinstance(data, dict) else data)
+    return results
+
+
+def percentile(values: List[float], pct: float) -> float:
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(len(ordered) * pct / 100.0))]
+
+
+def _latency_summary(values: List[float]) -> Dict:
+    return {
+        'mean_ms': round(statistics.mean(values) * 1000, 1) if values else 0.0,
+        'p50_ms': round(percentile(values, 50) * 1000, 1),
+        'p95_ms': round(percentile(values, 95) * 1000, 1),
+        'p99_ms': round(percentile(values, 99) * 1000, 1),
+    }
+
+
+def _stats_delta(before: Dict, after: Dict) -> Dict:
+    delta = {}
+    for model, counts in after.items():
+        previous = before.get(model, {})
+        delta[model] = {outcome: count - previous.get(outcome, 0) for outcome, count in counts.items()}
+    return delta
+
+
+def run_benchmark(base_config: Dict, results: List[Dict], concurrency: int, quorum: bool,
+                  use_cache: bool = False, stub=None, candidate_encoding: str = None) -> Dict:
+    """Replay `results` through a fresh SecondaryPipeline and measure the run."""
+    from async_runtime import run_coroutine
+    from llm_usage import UsageBudget, run_with_budget
+    from secondary_pipeline import SecondaryPipeline
+
+    config = copy.deepcopy(base_config)
+    pipeline_config = config.setdefault('secondary_pipeline', {})
+    pipeline_config['max_concurrent_requests'] = concurrency
+    pipeline_config['quorum'] = {**(pipeline_config.get('quorum') or {}), 'enabled': quorum}
+    pipeline_config['result_cache'] = {**(pipeline_config.get('result_cache') or {}), 'enabled': use_cache}
+    if candidate_encoding:
+        pipeline_config['candidates'] = {**(pipeline_config.get('candidates') or {}), 'encoding': candidate_encoding}
+
+    pipeline = SecondaryPipeline(preloaded_config=config)
+    budget = UsageBudget()
+    stub_before = stub.state.stats() if stub else {}
+
+    async def replay():
+        return [result async for result in pipeline.stream_low_confidence_results(results)]
+
+    started = time.perf_counter()
+    try:
+        ensemble_results = run_with_budget(budget, run_coroutine, replay())
+    finally:
+        run_coroutine(pipeline.ensemble.aclose())
+    wall_seconds = time.perf_counter() - started
+
+    exam_latencies = [max((r.processing_time for r in result.model_responses), default=0.0)
+                      for result in ensemble_results if not result.cached]
+    call_latencies = [r.processing_time for result in ensemble_results if not result.cached
+                      for r in result.model_responses]
+    failed_calls = sum(1 for result in ensemble_results if not result.cached
+                       for r in result.model_responses if not r.raw_response)
+    usage = budget.summary()
+
+    report = {
+        'max_concurrent_requests': concurrency,
+        'quorum': quorum,
+        'exams': len(ensemble_results),
+        'wall_seconds': round(wall_seconds, 2),
+        'throughput_exams_per_s': round(len(ensemble_results) / wall_seconds, 2) if wall_seconds else 0.0,
+        'exam_latency': _latency_summary(exam_latencies),
+        'call_latency': _latency_summary(call_latencies),
+        'completions': usage['calls'],
+        'failed_calls': failed_calls,
+        'unanswered_calls': sum(len(result.unanswered_models) for result in ensemble_results),
+        'prompt_tokens': usage['prompt_tokens'],
+        'cached_prompt_tokens': usage['cached_prompt_tokens'],
+        'completion_tokens': usage['completion_tokens'],
+        'candidate_encoding': pipeline.ensemble.candidate_encoding_stats(),
+        'improved': sum(1 for result in ensemble_results if result.improved),
+    }
+    if stub:
+        stub.state.wait_idle()
+        report['http_requests'] = _stats_delta(stub_before, stub.state.stats())
+    return report
+
+
+def print_report(runs: List[Dict]):
+    print("=" * 131)
+    print(f"{'conc':>5} {'quorum':>6} {'exams':>6} {'wall s':>8} {'exam/s':>7} "
+          f"{'p50 ms':>8} {'p95 ms':>8} {'p99 ms':>8} {'calls':>6} {'failed':>6} {'unans':>7} {'429s':>5} {'prompt tok':>11} {'cached':>8}")
+    print("-" * 131)
+    for run in runs:
+        latency = run['exam_latency']
+        rate_limited = sum(counts.get('rate_limited', 0) for counts in run.get('http_requests', {}).values())
+        print(f"{run['max_concurrent_requests']:>5} {'on' if run['quorum'] else 'off':>6} {run['exams']:>6} "
+              f"{run['wall_seconds']:>8.2f} {run['throughput_exams_per_s']:>7.2f} "
+              f"{latency['p50_ms']:>8.0f} {latency['p95_ms']:>8.0f} {latency['p99_ms']:>8.0f} "
+              f"{run['completions']:>6} {run['failed_calls']:>6} {run['unanswered_calls']:>7} {rate_limited:>5} {run['prompt_tokens']:>11} {run['cached_prompt_tokens']:>8}")
+    print("=" * 131)
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description='Replay saved low-confidence results through the secondary ensemble',
+        formatter_class=argparse.RawDescriptionHelpFormatter,
+        epilog=__doc__.split('Examples:', 1)[1] if 'Examples:' in __doc__ else None,
+    )
+    parser.add_argument('batches', nargs='+', help='Saved primary results (.jsonl batch files or .json)')
+    parser.add_argument('--config', default=str(Path(__file__).parent / 'config' / 'config.yaml'),
+                        help='Config file providing the secondary_pipeline section')
+    parser.add_argument('--concurrency', default='1,5,10', help='Comma-separated max_concurrent_requests values')
+    parser.add_argument('--quorum', default='off,on', help='Comma-separated quorum settings (on/off)')
+    parser.add_argument('--models', help='Comma-separated model ids (default: configured models)')
+    parser.add_argument('--limit', type=int, help='Replay at most this many low-confidence results')
+    parser.add_argument('--all-results', action='store_true', help='Replay every result, not only low-confidence ones')
+    parser.add_argument('--use-cache', action='store_true', help='Keep the ensemble result cache enabled')
+    parser.add_argument('--candidate-encoding', choices=['compact', 'json'],
+                        help='Override secondary_pipeline.candidates.encoding (compare prompt tokens per run)')
+    parser.add_argument('--base-url', help='Benchmark against this endpoint instead of the in-process stub')
+    parser.add_argument('--profiles', help='Stub per-model latency/error profiles (YAML/JSON)')
+    parser.add_argument('--seed', type=int, default=0, help='Stub random seed')
+    parser.add_argument('--output', help='Write the run reports to this JSON file')
+    args = parser.parse_args()
+
+    with open(args.config, 'r') as f:
+        base_config = yaml.safe_load(f) or {}
+    pipeline_config = base_config.setdefault('secondary_pipeline', {})
+    if args.models:
+        pipeline_config['models'] = [model.strip() for model in args.models.split(',') if model.strip()]
+
+    results = load_results(args.batches)
+    if not args.all_results:
+        threshold = pipeline_config.get('confidence_threshold', 0.8)
+        results = [r for r in results
+                   if r.get('output', {}).get('components', {}).get('confidence', 1.0) < threshold]
+    if args.limit:
+        results = results[:args.limit]
+    if not results:
+        print("❌ No results to replay")
+        return 1
+
+    stub = None
+    if args.base_url:
+        pipeline_config['base_url'] = args.base_url
+    else:
+        stub = start_stub_server(load_profiles(args.profiles), seed=args.seed)
+        pipeline_config['base_url'] = stub_base_url(stub)
+        os.environ.setdefault('OPENROUTER_API_KEY', 'stub')
+    # The env override would otherwise win over the benchmark's endpoint
+    os.environ.pop('OPENROUTER_BASE_URL', None)
+
+    print(f"Replaying {len(results)} results against {pipeline_config['base_url']} "
+          f"with models: {', '.join(pipeline_config.get('models', []))}")
+
+    runs = []
+    for quorum in [value.strip().lower() in ('on', 'true', '1') for value in args.quorum.split(',')]:
+        for concurrency in [int(value) for value in args.concurrency.split(',')]:
+            print(f"  max_concurrent_requests={concurrency}, quorum={'on' if quorum else 'off'}...")
+            runs.append(run_benchmark(base_config, results, concurrency, quorum, args.use_cache, stub,
+                                      args.candidate_encoding))
+
+    print_report(runs)
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump({'results_replayed': len(results), 'runs': runs}, f, indent=2)
+        print(f"Saved report to {args.output}")
+    if stub:
+        stub.shutdown()
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
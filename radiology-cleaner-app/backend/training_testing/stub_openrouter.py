@@ -0,0 +1,279 @@
+#!/usr/bin/env python3
+"""
+Local stub of the OpenRouter chat-completions API for offline benchmarking.
+
+Answers POST /chat/completions (also under /api/v1) with the OpenAI response
+schema. Requests that force a tool (the ensemble's select_best_match) get a
+tool call choosing one of the candidates in the prompt. Each model has its own
+profile:
+
+    latency_ms:      {median: 900, sigma: 0.4}  # log-normal response time
+    error_rate:      0.01                       # fraction answered with HTTP 500
+    rate_limit_rate: 0.02                       # fraction answered with HTTP 429
+    retry_after:     1                          # Retry-After seconds on 429s
+    agreement:       0.85                       # chance of picking the first candidate
+    prompt_cache:    true                       # report repeated system+tools prefixes as cached
+
+Profiles come from a YAML/JSON file keyed by model id ('default' applies to
+unlisted models). GET /stats returns request counts per model and outcome;
+'cancelled' counts requests whose client hung up before the response was written.
+
+Usage:
+    python3 stub_openrouter.py --port 8765 --profiles profiles.yaml
+    OPENROUTER_BASE_URL=http://127.0.0.1:8765/api/v1 OPENROUTER_API_KEY=stub ...
+"""
+
+import argparse
+import json
+import random
+import re
+import threading
+import time
+import uuid
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Dict, List, Optional
+
+import yaml
+
+DEFAULT_PROFILE = {
+    'latency_ms': {'median': 900, 'sigma': 0.4},
+    'error_rate': 0.0,
+    'rate_limit_rate': 0.0,
+    'retry_after': 1,
+    'agreement': 0.85,
+    'prompt_cache': True,
+}
+
+# JSON candidates ("snomed_id": "123") or compact rows (C1|name|fsn|score)
+CANDIDATE_ID_PATTERN = re.compile(r'"snomed_id":\s*"?(\d+)|^(C\d+)\|', re.MULTILINE)
+
+
+def load_profiles(path: Optional[str]) -> Dict[str, Dict]:
+    """Per-model profiles from a YAML/JSON file (JSON is valid YAML)."""
+    if not path:
+        return {}
+    with open(path, 'r', encoding='utf-8') as f:
+        return yaml.safe_load(f) or {}
+
+
+def _estimate_tokens(text: str) -> int:
+    return max(1, len(text) // 4)
+
+
+class StubState:
+    """Profiles, seeded RNG and request counters shared by the handler threads."""
+
+    def __init__(self, profiles: Optional[Dict[str, Dict]] = None, seed: Optional[int] = None):
+        self.profiles = profiles or {}
+        self.random = random.Random(seed)
+        self.counts: Dict[str, Dict[str, int]] = {}
+        self.seen_prefixes = set()
+        self.active = 0
+        self._lock = threading.Lock()
+        self._idle = threading.Condition(self._lock)
+
+    def profile(self, model: str) -> Dict:
+        profile = dict(DEFAULT_PROFILE)
+        profile.update(self.profiles.get('default', {}) or {})
+        profile.update(self.profiles.get(model, {}) or {})
+        return profile
+
+    def draw(self, model: str):
+        """Outcome ('ok', 'error' or 'rate_limited') and latency in seconds for one request."""
+        profile = self.profile(model)
+        latency = profile.get('latency_ms', {}) or {}
+        with self._lock:
+            roll = self.random.random()
+            seconds = self.random.lognormvariate(0.0, latency.get('sigma', 0.4)) * latency.get('median', 900) / 1000.0
+            pick = self.random.random()
+        if roll < profile['rate_limit_rate']:
+            return 'rate_limited', 0.0, pick
+        if roll < profile['rate_limit_rate'] + profile['error_rate']:
+            return 'error', seconds, pick
+        return 'ok', seconds, pick
+
+    def cached_prefix_tokens(self, model: str, body: Dict) -> int:
+        """Tokens of the system+tools prefix if this model has seen it before (a provider cache hit)."""
+        if not self.profile(model).get('prompt_cache', True):
+            return 0
+        prefix = json.dumps([body.get('tools', []), [m for m in body.get('messages', []) if m.get('role') == 'system']],
+                            sort_keys=True)
+        key = (model, hash(prefix))
+        with self._lock:
+            hit = key in self.seen_prefixes
+            self.seen_prefixes.add(key)
+        return _estimate_tokens(prefix) if hit else 0
+
+    def start(self):
+        with self._lock:
+            self.active += 1
+
+    def count(self, model: str, outcome: str):
+        """Record a finished request (outcomes are counted once the response is written or abandoned)."""
+        with self._lock:
+            model_counts = self.counts.setdefault(model, {})
+            model_counts[outcome] = model_counts.get(outcome, 0) + 1
+            self.active -= 1
+            self._idle.notify_all()
+
+    def wait_idle(self, timeout: float = 30.0) -> bool:
+        """Wait for requests still being answered (e.g. calls the client already cancelled) to be counted."""
+        with self._lock:
+            return self._idle.wait_for(lambda: self.active == 0, timeout=timeout)
+
+    def stats(self) -> Dict:
+        with self._lock:
+            return {model: dict(counts) for model, counts in self.counts.items()}
+
+
+def candidate_ids(messages: List[Dict]) -> List[str]:
+    """Candidate ids (SNOMED or compact short ids) listed in the user message, in prompt order."""
+    text = '\n'.join(str(m.get('content', '')) for m in messages if m.get('role') == 'user')
+    return [snomed_id or short_id for snomed_id, short_id in CANDIDATE_ID_PATTERN.findall(text)]
+
+
+def completion_response(model: str, body: Dict, pick: float, agreement: float, cached_tokens: int = 0) -> Dict:
+    messages = body.get('messages', [])
+    prompt_text = json.dumps(messages) + json.dumps(body.get('tools', []))
+    ids = candidate_ids(messages)
+    if not ids:
+        choice_id = None
+    elif pick < agreement or len(ids) == 1:
+        choice_id = ids[0]
+    else:
+        choice_id = ids[1 + int(pick * 1000) % (len(ids) - 1)]
+
+    arguments = json.dumps({
+        'best_match_snomed_id': choice_id,
+        'best_match_procedure_name': f"Stub procedure {choice_id}" if choice_id else None,
+        'confidence': 0.9 if choice_id else 0.0,
+        'reasoning': 'Stub response for offline benchmarking.',
+    })
+    if body.get('tools'):
+        message = {
+            'role': 'assistant',
+            'content': None,
+            'tool_calls': [{
+                'id': f"call_{uuid.uuid4().hex[:12]}",
+                'type': 'function',
+                'function': {'name': body['tools'][0]['function']['name'], 'arguments': arguments},
+            }],
+        }
+        finish_reason = 'tool_calls'
+    else:
+        message = {'role': 'assistant', 'content': arguments}
+        finish_reason = 'stop'
+
+    completion_tokens = _estimate_tokens(arguments)
+    prompt_tokens = _estimate_tokens(prompt_text)
+    return {
+        'id': f"gen-{uuid.uuid4().hex[:16]}",
+        'object': 'chat.completion',
+        'created': int(time.time()),
+        'model': model,
+        'choices': [{'index': 0, 'message': message, 'finish_reason': finish_reason}],
+        'usage': {
+            'prompt_tokens': prompt_tokens,
+            'completion_tokens': completion_tokens,
+            'total_tokens': prompt_tokens + completion_tokens,
+            'prompt_tokens_details': {'cached_tokens': min(cached_tokens, prompt_tokens)},
+        },
+    }
+
+
+class StubHandler(BaseHTTPRequestHandler):
+    protocol_version = 'HTTP/1.1'  # keep-alive, like the real API
+
+    @property
+    def state(self) -> StubState:
+        return self.server.state
+
+    def log_message(self, format, *args):
+        pass
+
+    def _send_json(self, status: int, payload: Dict, headers: Optional[Dict] = None) -> bool:
+        """Write a JSON response; False if the client hung up first (e.g. a call cancelled after quorum)."""
+        data = json.dumps(payload).encode('utf-8')
+        try:
+            self.send_response(status)
+            self.send_header('Content-Type', 'application/json')
+            self.send_header('Content-Length', str(len(data)))
+            for name, value in (headers or {}).items():
+                self.send_header(name, value)
+            self.end_headers()
+            self.wfile.write(data)
+            self.wfile.flush()
+        except (BrokenPipeError, ConnectionResetError):
+            self.close_connection = True
+            return False
+        return True
+
+    def do_GET(self):
+        if self.path.rstrip('/').endswith('/stats'):
+            self._send_json(200, self.state.stats())
+        else:
+            self._send_json(404, {'error': {'message': 'Not found'}})
+
+    def do_POST(self):
+        length = int(self.headers.get('Content-Length', 0))
+        body = self.rfile.read(length)
+        if not self.path.rstrip('/').endswith('/chat/completions'):
+            self._send_json(404, {'error': {'message': 'Not found'}})
+            return
+        try:
+            request = json.loads(body or b'{}')
+        except json.JSONDecodeError:
+            self._send_json(400, {'error': {'message': 'Invalid JSON'}})
+            return
+
+        model = request.get('model', 'unknown')
+        self.state.start()
+        outcome, seconds, pick = self.state.draw(model)
+        profile = self.state.profile(model)
+        time.sleep(seconds)
+
+        if outcome == 'rate_limited':
+            delivered = self._send_json(429, {'error': {'message': 'Rate limit exceeded (stub)', 'code': 429}},
+                                        headers={'Retry-After': str(profile['retry_after'])})
+        elif outcome == 'error':
+            delivered = self._send_json(500, {'error': {'message': 'Upstream error (stub)', 'code': 500}})
+        else:
+            cached_tokens = self.state.cached_prefix_tokens(model, request)
+            delivered = self._send_json(200, completion_response(model, request, pick, profile['agreement'], cached_tokens))
+        self.state.count(model, outcome if delivered else 'cancelled')
+
+
+def start_stub_server(profiles: Optional[Dict[str, Dict]] = None, host: str = '127.0.0.1', port: int = 0,
+                      seed: Optional[int] = None) -> ThreadingHTTPServer:
+    """Start the stub in a daemon thread; port 0 picks a free port (see server.server_address)."""
+    server = ThreadingHTTPServer((host, port), StubHandler)
+    server.daemon_threads = True
+    server.state = StubState(profiles, seed)
+    threading.Thread(target=server.serve_forever, name='stub-openrouter', daemon=True).start()
+    return server
+
+
+def stub_base_url(server: ThreadingHTTPServer) -> str:
+    host, port = server.server_address[:2]
+    return f"http://{host}:{port}/api/v1"
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Stub OpenRouter chat-completions server for offline benchmarks')
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=8765)
+    parser.add_argument('--profiles', help='YAML/JSON file of per-model latency and error profiles')
+    parser.add_argument('--seed', type=int, help='Random seed for reproducible runs')
+    args = parser.parse_args()
+
+    server = start_stub_server(load_profiles(args.profiles), args.host, args.port, args.seed)
+    print(f"Stub OpenRouter listening on {stub_base_url(server)} (Ctrl+C to stop)")
+    try:
+        while True:
+            time.sleep(3600)
+    except KeyboardInterrupt:
+        server.shutdown()
+
+
+if __name__ == '__main__':
+    main()